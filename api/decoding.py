@@ -0,0 +1,260 @@
+import json
+import re
+
+# orjson is optional; it parses several times faster than the standard library
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# Structural characters of a JSON document; everything between them is skipped at C speed
+_STRUCTURAL = re.compile(rb'[\[\]{}",\\]')
+
+def loads(data):
+    """
+    Decodes a JSON document from bytes or str, with orjson when it's installed.
+    """
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+def to_number(value, default=None) -> float | None:
+    """
+    Casts a payload number (or numeric string) to float, or returns `default`
+    for anything else, including null and booleans.
+    """
+    if value is None or isinstance(value, bool):
+        return default
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return default
+
+def _text(value) -> str | None:
+    return value if isinstance(value, str) and value else None
+
+class ArraySplitter:
+    """
+    Incremental splitter for a JSON document whose top level is an array.
+    feed() takes the body in chunks of any size and returns the raw bytes of
+    each element completed so far, so elements can be decoded (and dropped)
+    one at a time instead of materialising the whole list.
+    """
+
+    __slots__ = ("_buffer", "_position", "_depth", "_in_string", "_escaped_at", "_item_start", "done")
+
+    def __init__(self):
+        self._buffer = b""
+        self._position = 0
+        self._depth = 0
+        self._in_string = False
+        self._escaped_at = -1
+        self._item_start = None
+        self.done = False
+
+    def feed(self, chunk: bytes) -> list[bytes]:
+        if self.done:
+            return []
+        buffer = self._buffer = self._buffer + chunk
+        items = []
+        last_end = None
+        for match in _STRUCTURAL.finditer(buffer, self._position):
+            index = match.start()
+            char = buffer[index]
+            if self._in_string:
+                if index == self._escaped_at:
+                    continue
+                if char == 0x5C:  # backslash escapes the next byte
+                    self._escaped_at = index + 1
+                elif char == 0x22:  # closing quote
+                    self._in_string = False
+                continue
+            if char == 0x22:
+                self._in_string = True
+            elif char in (0x5B, 0x7B):  # [ {
+                self._depth += 1
+                if self._depth == 1:
+                    if char != 0x5B:
+                        raise ValueError("Expected a JSON array")
+                    self._item_start = index + 1
+            elif char in (0x5D, 0x7D):  # ] }
+                if self._depth == 1:
+                    item = buffer[self._item_start:index].strip()
+                    if item:
+                        items.append(item)
+                    self.done = True
+                    self._buffer = b""
+                    return items
+                self._depth -= 1
+            elif char == 0x2C and self._depth == 1:  # , between elements
+                items.append(buffer[self._item_start:index].strip())
+                self._item_start = index + 1
+                last_end = index + 1
+        # Keep only the unfinished element (drop the bytes already handed out)
+        if last_end is not None:
+            self._buffer = buffer[last_end:]
+            self._item_start -= last_end
+            self._escaped_at -= last_end
+            self._position = len(self._buffer)
+        else:
+            self._position = len(buffer)
+        return items
+
+def iter_array(data: bytes, decode=loads):
+    """
+    Yields the decoded elements of a JSON array body one at a time.
+    Args:
+        data (bytes): The response body.
+        decode: Turns one element's bytes into the value to yield.
+    """
+    splitter = ArraySplitter()
+    for item in splitter.feed(data):
+        yield decode(item)
+
+async def aiter_array(chunks, decode=loads):
+    """
+    Like iter_array, but for a body arriving as an async iterator of byte chunks
+    (e.g. httpx's Response.aiter_bytes()), so elements are decoded as they arrive.
+    """
+    splitter = ArraySplitter()
+    async for chunk in chunks:
+        for item in splitter.feed(chunk):
+            yield decode(item)
+        if splitter.done:
+            return
+
+class _Record:
+    """
+    Compact read-only view of the fields we use from one payload object.
+    Only the declared fields are kept (everything else in the payload is
+    dropped with the decoded dict), and each is validated/cast lazily on
+    first read, so fields nobody looks at cost nothing. get() reads like
+    dict.get under the provider's own key names, so code written against
+    the raw dicts keeps working.
+    """
+
+    __slots__ = ("_raw",)
+    # Provider key -> (attribute, converter), in declaration order
+    FIELDS: dict = {}
+
+    def __init_subclass__(cls):
+        super().__init_subclass__()
+        cls._KEYS = tuple(cls.FIELDS)
+        cls._INDEX = {}
+        for position, (key, (attribute, convert)) in enumerate(cls.FIELDS.items()):
+            cls._INDEX[key] = cls._INDEX[attribute] = (position, convert)
+
+    @classmethod
+    def from_dict(cls, data: dict):
+        record = cls.__new__(cls)
+        record._raw = tuple(map(data.get, cls._KEYS))
+        return record
+
+    @classmethod
+    def from_json(cls, data: bytes):
+        return cls.from_dict(loads(data))
+
+    def get(self, key: str, default=None):
+        field = self._INDEX.get(key)
+        if field is None:
+            return default
+        value = field[1](self._raw[field[0]])
+        return default if value is None else value
+
+    def __getattr__(self, attribute: str):
+        if attribute not in self._INDEX:
+            raise AttributeError(attribute)
+        return self.get(attribute)
+
+    def __getitem__(self, key: str):
+        # Declared fields always exist (None when null or absent in the payload), like dict keys
+        if key not in self._INDEX:
+            raise KeyError(key)
+        return self.get(key)
+
+    def raw_values(self) -> tuple:
+        """
+        Every field's raw (unconverted) value in declaration order, e.g. for hashing the record's content.
+        """
+        return self._raw
+
+    def to_dict(self) -> dict:
+        return {key: self.get(key) for key in self._KEYS}
+
+    def __repr__(self):
+        fields = ", ".join(f"{attribute}={self.get(attribute)!r}" for attribute, _ in self.FIELDS.values())
+        return f"{type(self).__name__}({fields})"
+
+_POSITION_FIELDS = ("wallet", "first_buy_time", "last_buy_time", "first_sell_time", "last_sell_time",
+                    "last_transaction_time", "last_trade_time", "realized", "unrealized", "total",
+                    "total_invested", "buy_transactions", "sell_transactions", "total_transactions")
+
+class PositionRecord(_Record):
+    """
+    One wallet's position in one token, as reported by Solana Tracker in
+    /first-buyers entries and in the 'tokens' of /pnl. Times are epoch ms.
+    """
+
+    __slots__ = ()
+    FIELDS = {name: (name, _text if name == "wallet" else to_number) for name in _POSITION_FIELDS}
+
+class HolderRecord(_Record):
+    """
+    One entry of Moralis /token/mainnet/holders.
+    """
+
+    __slots__ = ()
+    FIELDS = {
+        "ownerAddress": ("owner_address", _text),
+        "balanceFormatted": ("balance", to_number),
+        "usdValue": ("usd_value", to_number),
+        "percentageRelativeToTotalSupply": ("supply_percentage", to_number),
+    }
+
+def decode_first_buyers(data: bytes):
+    """
+    Decodes a /first-buyers body into PositionRecords. The body is parsed in one
+    go (much faster than splitting it element by element once it's in memory);
+    each entry's dict is dropped as soon as its record holds the fields we use.
+    Returns:
+        list[PositionRecord] | object: The records, or the decoded body as-is if it isn't a list.
+    """
+    payload = loads(data)
+    if not isinstance(payload, list):
+        return payload
+    return [PositionRecord.from_dict(buyer) for buyer in payload if isinstance(buyer, dict)]
+
+def _position_record(item: bytes):
+    buyer = loads(item)
+    return PositionRecord.from_dict(buyer) if isinstance(buyer, dict) else None
+
+async def adecode_first_buyers(chunks):
+    """
+    Like decode_first_buyers, but for a body arriving as an async iterator of
+    byte chunks: each entry becomes a PositionRecord as soon as it's complete,
+    so neither the whole body nor every entry's dict is held at once.
+    Returns:
+        list[PositionRecord]: The records.
+    Raises:
+        ValueError: If the body isn't a JSON array.
+    """
+    return [record async for record in aiter_array(chunks, _position_record) if record is not None]
+
+def decode_wallet_pnl(data: bytes):
+    """
+    Decodes a /pnl body, turning each entry of 'tokens' into a PositionRecord.
+    """
+    payload = loads(data)
+    if isinstance(payload, dict) and isinstance(payload.get("tokens"), dict):
+        payload["tokens"] = {mint: PositionRecord.from_dict(token) for mint, token in payload["tokens"].items()
+                             if isinstance(token, dict)}
+    return payload
+
+def decode_token_holders(data: bytes):
+    """
+    Decodes a Moralis holders body, turning each entry of 'result' into a HolderRecord.
+    """
+    payload = loads(data)
+    if isinstance(payload, dict) and isinstance(payload.get("result"), list):
+        payload["result"] = [HolderRecord.from_dict(holder) for holder in payload["result"] if isinstance(holder, dict)]
+    return payload
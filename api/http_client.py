@@ -0,0 +1,229 @@
+import asyncio
+import logging
+import time
+import httpx
+from api import decoding, rate_limiter
+from api.recorder import recorder
+from telemetry import metrics
+from telemetry.logs import event, get_logger
+from config.settings import (
+    SOLANA_TRACKER_API_KEY, SOLANA_TRACKER_BASE_URL,
+    MORALIS_API_KEY, MORALIS_BASE_URL,
+    HTTP_TIMEOUT_SECONDS, HTTP_CONNECT_TIMEOUT_SECONDS,
+    HTTP_MAX_CONNECTIONS, HTTP_MAX_KEEPALIVE_CONNECTIONS, HTTP_KEEPALIVE_EXPIRY_SECONDS,
+    HTTP2_ENABLED, HTTP_MAX_RETRIES, HTTP_BACKOFF_MAX_SECONDS, HTTP_STREAM_DECODE_MIN_BYTES,
+)
+
+SOLANA_TRACKER = "solana_tracker"
+MORALIS = "moralis"
+
+# Per-provider connection settings. Each provider gets its own pooled client so
+# base URLs and auth headers never leak between them.
+PROVIDERS = {
+    SOLANA_TRACKER: {
+        "base_url": SOLANA_TRACKER_BASE_URL,
+        "headers": {"x-api-key": SOLANA_TRACKER_API_KEY or ""},
+    },
+    MORALIS: {
+        "base_url": MORALIS_BASE_URL,
+        "headers": {"X-API-Key": MORALIS_API_KEY or "", "accept": "application/json"},
+    },
+}
+
+logger = get_logger(__name__)
+
+_REQUEST_SECONDS = metrics.histogram(
+    "vector_http_request_duration_seconds", "Provider request latency per attempt.", ("provider", "endpoint", "status"))
+_REQUESTS = metrics.counter(
+    "vector_http_requests_total", "Provider request attempts by response status.", ("provider", "endpoint", "status"))
+_RETRIES = metrics.counter(
+    "vector_http_retries_total", "Provider requests retried, by reason.", ("provider", "endpoint", "reason"))
+
+# Shared clients, created lazily on first use and reused for every request
+_clients: dict[str, httpx.AsyncClient] = {}
+# Optional custom transports per provider (e.g. mock servers for benchmarks)
+_transports: dict[str, httpx.AsyncBaseTransport] = {}
+
+def _http2_available() -> bool:
+    """
+    Returns True if HTTP/2 is enabled in settings and the 'h2' package is installed.
+    """
+    if not HTTP2_ENABLED:
+        return False
+    try:
+        import h2  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+def get_client(provider: str) -> httpx.AsyncClient:
+    """
+    Returns the shared async HTTP client for a provider, creating it on first use.
+    The client keeps connections alive between calls, so repeated requests to the
+    same provider reuse the existing TCP+TLS connection.
+    Args:
+        provider (str): One of the keys in PROVIDERS (e.g., "solana_tracker", "moralis").
+    Returns:
+        httpx.AsyncClient: The pooled client for that provider.
+    """
+    client = _clients.get(provider)
+    if client is None or client.is_closed:
+        config = PROVIDERS[provider]
+        client = httpx.AsyncClient(
+            base_url=config["base_url"],
+            headers=config["headers"],
+            http2=_http2_available(),
+            transport=_transports.get(provider),
+            timeout=httpx.Timeout(HTTP_TIMEOUT_SECONDS, connect=HTTP_CONNECT_TIMEOUT_SECONDS),
+            limits=httpx.Limits(
+                max_connections=HTTP_MAX_CONNECTIONS,
+                max_keepalive_connections=HTTP_MAX_KEEPALIVE_CONNECTIONS,
+                keepalive_expiry=HTTP_KEEPALIVE_EXPIRY_SECONDS,
+            ),
+        )
+        _clients[provider] = client
+    return client
+
+def set_transport(provider: str, transport: httpx.AsyncBaseTransport | None):
+    """
+    Routes a provider's requests through a custom httpx transport (or back to
+    the network if None). Any existing client for the provider is replaced on next use.
+    Args:
+        provider (str): The provider key in PROVIDERS.
+        transport (httpx.AsyncBaseTransport | None): The transport to use.
+    """
+    if transport is None:
+        _transports.pop(provider, None)
+    else:
+        _transports[provider] = transport
+    client = _clients.pop(provider, None)
+    if client is not None and not client.is_closed:
+        # Close in the background; in-flight requests on the old client may still finish
+        try:
+            asyncio.get_running_loop().create_task(client.aclose())
+        except RuntimeError:
+            pass
+
+async def get_json(provider: str, path: str, params: dict = None, endpoint: str = None, decode=None,
+                   stream_decode=None):
+    """
+    Sends a GET request to a provider and returns the decoded JSON body.
+    Every attempt goes through the provider's rate limiter first. 429 and 5xx
+    responses are retried with jittered exponential backoff (honouring Retry-After);
+    any other HTTP error is raised as an httpx exception so callers can report it.
+    Args:
+        provider (str): The provider key in PROVIDERS.
+        path (str): The request path, relative to the provider's base URL.
+        params (dict, optional): Query string parameters.
+        endpoint (str, optional): The endpoint name, used for quota cost accounting.
+        decode (callable, optional): Turns the raw response bytes into the return value
+            (e.g. one of the api.decoding decoders). Defaults to plain JSON decoding.
+        stream_decode (callable, optional): async (chunks) -> value, used instead of `decode` for
+            bodies of at least HTTP_STREAM_DECODE_MIN_BYTES (or of unknown length), so they're
+            decoded as they arrive. A connection lost mid-body isn't retried.
+    Returns:
+        The decoded JSON body.
+    Raises:
+        rate_limiter.QuotaExceededError: If the provider's daily quota is used up.
+    """
+    return await _request_json(provider, "GET", path, params=params, endpoint=endpoint, decode=decode,
+                               stream_decode=stream_decode)
+
+async def post_json(provider: str, path: str, body, params: dict = None, endpoint: str = None, decode=None):
+    """
+    Sends a POST request with a JSON body and returns the decoded JSON response.
+    Rate limiting, retries and errors work as in get_json().
+    Args:
+        provider (str): The provider key in PROVIDERS.
+        path (str): The request path, relative to the provider's base URL.
+        body: The JSON-serialisable request body.
+        params (dict, optional): Query string parameters.
+        endpoint (str, optional): The endpoint name, used for quota cost accounting.
+        decode (callable, optional): Turns the raw response bytes into the return value.
+    Returns:
+        The decoded JSON body.
+    """
+    return await _request_json(provider, "POST", path, params=params, body=body, endpoint=endpoint, decode=decode)
+
+def _stream_body(response: httpx.Response) -> bool:
+    length = response.headers.get("content-length")
+    return not (length and length.isdigit() and int(length) < HTTP_STREAM_DECODE_MIN_BYTES)
+
+async def _request_json(provider: str, method: str, path: str, params: dict = None, body=None, endpoint: str = None,
+                        decode=None, stream_decode=None):
+    decode = decode or decoding.loads
+    if recorder.replaying:
+        # Served from the archive: no network, no rate limiting, no quota spent
+        response = await recorder.replay(provider, method, path, params, body, endpoint, PROVIDERS[provider]["base_url"])
+        response.raise_for_status()
+        return decode(response.content)
+
+    client = get_client(provider)
+    attempt = 0
+    while True:
+        await rate_limiter.acquire(provider, endpoint, retry=attempt > 0)
+        sent_at = time.time()
+        started = time.perf_counter()
+        try:
+            # Streamed responses hand back headers first; the body is read (or decoded as it arrives) below
+            response = await client.send(client.build_request(method, path, params=params, json=body),
+                                         stream=stream_decode is not None)
+        except httpx.TransportError as e:
+            _observe(provider, endpoint, "error", started)
+            attempt += 1
+            if attempt > HTTP_MAX_RETRIES:
+                raise
+            _retry(provider, endpoint, "transport", attempt, error=type(e).__name__)
+            await asyncio.sleep(rate_limiter.backoff_delay(attempt))
+            continue
+        _observe(provider, endpoint, response.status_code, started)
+
+        if response.status_code in rate_limiter.RETRYABLE_STATUS_CODES:
+            retry_after = rate_limiter.parse_retry_after(response.headers.get("Retry-After"))
+            attempt += 1
+            # Give up early rather than spend quota on a retry we'd have to wait too long for
+            if attempt <= HTTP_MAX_RETRIES and (retry_after is None or retry_after <= HTTP_BACKOFF_MAX_SECONDS):
+                await response.aclose()
+                if response.status_code == 429:
+                    # The paused bucket enforces Retry-After for every caller; just add jitter
+                    rate_limiter.record_throttle(provider, retry_after)
+                    _retry(provider, endpoint, "throttled", attempt, retry_after=retry_after)
+                    await asyncio.sleep(rate_limiter.backoff_delay(attempt))
+                else:
+                    _retry(provider, endpoint, "server_error", attempt, status=response.status_code)
+                    await asyncio.sleep(rate_limiter.backoff_delay(attempt, retry_after))
+                continue
+
+        if stream_decode is not None:
+            if response.is_success and not recorder.recording and _stream_body(response):
+                try:
+                    return await stream_decode(response.aiter_bytes())
+                finally:
+                    await response.aclose()
+            await response.aread()
+        if recorder.recording:
+            recorder.record(provider, method, path, params, body, endpoint, response, sent_at, time.perf_counter() - started)
+        response.raise_for_status()  # Raise an exception for HTTP errors (4xx or 5xx)
+        # Decode straight from the body bytes (JSON is UTF-8), skipping httpx's text decoding
+        return decode(response.content)
+
+def _observe(provider: str, endpoint: str | None, status, started: float):
+    elapsed = time.perf_counter() - started
+    _REQUEST_SECONDS.observe(elapsed, provider=provider, endpoint=endpoint, status=status)
+    _REQUESTS.inc(provider=provider, endpoint=endpoint, status=status)
+    event(logger, logging.DEBUG, "http_request", provider=provider, endpoint=endpoint,
+          status=status, ms=round(elapsed * 1000, 1))
+
+def _retry(provider: str, endpoint: str | None, reason: str, attempt: int, **fields):
+    _RETRIES.inc(provider=provider, endpoint=endpoint, reason=reason)
+    event(logger, logging.INFO if reason == "throttled" else logging.DEBUG, "http_retry",
+          provider=provider, endpoint=endpoint, reason=reason, attempt=attempt, **fields)
+
+async def close_clients():
+    """
+    Closes every shared client and releases its pooled connections.
+    This function should be called once before the application exits.
+    """
+    for client in _clients.values():
+        await client.aclose()
+    _clients.clear()
@@ -1,53 +1,64 @@
-import requests
-from config.settings import MORALIS_API_KEY, MORALIS_BASE_URL, MORALIS_V2_BASE_URL
-import time
-import asyncio # Needed for async functions
+import logging
+import httpx
+from api import decoding, http_client, rate_limiter
+from api.price_batcher import PriceBatcher, BatchUnsupportedError
+from telemetry.logs import event, get_logger
+from config.settings import (MORALIS_API_KEY, MORALIS_PRICE_BATCH_SIZE, MORALIS_PRICE_BATCH_WINDOW_SECONDS,
+                             MORALIS_PRICE_BATCH_RETRY_SECONDS)
+
+logger = get_logger(__name__)
+
+# Statuses meaning the batch price endpoint isn't available to us
+_BATCH_UNSUPPORTED_STATUSES = (400, 401, 403, 404, 405, 501)
 
 # Helper function for making Moralis API requests
-async def _make_moralis_request(url: str, params: dict = None) -> dict | None:
+async def _make_moralis_request(path: str, params: dict = None, endpoint: str = None, body=None,
+                                unsupported_statuses: tuple = (), decode=None, not_found=None) -> dict | None:
     """
     Internal helper to make requests to Moralis API.
-    Handles headers, basic error checking, and returns JSON data.
+    Uses the shared pooled client, which carries the auth headers and timeouts,
+    and returns JSON data.
+    Args:
+        path (str): The request path, relative to MORALIS_BASE_URL.
+        params (dict, optional): Query string parameters.
+        endpoint (str, optional): The endpoint name, used to charge its compute-unit cost.
+        body (optional): JSON body; if given, the request is sent as a POST.
+        unsupported_statuses (tuple): HTTP statuses raised as BatchUnsupportedError instead of logged.
+        decode (callable, optional): Decoder for the response bytes (see api.decoding).
+        not_found (optional): Returned instead of None when the API answers 404.
     """
     if not MORALIS_API_KEY:
-        print("Moralis API Key not found. Please set MORALIS_API_KEY in your.env file.")
+        event(logger, logging.ERROR, "api_key_missing", provider="moralis", setting="MORALIS_API_KEY")
         return None
 
-    headers = {
-        "X-API-Key": MORALIS_API_KEY,
-        "accept": "application/json"
-    }
-
     try:
-        # Using requests.get directly, but in an async context, it's better to use aiohttp
-        # For simplicity and "small win", we'll stick to requests for now,
-        # but be aware that requests is blocking and might cause issues in a large async app.
-        # For a true async app, you'd use a library like `aiohttp`.
-        # For now, we'll simulate async by just using `await asyncio.sleep(0.1)`
-        # to yield control, though the actual network call is blocking.
-        response = requests.get(url, headers=headers, params=params, timeout=10)
-        response.raise_for_status()  # Raise an exception for HTTP errors (4xx or 5xx)
-        data = response.json()
-        return data
-    except requests.exceptions.HTTPError as http_err:
-        print(f"HTTP error occurred: {http_err} - URL: {url} - Response: {http_err.response.text}")
+        if body is not None:
+            return await http_client.post_json(http_client.MORALIS, path, body, params, endpoint=endpoint, decode=decode)
+        return await http_client.get_json(http_client.MORALIS, path, params, endpoint=endpoint, decode=decode)
+    except rate_limiter.QuotaExceededError as quota_err:
+        event(logger, logging.WARNING, "quota_exceeded", path=path, error=quota_err)
         return None
-    except requests.exceptions.ConnectionError as conn_err:
-        print(f"Connection error occurred: {conn_err} - URL: {url}")
+    except httpx.HTTPStatusError as http_err:
+        if http_err.response.status_code in unsupported_statuses:
+            raise BatchUnsupportedError(f"{path} returned {http_err.response.status_code}") from http_err
+        if http_err.response.status_code == 404 and not_found is not None:
+            event(logger, logging.DEBUG, "not_found", path=path)
+            return not_found
+        event(logger, logging.WARNING, "http_error", path=path, status=http_err.response.status_code,
+              response=http_err.response.text[:200])
         return None
-    except requests.exceptions.Timeout as timeout_err:
-        print(f"Timeout error occurred: {timeout_err} - URL: {url}")
+    except httpx.ConnectError as conn_err:
+        event(logger, logging.WARNING, "connection_error", path=path, error=conn_err)
         return None
-    except requests.exceptions.RequestException as req_err:
-        print(f"An unexpected request error occurred: {req_err} - URL: {url}")
+    except httpx.TimeoutException as timeout_err:
+        event(logger, logging.WARNING, "timeout", path=path, error=type(timeout_err).__name__)
+        return None
+    except httpx.RequestError as req_err:
+        event(logger, logging.WARNING, "request_error", path=path, error=req_err)
         return None
     except Exception as e:
-        print(f"An unexpected error occurred: {e} - URL: {url}")
+        event(logger, logging.ERROR, "unexpected_error", path=path, exc_info=e)
         return None
-    finally:
-        # Add a small delay to respect API rate limits (Moralis Starter: 40,000 CU/day)
-        # This is a simple way to avoid hitting limits too quickly.
-        await asyncio.sleep(0.1) # Yield control in async context
 
 async def get_new_tokens_by_exchange(exchange: str = "Raydium", limit: int = 10) -> list | None:
     """
@@ -59,12 +70,11 @@ async def get_new_tokens_by_exchange(exchange: str = "Raydium", limit: int = 10)
     Returns:
         list | None: A list of new token dictionaries, or None if an error occurs.
     """
-    print(f"Fetching new tokens from {exchange}...")
-    url = f"{MORALIS_BASE_URL}/token/mainnet/exchange/{exchange}/new"
+    path = f"/token/mainnet/exchange/{exchange}/new"
     params = {"limit": limit}
-    response_data = await _make_moralis_request(url, params)
+    response_data = await _make_moralis_request(path, params, endpoint="new_tokens")
     if response_data and isinstance(response_data, list):
-        print(f"Found {len(response_data)} new tokens from {exchange}.")
+        event(logger, logging.DEBUG, "new_tokens_fetched", exchange=exchange, tokens=len(response_data))
         return response_data
     return None
 
@@ -76,14 +86,14 @@ async def get_token_top_holders(token_mint_address: str, limit: int = 10) -> lis
         token_mint_address (str): The mint address of the token.
         limit (int): Number of top holders to retrieve.
     Returns:
-        list | None: A list of holder dictionaries, or None.
+        list[HolderRecord] | None: The holders, or None.
     """
-    print(f"Fetching top holders for token: {token_mint_address}...")
-    url = f"{MORALIS_BASE_URL}/token/mainnet/holders/{token_mint_address}"
+    path = f"/token/mainnet/holders/{token_mint_address}"
     params = {"limit": limit}
-    response_data = await _make_moralis_request(url, params)
+    response_data = await _make_moralis_request(path, params, endpoint="token_holders",
+                                                decode=decoding.decode_token_holders)
     if response_data and isinstance(response_data, dict) and 'result' in response_data:
-        print(f"Found {len(response_data['result'])} top holders for {token_mint_address}.")
+        event(logger, logging.DEBUG, "top_holders_fetched", mint=token_mint_address, holders=len(response_data['result']))
         return response_data['result']
     return None
 
@@ -95,11 +105,9 @@ async def get_wallet_profitability(wallet_address: str) -> dict | None:
     Based on documentation, it's often part of the Wallet API.
     Let's use a common pattern for Moralis Wallet API.
     """
-    print(f"Fetching profitability for wallet: {wallet_address}...")
-    url = f"{MORALIS_BASE_URL}/account/mainnet/{wallet_address}/profitability"
-    response_data = await _make_moralis_request(url)
+    path = f"/account/mainnet/{wallet_address}/profitability"
+    response_data = await _make_moralis_request(path, endpoint="wallet_profitability")
     if response_data and isinstance(response_data, dict):
-        print(f"Successfully fetched profitability for {wallet_address}.")
         return response_data
     return None
 
@@ -107,24 +115,63 @@ async def get_token_metadata(token_mint_address: str) -> dict | None:
     """
     Retrieves metadata for a specific token.
     Moralis API: /token/:network/:address/metadata [2, 6]
+    Returns an empty dict if Moralis confirms the mint is unknown (404 or an empty payload),
+    and None if the request failed.
     """
-    print(f"Fetching token metadata for: {token_mint_address}...")
-    url = f"{MORALIS_BASE_URL}/token/mainnet/{token_mint_address}/metadata"
-    response_data = await _make_moralis_request(url)
-    if response_data and isinstance(response_data, dict):
-        print(f"Successfully fetched metadata for token: {token_mint_address}.")
+    path = f"/token/mainnet/{token_mint_address}/metadata"
+    response_data = await _make_moralis_request(path, endpoint="token_metadata", not_found={})
+    if isinstance(response_data, dict):
         return response_data
     return None
 
-async def get_token_price(token_mint_address: str) -> dict | None:
+async def _fetch_token_price(token_mint_address: str) -> dict | None:
     """
-    Retrieves the current price of a specific token.
+    Fetches one token's price with its own request.
     Moralis API: /token/:network/:address/price [2, 4]
     """
-    print(f"Fetching token price for: {token_mint_address}...")
-    url = f"{MORALIS_BASE_URL}/token/mainnet/{token_mint_address}/price"
-    response_data = await _make_moralis_request(url)
+    path = f"/token/mainnet/{token_mint_address}/price"
+    response_data = await _make_moralis_request(path, endpoint="token_price")
     if response_data and isinstance(response_data, dict):
-        print(f"Successfully fetched price for token: {token_mint_address}.")
         return response_data
-    return None
\ No newline at end of file
+    return None
+
+async def _fetch_token_prices(token_mint_addresses: list) -> dict | None:
+    """
+    Fetches the prices of up to MORALIS_PRICE_BATCH_SIZE tokens in one request.
+    Moralis API: POST /token/:network/prices
+    Returns:
+        dict | None: Mint address -> price payload (unknown mints are left out),
+                     or None if the request failed.
+    Raises:
+        BatchUnsupportedError: If the endpoint isn't available.
+    """
+    response_data = await _make_moralis_request("/token/mainnet/prices", endpoint="token_prices",
+                                                body={"addresses": token_mint_addresses},
+                                                unsupported_statuses=_BATCH_UNSUPPORTED_STATUSES)
+    if not isinstance(response_data, list):
+        return None
+    return {item["tokenAddress"]: item for item in response_data if isinstance(item, dict) and item.get("tokenAddress")}
+
+# Concurrent price lookups are grouped into multi-token requests
+price_batcher = PriceBatcher("moralis", _fetch_token_prices, _fetch_token_price,
+                             MORALIS_PRICE_BATCH_SIZE, MORALIS_PRICE_BATCH_WINDOW_SECONDS,
+                             MORALIS_PRICE_BATCH_RETRY_SECONDS)
+
+async def get_token_price(token_mint_address: str) -> dict | None:
+    """
+    Retrieves the current price of a specific token.
+    Lookups made at the same time are sent together as one batch request,
+    so refreshing many tokens costs one request per batch rather than per token.
+    Moralis API: /token/:network/prices, or /token/:network/:address/price as a fallback [2, 4]
+    """
+    return await price_batcher.get(token_mint_address)
+
+async def get_token_prices(token_mint_addresses) -> dict[str, dict | None]:
+    """
+    Retrieves the current prices of many tokens in as few requests as possible.
+    Args:
+        token_mint_addresses: The mint addresses of the tokens.
+    Returns:
+        dict: Mint address -> price payload, or None for tokens without a price.
+    """
+    return await price_batcher.get_many(token_mint_addresses)
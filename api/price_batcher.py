@@ -0,0 +1,130 @@
+import asyncio
+import logging
+import time
+from telemetry import metrics
+from telemetry.logs import event, get_logger
+
+logger = get_logger(__name__)
+
+_BATCHES = metrics.counter("vector_price_requests_total", "Price requests sent, by mode.", ("batcher", "mode"))
+_BATCH_SIZE = metrics.histogram("vector_price_batch_size", "Mints per batched price request.", ("batcher",),
+                                buckets=(1, 2, 5, 10, 25, 50, 100, 250))
+
+class BatchUnsupportedError(Exception):
+    """
+    Raised by a batch fetch when the provider doesn't offer the batch endpoint
+    (e.g. on the current plan), so the batcher switches to per-mint requests.
+    """
+
+class PriceBatcher:
+    """
+    Collects concurrent single-mint price lookups for a short window (or until
+    `max_batch` mints are waiting) and sends them as one multi-token request.
+    Each caller gets its own mint's price back. Callers asking for the same mint
+    in the same window share one slot. If a batch request fails, its mints are
+    fetched one by one; if the provider rejects batching, lookups go straight to
+    the single-mint endpoint until `retry_seconds` have passed, then the batch
+    endpoint is tried again.
+    """
+
+    def __init__(self, name: str, fetch_batch, fetch_one, max_batch: int, window_seconds: float,
+                 retry_seconds: float = 600.0):
+        """
+        Args:
+            name (str): Label used in metrics and logs.
+            fetch_batch: async (list[str]) -> dict[str, dict] | None. Mints missing from
+                         the result are treated as unknown; None means the request failed.
+            fetch_one: async (str) -> dict | None. The single-mint fallback.
+            max_batch (int): Maximum mints per batch request.
+            window_seconds (float): How long the first lookup waits for others to join (0 = no batching).
+            retry_seconds (float): How long to skip the batch endpoint after the provider rejects it.
+        """
+        self.name = name
+        self._fetch_batch = fetch_batch
+        self._fetch_one = fetch_one
+        self.max_batch = max_batch
+        self.window_seconds = window_seconds
+        self.retry_seconds = retry_seconds
+        # time.monotonic() before which the batch endpoint isn't tried
+        self._unsupported_until = 0.0
+        self._pending: dict[str, asyncio.Future] = {}
+        self._timer: asyncio.TimerHandle | None = None
+        # Keeps dispatched batches alive until they finish
+        self._tasks: set[asyncio.Task] = set()
+
+    @property
+    def batching_supported(self) -> bool:
+        return self._unsupported_until <= time.monotonic()
+
+    async def get(self, mint: str) -> dict | None:
+        """
+        Returns the price payload for one mint, batched with any concurrent lookups.
+        """
+        if self.window_seconds <= 0 or not self.batching_supported:
+            _BATCHES.inc(batcher=self.name, mode="single")
+            return await self._fetch_one(mint)
+
+        future = self._pending.get(mint)
+        if future is None:
+            loop = asyncio.get_running_loop()
+            future = self._pending[mint] = loop.create_future()
+            if len(self._pending) >= self.max_batch:
+                self._dispatch()
+            elif self._timer is None:
+                self._timer = loop.call_later(self.window_seconds, self._dispatch)
+        # Shield the shared slot, so one cancelled caller doesn't cancel it for the others
+        return await asyncio.shield(future)
+
+    async def get_many(self, mints) -> dict[str, dict | None]:
+        """
+        Returns mint -> price payload for every mint, using as few batch requests as possible.
+        """
+        unique = list(dict.fromkeys(mints))
+        prices = await asyncio.gather(*(self.get(mint) for mint in unique))
+        return dict(zip(unique, prices))
+
+    def _dispatch(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        if not self._pending:
+            return
+        batch, self._pending = self._pending, {}
+        task = asyncio.get_running_loop().create_task(self._send(batch))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _send(self, batch: dict[str, asyncio.Future]):
+        mints = list(batch)
+        prices = None
+        if self.batching_supported:
+            try:
+                _BATCHES.inc(batcher=self.name, mode="batch")
+                _BATCH_SIZE.observe(len(mints), batcher=self.name)
+                prices = await self._fetch_batch(mints)
+            except BatchUnsupportedError as e:
+                self._unsupported_until = time.monotonic() + self.retry_seconds
+                event(logger, logging.WARNING, "price_batching_unsupported", batcher=self.name,
+                      retry_seconds=self.retry_seconds, error=e)
+            except Exception as e:
+                event(logger, logging.WARNING, "price_batch_failed", batcher=self.name, mints=len(mints), error=e)
+
+        if prices is not None:
+            for mint, future in batch.items():
+                if not future.done():
+                    future.set_result(prices.get(mint))
+            return
+
+        # The batch failed: fall back to one request per mint
+        async def fetch(mint: str, future: asyncio.Future):
+            _BATCHES.inc(batcher=self.name, mode="fallback")
+            try:
+                result = await self._fetch_one(mint)
+            except Exception as e:
+                if not future.done():
+                    future.set_exception(e)
+                return
+            if not future.done():
+                future.set_result(result)
+
+        await asyncio.gather(*(fetch(mint, future) for mint, future in batch.items()))
@@ -0,0 +1,329 @@
+import asyncio
+import logging
+import time
+from collections import deque
+from api import solana_tracker, moralis_client, rate_limiter
+from telemetry import metrics
+from telemetry.logs import event, get_logger
+from config.settings import (
+    ROUTER_PROVIDER_ORDER, ROUTER_WINDOW, ROUTER_FAILURE_THRESHOLD, ROUTER_COOLDOWN_SECONDS,
+    ROUTER_HEDGE_MIN_DELAY_SECONDS, ROUTER_HEDGE_MIN_QUOTA_FRACTION,
+)
+
+TOKEN_METADATA = "token_metadata"
+WALLET_PNL = "wallet_pnl"
+# Wallet PnL with its per-token positions, for re-scoring
+WALLET_POSITIONS = "wallet_positions"
+
+# Latency assumed for a provider with no recent calls, so it still gets tried
+_DEFAULT_LATENCY_SECONDS = 0.5
+# Added to a provider's mean latency per unit of error rate, so a provider that fails
+# fast never outranks one that answers
+_ERROR_PENALTY_SECONDS = 5.0
+# Below this fraction of daily quota a provider is only used if nothing else is healthy
+_LOW_QUOTA_FRACTION = 0.1
+
+logger = get_logger(__name__)
+
+_REQUESTS = metrics.counter("vector_router_requests_total", "Routed provider calls by outcome.", ("kind", "provider", "outcome"))
+_HEDGES = metrics.counter("vector_router_hedges_total", "Hedged second requests sent.", ("kind",))
+_FAILOVERS = metrics.counter("vector_router_failovers_total", "Lookups retried on another provider after a failure.", ("kind",))
+_UNSERVED = metrics.counter("vector_router_unserved_total", "Lookups no provider could answer.", ("kind",))
+
+def normalise_solana_tracker_token(data: dict) -> dict:
+    return {
+        "mint": data.get("mint"),
+        "name": data.get("name"),
+        "symbol": data.get("symbol"),
+        "decimals": data.get("decimals"),
+        "image": data.get("image"),
+        "price_usd": data.get("priceUsd"),
+    }
+
+def normalise_moralis_token(data: dict) -> dict:
+    decimals = data.get("decimals")
+    return {
+        "mint": data.get("mint"),
+        "name": data.get("name"),
+        "symbol": data.get("symbol"),
+        "decimals": int(decimals) if decimals not in (None, "") else None,
+        "image": data.get("logo"),
+        "price_usd": None,  # Moralis metadata carries no price
+    }
+
+def normalise_solana_tracker_pnl(data: dict) -> dict:
+    summary = data.get("summary") or {}
+    tokens = data.get("tokens") or {}
+    return {
+        "realized_pnl_usd": summary.get("realized"),
+        "unrealized_pnl_usd": summary.get("unrealized"),
+        "total_pnl_usd": summary.get("total"),
+        "volume_usd": sum(token.get("total_invested") or 0.0 for token in tokens.values()),
+        "tokens_traded": len(tokens),
+    }
+
+def normalise_solana_tracker_positions(data: dict) -> dict:
+    return {**normalise_solana_tracker_pnl(data), "tokens": data.get("tokens") or {}}
+
+def normalise_moralis_pnl(data: dict) -> dict:
+    realized = data.get("total_realized_profit_usd")
+    realized = float(realized) if realized not in (None, "") else None
+    volume = data.get("total_trade_volume")
+    return {
+        "realized_pnl_usd": realized,
+        "unrealized_pnl_usd": None,
+        "total_pnl_usd": realized,
+        "volume_usd": float(volume) if volume not in (None, "") else None,
+        "tokens_traded": data.get("total_count_of_trades"),
+    }
+
+# kind -> provider -> (fetch, normalise, endpoint name for quota checks)
+ROUTES = {
+    TOKEN_METADATA: {
+        "solana_tracker": (solana_tracker.get_token_metadata, normalise_solana_tracker_token, "token_metadata"),
+        "moralis": (moralis_client.get_token_metadata, normalise_moralis_token, "token_metadata"),
+    },
+    WALLET_PNL: {
+        "solana_tracker": (solana_tracker.get_wallet_pnl, normalise_solana_tracker_pnl, "wallet_pnl"),
+        "moralis": (moralis_client.get_wallet_profitability, normalise_moralis_pnl, "wallet_profitability"),
+    },
+    # Moralis' profitability summary has no per-token positions, so it can't serve re-scoring
+    WALLET_POSITIONS: {
+        "solana_tracker": (solana_tracker.get_wallet_pnl, normalise_solana_tracker_positions, "wallet_pnl"),
+    },
+}
+
+def has_credentials(provider: str) -> bool:
+    """
+    Returns False for a provider whose API key isn't configured (its calls fail at once).
+    """
+    if provider == "solana_tracker":
+        return bool(solana_tracker.SOLANA_TRACKER_API_KEY)
+    if provider == "moralis":
+        return bool(moralis_client.MORALIS_API_KEY)
+    return True
+
+class ProviderStats:
+    """
+    Rolling latency and success record of one provider over its last `window` calls.
+    """
+
+    __slots__ = ("latencies", "outcomes", "consecutive_failures", "cooldown_until")
+
+    def __init__(self, window: int = ROUTER_WINDOW):
+        self.latencies = deque(maxlen=window)
+        self.outcomes = deque(maxlen=window)
+        self.consecutive_failures = 0
+        self.cooldown_until = 0.0
+
+    def record(self, latency: float, ok: bool):
+        self.latencies.append(latency)
+        self.outcomes.append(ok)
+        if ok:
+            self.consecutive_failures = 0
+            return
+        self.consecutive_failures += 1
+        if self.consecutive_failures >= ROUTER_FAILURE_THRESHOLD:
+            self.cooldown_until = time.monotonic() + ROUTER_COOLDOWN_SECONDS
+
+    def error_rate(self) -> float:
+        if not self.outcomes:
+            return 0.0
+        return 1.0 - sum(self.outcomes) / len(self.outcomes)
+
+    def mean_latency(self) -> float:
+        if not self.latencies:
+            return _DEFAULT_LATENCY_SECONDS
+        return sum(self.latencies) / len(self.latencies)
+
+    def latency_quantile(self, q: float) -> float:
+        if not self.latencies:
+            return _DEFAULT_LATENCY_SECONDS
+        ordered = sorted(self.latencies)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * q))]
+
+    def cooling_down(self) -> bool:
+        return self.cooldown_until > time.monotonic()
+
+class ProviderRouter:
+    """
+    Serves lookups that more than one provider can answer (token metadata,
+    wallet PnL) in one normalised schema, choosing the provider per call.
+    Providers are ranked by recent mean latency plus a penalty per unit of
+    error rate; providers without an API key are never used.
+    Providers that are nearly out of quota, or that just failed several times
+    in a row, are only tried last. A failed or empty answer falls through to
+    the next provider. A hedged lookup also asks the next provider when the
+    first takes longer than its usual p90, and returns whichever answers first.
+    A provider that confirms the key is unknown (an empty dict, e.g. a 404)
+    isn't counted as failing; the lookup returns an empty dict only if every
+    provider asked confirmed that, and None if any of them failed.
+    """
+
+    def __init__(self, routes: dict = None, order: list = None):
+        self.routes = routes if routes is not None else ROUTES
+        self.order = order if order is not None else ROUTER_PROVIDER_ORDER
+        self.stats: dict[tuple, ProviderStats] = {}
+
+    def _stats(self, kind: str, provider: str) -> ProviderStats:
+        key = (kind, provider)
+        stats = self.stats.get(key)
+        if stats is None:
+            stats = self.stats[key] = ProviderStats()
+        return stats
+
+    def reset(self):
+        self.stats.clear()
+
+    def health(self) -> dict:
+        """
+        Returns each provider's rolling health per lookup kind, for logs and benchmarks.
+        """
+        report = {}
+        for (kind, provider), stats in self.stats.items():
+            report.setdefault(kind, {})[provider] = {
+                "calls": len(stats.outcomes),
+                "error_rate": round(stats.error_rate(), 3),
+                "mean_ms": round(stats.mean_latency() * 1000, 1),
+                "p90_ms": round(stats.latency_quantile(0.9) * 1000, 1),
+                "cooling_down": stats.cooling_down(),
+                "quota_remaining_fraction": rate_limiter.remaining_fraction(provider),
+            }
+        return report
+
+    def rank(self, kind: str) -> list[str]:
+        """
+        Returns the providers able to serve `kind`, best first.
+        Providers without credentials, or whose quota can't cover the call, are left out.
+        """
+        candidates = []
+        providers = sorted(self.routes[kind], key=lambda name: self.order.index(name) if name in self.order else len(self.order))
+        for position, provider in enumerate(providers):
+            endpoint = self.routes[kind][provider][2]
+            if not has_credentials(provider) or not rate_limiter.can_afford(provider, endpoint):
+                continue
+            stats = self._stats(kind, provider)
+            score = stats.mean_latency() + _ERROR_PENALTY_SECONDS * stats.error_rate()
+            remaining = rate_limiter.remaining_fraction(provider)
+            demoted = stats.cooling_down() or (remaining is not None and remaining < _LOW_QUOTA_FRACTION)
+            candidates.append((demoted, score, position, provider))
+        return [provider for *_, provider in sorted(candidates)]
+
+    def _hedge_delay(self, kind: str, provider: str) -> float:
+        stats = self._stats(kind, provider)
+        if not stats.latencies:
+            return ROUTER_HEDGE_MIN_DELAY_SECONDS
+        return max(ROUTER_HEDGE_MIN_DELAY_SECONDS, stats.latency_quantile(0.9))
+
+    def _can_hedge(self, kind: str, provider: str) -> bool:
+        remaining = rate_limiter.remaining_fraction(provider)
+        return remaining is None or remaining >= ROUTER_HEDGE_MIN_QUOTA_FRACTION
+
+    async def _call(self, kind: str, provider: str, key: str) -> dict | None:
+        fetch, normalise, _ = self.routes[kind][provider]
+        started = time.perf_counter()
+        try:
+            data = await fetch(key)
+            result = normalise(data) if data else ({} if data == {} else None)
+        except asyncio.CancelledError:
+            # Lost a hedge race; says nothing about the provider's health
+            raise
+        except Exception as e:
+            event(logger, logging.WARNING, "route_call_failed", kind=kind, provider=provider, error=e)
+            result = None
+        ok = result is not None
+        self._stats(kind, provider).record(time.perf_counter() - started, ok)
+        _REQUESTS.inc(kind=kind, provider=provider, outcome=("ok" if result else "not_found") if ok else "failed")
+        if result:
+            result["provider"] = provider
+        return result
+
+    async def fetch(self, kind: str, key: str, hedge: bool = False) -> dict | None:
+        """
+        Looks up `key` (a mint or wallet address) from the best available provider.
+        Args:
+            kind (str): TOKEN_METADATA, WALLET_PNL or WALLET_POSITIONS.
+            key (str): The mint address or wallet address.
+            hedge (bool): Whether to race a second provider when the first is slow.
+        Returns:
+            dict | None: The normalised payload (with a 'provider' field), an empty dict if every
+                         provider asked confirmed the key is unknown, or None if none could answer.
+        """
+        remaining = self.rank(kind)
+        if not remaining:
+            _UNSERVED.inc(kind=kind)
+            return None
+        pending: dict[asyncio.Task, str] = {}
+        failed = False
+
+        def launch():
+            provider = remaining.pop(0)
+            pending[asyncio.ensure_future(self._call(kind, provider, key))] = provider
+
+        launch()
+        hedge_delay = self._hedge_delay(kind, pending[next(iter(pending))]) if hedge else None
+        try:
+            while pending:
+                timeout = hedge_delay if hedge_delay is not None and remaining else None
+                done, _ = await asyncio.wait(pending, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+                if not done:
+                    # The first provider is slow: race the next one against it (only once)
+                    hedge_delay = None
+                    if self._can_hedge(kind, remaining[0]):
+                        _HEDGES.inc(kind=kind)
+                        launch()
+                    continue
+                for task in done:
+                    pending.pop(task)
+                    result = task.result()
+                    if result:
+                        return result
+                    failed = failed or result is None
+                if not pending and remaining:
+                    _FAILOVERS.inc(kind=kind)
+                    launch()
+        finally:
+            for task in pending:
+                task.cancel()
+        _UNSERVED.inc(kind=kind)
+        return None if failed else {}
+
+router = ProviderRouter()
+
+async def get_token_metadata(token_mint_address: str, hedge: bool = False) -> dict | None:
+    """
+    Token metadata from whichever provider is healthiest.
+    Returns:
+        dict | None: mint, name, symbol, decimals, image, price_usd and provider; an empty dict if
+                     the providers confirm the mint is unknown, None if no provider answered.
+    """
+    result = await router.fetch(TOKEN_METADATA, token_mint_address, hedge)
+    if result and not result.get("mint"):
+        result["mint"] = token_mint_address
+    return result
+
+async def get_wallet_pnl(wallet_address: str, hedge: bool = False) -> dict | None:
+    """
+    Wallet PnL summary from whichever provider is healthiest.
+    Returns:
+        dict | None: realized_pnl_usd, unrealized_pnl_usd, total_pnl_usd, volume_usd, tokens_traded,
+                     wallet and provider; None if no provider answered. Fields a provider doesn't report are None.
+    """
+    result = await router.fetch(WALLET_PNL, wallet_address, hedge)
+    if not result:
+        return None
+    result["wallet"] = wallet_address
+    return result
+
+async def get_wallet_positions(wallet_address: str, hedge: bool = False) -> dict | None:
+    """
+    Wallet PnL summary plus its per-token positions, from whichever provider that reports them is healthiest.
+    Returns:
+        dict | None: The get_wallet_pnl fields plus 'tokens' (mint -> position record, as in
+                     solana_tracker.get_wallet_pnl); None if no provider answered.
+    """
+    result = await router.fetch(WALLET_POSITIONS, wallet_address, hedge)
+    if not result:
+        return None
+    result["wallet"] = wallet_address
+    return result
@@ -0,0 +1,267 @@
+import asyncio
+import datetime
+import email.utils
+import random
+import time
+from telemetry import metrics
+from config.settings import (
+    SOLANA_TRACKER_REQUESTS_PER_SECOND, SOLANA_TRACKER_DAILY_REQUEST_QUOTA,
+    MORALIS_COMPUTE_UNITS_PER_SECOND, MORALIS_DAILY_COMPUTE_UNITS,
+    HTTP_BACKOFF_BASE_SECONDS, HTTP_BACKOFF_MAX_SECONDS,
+)
+
+# Moralis compute-unit (CU) cost per endpoint. Adjust these if your plan's pricing differs.
+MORALIS_ENDPOINT_COSTS = {
+    "new_tokens": 50,
+    "token_holders": 50,
+    "wallet_profitability": 50,
+    "token_metadata": 10,
+    "token_price": 10,
+    # Charged per request, however many tokens it carries
+    "token_prices": 50,
+}
+MORALIS_DEFAULT_COST = 10
+
+# Status codes worth retrying: rate limited, or a transient server-side failure
+RETRYABLE_STATUS_CODES = {429, 500, 502, 503, 504}
+
+_QUOTA_UNITS = metrics.counter(
+    "vector_quota_units_total", "Quota spent per endpoint (requests for Solana Tracker, compute units for Moralis).",
+    ("provider", "endpoint"))
+_QUOTA_USED = metrics.gauge("vector_quota_used_today", "Quota used so far today.", ("provider",))
+_QUOTA_REMAINING = metrics.gauge("vector_quota_remaining_today", "Quota left today (only for capped providers).", ("provider",))
+_QUOTA_REFUSED = metrics.counter("vector_quota_refused_total", "Requests refused because the daily quota was used up.", ("provider",))
+_THROTTLED = metrics.counter("vector_rate_limited_total", "429 responses received.", ("provider",))
+_WAIT_SECONDS = metrics.histogram("vector_rate_limit_wait_seconds", "Time spent waiting for the client-side rate limit.", ("provider",))
+
+class QuotaExceededError(Exception):
+    """
+    Raised when a request would exceed a provider's daily quota.
+    """
+
+class TokenBucket:
+    """
+    Async token bucket. Tokens refill continuously at `rate` per second up to `capacity`,
+    and each request spends `cost` tokens, waiting until enough have accumulated.
+    """
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._updated = time.monotonic()
+        # Created on first use in each event loop: an asyncio.Lock binds to the loop that
+        # first waits on it, and the shared buckets outlive any one asyncio.run()
+        self._lock: asyncio.Lock | None = None
+        self._loop = None
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    async def acquire(self, cost: float = 1.0):
+        """
+        Waits until `cost` tokens are available and spends them.
+        Requests are served in arrival order, since waiters queue on the lock.
+        """
+        cost = min(cost, self.capacity)
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            self._lock = asyncio.Lock()
+            self._loop = loop
+        async with self._lock:
+            while True:
+                self._refill()
+                if self._tokens >= cost:
+                    self._tokens -= cost
+                    return
+                await asyncio.sleep((cost - self._tokens) / self.rate)
+
+    def pause(self, seconds: float):
+        """
+        Drains the bucket so no request is sent for `seconds`.
+        Used when the provider tells us to back off (429 / Retry-After).
+        """
+        self._refill()
+        self._tokens = min(self._tokens, -seconds * self.rate)
+
+class DailyQuota:
+    """
+    Tracks usage against a daily budget that resets at midnight UTC.
+    A limit of None means usage is counted but never refused.
+    """
+
+    def __init__(self, limit: float | None):
+        self.limit = limit
+        self.used = 0.0
+        self.requests = 0
+        self.retries = 0
+        self.throttled = 0
+        self._day = self._today()
+
+    @staticmethod
+    def _today() -> datetime.date:
+        return datetime.datetime.now(datetime.timezone.utc).date()
+
+    def _roll_over(self):
+        today = self._today()
+        if today != self._day:
+            self._day = today
+            self.used = 0.0
+            self.requests = 0
+            self.retries = 0
+            self.throttled = 0
+
+    def remaining(self) -> float | None:
+        self._roll_over()
+        if self.limit is None:
+            return None
+        return max(0.0, self.limit - self.used)
+
+    def consume(self, cost: float):
+        """
+        Records `cost` against today's budget.
+        Raises QuotaExceededError instead if the budget would be exceeded.
+        """
+        self._roll_over()
+        if self.limit is not None and self.used + cost > self.limit:
+            raise QuotaExceededError(f"Daily quota of {self.limit:g} exhausted ({self.used:g} used).")
+        self.used += cost
+        self.requests += 1
+
+# One bucket and one quota per provider. Solana Tracker is billed per request,
+# Moralis per compute unit, so the bucket units differ between them.
+_buckets = {
+    "solana_tracker": TokenBucket(SOLANA_TRACKER_REQUESTS_PER_SECOND, max(1.0, SOLANA_TRACKER_REQUESTS_PER_SECOND)),
+    "moralis": TokenBucket(MORALIS_COMPUTE_UNITS_PER_SECOND, MORALIS_COMPUTE_UNITS_PER_SECOND),
+}
+_quotas = {
+    "solana_tracker": DailyQuota(SOLANA_TRACKER_DAILY_REQUEST_QUOTA),
+    "moralis": DailyQuota(MORALIS_DAILY_COMPUTE_UNITS),
+}
+
+def configure_provider(provider: str, rate: float, capacity: float = None, daily_limit: float | None = None):
+    """
+    Replaces a provider's rate limit and daily quota (e.g. for a different plan,
+    or to match a local mock server in benchmarks). Today's usage is reset.
+    Args:
+        provider (str): The provider key (e.g., "solana_tracker", "moralis").
+        rate (float): Tokens (requests or CUs) refilled per second.
+        capacity (float, optional): Burst size. Defaults to one second's worth of tokens.
+        daily_limit (float | None): Daily budget, or None for no cap.
+    """
+    _buckets[provider] = TokenBucket(rate, capacity if capacity is not None else max(1.0, rate))
+    _quotas[provider] = DailyQuota(daily_limit)
+
+def endpoint_cost(provider: str, endpoint: str | None) -> float:
+    """
+    Returns the quota cost of one call to `endpoint` on `provider`.
+    Solana Tracker charges one request per call; Moralis charges per-endpoint CUs.
+    """
+    if provider == "moralis":
+        return MORALIS_ENDPOINT_COSTS.get(endpoint, MORALIS_DEFAULT_COST)
+    return 1.0
+
+async def acquire(provider: str, endpoint: str | None = None, retry: bool = False) -> float:
+    """
+    Reserves quota for one request and waits for the provider's rate limit.
+    Args:
+        provider (str): The provider key (e.g., "solana_tracker", "moralis").
+        endpoint (str, optional): The endpoint name, used to look up its cost.
+        retry (bool): Whether this request is a retry of an earlier attempt.
+    Returns:
+        float: The cost charged for this request.
+    Raises:
+        QuotaExceededError: If today's budget for the provider is used up.
+    """
+    cost = endpoint_cost(provider, endpoint)
+    quota = _quotas[provider]
+    try:
+        quota.consume(cost)
+    except QuotaExceededError:
+        _QUOTA_REFUSED.inc(provider=provider)
+        raise
+    if retry:
+        quota.retries += 1
+    _QUOTA_UNITS.inc(cost, provider=provider, endpoint=endpoint)
+    _QUOTA_USED.set(quota.used, provider=provider)
+    if quota.limit is not None:
+        _QUOTA_REMAINING.set(quota.limit - quota.used, provider=provider)
+    with _WAIT_SECONDS.time(provider=provider):
+        await _buckets[provider].acquire(cost)
+    return cost
+
+def parse_retry_after(value: str | None) -> float | None:
+    """
+    Parses a Retry-After header, given either as seconds or as an HTTP date.
+    Returns the delay in seconds, or None if the header is missing or malformed.
+    """
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        retry_at = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if retry_at.tzinfo is None:
+        retry_at = retry_at.replace(tzinfo=datetime.timezone.utc)
+    return max(0.0, (retry_at - datetime.datetime.now(datetime.timezone.utc)).total_seconds())
+
+def backoff_delay(attempt: int, retry_after: float | None = None) -> float:
+    """
+    Returns how long to wait before retry number `attempt` (starting at 1).
+    Uses full-jitter exponential backoff, but never less than the provider's Retry-After.
+    """
+    delay = random.uniform(0, min(HTTP_BACKOFF_MAX_SECONDS, HTTP_BACKOFF_BASE_SECONDS * 2 ** (attempt - 1)))
+    if retry_after is not None:
+        delay = max(delay, retry_after)
+    return delay
+
+def record_throttle(provider: str, retry_after: float | None):
+    """
+    Records a 429 from a provider and pauses its bucket for every caller,
+    so concurrent requests stop hitting the limit too.
+    """
+    _quotas[provider].throttled += 1
+    _THROTTLED.inc(provider=provider)
+    _buckets[provider].pause(retry_after if retry_after is not None else HTTP_BACKOFF_BASE_SECONDS)
+
+def remaining_fraction(provider: str) -> float | None:
+    """
+    Returns the fraction (0-1) of today's quota left for a provider, or None if it's uncapped.
+    """
+    quota = _quotas[provider]
+    remaining = quota.remaining()
+    if remaining is None or not quota.limit:
+        return None
+    return remaining / quota.limit
+
+def can_afford(provider: str, endpoint: str | None = None) -> bool:
+    """
+    Returns True if today's quota still covers one call to `endpoint`.
+    """
+    remaining = _quotas[provider].remaining()
+    return remaining is None or remaining >= endpoint_cost(provider, endpoint)
+
+def get_quota_usage() -> dict:
+    """
+    Returns today's quota accounting for every provider.
+    Returns:
+        dict: Provider name -> {'used', 'limit', 'remaining', 'requests', 'retries', 'throttled'}.
+    """
+    usage = {}
+    for provider, quota in _quotas.items():
+        remaining = quota.remaining()
+        usage[provider] = {
+            "used": quota.used,
+            "limit": quota.limit,
+            "remaining": remaining,
+            "requests": quota.requests,
+            "retries": quota.retries,
+            "throttled": quota.throttled,
+        }
+    return usage
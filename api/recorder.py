@@ -0,0 +1,195 @@
+import asyncio
+import hashlib
+import json
+import logging
+import mmap
+import os
+import time
+import zlib
+from urllib.parse import urlencode
+import httpx
+from telemetry import metrics
+from telemetry.logs import event, get_logger
+from config.settings import API_ARCHIVE_PATH, API_REPLAY_SPEED
+
+RECORD = "record"
+REPLAY = "replay"
+
+logger = get_logger(__name__)
+
+_RECORDED = metrics.counter("vector_api_recorded_total", "Provider responses written to the API archive.", ("provider", "endpoint"))
+_REPLAYED = metrics.counter("vector_api_replayed_total", "Provider requests served from the API archive, by outcome.",
+                            ("provider", "endpoint", "outcome"))
+
+class ReplayMissError(httpx.RequestError):
+    """
+    Raised in replay mode for a request the archive has no response for.
+    It's an httpx.RequestError, so callers handle it like any failed request.
+    """
+
+def request_key(provider: str, method: str, path: str, params: dict = None, body=None) -> str:
+    """
+    Returns the archive key for a request: provider, method, path and sorted
+    query string, plus a digest of the JSON body if there is one.
+    """
+    key = f"{provider} {method} {path}"
+    if params:
+        key += "?" + urlencode(sorted((str(name), str(value)) for name, value in params.items()))
+    if body is not None:
+        encoded = json.dumps(body, sort_keys=True, separators=(",", ":"), default=str).encode()
+        key += "#" + hashlib.blake2b(encoded, digest_size=8).hexdigest()
+    return key
+
+class ApiRecorder:
+    """
+    Records provider responses to an on-disk archive, or serves them back from it.
+    The archive is two files: `<path>` holds each response body compressed on
+    its own (zlib), one after another, and `<path>.idx` is a JSON-lines index
+    (key, endpoint, status, timing, and the body's offset and length). Only
+    the index is read up front; bodies are decompressed on demand from a
+    memory map. Recording appends, so several sessions can share one archive.
+    In replay, repeated requests for the same key get the recorded responses
+    in order (the last one repeats once they run out), with no network and no
+    rate limiting. `speed` 0 serves them at once; otherwise each response is
+    served when it arrived in the recording, measured from the first recorded
+    request and scaled by `speed`, so the recorded bursts and gaps are kept.
+    A response asked for later than that is served at once.
+    """
+
+    def __init__(self):
+        self.mode: str | None = None
+        self.path: str | None = None
+        self.speed = 0.0
+        self._data = None
+        self._index = None
+        self._offset = 0
+        self._map: mmap.mmap | None = None
+        self._entries: dict[str, list[dict]] = {}
+        self._cursors: dict[str, int] = {}
+        # Recording time of the first request, and when the first replayed request came in
+        self._first_time = 0.0
+        self._replay_started: float | None = None
+
+    @property
+    def recording(self) -> bool:
+        return self.mode == RECORD
+
+    @property
+    def replaying(self) -> bool:
+        return self.mode == REPLAY
+
+    def open(self, mode: str, path: str = API_ARCHIVE_PATH, speed: float = API_REPLAY_SPEED):
+        """
+        Starts recording to, or replaying from, the archive at `path`.
+        Args:
+            mode (str): RECORD or REPLAY.
+            path (str): The archive's data file; the index is `<path>.idx`.
+            speed (float): Replay pacing (see the class docstring).
+        """
+        self.close()
+        if mode == RECORD:
+            directory = os.path.dirname(path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self._data = open(path, "ab")
+            self._offset = self._data.tell()
+            self._index = open(f"{path}.idx", "a", encoding="utf-8")
+        elif mode == REPLAY:
+            self._load(path)
+        else:
+            raise ValueError(f"Unknown archive mode: {mode!r}")
+        self.mode = mode
+        self.path = path
+        self.speed = speed
+        event(logger, logging.INFO, "api_archive_opened", mode=mode, path=path,
+              keys=len(self._entries) if mode == REPLAY else None)
+
+    def _load(self, path: str):
+        size = os.path.getsize(path)
+        entries: dict[str, list[dict]] = {}
+        with open(f"{path}.idx", "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    continue  # a line cut short by a crash while recording
+                # Skip entries whose body never made it to disk
+                if entry["offset"] + entry["length"] <= size:
+                    entries.setdefault(entry["key"], []).append(entry)
+        with open(path, "rb") as f:
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) if size else None
+        self._entries = entries
+        self._cursors = {}
+        self._first_time = min((entry["time"] for key_entries in entries.values() for entry in key_entries), default=0.0)
+        self._replay_started = None
+
+    def close(self):
+        if self._data is not None:
+            self._data.close()
+            self._index.close()
+        if self._map is not None:
+            self._map.close()
+        self.__init__()
+
+    def keys(self, endpoint: str = None) -> list[str]:
+        """
+        Keys with a recorded response in replay mode, optionally only those of one endpoint.
+        """
+        return [key for key, entries in self._entries.items() if endpoint is None or entries[0]["endpoint"] == endpoint]
+
+    def record(self, provider: str, method: str, path: str, params: dict, body, endpoint: str | None,
+               response: httpx.Response, started: float, elapsed: float):
+        """
+        Appends one response to the archive.
+        Args:
+            started (float): When the request was sent (epoch seconds).
+            elapsed (float): Seconds until the response arrived.
+        """
+        compressed = zlib.compress(response.content)
+        self._data.write(compressed)
+        # The body goes to disk before its index line, so the index never points past the data
+        self._data.flush()
+        self._index.write(json.dumps({
+            "key": request_key(provider, method, path, params, body),
+            "endpoint": endpoint,
+            "status": response.status_code,
+            "content_type": response.headers.get("content-type"),
+            "time": round(started, 3),
+            "elapsed": round(elapsed, 4),
+            "offset": self._offset,
+            "length": len(compressed),
+        }, separators=(",", ":")) + "\n")
+        self._index.flush()
+        self._offset += len(compressed)
+        _RECORDED.inc(provider=provider, endpoint=endpoint)
+
+    async def replay(self, provider: str, method: str, path: str, params: dict = None, body=None,
+                     endpoint: str = None, base_url: str = "") -> httpx.Response:
+        """
+        Returns the recorded response for a request.
+        Raises:
+            ReplayMissError: If the archive has no response for it.
+        """
+        key = request_key(provider, method, path, params, body)
+        request = httpx.Request(method, f"{base_url}{path}", params=params)
+        entries = self._entries.get(key)
+        if not entries:
+            _REPLAYED.inc(provider=provider, endpoint=endpoint, outcome="miss")
+            raise ReplayMissError(f"No recorded response for {key}", request=request)
+        position = self._cursors.get(key, 0)
+        self._cursors[key] = position + 1
+        entry = entries[min(position, len(entries) - 1)]
+        if self.speed > 0:
+            now = time.monotonic()
+            if self._replay_started is None:
+                self._replay_started = now
+            due = self._replay_started + (entry["time"] - self._first_time + entry["elapsed"]) / self.speed
+            if due > now:
+                await asyncio.sleep(due - now)
+        content = zlib.decompress(self._map[entry["offset"]:entry["offset"] + entry["length"]])
+        _REPLAYED.inc(provider=provider, endpoint=endpoint, outcome="hit")
+        headers = {"content-type": entry["content_type"]} if entry.get("content_type") else None
+        return httpx.Response(entry["status"], content=content, headers=headers, request=request)
+
+# Shared recorder; main.py opens it when API_ARCHIVE_MODE is set in settings
+recorder = ApiRecorder()
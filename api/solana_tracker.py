@@ -1,52 +1,75 @@
-import requests
-from config.settings import SOLANA_TRACKER_API_KEY, SOLANA_TRACKER_BASE_URL, API_FETCH_LIMIT
-import time
+import logging
+import httpx
+from api import decoding, http_client, rate_limiter
+from telemetry.logs import event, get_logger
+from config.settings import SOLANA_TRACKER_API_KEY, API_FETCH_LIMIT
 
-async def get_first_token_buyers(token_mint_address: str) -> list | None:
+logger = get_logger(__name__)
+
+async def _make_solana_tracker_request(path: str, description: str, endpoint: str = None, decode=None,
+                                       stream_decode=None, not_found=None):
     """
-    Retrieves the first 100 buyers of a specific token with PnL data.
-    Uses Solana Tracker API's /first-buyers/{token} endpoint.
+    Internal helper to make requests to the Solana Tracker API.
+    Uses the shared pooled client, so auth headers and timeouts are applied for us.
     Args:
-        token_mint_address (str): The mint address of the token.
+        path (str): The request path, relative to SOLANA_TRACKER_BASE_URL.
+        description (str): A short description of the request, used in error messages.
+        endpoint (str, optional): The endpoint name, used for quota accounting.
+        decode (callable, optional): Decoder for the response bytes (see api.decoding).
+        stream_decode (callable, optional): Decoder for large bodies as they arrive (see http_client.get_json).
+        not_found (optional): Returned instead of None when the API answers 404.
     Returns:
-        list | None: A list of buyer dictionaries if successful, None otherwise.
+        The decoded JSON body, or None if an error occurs.
     """
     if not SOLANA_TRACKER_API_KEY:
-        print("Solana Tracker API Key not found. Please set SOLANA_TRACKER_API_KEY in your.env file.")
+        event(logger, logging.ERROR, "api_key_missing", provider="solana_tracker", setting="SOLANA_TRACKER_API_KEY")
         return None
 
-    endpoint = f"{SOLANA_TRACKER_BASE_URL}/first-buyers/{token_mint_address}"
-    headers = {"x-api-key": SOLANA_TRACKER_API_KEY}
-
     try:
-        print(f"Fetching first buyers for token: {token_mint_address}...")
-        response = requests.get(endpoint, headers=headers)
-        response.raise_for_status()  # Raise an exception for HTTP errors (4xx or 5xx)
-        data = response.json()
-
-        if data and isinstance(data, list):
-            print(f"Successfully fetched {len(data)} first buyers.")
-            return data
-        else:
-            print(f"No data or unexpected format received for first buyers of {token_mint_address}: {data}")
-            return None
-    except requests.exceptions.HTTPError as http_err:
-        print(f"HTTP error occurred while fetching first buyers: {http_err} - Response: {response.text}")
-        # Implement exponential backoff for rate limits if needed [2]
+        return await http_client.get_json(http_client.SOLANA_TRACKER, path, endpoint=endpoint, decode=decode,
+                                          stream_decode=stream_decode)
+    except rate_limiter.QuotaExceededError as quota_err:
+        event(logger, logging.WARNING, "quota_exceeded", request=description, error=quota_err)
+        return None
+    except httpx.HTTPStatusError as http_err:
+        if http_err.response.status_code == 404 and not_found is not None:
+            event(logger, logging.DEBUG, "not_found", request=description)
+            return not_found
+        event(logger, logging.WARNING, "http_error", request=description, status=http_err.response.status_code,
+              response=http_err.response.text[:200])
         return None
-    except requests.exceptions.ConnectionError as conn_err:
-        print(f"Connection error occurred while fetching first buyers: {conn_err}")
+    except httpx.ConnectError as conn_err:
+        event(logger, logging.WARNING, "connection_error", request=description, error=conn_err)
         return None
-    except requests.exceptions.Timeout as timeout_err:
-        print(f"Timeout error occurred while fetching first buyers: {timeout_err}")
+    except httpx.TimeoutException as timeout_err:
+        event(logger, logging.WARNING, "timeout", request=description, error=type(timeout_err).__name__)
         return None
-    except requests.exceptions.RequestException as req_err:
-        print(f"An unexpected error occurred while fetching first buyers: {req_err}")
+    except httpx.RequestError as req_err:
+        event(logger, logging.WARNING, "request_error", request=description, error=req_err)
         return None
     except Exception as e:
-        print(f"An unexpected error occurred: {e}")
+        event(logger, logging.ERROR, "unexpected_error", request=description, exc_info=e)
         return None
 
+async def get_first_token_buyers(token_mint_address: str) -> list | None:
+    """
+    Retrieves the first 100 buyers of a specific token with PnL data.
+    Uses Solana Tracker API's /first-buyers/{token} endpoint.
+    Args:
+        token_mint_address (str): The mint address of the token.
+    Returns:
+        list[PositionRecord] | None: The buyers' positions if successful, None otherwise.
+    """
+    data = await _make_solana_tracker_request(f"/first-buyers/{token_mint_address}", "first buyers",
+                                              endpoint="first_buyers", decode=decoding.decode_first_buyers,
+                                              stream_decode=decoding.adecode_first_buyers)
+
+    if data and isinstance(data, list):
+        event(logger, logging.DEBUG, "first_buyers_fetched", mint=token_mint_address, buyers=len(data))
+        return data
+    event(logger, logging.DEBUG, "first_buyers_missing", mint=token_mint_address)
+    return None
+
 async def get_wallet_pnl(wallet_address: str, token_mint_address: str = None) -> dict | None:
     """
     Retrieves Profit and Loss (PnL) data for a specific wallet, optionally for a specific token.
@@ -55,46 +78,19 @@ async def get_wallet_pnl(wallet_address: str, token_mint_address: str = None) ->
         wallet_address (str): The public key of the wallet.
         token_mint_address (str, optional): The mint address of a specific token. If None, gets overall wallet PnL.
     Returns:
-        dict | None: PnL data if successful, None otherwise.
+        dict | None: PnL data if successful (each entry of 'tokens' a PositionRecord), None otherwise.
     """
-    if not SOLANA_TRACKER_API_KEY:
-        print("Solana Tracker API Key not found. Please set SOLANA_TRACKER_API_KEY in your.env file.")
-        return None
-
     if token_mint_address:
-        endpoint = f"{SOLANA_TRACKER_BASE_URL}/pnl/{wallet_address}/{token_mint_address}"
+        path = f"/pnl/{wallet_address}/{token_mint_address}"
     else:
-        endpoint = f"{SOLANA_TRACKER_BASE_URL}/pnl/{wallet_address}"
+        path = f"/pnl/{wallet_address}"
 
-    headers = {"x-api-key": SOLANA_TRACKER_API_KEY}
+    data = await _make_solana_tracker_request(path, "PnL", endpoint="wallet_pnl", decode=decoding.decode_wallet_pnl)
 
-    try:
-        print(f"Fetching PnL for wallet: {wallet_address}" + (f" for token: {token_mint_address}" if token_mint_address else "") + "...")
-        response = requests.get(endpoint, headers=headers)
-        response.raise_for_status()
-        data = response.json()
-
-        if data:
-            print(f"Successfully fetched PnL data for {wallet_address}.")
-            return data
-        else:
-            print(f"No PnL data found for {wallet_address}" + (f" for token {token_mint_address}" if token_mint_address else "") + ".")
-            return None
-    except requests.exceptions.HTTPError as http_err:
-        print(f"HTTP error occurred while fetching PnL: {http_err} - Response: {response.text}")
-        return None
-    except requests.exceptions.ConnectionError as conn_err:
-        print(f"Connection error occurred while fetching PnL: {conn_err}")
-        return None
-    except requests.exceptions.Timeout as timeout_err:
-        print(f"Timeout error occurred while fetching PnL: {timeout_err}")
-        return None
-    except requests.exceptions.RequestException as req_err:
-        print(f"An unexpected error occurred while fetching PnL: {req_err}")
-        return None
-    except Exception as e:
-        print(f"An unexpected error occurred: {e}")
-        return None
+    if data:
+        return data
+    event(logger, logging.DEBUG, "wallet_pnl_missing", wallet=wallet_address, mint=token_mint_address)
+    return None
 
 async def get_token_metadata(token_mint_address: str) -> dict | None:
     """
@@ -103,33 +99,15 @@ async def get_token_metadata(token_mint_address: str) -> dict | None:
     Args:
         token_mint_address (str): The mint address of the token.
     Returns:
-        dict | None: Token metadata if successful, None otherwise.
+        dict | None: Token metadata if successful, an empty dict if the API confirms the mint
+                     is unknown (404 or an empty payload), None if the request failed.
     """
-    if not SOLANA_TRACKER_API_KEY:
-        print("Solana Tracker API Key not found. Please set SOLANA_TRACKER_API_KEY in your.env file.")
-        return None
+    data = await _make_solana_tracker_request(f"/tokens/{token_mint_address}", "token metadata",
+                                              endpoint="token_metadata", not_found={})
 
-    endpoint = f"{SOLANA_TRACKER_BASE_URL}/tokens/{token_mint_address}"
-    headers = {"x-api-key": SOLANA_TRACKER_API_KEY}
-
-    try:
-        print(f"Fetching token metadata for: {token_mint_address}...")
-        response = requests.get(endpoint, headers=headers)
-        response.raise_for_status()
-        data = response.json()
-
-        if data and data.get('status') == 'success' and data.get('data'):
-            print(f"Successfully fetched metadata for token: {token_mint_address}.")
-            return data['data']
-        else:
-            print(f"No metadata or unexpected format received for token {token_mint_address}: {data}")
-            return None
-    except requests.exceptions.HTTPError as http_err:
-        print(f"HTTP error occurred while fetching token metadata: {http_err} - Response: {response.text}")
-        return None
-    except requests.exceptions.RequestException as req_err:
-        print(f"An unexpected error occurred while fetching token metadata: {req_err}")
-        return None
-    except Exception as e:
-        print(f"An unexpected error occurred: {e}")
-        return None
\ No newline at end of file
+    if data and isinstance(data, dict) and data.get('status') == 'success' and data.get('data'):
+        return data['data']
+    event(logger, logging.DEBUG, "token_metadata_missing", mint=token_mint_address)
+    if data == {} or (isinstance(data, dict) and data.get('status') == 'success'):
+        return {}
+    return None
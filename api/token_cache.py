@@ -0,0 +1,199 @@
+import asyncio
+import time
+from collections import OrderedDict
+from api import solana_tracker, moralis_client, provider_router
+from telemetry import metrics
+from config.settings import (
+    TOKEN_CACHE_MAX_ENTRIES, TOKEN_CACHE_STATIC_TTL_SECONDS,
+    TOKEN_CACHE_VOLATILE_TTL_SECONDS, TOKEN_CACHE_NEGATIVE_TTL_SECONDS,
+)
+
+# Fields that change quickly (prices, market data). Everything else in a metadata
+# payload (name, symbol, decimals, image, ...) is treated as static.
+SOLANA_TRACKER_VOLATILE_FIELDS = ("priceUsd", "marketCapUsd", "liquidityUsd")
+MORALIS_VOLATILE_FIELDS = ("fullyDilutedValue",)
+ROUTER_VOLATILE_FIELDS = ("price_usd",)
+
+_LOOKUPS = metrics.counter("vector_cache_lookups_total", "Token metadata cache lookups.", ("cache", "result"))
+
+# Timestamps are refreshed on every write, so they never count as a change
+_PERSIST_IGNORED_FIELDS = ("created_at", "updated_at", "last_price_updated")
+
+class _CacheEntry:
+    __slots__ = ("static", "volatile", "static_expires", "volatile_expires", "missing_until")
+
+    def __init__(self):
+        self.static = None
+        self.volatile = None
+        self.static_expires = 0.0
+        self.volatile_expires = 0.0
+        self.missing_until = 0.0
+
+class TokenMetadataCache:
+    """
+    LRU cache in front of a provider's token metadata lookup.
+    Static and volatile fields expire separately, and concurrent lookups of the
+    same mint share one in-flight request. A mint the provider confirms is
+    unknown (an empty dict) is cached as missing for a short time; a failed
+    lookup (None) caches nothing and leaves the cached static fields in place.
+    """
+
+    def __init__(self, name: str, fetch, volatile_fields: tuple, max_entries: int = TOKEN_CACHE_MAX_ENTRIES,
+                 static_ttl: float = TOKEN_CACHE_STATIC_TTL_SECONDS,
+                 volatile_ttl: float = TOKEN_CACHE_VOLATILE_TTL_SECONDS,
+                 negative_ttl: float = TOKEN_CACHE_NEGATIVE_TTL_SECONDS):
+        self.name = name
+        self._fetch = fetch
+        self.volatile_fields = volatile_fields
+        self.max_entries = max_entries
+        self.static_ttl = static_ttl
+        self.volatile_ttl = volatile_ttl
+        self.negative_ttl = negative_ttl
+        self._entries: OrderedDict[str, _CacheEntry] = OrderedDict()
+        self._inflight: dict[str, asyncio.Task] = {}
+        self._persisted: dict[str, dict] = {}
+        self.hits = 0
+        self.misses = 0
+
+    def _lookup(self, token_mint_address: str, include_volatile: bool):
+        """
+        Returns (found, value) from the cache without fetching.
+        found is False when the entry is absent or stale.
+        """
+        entry = self._entries.get(token_mint_address)
+        if entry is None:
+            return False, None
+        now = time.monotonic()
+        if entry.missing_until > now:
+            return True, None
+        if entry.static is None or entry.static_expires <= now:
+            return False, None
+        if include_volatile and entry.volatile_expires <= now:
+            return False, None
+        self._entries.move_to_end(token_mint_address)
+        if include_volatile:
+            return True, {**entry.static, **entry.volatile}
+        return True, dict(entry.static)
+
+    def _store(self, token_mint_address: str, data: dict | None):
+        if data is None:
+            return
+        entry = self._entries.get(token_mint_address) or _CacheEntry()
+        now = time.monotonic()
+        if not data:
+            entry.static = None
+            entry.volatile = None
+            entry.missing_until = now + self.negative_ttl
+        else:
+            entry.static = {key: value for key, value in data.items() if key not in self.volatile_fields}
+            entry.volatile = {key: value for key, value in data.items() if key in self.volatile_fields}
+            entry.static_expires = now + self.static_ttl
+            entry.volatile_expires = now + self.volatile_ttl
+            entry.missing_until = 0.0
+        self._entries[token_mint_address] = entry
+        self._entries.move_to_end(token_mint_address)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    async def _load(self, token_mint_address: str) -> dict | None:
+        task = asyncio.current_task()
+        try:
+            data = await self._fetch(token_mint_address)
+            # A lookup detached by clear() or invalidate() still answers its callers but mustn't refill the cache
+            if self._inflight.get(token_mint_address) is task:
+                self._store(token_mint_address, data)
+            return data
+        finally:
+            if self._inflight.get(token_mint_address) is task:
+                del self._inflight[token_mint_address]
+
+    async def get(self, token_mint_address: str, include_volatile: bool = True) -> dict | None:
+        """
+        Returns the metadata for a mint, fetching it from the provider only when needed.
+        Args:
+            token_mint_address (str): The mint address of the token.
+            include_volatile (bool): If False, a cached entry with stale prices is still
+                                     served, since only the static fields are wanted.
+        Returns:
+            dict | None: The token metadata, or None if the mint is unknown or the lookup failed.
+        """
+        found, value = self._lookup(token_mint_address, include_volatile)
+        if found:
+            self.hits += 1
+            _LOOKUPS.inc(cache=self.name, result="hit")
+            return value
+
+        self.misses += 1
+        _LOOKUPS.inc(cache=self.name, result="miss")
+        task = self._inflight.get(token_mint_address)
+        if task is None:
+            task = asyncio.ensure_future(self._load(token_mint_address))
+            self._inflight[token_mint_address] = task
+        # Shield the shared request, so one cancelled caller doesn't cancel it for the others
+        data = await asyncio.shield(task)
+        return dict(data) if data else None
+
+    def clear(self):
+        """
+        Drops every cached entry and the record of persisted rows, and detaches
+        in-flight lookups, so later calls fetch afresh.
+        """
+        self._entries.clear()
+        self._inflight.clear()
+        self._persisted.clear()
+        self.hits = 0
+        self.misses = 0
+
+    def invalidate(self, token_mint_address: str):
+        """
+        Drops a mint from the cache, so the next lookup goes to the provider.
+        """
+        self._entries.pop(token_mint_address, None)
+        self._inflight.pop(token_mint_address, None)
+
+    def needs_persist(self, token_mint_address: str, row: dict) -> bool:
+        """
+        Returns True if `row` differs from what was last written for this mint.
+        """
+        return self._persisted.get(token_mint_address) != _comparable(row)
+
+    def mark_persisted(self, token_mint_address: str, row: dict):
+        """
+        Records `row` as the latest state written to the 'token_metadata' table.
+        """
+        self._persisted[token_mint_address] = _comparable(row)
+
+def _comparable(row: dict) -> dict:
+    return {key: value for key, value in row.items() if key not in _PERSIST_IGNORED_FIELDS}
+
+# One cache per provider, since their payloads differ
+solana_tracker_cache = TokenMetadataCache("solana_tracker", solana_tracker.get_token_metadata, SOLANA_TRACKER_VOLATILE_FIELDS)
+moralis_cache = TokenMetadataCache("moralis", moralis_client.get_token_metadata, MORALIS_VOLATILE_FIELDS)
+# Normalised metadata from whichever provider the router picks
+router_cache = TokenMetadataCache("router", provider_router.get_token_metadata, ROUTER_VOLATILE_FIELDS)
+
+_caches = {
+    "solana_tracker": solana_tracker_cache,
+    "moralis": moralis_cache,
+    "router": router_cache,
+}
+
+async def get_token_metadata(token_mint_address: str, provider: str = "solana_tracker",
+                             include_volatile: bool = True) -> dict | None:
+    """
+    Cached token metadata lookup.
+    Args:
+        token_mint_address (str): The mint address of the token.
+        provider (str): "solana_tracker", "moralis", or "router" for the normalised
+                        schema from provider_router.
+        include_volatile (bool): Whether fresh price fields are required.
+    Returns:
+        dict | None: Token metadata if known, None otherwise.
+    """
+    return await _caches[provider].get(token_mint_address, include_volatile)
+
+def get_cache(provider: str = "solana_tracker") -> TokenMetadataCache:
+    """
+    Returns the metadata cache for a provider.
+    """
+    return _caches[provider]
@@ -0,0 +1,320 @@
+import asyncio
+import json
+import logging
+import random
+import time
+from collections import OrderedDict, deque
+import websockets
+from api import decoding
+from telemetry import metrics
+from telemetry.logs import event as log_event, get_logger
+from config.settings import (
+    SOLANA_TRACKER_API_KEY, SOLANA_TRACKER_DATASTREAM_URL,
+    STREAM_QUEUE_SIZE, STREAM_OVERFLOW_POLICY,
+    STREAM_RECONNECT_BASE_SECONDS, STREAM_RECONNECT_MAX_SECONDS,
+)
+
+BUY = 1
+SELL = -1
+
+# Signatures remembered for de-duplicating events replayed after a reconnect
+_RECENT_SIGNATURES = 50_000
+# Latency samples kept for percentile reporting
+_LATENCY_SAMPLES = 10_000
+
+logger = get_logger(__name__)
+
+_SIGNAL_LATENCY_SECONDS = metrics.histogram(
+    "vector_signal_latency_seconds", "Time from a trade message arriving to its signal being emitted.",
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0))
+_SIGNALS = metrics.counter("vector_signals_total", "Trade signals by what happened to them.", ("outcome",))
+_QUEUE_DEPTH = metrics.gauge("vector_queue_depth", "Items waiting in each pipeline queue.", ("queue",))
+_RECONNECTS = metrics.counter("vector_stream_reconnects_total", "Trade stream reconnects.")
+
+class TradeEvent:
+    """
+    Compact, normalised trade from the stream.
+    `side` is BUY or SELL, `block_time` is epoch ms, and `received_at` is the
+    time.perf_counter() reading taken when the message arrived.
+    """
+
+    __slots__ = ("signature", "wallet", "mint", "side", "amount", "price_usd", "volume_usd",
+                 "block_time", "received_at", "merged")
+
+    def __init__(self, signature, wallet, mint, side, amount, price_usd, volume_usd, block_time, received_at):
+        self.signature = signature
+        self.wallet = wallet
+        self.mint = mint
+        self.side = side
+        self.amount = amount
+        self.price_usd = price_usd
+        self.volume_usd = volume_usd
+        self.block_time = block_time
+        self.received_at = received_at
+        # Number of trades coalesced into this one
+        self.merged = 1
+
+    def __repr__(self):
+        side = "buy" if self.side == BUY else "sell"
+        return f"TradeEvent({self.wallet} {side} {self.amount} {self.mint} @ {self.price_usd})"
+
+def _float(value) -> float:
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return 0.0
+
+def normalise_trade(data: dict, received_at: float, wallet: str = None) -> TradeEvent | None:
+    """
+    Converts a Datastream wallet trade payload into a TradeEvent.
+    Args:
+        data (dict): The 'data' object of a wallet room message.
+        received_at (float): time.perf_counter() when the message arrived.
+        wallet (str, optional): The subscribed wallet, used if the payload omits it.
+    Returns:
+        TradeEvent | None: The trade, or None if the payload isn't a recognisable trade.
+    """
+    side_name = (data.get("type") or data.get("side") or "").lower()
+    if side_name not in ("buy", "sell"):
+        return None
+    side = BUY if side_name == "buy" else SELL
+
+    mint = data.get("mint")
+    if not mint:
+        # Buys receive the token, sells send it
+        token = data.get("token") or {}
+        leg = token.get("to") if side == BUY else token.get("from")
+        mint = (leg or {}).get("address")
+    wallet = data.get("wallet") or wallet
+    if not mint or not wallet:
+        return None
+
+    return TradeEvent(
+        signature=data.get("tx") or data.get("signature"),
+        wallet=wallet,
+        mint=mint,
+        side=side,
+        amount=_float(data.get("amount")),
+        price_usd=_float(data.get("priceUsd")),
+        volume_usd=_float(data.get("volume")),
+        block_time=_float(data.get("time")),
+        received_at=received_at,
+    )
+
+class SignalQueue:
+    """
+    Bounded async queue of TradeEvents with an explicit overflow policy:
+    - "drop_newest": an event arriving at a full queue is discarded.
+    - "drop_oldest": the oldest pending event is discarded to make room.
+    - "coalesce": an event arriving at a full queue is merged into a pending event
+      for the same wallet, mint and side (amounts and volumes summed, priced at
+      their VWAP); with none pending, the oldest is dropped.
+    While there's room every event is queued on its own, whatever the policy.
+    Producers never block, so a slow consumer can't stall the websocket reader.
+    """
+
+    def __init__(self, maxsize: int = STREAM_QUEUE_SIZE, policy: str = STREAM_OVERFLOW_POLICY):
+        if policy not in ("drop_oldest", "drop_newest", "coalesce"):
+            raise ValueError(f"Unknown overflow policy: {policy}")
+        self.maxsize = maxsize
+        self.policy = policy
+        self._items: OrderedDict = OrderedDict()
+        # (wallet, mint, side) -> sequence number of the newest pending event, for coalescing
+        self._latest: dict[tuple, int] = {}
+        self._sequence = 0
+        self._not_empty = asyncio.Event()
+        self._latencies = deque(maxlen=_LATENCY_SAMPLES)
+        self.dropped = 0
+        self.coalesced = 0
+        self.emitted = 0
+
+    def __len__(self):
+        return len(self._items)
+
+    def _pop_oldest(self) -> TradeEvent:
+        sequence, event = self._items.popitem(last=False)
+        key = (event.wallet, event.mint, event.side)
+        if self._latest.get(key) == sequence:
+            del self._latest[key]
+        return event
+
+    def put_nowait(self, event: TradeEvent) -> bool:
+        """
+        Adds an event according to the overflow policy.
+        Returns:
+            bool: False if the event was dropped.
+        """
+        key = (event.wallet, event.mint, event.side)
+        if len(self._items) >= self.maxsize:
+            pending = self._items.get(self._latest.get(key)) if self.policy == "coalesce" else None
+            if pending is not None:
+                pending.amount += event.amount
+                pending.volume_usd += event.volume_usd
+                # The merged amount was filled at several prices; its VWAP is what it cost
+                pending.price_usd = pending.volume_usd / pending.amount if pending.amount else event.price_usd
+                pending.block_time = max(pending.block_time, event.block_time)
+                pending.merged += 1
+                self.coalesced += 1
+                _SIGNALS.inc(outcome="coalesced")
+                return True
+            self.dropped += 1
+            _SIGNALS.inc(outcome="dropped")
+            if self.policy == "drop_newest":
+                return False
+            self._pop_oldest()
+        self._sequence += 1
+        self._items[self._sequence] = event
+        self._latest[key] = self._sequence
+        _QUEUE_DEPTH.set(len(self._items), queue="signals")
+        self._not_empty.set()
+        return True
+
+    async def get(self) -> TradeEvent:
+        """
+        Waits for the next event and records its receipt-to-emission latency.
+        """
+        while not self._items:
+            self._not_empty.clear()
+            await self._not_empty.wait()
+        event = self._pop_oldest()
+        latency = time.perf_counter() - event.received_at
+        self._latencies.append(latency)
+        self.emitted += 1
+        _SIGNAL_LATENCY_SECONDS.observe(latency)
+        _SIGNALS.inc(outcome="emitted")
+        _QUEUE_DEPTH.set(len(self._items), queue="signals")
+        return event
+
+    def latency_stats(self) -> dict:
+        """
+        Returns receipt-to-emission latency percentiles (in milliseconds) over recent events.
+        """
+        if not self._latencies:
+            return {"count": 0, "p50_ms": None, "p99_ms": None, "max_ms": None}
+        samples = sorted(self._latencies)
+        return {
+            "count": len(samples),
+            "p50_ms": samples[len(samples) // 2] * 1000.0,
+            "p99_ms": samples[min(len(samples) - 1, int(len(samples) * 0.99))] * 1000.0,
+            "max_ms": samples[-1] * 1000.0,
+        }
+
+class TradeStream:
+    """
+    Websocket client that subscribes to trade events for a set of wallets and
+    pushes normalised TradeEvents onto a SignalQueue.
+    Reconnects with jittered backoff and resubscribes every wallet. Each
+    disconnected window is recorded in `gaps` (and passed to `on_gap`, if given)
+    so callers can backfill trades that may have been missed.
+    """
+
+    def __init__(self, wallets, queue: SignalQueue = None, url: str = None, on_gap=None):
+        self.url = url or f"{SOLANA_TRACKER_DATASTREAM_URL}/{SOLANA_TRACKER_API_KEY or ''}"
+        self.queue = queue if queue is not None else SignalQueue()
+        self.on_gap = on_gap
+        self.wallets: set[str] = set(wallets)
+        self.gaps: list[tuple[float, float]] = []
+        self.reconnects = 0
+        self.duplicates = 0
+        self._recent_signatures: OrderedDict = OrderedDict()
+        self._websocket = None
+        self._stopping = False
+
+    @staticmethod
+    def _room(wallet: str) -> str:
+        return f"wallet:{wallet}"
+
+    async def _send(self, message_type: str, wallets):
+        for wallet in wallets:
+            await self._websocket.send(json.dumps({"type": message_type, "room": self._room(wallet)}))
+
+    async def update_wallets(self, wallets):
+        """
+        Replaces the tracked wallet set, joining and leaving rooms on a live connection.
+        """
+        wallets = set(wallets)
+        added = wallets - self.wallets
+        removed = self.wallets - wallets
+        self.wallets = wallets
+        if self._websocket is not None:
+            try:
+                await self._send("join", added)
+                await self._send("leave", removed)
+            except websockets.ConnectionClosed:
+                pass  # The reconnect resubscribes from self.wallets
+
+    def _is_duplicate(self, signature: str | None, wallet: str) -> bool:
+        if not signature:
+            return False
+        key = (signature, wallet)
+        if key in self._recent_signatures:
+            self.duplicates += 1
+            return True
+        self._recent_signatures[key] = None
+        if len(self._recent_signatures) > _RECENT_SIGNATURES:
+            self._recent_signatures.popitem(last=False)
+        return False
+
+    def _handle_message(self, raw, received_at: float):
+        try:
+            message = decoding.loads(raw)
+        except ValueError:
+            return
+        if not isinstance(message, dict) or message.get("type") != "message":
+            return
+        room = message.get("room") or ""
+        wallet = room.split(":", 1)[1] if room.startswith("wallet:") else None
+        data = message.get("data")
+        if not isinstance(data, dict):
+            return
+        event = normalise_trade(data, received_at, wallet)
+        if event is None or event.wallet not in self.wallets:
+            return
+        if self._is_duplicate(event.signature, event.wallet):
+            return
+        self.queue.put_nowait(event)
+
+    async def run(self):
+        """
+        Connects and streams until stop() is called, reconnecting on failures.
+        """
+        attempt = 0
+        disconnected_at = None
+        while not self._stopping:
+            try:
+                async with websockets.connect(self.url, ping_interval=20, ping_timeout=20) as websocket:
+                    self._websocket = websocket
+                    await self._send("join", self.wallets)
+                    if disconnected_at is not None:
+                        gap = (disconnected_at, time.time())
+                        self.gaps.append(gap)
+                        log_event(logger, logging.INFO, "stream_reconnected", gap_seconds=round(gap[1] - gap[0], 1),
+                                  wallets=len(self.wallets))
+                        if self.on_gap:
+                            self.on_gap(set(self.wallets), *gap)
+                        disconnected_at = None
+                    attempt = 0
+                    async for raw in websocket:
+                        self._handle_message(raw, time.perf_counter())
+            except (OSError, websockets.WebSocketException) as e:
+                if not self._stopping:
+                    log_event(logger, logging.WARNING, "stream_connection_error", error=e)
+            finally:
+                self._websocket = None
+            if self._stopping:
+                break
+            if disconnected_at is None:
+                disconnected_at = time.time()
+            attempt += 1
+            self.reconnects += 1
+            _RECONNECTS.inc()
+            delay = random.uniform(0, min(STREAM_RECONNECT_MAX_SECONDS, STREAM_RECONNECT_BASE_SECONDS * 2 ** (attempt - 1)))
+            await asyncio.sleep(delay)
+
+    async def stop(self):
+        """
+        Stops streaming and closes the connection.
+        """
+        self._stopping = True
+        if self._websocket is not None:
+            await self._websocket.close()
@@ -0,0 +1,125 @@
+import asyncio
+import json
+import random
+import time
+import websockets
+from api.trade_stream import TradeStream, SignalQueue
+
+class MockDatastream:
+    """
+    Local stand-in for the Solana Tracker Datastream websocket.
+    Clients join 'wallet:<address>' rooms; publish() sends a trade to every
+    client in that wallet's room, and drop_connections() simulates an outage.
+    """
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0):
+        self.host = host
+        self.port = port
+        self._server = None
+        self._rooms: dict[str, set] = {}
+        self._connections: set = set()
+
+    @property
+    def url(self) -> str:
+        return f"ws://{self.host}:{self.port}"
+
+    async def _handler(self, websocket):
+        self._connections.add(websocket)
+        try:
+            async for raw in websocket:
+                message = json.loads(raw)
+                room = message.get("room")
+                if message.get("type") == "join":
+                    self._rooms.setdefault(room, set()).add(websocket)
+                    await websocket.send(json.dumps({"type": "joined", "room": room}))
+                elif message.get("type") == "leave":
+                    self._rooms.get(room, set()).discard(websocket)
+        except websockets.ConnectionClosed:
+            pass
+        finally:
+            self._connections.discard(websocket)
+            for members in self._rooms.values():
+                members.discard(websocket)
+
+    async def start(self):
+        self._server = await websockets.serve(self._handler, self.host, self.port)
+        self.port = self._server.sockets[0].getsockname()[1]
+
+    async def stop(self):
+        self._server.close()
+        await self._server.wait_closed()
+
+    def subscribers(self, wallet: str) -> int:
+        return len(self._rooms.get(f"wallet:{wallet}", ()))
+
+    async def publish(self, wallet: str, trade: dict):
+        room = f"wallet:{wallet}"
+        message = json.dumps({"type": "message", "room": room, "data": {"wallet": wallet, **trade}})
+        for websocket in list(self._rooms.get(room, ())):
+            try:
+                await websocket.send(message)
+            except websockets.ConnectionClosed:
+                pass
+
+    async def drop_connections(self):
+        for websocket in list(self._connections):
+            await websocket.close()
+
+def random_trade(mint: str) -> dict:
+    side = random.choice(("buy", "sell"))
+    amount = random.uniform(1, 1_000_000)
+    price = random.uniform(1e-6, 1e-2)
+    return {
+        "tx": f"{random.getrandbits(128):032x}",
+        "type": side,
+        "mint": mint,
+        "amount": amount,
+        "priceUsd": price,
+        "volume": amount * price,
+        "time": time.time() * 1000,
+    }
+
+async def main(wallet_count: int = 100, events: int = 20_000):
+    """
+    Streams random trades through a TradeStream connected to the stand-in,
+    drops the connection halfway through, and reports latency and queue stats.
+    """
+    server = MockDatastream()
+    await server.start()
+    wallets = [f"wallet{i}" for i in range(wallet_count)]
+    queue = SignalQueue()
+    stream = TradeStream(wallets, queue=queue, url=server.url)
+    stream_task = asyncio.create_task(stream.run())
+    while server.subscribers(wallets[-1]) == 0:
+        await asyncio.sleep(0.01)
+
+    received = 0
+
+    async def consume():
+        nonlocal received
+        while True:
+            await queue.get()
+            received += 1
+
+    consumer = asyncio.create_task(consume())
+    mints = [f"mint{i}" for i in range(20)]
+    for i in range(events):
+        if i == events // 2:
+            await server.drop_connections()
+            while server.subscribers(wallets[-1]) == 0:
+                await asyncio.sleep(0.01)
+        await server.publish(random.choice(wallets), random_trade(random.choice(mints)))
+    await asyncio.sleep(0.5)
+
+    print(f"Published {events}, emitted {received} signals "
+          f"({queue.coalesced} coalesced, {queue.dropped} dropped, {stream.duplicates} duplicates).")
+    print(f"Reconnects: {stream.reconnects}, gaps: {[round(end - start, 3) for start, end in stream.gaps]}")
+    print(f"Latency: {queue.latency_stats()}")
+
+    consumer.cancel()
+    await stream.stop()
+    stream_task.cancel()
+    await server.stop()
+
+if __name__ == "__main__":
+    asyncio.run(main())
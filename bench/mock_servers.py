@@ -0,0 +1,372 @@
+import asyncio
+import datetime
+import json
+import random
+import time
+import zlib
+from collections import Counter, defaultdict
+from urllib.parse import parse_qs
+import httpx
+
+SUPABASE_MOCK_URL = "http://supabase.mock"
+
+class MockBehaviour:
+    """
+    How a mock server misbehaves: latency, error rate and rate limiting.
+    Args:
+        latency_ms (float): Median response latency.
+        latency_sigma (float): Log-normal spread of the latency (0 = constant).
+        error_rate (float): Fraction of requests answered with a 500.
+        rate_limit_rps (float, optional): Requests per second above which the server answers 429.
+        retry_after (float): Retry-After value sent with 429 responses.
+        seed (int): Random seed, so runs are reproducible.
+    """
+
+    def __init__(self, latency_ms: float = 20.0, latency_sigma: float = 0.3, error_rate: float = 0.0,
+                 rate_limit_rps: float = None, retry_after: float = 1.0, seed: int = 1):
+        self.latency_ms = latency_ms
+        self.latency_sigma = latency_sigma
+        self.error_rate = error_rate
+        self.rate_limit_rps = rate_limit_rps
+        self.retry_after = retry_after
+        self.seed = seed
+
+class MockServer:
+    """
+    Base class for in-process HTTP mocks served through httpx.MockTransport.
+    Subclasses implement route() and respond(); this class adds latency,
+    injected errors and 429s, and records calls and latency per route.
+    """
+
+    def __init__(self, behaviour: MockBehaviour = None):
+        self.behaviour = behaviour or MockBehaviour()
+        self._random = random.Random(self.behaviour.seed)
+        self.calls = Counter()
+        self.statuses = Counter()
+        self.latencies = defaultdict(list)
+        self._tokens = self.behaviour.rate_limit_rps or 0.0
+        self._updated = time.monotonic()
+
+    def transport(self) -> httpx.MockTransport:
+        return httpx.MockTransport(self.handle)
+
+    def route(self, request: httpx.Request) -> str:
+        raise NotImplementedError
+
+    def respond(self, route: str, request: httpx.Request) -> httpx.Response:
+        raise NotImplementedError
+
+    def _throttled(self) -> bool:
+        rate = self.behaviour.rate_limit_rps
+        if not rate:
+            return False
+        now = time.monotonic()
+        self._tokens = min(rate, self._tokens + (now - self._updated) * rate)
+        self._updated = now
+        if self._tokens < 1.0:
+            return True
+        self._tokens -= 1.0
+        return False
+
+    async def handle(self, request: httpx.Request) -> httpx.Response:
+        started = time.perf_counter()
+        route = self.route(request)
+        self.calls[route] += 1
+        behaviour = self.behaviour
+        if behaviour.latency_ms > 0:
+            await asyncio.sleep(behaviour.latency_ms / 1000.0 * self._random.lognormvariate(0.0, behaviour.latency_sigma))
+        if self._throttled():
+            response = httpx.Response(429, headers={"Retry-After": str(behaviour.retry_after)}, json={"error": "rate limited"})
+        elif self._random.random() < behaviour.error_rate:
+            response = httpx.Response(500, json={"error": "injected failure"})
+        else:
+            response = self.respond(route, request)
+        self.statuses[response.status_code] += 1
+        self.latencies[route].append(time.perf_counter() - started)
+        return response
+
+    def total_calls(self) -> int:
+        return sum(self.calls.values())
+
+class _SyntheticMarket:
+    """
+    Deterministic fake market data. Each mint's first buyers are drawn from a
+    fixed universe of wallets, so wallets recur across mints as they would in reality.
+    """
+
+    def __init__(self, wallet_count: int, buyers_per_mint: int = 100):
+        self.wallet_count = wallet_count
+        self.buyers_per_mint = buyers_per_mint
+
+    @staticmethod
+    def _rng(key: str) -> random.Random:
+        return random.Random(zlib.crc32(key.encode()))
+
+    def wallet(self, index: int) -> str:
+        return f"Wallet{index:08d}"
+
+    def launch_time(self, mint: str) -> float:
+        return 1_700_000_000_000 + self._rng(mint).randrange(0, 10_000_000_000)
+
+    def first_buyers(self, mint: str) -> list:
+        rng = self._rng(mint)
+        launch = self.launch_time(mint)
+        count = min(self.buyers_per_mint, self.wallet_count)
+        buyers = []
+        for rank, index in enumerate(rng.sample(range(self.wallet_count), count)):
+            first_buy = launch + rank * rng.uniform(200, 5_000)
+            invested = rng.uniform(10, 5_000)
+            realized = rng.gauss(0, invested)
+            unrealized = rng.gauss(0, invested / 4)
+            sold = rng.random() < 0.7
+            buyers.append({
+                "wallet": self.wallet(index),
+                "first_buy_time": first_buy,
+                "first_sell_time": first_buy + rng.uniform(5_000, 86_400_000) if sold else None,
+                "last_transaction_time": first_buy + rng.uniform(5_000, 172_800_000),
+                "realized": realized,
+                "unrealized": unrealized,
+                "total": realized + unrealized,
+                "total_invested": invested,
+                "buy_transactions": rng.randint(1, 10),
+                "sell_transactions": rng.randint(0, 10) if sold else 0,
+                "total_transactions": rng.randint(1, 20),
+            })
+        return buyers
+
+    def wallet_pnl(self, wallet: str) -> dict:
+        rng = self._rng(wallet)
+        tokens = {}
+        for i in range(rng.randint(1, 20)):
+            invested = rng.uniform(10, 5_000)
+            first_buy = 1_700_000_000_000 + rng.randrange(0, 10_000_000_000)
+            tokens[f"Mint{rng.getrandbits(40):012x}"] = {
+                "realized": rng.gauss(0, invested),
+                "unrealized": rng.gauss(0, invested / 4),
+                "total_invested": invested,
+                "first_buy_time": first_buy,
+                "last_sell_time": first_buy + rng.uniform(5_000, 86_400_000),
+                "last_trade_time": first_buy + rng.uniform(5_000, 172_800_000),
+                "total_transactions": rng.randint(1, 20),
+            }
+        realized = sum(token["realized"] for token in tokens.values())
+        unrealized = sum(token["unrealized"] for token in tokens.values())
+        return {"tokens": tokens, "summary": {"realized": realized, "unrealized": unrealized, "total": realized + unrealized}}
+
+    def token(self, mint: str) -> dict:
+        rng = self._rng(mint)
+        return {
+            "mint": mint,
+            "name": f"Token {mint[:6]}",
+            "symbol": mint[:4].upper(),
+            "decimals": 6,
+            "image": f"https://example.invalid/{mint}.png",
+            "priceUsd": rng.uniform(1e-6, 1.0),
+        }
+
+    def price(self, mint: str) -> dict:
+        return {"tokenAddress": mint, "usdPrice": self.token(mint)["priceUsd"], "exchangeName": "Raydium"}
+
+class SolanaTrackerMock(MockServer):
+    """
+    Mimics the Solana Tracker Data API: /first-buyers/{mint}, /pnl/{wallet}[/{mint}], /tokens/{mint}.
+    """
+
+    def __init__(self, market: _SyntheticMarket, behaviour: MockBehaviour = None):
+        super().__init__(behaviour)
+        self.market = market
+
+    def route(self, request: httpx.Request) -> str:
+        parts = request.url.path.strip("/").split("/")
+        return {"first-buyers": "first_buyers", "pnl": "wallet_pnl", "tokens": "token_metadata"}.get(parts[0], "unknown")
+
+    def respond(self, route: str, request: httpx.Request) -> httpx.Response:
+        parts = request.url.path.strip("/").split("/")
+        if route == "first_buyers":
+            return httpx.Response(200, json=self.market.first_buyers(parts[1]))
+        if route == "wallet_pnl":
+            return httpx.Response(200, json=self.market.wallet_pnl(parts[1]))
+        if route == "token_metadata":
+            return httpx.Response(200, json={"status": "success", "data": self.market.token(parts[1])})
+        return httpx.Response(404, json={"error": "not found"})
+
+class MoralisMock(MockServer):
+    """
+    Mimics the Moralis Solana gateway /token/mainnet/... and /account/mainnet/... endpoints.
+    """
+
+    def __init__(self, market: _SyntheticMarket, behaviour: MockBehaviour = None):
+        super().__init__(behaviour)
+        self.market = market
+        self._new_token_counter = 0
+
+    def route(self, request: httpx.Request) -> str:
+        parts = request.url.path.strip("/").split("/")
+        if parts[:2] == ["account", "mainnet"]:
+            return "wallet_profitability"
+        if parts[:2] != ["token", "mainnet"] or len(parts) < 3:
+            return "unknown"
+        if parts[2] == "exchange":
+            return "new_tokens"
+        if parts[2] == "holders":
+            return "token_holders"
+        if parts[2] == "prices":
+            return "token_prices"
+        return {"metadata": "token_metadata", "price": "token_price"}.get(parts[-1], "unknown")
+
+    def respond(self, route: str, request: httpx.Request) -> httpx.Response:
+        parts = request.url.path.strip("/").split("/")
+        if route == "new_tokens":
+            limit = int(request.url.params.get("limit", 10))
+            tokens = []
+            for _ in range(limit):
+                self._new_token_counter += 1
+                mint = f"NewMint{self._new_token_counter:010d}"
+                tokens.append({"tokenAddress": mint, "name": f"Token {mint}", "symbol": "NEW", "decimals": 6})
+            return httpx.Response(200, json=tokens)
+        if route == "token_holders":
+            buyers = self.market.first_buyers(parts[3])
+            return httpx.Response(200, json={"result": [{"ownerAddress": buyer["wallet"], "balance": buyer["total_invested"]} for buyer in buyers]})
+        if route == "token_metadata":
+            token = self.market.token(parts[2])
+            return httpx.Response(200, json={"mint": token["mint"], "name": token["name"], "symbol": token["symbol"], "decimals": token["decimals"], "logo": token["image"]})
+        if route == "token_price":
+            return httpx.Response(200, json=self.market.price(parts[2]))
+        if route == "token_prices":
+            addresses = json.loads(request.content or b"{}").get("addresses", [])
+            return httpx.Response(200, json=[self.market.price(mint) for mint in addresses])
+        if route == "wallet_profitability":
+            pnl = self.market.wallet_pnl(parts[2])
+            return httpx.Response(200, json={"total_realized_profit_usd": pnl["summary"]["realized"], "total_trade_volume": sum(t["total_invested"] for t in pnl["tokens"].values())})
+        return httpx.Response(404, json={"error": "not found"})
+
+class PostgrestMock(MockServer):
+    """
+    Minimal in-memory PostgREST for the 'wallets' and 'token_metadata' tables.
+    Supports the subset of the protocol the Supabase client sends for this app:
+    select with eq/in/gt/gte filters and or/and trees, order, offset/limit; insert; upsert with
+    on_conflict, merge-duplicates and missing=default; and update with eq filters.
+    """
+
+    PRIMARY_KEYS = {"wallets": "wallet_address", "token_metadata": "token_mint"}
+    # Columns declared "default now()", filled on insert when the client asks for missing=default
+    NOW_DEFAULTS = {"wallets": ("first_seen", "created_at", "updated_at"), "token_metadata": ("created_at", "updated_at")}
+
+    def __init__(self, behaviour: MockBehaviour = None):
+        super().__init__(behaviour)
+        self.tables: dict[str, dict] = {table: {} for table in self.PRIMARY_KEYS}
+
+    def route(self, request: httpx.Request) -> str:
+        table = request.url.path.rstrip("/").split("/")[-1]
+        return f"{request.method.lower()}_{table}"
+
+    @staticmethod
+    def _parse_in(value: str) -> set:
+        return {item.strip('"') for item in value[len("in.("):-1].split(",")} if value.endswith(")") else set()
+
+    @staticmethod
+    def _split(conditions: str) -> list:
+        """
+        Splits a logic tree's conditions on the commas that aren't inside parentheses or quotes.
+        """
+        parts, depth, quoted, start = [], 0, False, 0
+        for position, char in enumerate(conditions):
+            if char == '"':
+                quoted = not quoted
+            elif not quoted and char == "(":
+                depth += 1
+            elif not quoted and char == ")":
+                depth -= 1
+            elif not quoted and char == "," and depth == 0:
+                parts.append(conditions[start:position])
+                start = position + 1
+        parts.append(conditions[start:])
+        return parts
+
+    def _matches(self, row: dict, column: str, value: str) -> bool:
+        if column in ("or", "and"):
+            results = (self._condition(row, condition) for condition in self._split(value[1:-1]))
+            return any(results) if column == "or" else all(results)
+        operator, _, operand = value.partition(".")
+        if operator == "in":
+            return str(row.get(column)) in self._parse_in(value)
+        operand = operand.strip('"')
+        if operator == "eq":
+            return str(row.get(column)) == operand
+        if row.get(column) is None:
+            return False
+        if operator == "gt":
+            return str(row.get(column)) > operand
+        if operator == "gte":
+            return str(row.get(column)) >= operand
+        return True
+
+    def _condition(self, row: dict, condition: str) -> bool:
+        # Either "column.op.value" or a nested "and(...)"/"or(...)"
+        if condition.startswith(("and(", "or(")):
+            name, _, tree = condition.partition("(")
+            return self._matches(row, name, "(" + tree)
+        column, _, value = condition.partition(".")
+        return self._matches(row, column, value)
+
+    def _filter(self, rows, params: dict):
+        for column, values in params.items():
+            if column in ("select", "order", "offset", "limit", "on_conflict", "columns"):
+                continue
+            rows = [row for row in rows if self._matches(row, column, values[0])]
+        return rows
+
+    def respond(self, route: str, request: httpx.Request) -> httpx.Response:
+        table_name = request.url.path.rstrip("/").split("/")[-1]
+        if table_name not in self.tables:
+            return httpx.Response(404, json={"message": f"relation {table_name} does not exist"})
+        table = self.tables[table_name]
+        primary_key = self.PRIMARY_KEYS[table_name]
+        params = parse_qs(request.url.query.decode(), keep_blank_values=True)
+
+        if request.method == "GET":
+            rows = self._filter(list(table.values()), params)
+            for order in reversed((params.get("order") or [""])[0].split(",")):
+                if order:
+                    column, _, direction = order.partition(".")
+                    rows.sort(key=lambda row: str(row.get(column) or ""), reverse=direction.startswith("desc"))
+            offset = int((params.get("offset") or ["0"])[0])
+            limit = params.get("limit")
+            rows = rows[offset:offset + int(limit[0])] if limit else rows[offset:]
+            columns = (params.get("select") or ["*"])[0]
+            if columns != "*":
+                names = [name.strip() for name in columns.split(",")]
+                rows = [{name: row.get(name) for name in names} for row in rows]
+            return httpx.Response(200, json=rows)
+
+        body = json.loads(request.content or b"null")
+        if request.method == "POST":
+            records = body if isinstance(body, list) else [body]
+            prefer = request.headers.get("prefer", "")
+            merge = "resolution=merge-duplicates" in prefer
+            ignore = "resolution=ignore-duplicates" in prefer
+            key = (params.get("on_conflict") or [primary_key])[0]
+            defaults = {}
+            if "missing=default" in prefer:
+                now = datetime.datetime.now(datetime.timezone.utc).isoformat()
+                defaults = {column: now for column in self.NOW_DEFAULTS[table_name]}
+            written = []
+            for record in records:
+                existing = table.get(record.get(key))
+                if existing is not None and not merge:
+                    if ignore:
+                        continue
+                    return httpx.Response(409, json={"message": "duplicate key value violates unique constraint"})
+                row = dict(existing if existing is not None else defaults)
+                row.update(record)
+                table[record.get(key)] = row
+                written.append(row)
+            return httpx.Response(201, json=written)
+
+        if request.method == "PATCH":
+            rows = self._filter(list(table.values()), params)
+            for row in rows:
+                row.update(body)
+            return httpx.Response(200, json=rows)
+
+        return httpx.Response(405, json={"message": "method not allowed"})
@@ -0,0 +1,314 @@
+"""
+Offline benchmarks for discovery and the api/ and db/ layers.
+
+Every provider and Supabase call is served by the in-process mocks in
+bench/mock_servers.py, so no API quota is spent. Results are written to
+bench/results/ as JSON and can be compared against an earlier run:
+
+    python -m bench.run --wallets 10000 --label baseline
+    python -m bench.run --wallets 10000 --label after --compare bench/results/<baseline>.json
+
+Provider traffic can be archived with --record and served back with --replay
+(see api/recorder.py), the same way API_ARCHIVE_MODE works for main.py.
+"""
+import argparse
+import asyncio
+import datetime
+import json
+import os
+import tempfile
+import time
+from api import http_client, moralis_client, provider_router, rate_limiter, recorder, solana_tracker, token_cache
+from db import outbox, price_store, supabase_manager
+from wallet import discovery
+from wallet.checkpoints import CheckpointStore
+from wallet.cooccurrence import CooccurrenceIndex
+from wallet.registry import registry
+from telemetry import logs, metrics
+from bench.mock_servers import (
+    SUPABASE_MOCK_URL, MockBehaviour, MoralisMock, PostgrestMock, SolanaTrackerMock, _SyntheticMarket,
+)
+
+RESULTS_DIR = os.path.join(os.path.dirname(__file__), "results")
+
+def percentile(samples: list, fraction: float) -> float | None:
+    if not samples:
+        return None
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+def latency_summary(samples: list) -> dict:
+    """
+    Returns count, p50 and p99 (in milliseconds) of latency samples given in seconds.
+    """
+    p50 = percentile(samples, 0.50)
+    p99 = percentile(samples, 0.99)
+    return {
+        "count": len(samples),
+        "p50_ms": round(p50 * 1000, 3) if p50 is not None else None,
+        "p99_ms": round(p99 * 1000, 3) if p99 is not None else None,
+    }
+
+def server_summary(server) -> dict:
+    return {
+        "calls": dict(server.calls),
+        "statuses": {str(status): count for status, count in server.statuses.items()},
+        "latency": {route: latency_summary(samples) for route, samples in server.latencies.items()},
+    }
+
+class Environment:
+    """
+    Wires the application's provider clients and Supabase client to fresh mocks.
+    """
+
+    def __init__(self, args):
+        behaviour = dict(latency_ms=args.latency_ms, latency_sigma=args.latency_sigma,
+                         error_rate=args.error_rate, rate_limit_rps=args.rate_limit_rps, seed=args.seed)
+        self.market = _SyntheticMarket(args.wallets, args.buyers_per_mint)
+        self.solana_tracker = SolanaTrackerMock(self.market, MockBehaviour(**behaviour))
+        self.moralis = MoralisMock(self.market, MockBehaviour(**behaviour))
+        self.postgrest = PostgrestMock(MockBehaviour(latency_ms=args.db_latency_ms, latency_sigma=args.latency_sigma, seed=args.seed))
+
+        # The request helpers refuse to run without a key; the mocks accept any
+        solana_tracker.SOLANA_TRACKER_API_KEY = solana_tracker.SOLANA_TRACKER_API_KEY or "bench"
+        moralis_client.MORALIS_API_KEY = moralis_client.MORALIS_API_KEY or "bench"
+        http_client.set_transport(http_client.SOLANA_TRACKER, self.solana_tracker.transport())
+        http_client.set_transport(http_client.MORALIS, self.moralis.transport())
+        # Let the client run as fast as the mock allows; 429s still exercise the backoff path
+        client_rate = args.client_rps or 1_000_000
+        rate_limiter.configure_provider(http_client.SOLANA_TRACKER, client_rate)
+        rate_limiter.configure_provider(http_client.MORALIS, client_rate * 100)
+        # Built the same way as in production, with only the transport swapped for the mock
+        supabase_manager.initialize_supabase_client(SUPABASE_MOCK_URL, "mock-anon-key", transport=self.postgrest.transport())
+        registry.clear()
+        # Keep synthetic prices out of the real history
+        price_store.price_store = price_store.PriceStore(path=None)
+        metrics.reset()
+        provider_router.router.reset()
+        for provider in ("solana_tracker", "moralis", "router"):
+            token_cache.get_cache(provider).clear()
+
+    def api_calls(self) -> int:
+        return self.solana_tracker.total_calls() + self.moralis.total_calls()
+
+    async def close(self):
+        await http_client.close_clients()
+
+async def bench_discovery(args) -> dict:
+    """
+    Runs discover_and_store_wallets over enough mints to touch every wallet about twice.
+    """
+    env = Environment(args)
+    mint_count = args.mints or max(1, 2 * args.wallets // args.buyers_per_mint)
+    mints = [f"BenchMint{i:08d}" for i in range(mint_count)]
+    journal_dir = tempfile.TemporaryDirectory() if args.outbox else None
+    if journal_dir is not None:
+        outbox.outbox = outbox.WriteOutbox(path=os.path.join(journal_dir.name, "outbox.jsonl"))
+        await outbox.outbox.start()
+    index = CooccurrenceIndex(path=None)
+    started = time.perf_counter()
+    stats = await discovery.discover_and_store_wallets(mints, checkpoints=CheckpointStore(path=None), cooccurrence=index)
+    elapsed = time.perf_counter() - started
+    drain_seconds = None
+    if journal_dir is not None:
+        # Ingest is acknowledged once journaled; time the background drain separately
+        drain_started = time.perf_counter()
+        await outbox.outbox.stop(timeout=600)
+        drain_seconds = round(time.perf_counter() - drain_started, 3)
+        journal_dir.cleanup()
+    wallets = max(1, stats["wallets_unique"])
+    await env.close()
+    return {
+        "mints": mint_count,
+        "elapsed_seconds": round(elapsed, 3),
+        "wallets_unique": stats["wallets_unique"],
+        "wallets_written": stats["wallets_written"],
+        "wallets_per_second": round(stats["wallets_unique"] / elapsed, 1) if elapsed else None,
+        "outbox_drain_seconds": drain_seconds,
+        "api_calls": env.api_calls(),
+        "api_calls_per_wallet": round(env.api_calls() / wallets, 4),
+        "db_calls": env.postgrest.total_calls(),
+        "db_calls_per_wallet": round(env.postgrest.total_calls() / wallets, 4),
+        "pipeline": {key: value for key, value in stats.items() if key != "elapsed_seconds"},
+        "quota": rate_limiter.get_quota_usage(),
+        "stages": metrics.get_metric("vector_stage_duration_seconds").summary(),
+        "cooccurrence": index.stats(),
+        "solana_tracker": server_summary(env.solana_tracker),
+        "moralis": server_summary(env.moralis),
+        "postgrest": server_summary(env.postgrest),
+    }
+
+async def _timed_calls(coroutine_factory, keys: list, concurrency: int) -> tuple[list, float, int]:
+    """
+    Calls coroutine_factory(key) for every key with bounded concurrency.
+    Returns (per-call latencies, elapsed seconds, failures).
+    """
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+    failures = 0
+
+    async def call(key):
+        nonlocal failures
+        async with semaphore:
+            started = time.perf_counter()
+            result = await coroutine_factory(key)
+            latencies.append(time.perf_counter() - started)
+            if result is None:
+                failures += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(call(key) for key in keys))
+    return latencies, time.perf_counter() - started, failures
+
+async def bench_api(args) -> dict:
+    """
+    Calls the provider functions directly for a sample of wallets and mints.
+    """
+    env = Environment(args)
+    wallets = [env.market.wallet(i) for i in range(min(args.wallets, args.api_sample))]
+    mints = [f"BenchMint{i:08d}" for i in range(max(1, len(wallets) // 10))]
+    results = {}
+    for name, factory, keys in (
+        ("solana_tracker.get_wallet_pnl", solana_tracker.get_wallet_pnl, wallets),
+        ("solana_tracker.get_first_token_buyers", solana_tracker.get_first_token_buyers, mints),
+        ("solana_tracker.get_token_metadata", solana_tracker.get_token_metadata, mints),
+        ("moralis_client.get_token_price", moralis_client.get_token_price, mints),
+        ("moralis_client.get_wallet_profitability", moralis_client.get_wallet_profitability, wallets),
+        ("provider_router.get_wallet_pnl", provider_router.get_wallet_pnl, wallets),
+        ("provider_router.get_wallet_pnl.hedged", lambda wallet: provider_router.get_wallet_pnl(wallet, hedge=True), wallets),
+    ):
+        latencies, elapsed, failures = await _timed_calls(factory, keys, args.concurrency)
+        results[name] = {
+            "calls": len(keys),
+            "failures": failures,
+            "calls_per_second": round(len(keys) / elapsed, 1) if elapsed else None,
+            **latency_summary(latencies),
+        }
+    await env.close()
+    results["quota"] = rate_limiter.get_quota_usage()
+    results["router"] = provider_router.router.health()
+    return results
+
+async def bench_db(args) -> dict:
+    """
+    Bulk-upserts every wallet, re-upserts them (all existing), then loads them into the registry.
+    """
+    env = Environment(args)
+    now = datetime.datetime.now(datetime.timezone.utc).isoformat()
+    records = [{"wallet_address": env.market.wallet(i), "label": "Bench", "score": float(i % 100), "is_bot": False, "last_active": now}
+               for i in range(args.wallets)]
+    results = {}
+    for name in ("bulk_upsert_wallets.insert", "bulk_upsert_wallets.update"):
+        calls_before = env.postgrest.total_calls()
+        started = time.perf_counter()
+        written = await supabase_manager.bulk_upsert_wallets(records)
+        elapsed = time.perf_counter() - started
+        results[name] = {
+            "rows": len(records),
+            "rows_written": sum(1 for ok in written.values() if ok),
+            "elapsed_seconds": round(elapsed, 3),
+            "rows_per_second": round(len(records) / elapsed, 1) if elapsed else None,
+            "db_calls": env.postgrest.total_calls() - calls_before,
+        }
+    calls_before = env.postgrest.total_calls()
+    started = time.perf_counter()
+    loaded = await registry.load()
+    elapsed = time.perf_counter() - started
+    results["registry.load"] = {
+        "rows": loaded,
+        "elapsed_seconds": round(elapsed, 3),
+        "rows_per_second": round(loaded / elapsed, 1) if elapsed else None,
+        "db_calls": env.postgrest.total_calls() - calls_before,
+    }
+    results["postgrest"] = server_summary(env.postgrest)
+    await env.close()
+    return results
+
+SCENARIOS = {
+    "discovery": bench_discovery,
+    "api": bench_api,
+    "db": bench_db,
+}
+
+def _flatten(results: dict, prefix: str = "") -> dict:
+    flat = {}
+    for key, value in results.items():
+        name = f"{prefix}{key}"
+        if isinstance(value, dict):
+            flat.update(_flatten(value, f"{name}."))
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            flat[name] = value
+    return flat
+
+def compare(current: dict, baseline: dict):
+    """
+    Prints the numeric metrics that differ between two result files.
+    """
+    now = _flatten(current["results"])
+    before = _flatten(baseline["results"])
+    print(f"\nComparison with '{baseline.get('label')}' ({baseline.get('timestamp')}):")
+    for name in sorted(now.keys() & before.keys()):
+        old, new = before[name], now[name]
+        if old == new:
+            continue
+        change = f"{(new - old) / old * 100:+.1f}%" if old else "n/a"
+        print(f"  {name}: {old} -> {new} ({change})")
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline benchmarks against local mock providers and PostgREST.")
+    parser.add_argument("--scenario", choices=sorted(SCENARIOS) + ["all"], default="all")
+    parser.add_argument("--wallets", type=int, default=1000, help="Size of the wallet universe (1k-100k).")
+    parser.add_argument("--buyers-per-mint", type=int, default=100)
+    parser.add_argument("--mints", type=int, default=None, help="Mints to scan (default: 2 x wallets / buyers-per-mint).")
+    parser.add_argument("--latency-ms", type=float, default=20.0, help="Median provider latency.")
+    parser.add_argument("--db-latency-ms", type=float, default=10.0, help="Median PostgREST latency.")
+    parser.add_argument("--latency-sigma", type=float, default=0.3)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--rate-limit-rps", type=float, default=None, help="Mock providers answer 429 above this rate.")
+    parser.add_argument("--client-rps", type=float, default=None, help="Client-side rate limit (default: unlimited).")
+    parser.add_argument("--api-sample", type=int, default=500, help="Wallets used by the api scenario.")
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--outbox", action="store_true", help="Write discovery results through the write-behind outbox.")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--label", default="run")
+    parser.add_argument("--compare", default=None, help="Earlier result file to compare against.")
+    parser.add_argument("--verbose", action="store_true", help="Show the application's own logs.")
+    parser.add_argument("--record", default=None, help="Archive every mock provider response to this file.")
+    parser.add_argument("--replay", default=None, help="Serve provider responses from this archive instead of the mocks.")
+    parser.add_argument("--replay-speed", type=float, default=0.0, help="0 = as fast as possible, 1 = recorded timing.")
+    args = parser.parse_args()
+    logs.configure("INFO" if args.verbose else "ERROR")
+    if args.record:
+        recorder.recorder.open(recorder.RECORD, args.record)
+    elif args.replay:
+        recorder.recorder.open(recorder.REPLAY, args.replay, speed=args.replay_speed)
+
+    scenarios = sorted(SCENARIOS) if args.scenario == "all" else [args.scenario]
+    results = {}
+    for name in scenarios:
+        print(f"Running {name} benchmark ({args.wallets} wallets)...")
+        results[name] = asyncio.run(SCENARIOS[name](args))
+    recorder.recorder.close()
+
+    timestamp = datetime.datetime.now(datetime.timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+    output = {"label": args.label, "timestamp": timestamp, "args": vars(args), "results": results}
+    os.makedirs(RESULTS_DIR, exist_ok=True)
+    path = os.path.join(RESULTS_DIR, f"{timestamp}-{args.label}.json")
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(output, f, indent=2)
+
+    for name, result in results.items():
+        headline = {key: value for key, value in result.items() if not isinstance(value, dict)}
+        if headline:
+            print(f"{name}: {json.dumps(headline)}")
+        for key, value in result.items():
+            if isinstance(value, dict) and not any(isinstance(item, dict) for item in value.values()):
+                print(f"{name} {key}: {json.dumps(value)}")
+    print(f"Results saved to {path}")
+
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            compare(output, json.load(f))
+
+if __name__ == "__main__":
+    main()
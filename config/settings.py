@@ -13,8 +13,138 @@ SUPABASE_ANON_KEY = os.getenv("SUPABASE_ANON_KEY")
 # You will need to get this from the Solana Tracker website
 SOLANA_TRACKER_API_KEY = os.getenv("SOLANA_TRACKER_API_KEY")
 
+# --- Moralis API Key ---
+# You will need to get this from the Moralis admin panel
+MORALIS_API_KEY = os.getenv("MORALIS_API_KEY")
+
 # --- API Endpoints ---
 SOLANA_TRACKER_BASE_URL = "https://data.solanatracker.io"
+MORALIS_BASE_URL = "https://solana-gateway.moralis.io"
+MORALIS_V2_BASE_URL = "https://deep-index.moralis.io/api/v2.2"
+
+# --- Real-time Trade Stream ---
+# Solana Tracker Datastream websocket; the API key is appended to the URL
+SOLANA_TRACKER_DATASTREAM_URL = os.getenv("SOLANA_TRACKER_DATASTREAM_URL", "wss://datastream.solanatracker.io")
+# Maximum number of tracked wallets to subscribe to
+STREAM_MAX_WALLETS = int(os.getenv("STREAM_MAX_WALLETS", "1000"))
+# Pending signals kept before the overflow policy applies
+STREAM_QUEUE_SIZE = int(os.getenv("STREAM_QUEUE_SIZE", "10000"))
+# When full: "drop_oldest", "drop_newest" or "coalesce" (merge into a pending trade of the same wallet/token/side)
+STREAM_OVERFLOW_POLICY = os.getenv("STREAM_OVERFLOW_POLICY", "coalesce")
+STREAM_RECONNECT_BASE_SECONDS = float(os.getenv("STREAM_RECONNECT_BASE_SECONDS", "0.5"))
+STREAM_RECONNECT_MAX_SECONDS = float(os.getenv("STREAM_RECONNECT_MAX_SECONDS", "30"))
+
+# --- HTTP Client Settings ---
+# One pooled client is shared per provider, so connections are kept alive between calls.
+HTTP_TIMEOUT_SECONDS = float(os.getenv("HTTP_TIMEOUT_SECONDS", "10"))
+HTTP_CONNECT_TIMEOUT_SECONDS = float(os.getenv("HTTP_CONNECT_TIMEOUT_SECONDS", "5"))
+HTTP_MAX_CONNECTIONS = int(os.getenv("HTTP_MAX_CONNECTIONS", "20"))
+HTTP_MAX_KEEPALIVE_CONNECTIONS = int(os.getenv("HTTP_MAX_KEEPALIVE_CONNECTIONS", "10"))
+HTTP_KEEPALIVE_EXPIRY_SECONDS = float(os.getenv("HTTP_KEEPALIVE_EXPIRY_SECONDS", "30"))
+# HTTP/2 is only used when the optional 'h2' package is installed
+HTTP2_ENABLED = os.getenv("HTTP2_ENABLED", "true").lower() == "true"
+# Array bodies at least this large (or of unknown length) are decoded as they arrive, where the endpoint supports it
+HTTP_STREAM_DECODE_MIN_BYTES = int(os.getenv("HTTP_STREAM_DECODE_MIN_BYTES", "1048576"))
+
+# --- API Record/Replay ---
+# "record" archives every provider response; "replay" serves them from the archive with no network (empty = off)
+API_ARCHIVE_MODE = os.getenv("API_ARCHIVE_MODE", "")
+API_ARCHIVE_PATH = os.getenv("API_ARCHIVE_PATH", "data/api_archive.bin")
+# Replay pacing: 0 = as fast as possible, 1 = responses arrive on the recorded timeline, 2 = twice as fast, ...
+API_REPLAY_SPEED = float(os.getenv("API_REPLAY_SPEED", "0"))
+
+# --- Rate Limits and Quotas ---
+# Solana Tracker free tier: 1 request/second, 10,000 requests/month
+SOLANA_TRACKER_REQUESTS_PER_SECOND = float(os.getenv("SOLANA_TRACKER_REQUESTS_PER_SECOND", "1"))
+# Leave unset for no daily cap (e.g. a monthly plan divided by 30 is a reasonable value)
+SOLANA_TRACKER_DAILY_REQUEST_QUOTA = float(os.getenv("SOLANA_TRACKER_DAILY_REQUEST_QUOTA")) if os.getenv("SOLANA_TRACKER_DAILY_REQUEST_QUOTA") else None
+# Moralis bills in compute units (CU); Starter plan: 40,000 CU/day
+MORALIS_COMPUTE_UNITS_PER_SECOND = float(os.getenv("MORALIS_COMPUTE_UNITS_PER_SECOND", "1000"))
+MORALIS_DAILY_COMPUTE_UNITS = float(os.getenv("MORALIS_DAILY_COMPUTE_UNITS", "40000"))
+# Retries on 429 and 5xx responses use jittered exponential backoff
+HTTP_MAX_RETRIES = int(os.getenv("HTTP_MAX_RETRIES", "4"))
+HTTP_BACKOFF_BASE_SECONDS = float(os.getenv("HTTP_BACKOFF_BASE_SECONDS", "0.5"))
+HTTP_BACKOFF_MAX_SECONDS = float(os.getenv("HTTP_BACKOFF_MAX_SECONDS", "30"))
+
+# --- Provider Routing ---
+# Token metadata and wallet PnL can come from either provider; the healthiest one is tried first
+ROUTER_PROVIDER_ORDER = [name.strip() for name in os.getenv("ROUTER_PROVIDER_ORDER", "solana_tracker,moralis").split(",") if name.strip()]
+# Recent calls per provider used for latency and error-rate estimates
+ROUTER_WINDOW = int(os.getenv("ROUTER_WINDOW", "100"))
+# After this many failures in a row a provider is only tried last, for ROUTER_COOLDOWN_SECONDS
+ROUTER_FAILURE_THRESHOLD = int(os.getenv("ROUTER_FAILURE_THRESHOLD", "5"))
+ROUTER_COOLDOWN_SECONDS = float(os.getenv("ROUTER_COOLDOWN_SECONDS", "30"))
+# Hedged lookups ask the next provider once the first is slower than its usual p90 (but at least this long)
+ROUTER_HEDGE_MIN_DELAY_SECONDS = float(os.getenv("ROUTER_HEDGE_MIN_DELAY_SECONDS", "0.25"))
+# Don't hedge onto a provider with less than this fraction of its daily quota left
+ROUTER_HEDGE_MIN_QUOTA_FRACTION = float(os.getenv("ROUTER_HEDGE_MIN_QUOTA_FRACTION", "0.2"))
+
+# --- Batched Price Lookups ---
+# Concurrent get_token_price calls within this window are sent as one multi-token request (0 = no batching)
+MORALIS_PRICE_BATCH_WINDOW_SECONDS = float(os.getenv("MORALIS_PRICE_BATCH_WINDOW_SECONDS", "0.025"))
+# Moralis accepts up to 100 addresses per /token/mainnet/prices request
+MORALIS_PRICE_BATCH_SIZE = int(os.getenv("MORALIS_PRICE_BATCH_SIZE", "100"))
+# After Moralis rejects the batch endpoint, prices are fetched one by one for this long before batching is retried
+MORALIS_PRICE_BATCH_RETRY_SECONDS = float(os.getenv("MORALIS_PRICE_BATCH_RETRY_SECONDS", "600"))
+
+# --- Token Metadata Cache ---
+TOKEN_CACHE_MAX_ENTRIES = int(os.getenv("TOKEN_CACHE_MAX_ENTRIES", "10000"))
+# Name, symbol, decimals etc. rarely change; prices do
+TOKEN_CACHE_STATIC_TTL_SECONDS = float(os.getenv("TOKEN_CACHE_STATIC_TTL_SECONDS", "86400"))
+TOKEN_CACHE_VOLATILE_TTL_SECONDS = float(os.getenv("TOKEN_CACHE_VOLATILE_TTL_SECONDS", "30"))
+# How long an unknown mint (or a failed lookup) is remembered before retrying
+TOKEN_CACHE_NEGATIVE_TTL_SECONDS = float(os.getenv("TOKEN_CACHE_NEGATIVE_TTL_SECONDS", "300"))
+
+# --- Database Write Settings ---
+# Maximum number of rows sent in one bulk upsert request
+SUPABASE_UPSERT_CHUNK_SIZE = int(os.getenv("SUPABASE_UPSERT_CHUNK_SIZE", "500"))
+
+# --- Write-behind Outbox ---
+# When enabled, wallet and token writes are journaled locally and acknowledged at once,
+# then pushed to Supabase in bulk by a background flusher
+OUTBOX_ENABLED = os.getenv("OUTBOX_ENABLED", "true").lower() == "true"
+OUTBOX_JOURNAL_PATH = os.getenv("OUTBOX_JOURNAL_PATH", "data/outbox.jsonl")
+# fsync the journal on every append (set to false to trade power-loss safety for speed)
+OUTBOX_FSYNC = os.getenv("OUTBOX_FSYNC", "true").lower() == "true"
+# The flusher runs this often, or sooner once OUTBOX_FLUSH_ROWS rows are pending
+OUTBOX_FLUSH_SECONDS = float(os.getenv("OUTBOX_FLUSH_SECONDS", "1"))
+OUTBOX_FLUSH_ROWS = int(os.getenv("OUTBOX_FLUSH_ROWS", "500"))
+# Failed writes are retried with jittered exponential backoff
+OUTBOX_RETRY_BASE_SECONDS = float(os.getenv("OUTBOX_RETRY_BASE_SECONDS", "1"))
+OUTBOX_RETRY_MAX_SECONDS = float(os.getenv("OUTBOX_RETRY_MAX_SECONDS", "60"))
+
+# --- Local Price History ---
+# One memory-mapped ring buffer per mint and tier is kept here (empty = memory only)
+PRICE_STORE_PATH = os.getenv("PRICE_STORE_PATH", "data/prices")
+# Buckets kept per tier: 1 hour of 1s closes, 7 days of 1m closes, 1 year of 1h closes
+PRICE_STORE_SECOND_POINTS = int(os.getenv("PRICE_STORE_SECOND_POINTS", "3600"))
+PRICE_STORE_MINUTE_POINTS = int(os.getenv("PRICE_STORE_MINUTE_POINTS", "10080"))
+PRICE_STORE_HOUR_POINTS = int(os.getenv("PRICE_STORE_HOUR_POINTS", "8760"))
+# Mints kept mapped at once (each maps one file per tier)
+PRICE_STORE_MAX_OPEN_MINTS = int(os.getenv("PRICE_STORE_MAX_OPEN_MINTS", "256"))
+
+# --- Local PnL Engine ---
+# Positions built from streamed trades are snapshotted here (empty = memory only)
+PNL_SNAPSHOT_PATH = os.getenv("PNL_SNAPSHOT_PATH", "data/pnl_snapshot.json")
+PNL_SNAPSHOT_SECONDS = float(os.getenv("PNL_SNAPSHOT_SECONDS", "60"))
+# Every PNL_RECONCILE_SECONDS a sample of wallets is checked against a provider's PnL (0 = never)
+PNL_RECONCILE_SECONDS = float(os.getenv("PNL_RECONCILE_SECONDS", "3600"))
+PNL_RECONCILE_SAMPLE = int(os.getenv("PNL_RECONCILE_SAMPLE", "20"))
+# Local and remote realized PnL agree within this fraction, or this many USD, whichever is larger
+PNL_RECONCILE_TOLERANCE = float(os.getenv("PNL_RECONCILE_TOLERANCE", "0.05"))
+PNL_RECONCILE_MIN_USD = float(os.getenv("PNL_RECONCILE_MIN_USD", "1"))
+
+# --- Wallet Registry ---
+# Rows per page when loading the 'wallets' table into memory
+WALLET_REGISTRY_PAGE_SIZE = int(os.getenv("WALLET_REGISTRY_PAGE_SIZE", "1000"))
+
+# --- Batch Re-scoring ---
+# `python main.py rescore` re-scores every wallet with local positions; wallets are read this many at a time
+RESCORE_PAGE_SIZE = int(os.getenv("RESCORE_PAGE_SIZE", "5000"))
+# Scoring processes (0 = one per CPU core)
+RESCORE_WORKERS = int(os.getenv("RESCORE_WORKERS", "0"))
+# Scores that move less than this aren't written back
+RESCORE_MIN_SCORE_CHANGE = float(os.getenv("RESCORE_MIN_SCORE_CHANGE", "0.01"))
 
 # --- Configuration for Wallet Discovery ---
 # Example token to find first buyers for. You can change this later.
@@ -25,6 +155,72 @@ SOLANA_TRACKER_BASE_URL = "https://data.solanatracker.io"
 DEFAULT_DISCOVERY_TOKEN_MINT = "EPjFWdd5AufqSSqeM2qN1xzybapC8G4wEGGkZwyTDt1v" # USDC
 # Or for a memecoin, you'd find its mint address.
 
+# Mints to scan when DISCOVERY_MINT_SOURCE is "config" (comma-separated in DISCOVERY_TOKEN_MINTS)
+DISCOVERY_TOKEN_MINTS = [mint.strip() for mint in os.getenv("DISCOVERY_TOKEN_MINTS", DEFAULT_DISCOVERY_TOKEN_MINT).split(",") if mint.strip()]
+# "config" scans DISCOVERY_TOKEN_MINTS, "moralis" scans newly listed tokens on an exchange
+DISCOVERY_MINT_SOURCE = os.getenv("DISCOVERY_MINT_SOURCE", "config")
+DISCOVERY_NEW_TOKENS_EXCHANGE = os.getenv("DISCOVERY_NEW_TOKENS_EXCHANGE", "Raydium")
+DISCOVERY_NEW_TOKENS_LIMIT = int(os.getenv("DISCOVERY_NEW_TOKENS_LIMIT", "100"))
+
+# --- Discovery Pipeline ---
+# Worker counts per stage, and the size of the bounded queue between stages
+DISCOVERY_FETCH_WORKERS = int(os.getenv("DISCOVERY_FETCH_WORKERS", "4"))
+DISCOVERY_NORMALISE_WORKERS = int(os.getenv("DISCOVERY_NORMALISE_WORKERS", "1"))
+DISCOVERY_ENRICH_WORKERS = int(os.getenv("DISCOVERY_ENRICH_WORKERS", "4"))
+DISCOVERY_QUEUE_SIZE = int(os.getenv("DISCOVERY_QUEUE_SIZE", "64"))
+# Per-mint progress is saved here, so reruns skip unchanged mints and resume interrupted ones
+DISCOVERY_CHECKPOINT_PATH = os.getenv("DISCOVERY_CHECKPOINT_PATH", "data/discovery_checkpoints.json")
+# Completed mints checked more recently than this are skipped without an API call (0 = always re-check)
+DISCOVERY_RECHECK_SECONDS = float(os.getenv("DISCOVERY_RECHECK_SECONDS", "3600"))
+# Wallets are written once this many are pending, or after this many seconds
+DISCOVERY_WRITE_BATCH_SIZE = int(os.getenv("DISCOVERY_WRITE_BATCH_SIZE", "500"))
+DISCOVERY_WRITE_FLUSH_SECONDS = float(os.getenv("DISCOVERY_WRITE_FLUSH_SECONDS", "2"))
+# Checkpoints and the co-occurrence/position indexes are saved at most this often during a run, and at its end
+DISCOVERY_SAVE_SECONDS = float(os.getenv("DISCOVERY_SAVE_SECONDS", "60"))
+
+# --- First-buyer Co-occurrence Index ---
+# Every first-buyers payload is indexed here, so repeat early buyers and coordinated groups can be found (empty = memory only)
+COOCCURRENCE_PATH = os.getenv("COOCCURRENCE_PATH", "data/cooccurrence.npz")
+# Buyers up to this rank on a launch count as early
+COOCCURRENCE_EARLY_RANK = int(os.getenv("COOCCURRENCE_EARLY_RANK", "20"))
+# Wallets are clustered together when they share at least this many early launches,
+# and those are at least this fraction (Jaccard) of the early launches either of them bought
+COOCCURRENCE_MIN_SHARED = int(os.getenv("COOCCURRENCE_MIN_SHARED", "3"))
+COOCCURRENCE_MIN_JACCARD = float(os.getenv("COOCCURRENCE_MIN_JACCARD", "0.5"))
+# The latest first-buyer position of every discovered wallet is kept here for batch re-scoring (empty = memory only)
+POSITION_STORE_PATH = os.getenv("POSITION_STORE_PATH", "data/first_buyer_positions.npz")
+
+# --- Logging and Metrics ---
+# DEBUG also logs every provider request and database call
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+# "text" (key=value) or "json" (one object per line)
+LOG_FORMAT = os.getenv("LOG_FORMAT", "text")
+# Metrics are written here in Prometheus text format on exit and every METRICS_DUMP_SECONDS (empty = never)
+METRICS_PATH = os.getenv("METRICS_PATH", "data/metrics.prom")
+METRICS_DUMP_SECONDS = float(os.getenv("METRICS_DUMP_SECONDS", "60"))
+# Serve /metrics for Prometheus to scrape on this port (0 = disabled)
+METRICS_PORT = int(os.getenv("METRICS_PORT", "0"))
+
+# --- Service Mode Scheduler ---
+# `python main.py serve` keeps running: periodic discovery plus wallet and price refreshes
+# All scheduled API calls share this budget
+SCHEDULER_API_CALLS_PER_MINUTE = float(os.getenv("SCHEDULER_API_CALLS_PER_MINUTE", "40"))
+SCHEDULER_API_BURST = float(os.getenv("SCHEDULER_API_BURST", "10"))
+SCHEDULER_MAX_CONCURRENCY = int(os.getenv("SCHEDULER_MAX_CONCURRENCY", "4"))
+# Top wallets by score whose PnL is refreshed (bots excluded)
+SCHEDULER_MAX_WALLETS = int(os.getenv("SCHEDULER_MAX_WALLETS", "5000"))
+# A score-100 wallet is refreshed every MIN seconds, a score-0 wallet every MAX seconds (geometric in between)
+SCHEDULER_WALLET_REFRESH_MIN_SECONDS = float(os.getenv("SCHEDULER_WALLET_REFRESH_MIN_SECONDS", "300"))
+SCHEDULER_WALLET_REFRESH_MAX_SECONDS = float(os.getenv("SCHEDULER_WALLET_REFRESH_MAX_SECONDS", "86400"))
+# Token prices older than this are refreshed (batched)
+SCHEDULER_PRICE_REFRESH_SECONDS = float(os.getenv("SCHEDULER_PRICE_REFRESH_SECONDS", "900"))
+# Pause between discovery runs (0 = no discovery)
+SCHEDULER_DISCOVERY_SECONDS = float(os.getenv("SCHEDULER_DISCOVERY_SECONDS", "600"))
+# How often newly tracked wallets and tokens are picked up and score changes are written
+SCHEDULER_SYNC_SECONDS = float(os.getenv("SCHEDULER_SYNC_SECONDS", "30"))
+# On shutdown, how long in-flight work may take to finish
+SCHEDULER_DRAIN_SECONDS = float(os.getenv("SCHEDULER_DRAIN_SECONDS", "30"))
+
 # --- General Application Settings ---
 # Number of wallets to fetch in one API call (adjust based on API limits)
-API_FETCH_LIMIT = 100
\ No newline at end of file
+API_FETCH_LIMIT = 100
@@ -0,0 +1,290 @@
+import asyncio
+import json
+import logging
+import os
+import random
+import time
+from db import supabase_manager
+from telemetry import metrics
+from telemetry.logs import event, get_logger
+from config.settings import (
+    OUTBOX_JOURNAL_PATH, OUTBOX_FSYNC, OUTBOX_FLUSH_SECONDS, OUTBOX_FLUSH_ROWS,
+    OUTBOX_RETRY_BASE_SECONDS, OUTBOX_RETRY_MAX_SECONDS,
+)
+
+logger = get_logger(__name__)
+
+# table -> (primary key column, bulk writer returning {key: written})
+TABLES = {
+    "wallets": ("wallet_address", supabase_manager.bulk_upsert_wallets),
+    "token_metadata": ("token_mint", supabase_manager.bulk_upsert_token_metadata),
+}
+
+_PENDING = metrics.gauge("vector_outbox_pending_rows", "Rows waiting to be written to Supabase.", ("table",))
+_ENQUEUED = metrics.counter("vector_outbox_enqueued_total", "Rows journaled (before coalescing).", ("table",))
+_WRITTEN = metrics.counter("vector_outbox_written_total", "Rows written to Supabase by the flusher.", ("table",))
+_FAILED = metrics.counter("vector_outbox_failed_total", "Row writes that failed and were queued for retry.", ("table",))
+_FLUSH_SECONDS = metrics.histogram("vector_outbox_flush_duration_seconds", "Time per flush of all pending rows.")
+_JOURNAL_BYTES = metrics.gauge("vector_outbox_journal_bytes", "Size of the outbox journal.")
+
+class WriteOutbox:
+    """
+    Write-behind buffer for the 'wallets' and 'token_metadata' tables.
+    enqueue() appends the row to a local append-only journal and returns at once.
+    Pending rows are coalesced per primary key, so only each row's latest state
+    is written. A background flusher pushes them in bulk upserts and retries
+    failures with jittered exponential backoff. The journal is compacted to the
+    still-pending rows after every flush and replayed on start, so rows that
+    were acknowledged but not yet written survive a crash.
+    """
+
+    def __init__(self, path: str = OUTBOX_JOURNAL_PATH, fsync: bool = OUTBOX_FSYNC,
+                 flush_seconds: float = OUTBOX_FLUSH_SECONDS, flush_rows: int = OUTBOX_FLUSH_ROWS,
+                 retry_base_seconds: float = OUTBOX_RETRY_BASE_SECONDS,
+                 retry_max_seconds: float = OUTBOX_RETRY_MAX_SECONDS):
+        self.path = path
+        self.fsync = fsync
+        self.flush_seconds = flush_seconds
+        self.flush_rows = flush_rows
+        self.retry_base_seconds = retry_base_seconds
+        self.retry_max_seconds = retry_max_seconds
+        self._pending: dict[str, dict[str, dict]] = {table: {} for table in TABLES}
+        self._journal = None
+        self._flusher: asyncio.Task | None = None
+        self._wake = asyncio.Event()
+        self._lock = asyncio.Lock()
+        self._failures = 0
+        self.running = False
+
+    def pending_count(self) -> int:
+        return sum(len(rows) for rows in self._pending.values())
+
+    def _open_journal(self):
+        if not self.path:
+            return
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._journal = open(self.path, "a", encoding="utf-8")
+
+    def _append(self, entries: list):
+        if self._journal is None:
+            return
+        self._journal.write("".join(json.dumps(entry, separators=(",", ":"), default=str) + "\n" for entry in entries))
+        self._journal.flush()
+        if self.fsync:
+            os.fsync(self._journal.fileno())
+        _JOURNAL_BYTES.set(self._journal.tell())
+
+    def _coalesce(self, table: str, record: dict):
+        key_column, _ = TABLES[table]
+        key = record.get(key_column)
+        if not key:
+            return
+        pending = self._pending[table]
+        # Later writes replace earlier ones field by field, so a partial update keeps the rest
+        pending[key] = {**pending[key], **record} if key in pending else dict(record)
+
+    def replay(self) -> int:
+        """
+        Loads rows left in the journal by a previous run back into the pending set.
+        Returns:
+            int: Number of journal entries replayed.
+        """
+        if not self.path or not os.path.exists(self.path):
+            return 0
+        replayed = 0
+        with open(self.path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    # A torn last line from a crash mid-append; it was never acknowledged
+                    continue
+                if entry.get("table") in TABLES and isinstance(entry.get("record"), dict):
+                    self._coalesce(entry["table"], entry["record"])
+                    replayed += 1
+        self._update_gauges()
+        if replayed:
+            event(logger, logging.INFO, "outbox_replayed", entries=replayed, rows=self.pending_count())
+        return replayed
+
+    async def start(self):
+        """
+        Replays the journal and starts the background flusher.
+        """
+        if self.running:
+            return
+        self.replay()
+        self._compact()
+        self._wake = asyncio.Event()
+        self._lock = asyncio.Lock()
+        self.running = True
+        self._flusher = asyncio.create_task(self._run())
+        if self.pending_count():
+            self._wake.set()
+
+    async def stop(self, timeout: float = 10.0):
+        """
+        Stops the flusher after one last attempt to write everything pending.
+        Rows that still can't be written stay in the journal for the next run.
+        """
+        if not self.running:
+            return
+        self.running = False
+        if self._flusher is not None:
+            # Let a flush that's already writing finish first, so its rows are confirmed or put back
+            try:
+                await asyncio.wait_for(self._lock.acquire(), timeout)
+                locked = True
+            except asyncio.TimeoutError:
+                locked = False
+            self._flusher.cancel()
+            try:
+                await self._flusher
+            except asyncio.CancelledError:
+                pass
+            finally:
+                if locked:
+                    self._lock.release()
+            self._flusher = None
+        try:
+            await asyncio.wait_for(self.flush(), timeout)
+        except asyncio.TimeoutError:
+            event(logger, logging.WARNING, "outbox_stop_timeout", pending=self.pending_count())
+        if self._journal is not None:
+            self._journal.close()
+            self._journal = None
+
+    def enqueue_many(self, table: str, records: list[dict]):
+        """
+        Journals rows for `table` and queues them for writing. Returns once they
+        are on disk; the database write happens in the background.
+        """
+        if not records:
+            return
+        if table not in TABLES:
+            raise ValueError(f"Table {table} is not handled by the outbox.")
+        self._append([{"table": table, "record": record} for record in records])
+        for record in records:
+            self._coalesce(table, record)
+        _ENQUEUED.inc(len(records), table=table)
+        self._update_gauges()
+        if self.pending_count() >= self.flush_rows:
+            self._wake.set()
+
+    def enqueue(self, table: str, record: dict):
+        self.enqueue_many(table, [record])
+
+    def _update_gauges(self):
+        for table, rows in self._pending.items():
+            _PENDING.set(len(rows), table=table)
+
+    def _compact(self):
+        """
+        Rewrites the journal to hold only the rows still pending.
+        """
+        if not self.path:
+            return
+        if self._journal is not None:
+            self._journal.close()
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        temp_path = f"{self.path}.tmp"
+        with open(temp_path, "w", encoding="utf-8") as f:
+            for table, rows in self._pending.items():
+                for record in rows.values():
+                    f.write(json.dumps({"table": table, "record": record}, separators=(",", ":"), default=str) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp_path, self.path)
+        self._open_journal()
+        _JOURNAL_BYTES.set(self._journal.tell())
+
+    async def flush(self) -> bool:
+        """
+        Writes every pending row now.
+        Returns:
+            bool: True if nothing is left pending.
+        """
+        async with self._lock:
+            with _FLUSH_SECONDS.time():
+                for table, (key_column, write) in TABLES.items():
+                    batch = self._pending[table]
+                    if not batch:
+                        continue
+                    self._pending[table] = {}
+                    results = {}
+                    try:
+                        results = await write(list(batch.values())) or {}
+                    except Exception as e:
+                        event(logger, logging.WARNING, "outbox_write_failed", table=table, rows=len(batch), error=e)
+                    finally:
+                        # Rows not confirmed go back, even if the flush is cancelled mid-write
+                        self._requeue(table, batch, results)
+                # Only now that the writes are confirmed may rows leave the journal
+                self._compact()
+                self._update_gauges()
+            return not self.pending_count()
+
+    def _requeue(self, table: str, batch: dict, results: dict):
+        failed = 0
+        for key, record in batch.items():
+            if results.get(key):
+                continue
+            failed += 1
+            # Rows updated again while the write was in flight keep their newer fields
+            newer = self._pending[table].get(key)
+            self._pending[table][key] = {**record, **newer} if newer else record
+        _WRITTEN.inc(len(batch) - failed, table=table)
+        if failed:
+            _FAILED.inc(failed, table=table)
+
+    def _retry_delay(self) -> float:
+        return random.uniform(0, min(self.retry_max_seconds, self.retry_base_seconds * 2 ** (self._failures - 1)))
+
+    async def _run(self):
+        while self.running:
+            delay = self._retry_delay() if self._failures else self.flush_seconds
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout=delay)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+            # Before Python 3.12, wait_for can swallow stop()'s cancellation when the wake-up
+            # lands at the same time, and flushing then would wait forever on stop()'s lock
+            if not self.running:
+                return
+            if not self.pending_count():
+                continue
+            started = time.monotonic()
+            if await self.flush():
+                self._failures = 0
+            else:
+                self._failures += 1
+                event(logger, logging.WARNING, "outbox_retry_scheduled", pending=self.pending_count(),
+                      attempt=self._failures, flush_ms=round((time.monotonic() - started) * 1000, 1))
+
+# Shared outbox; main.py starts it when OUTBOX_ENABLED is set in settings
+outbox = WriteOutbox()
+
+async def write_wallets(records: list[dict]) -> dict[str, bool]:
+    """
+    Writes wallet rows through the outbox if it's running, or straight to Supabase otherwise.
+    Returns:
+        dict[str, bool]: Wallet address -> True if the row was journaled or written.
+    """
+    if outbox.running:
+        outbox.enqueue_many("wallets", records)
+        return {record["wallet_address"]: True for record in records if record.get("wallet_address")}
+    return await supabase_manager.bulk_upsert_wallets(records)
+
+async def write_token_metadata(row: dict) -> bool:
+    """
+    Writes a token metadata row through the outbox if it's running, or straight to Supabase otherwise.
+    """
+    if outbox.running:
+        outbox.enqueue("token_metadata", row)
+        return True
+    return await supabase_manager.insert_token_metadata(row)
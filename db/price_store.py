@@ -0,0 +1,383 @@
+import logging
+import os
+import time
+from collections import OrderedDict
+import numpy as np
+from telemetry import metrics
+from telemetry.logs import event, get_logger
+from config.settings import (
+    PRICE_STORE_PATH, PRICE_STORE_MAX_OPEN_MINTS,
+    PRICE_STORE_SECOND_POINTS, PRICE_STORE_MINUTE_POINTS, PRICE_STORE_HOUR_POINTS,
+)
+
+logger = get_logger(__name__)
+
+# (name, bucket width in seconds, ring capacity), finest first
+TIERS = (
+    ("1s", 1.0, PRICE_STORE_SECOND_POINTS),
+    ("1m", 60.0, PRICE_STORE_MINUTE_POINTS),
+    ("1h", 3600.0, PRICE_STORE_HOUR_POINTS),
+)
+
+_SAMPLES = metrics.counter("vector_price_samples_total", "Price samples recorded, by what happened to them.", ("outcome",))
+_OPEN_SERIES = metrics.gauge("vector_price_store_open_mints", "Mints whose price buffers are currently mapped.")
+
+class RingBuffer:
+    """
+    Fixed-size ring of (timestamp, price) rows for one mint and one tier.
+    Row 0 of the backing array is a header holding the total number of buckets
+    ever written, so the write position survives a restart; rows 1.. hold the
+    ring. Each row is the last sample seen in its bucket (its close), stamped
+    with that sample's own time, so a lookup never sees a price from after the
+    time it asks about.
+    """
+
+    __slots__ = ("resolution", "capacity", "_data")
+
+    def __init__(self, resolution: float, capacity: int, path: str = None):
+        self.resolution = resolution
+        self.capacity = capacity
+        if path is None:
+            self._data = np.zeros((capacity + 1, 2), dtype=np.float64)
+            return
+        if os.path.exists(path):
+            data = np.load(path, mmap_mode="r+")
+            if data.shape == (capacity + 1, 2):
+                self._data = data
+                return
+            # Capacity changed in settings: keep what fits
+            series = RingBuffer._ordered_rows(data, data.shape[0] - 1)
+            del data
+            self._data = np.lib.format.open_memmap(path, mode="w+", dtype=np.float64, shape=(capacity + 1, 2))
+            self._write_rows(series[-capacity:])
+            return
+        self._data = np.lib.format.open_memmap(path, mode="w+", dtype=np.float64, shape=(capacity + 1, 2))
+
+    @staticmethod
+    def _ordered_rows(data: np.ndarray, capacity: int) -> np.ndarray:
+        total = int(data[0, 0])
+        ring = data[1:]
+        if total <= capacity:
+            return np.array(ring[:total])
+        head = total % capacity
+        return np.concatenate((ring[head:], ring[:head]))
+
+    def _write_rows(self, rows: np.ndarray):
+        self._data[1:len(rows) + 1] = rows
+        self._data[0, 0] = len(rows)
+
+    def __len__(self):
+        return min(int(self._data[0, 0]), self.capacity)
+
+    def last(self) -> tuple[float, float] | None:
+        total = int(self._data[0, 0])
+        if not total:
+            return None
+        row = self._data[1 + (total - 1) % self.capacity]
+        return float(row[0]), float(row[1])
+
+    def append(self, timestamp: float, price: float) -> bool:
+        """
+        Adds a sample, replacing the latest row if the sample falls in the same bucket.
+        Returns:
+            bool: False if the sample is older than the latest row and was ignored.
+        """
+        total = int(self._data[0, 0])
+        if total:
+            last_row = 1 + (total - 1) % self.capacity
+            last_time = self._data[last_row, 0]
+            if timestamp < last_time:
+                return False
+            if timestamp // self.resolution == last_time // self.resolution:
+                self._data[last_row] = (timestamp, price)
+                return True
+        self._data[1 + total % self.capacity] = (timestamp, price)
+        self._data[0, 0] = total + 1
+        return True
+
+    def extend(self, timestamps: np.ndarray, prices: np.ndarray) -> np.ndarray:
+        """
+        Adds samples sorted by time, with the same result as append() on each in
+        turn: each bucket keeps its last sample, and the new rows are written
+        into the ring as at most two slices.
+        Returns:
+            np.ndarray: Mask of the samples that weren't older than the latest row.
+        """
+        total = int(self._data[0, 0])
+        accepted = np.ones(len(timestamps), dtype=bool)
+        if total:
+            last_row = 1 + (total - 1) % self.capacity
+            last_time = self._data[last_row, 0]
+            accepted = timestamps >= last_time
+        timestamps, prices = timestamps[accepted], prices[accepted]
+        if not len(timestamps):
+            return accepted
+        buckets = timestamps // self.resolution
+        # The close of each bucket is its last sample
+        closes = np.searchsorted(buckets, np.unique(buckets), side="right") - 1
+        rows = np.column_stack((timestamps[closes], prices[closes]))
+        if total and buckets[0] == last_time // self.resolution:
+            self._data[last_row] = rows[0]
+            rows = rows[1:]
+        added = len(rows)
+        # Only the newest `capacity` rows survive the wrap
+        rows = rows[-self.capacity:]
+        start = (total + added - len(rows)) % self.capacity
+        first = min(len(rows), self.capacity - start)
+        self._data[1 + start:1 + start + first] = rows[:first]
+        self._data[1:1 + len(rows) - first] = rows[first:]
+        self._data[0, 0] = total + added
+        return accepted
+
+    def series(self) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Returns (timestamps, prices) in time order, as copies.
+        """
+        rows = self._ordered_rows(self._data, self.capacity)
+        return rows[:, 0], rows[:, 1]
+
+    def flush(self):
+        if isinstance(self._data, np.memmap):
+            self._data.flush()
+
+class _MintSeries:
+    __slots__ = ("tiers",)
+
+    def __init__(self, tiers: list):
+        self.tiers = tiers
+
+class PriceStore:
+    """
+    Local price history for tracked mints.
+    Every sample goes into one ring buffer per tier (1s, 1m and 1h buckets by
+    default), so recent history is kept at full resolution and older history
+    survives at coarser resolution for much longer. Each buffer is a
+    memory-mapped .npy file under `path`, so history survives restarts; without
+    a path the buffers only live in memory. Only the most recently used
+    `max_open` mints stay mapped at a time.
+    Queries take arrays of times and answer with the finest tier that still
+    covers each one.
+    """
+
+    def __init__(self, path: str = PRICE_STORE_PATH, tiers: tuple = TIERS, max_open: int = PRICE_STORE_MAX_OPEN_MINTS):
+        self.path = path
+        self.tiers = tiers
+        self.max_open = max_open
+        self._open: OrderedDict[str, _MintSeries] = OrderedDict()
+        # Without a path nothing can be re-opened, so nothing is evicted either
+        self._memory_only = not path
+
+    def _file(self, mint: str, tier_name: str) -> str:
+        return os.path.join(self.path, f"{mint}.{tier_name}.npy")
+
+    def _series(self, mint: str, create: bool) -> _MintSeries | None:
+        series = self._open.get(mint)
+        if series is not None:
+            self._open.move_to_end(mint)
+            return series
+        if self._memory_only:
+            if not create:
+                return None
+            series = self._open[mint] = _MintSeries([RingBuffer(width, capacity) for _, width, capacity in self.tiers])
+            return series
+        if not create and not os.path.exists(self._file(mint, self.tiers[0][0])):
+            return None
+        os.makedirs(self.path, exist_ok=True)
+        try:
+            series = _MintSeries([RingBuffer(width, capacity, self._file(mint, name)) for name, width, capacity in self.tiers])
+        except (OSError, ValueError) as e:
+            event(logger, logging.WARNING, "price_series_unreadable", mint=mint, error=e)
+            return None
+        self._open[mint] = series
+        while len(self._open) > self.max_open:
+            _, evicted = self._open.popitem(last=False)
+            for buffer in evicted.tiers:
+                buffer.flush()
+        _OPEN_SERIES.set(len(self._open))
+        return series
+
+    def mints(self) -> list[str]:
+        """
+        Returns every mint with recorded history.
+        """
+        if self._memory_only:
+            return list(self._open)
+        if not os.path.isdir(self.path):
+            return []
+        suffix = f".{self.tiers[0][0]}.npy"
+        return [name[:-len(suffix)] for name in os.listdir(self.path) if name.endswith(suffix)]
+
+    def record(self, mint: str, price: float, timestamp: float = None) -> bool:
+        """
+        Records a price sample.
+        Args:
+            mint (str): The token mint address.
+            price (float): Price in USD.
+            timestamp (float, optional): Epoch seconds. Defaults to now.
+        Returns:
+            bool: True if the sample was stored in at least one tier.
+        """
+        try:
+            price = float(price)
+        except (TypeError, ValueError):
+            price = np.nan
+        if not mint or not np.isfinite(price) or price <= 0:
+            _SAMPLES.inc(outcome="invalid")
+            return False
+        series = self._series(mint, create=True)
+        if series is None:
+            _SAMPLES.inc(outcome="failed")
+            return False
+        timestamp = time.time() if timestamp is None else timestamp
+        stored = False
+        for buffer in series.tiers:
+            stored = buffer.append(timestamp, price) or stored
+        _SAMPLES.inc(outcome="stored" if stored else "stale")
+        return stored
+
+    def record_many(self, mint: str, timestamps, prices) -> int:
+        """
+        Records several samples of one mint at once, in time order. Each tier
+        takes the whole batch in one vectorized write instead of one per sample.
+        Returns:
+            int: Number of samples stored.
+        """
+        timestamps = np.asarray(timestamps, dtype=np.float64)
+        prices = np.asarray(prices, dtype=np.float64)
+        valid = np.isfinite(timestamps) & np.isfinite(prices) & (prices > 0) if mint else np.zeros(len(prices), dtype=bool)
+        if not valid.all():
+            _SAMPLES.inc(len(prices) - int(valid.sum()), outcome="invalid")
+        if not valid.any():
+            return 0
+        order = np.argsort(timestamps[valid], kind="stable")
+        timestamps, prices = timestamps[valid][order], prices[valid][order]
+        series = self._series(mint, create=True)
+        if series is None:
+            _SAMPLES.inc(len(prices), outcome="failed")
+            return 0
+        stored = np.zeros(len(prices), dtype=bool)
+        for buffer in series.tiers:
+            stored |= buffer.extend(timestamps, prices)
+        count = int(stored.sum())
+        _SAMPLES.inc(count, outcome="stored")
+        if count < len(prices):
+            _SAMPLES.inc(len(prices) - count, outcome="stale")
+        return count
+
+    def latest(self, mint: str) -> tuple[float, float] | None:
+        """
+        Returns the most recent (timestamp, price) of a mint, or None if it has no history.
+        """
+        series = self._series(mint, create=False)
+        return None if series is None else series.tiers[0].last()
+
+    def series(self, mint: str, start: float = None, end: float = None, tier: str = None) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Returns (timestamps, prices) between `start` and `end` (epoch seconds, inclusive).
+        Args:
+            tier (str, optional): Tier to read ("1s", "1m", "1h"). Defaults to the finest
+                                  tier whose history reaches back to `start`.
+        """
+        series = self._series(mint, create=False)
+        if series is None:
+            return np.empty(0), np.empty(0)
+        if tier is not None:
+            names = [name for name, _, _ in self.tiers]
+            if tier not in names:
+                raise ValueError(f"Unknown tier: {tier}")
+            timestamps, prices = series.tiers[names.index(tier)].series()
+        else:
+            for buffer in series.tiers:
+                timestamps, prices = buffer.series()
+                if start is None or (len(timestamps) and timestamps[0] <= start):
+                    break
+        keep = np.ones(len(timestamps), dtype=bool)
+        if start is not None:
+            keep &= timestamps >= start
+        if end is not None:
+            keep &= timestamps <= end
+        return timestamps[keep], prices[keep]
+
+    def price_at(self, mint: str, times) -> np.ndarray:
+        """
+        Returns the price of `mint` at each of `times` (epoch seconds): the latest
+        sample at or before that time, from the finest tier that reaches back far
+        enough. NaN where there is no history yet.
+        """
+        times = np.atleast_1d(np.asarray(times, dtype=np.float64))
+        prices = np.full(times.shape, np.nan)
+        series = self._series(mint, create=False)
+        if series is None:
+            return prices
+        unresolved = np.ones(times.shape, dtype=bool)
+        for buffer in series.tiers:
+            timestamps, closes = buffer.series()
+            if not len(timestamps):
+                continue
+            covered = unresolved & (times >= timestamps[0])
+            positions = np.searchsorted(timestamps, times[covered], side="right") - 1
+            prices[covered] = closes[positions]
+            unresolved &= ~covered
+            if not unresolved.any():
+                break
+        return prices
+
+    def returns(self, mint: str, windows, at: float = None) -> np.ndarray:
+        """
+        Returns the simple return over each of `windows` (seconds) ending at `at` (default now).
+        NaN where the price at the start of a window isn't known.
+        """
+        at = time.time() if at is None else at
+        windows = np.atleast_1d(np.asarray(windows, dtype=np.float64))
+        prices = self.price_at(mint, np.concatenate(([at], at - windows)))
+        with np.errstate(divide="ignore", invalid="ignore"):
+            return prices[0] / prices[1:] - 1.0
+
+    def window_stats(self, mint: str, start: float, end: float = None) -> dict | None:
+        """
+        Summarises a holding period, e.g. a wallet's position from entry to exit.
+        Returns:
+            dict | None: entry_price, exit_price, return, max_drawdown (<= 0), max_runup (>= 0)
+                         and samples; None if there is no history in the window.
+        """
+        end = time.time() if end is None else end
+        timestamps, prices = self.series(mint, start, end)
+        entry = self.price_at(mint, start)[0]
+        if np.isfinite(entry):
+            # The last price seen at or before the entry is what the position was opened at
+            prices = np.concatenate(([entry], prices))
+        if not len(prices):
+            return None
+        peaks = np.maximum.accumulate(prices)
+        troughs = np.minimum.accumulate(prices)
+        return {
+            "entry_price": float(prices[0]),
+            "exit_price": float(prices[-1]),
+            "return": float(prices[-1] / prices[0] - 1.0),
+            "max_drawdown": float(np.min(prices / peaks - 1.0)),
+            "max_runup": float(np.max(prices / troughs - 1.0)),
+            "samples": int(len(timestamps)),
+        }
+
+    def flush(self):
+        """
+        Flushes every mapped buffer to disk.
+        """
+        for series in self._open.values():
+            for buffer in series.tiers:
+                buffer.flush()
+
+    def close(self):
+        self.flush()
+        if not self._memory_only:
+            self._open.clear()
+            _OPEN_SERIES.set(0)
+
+# Shared store; the pipeline and the trade stream record into it
+price_store = PriceStore()
+
+def record_price(mint: str, price: float, timestamp: float = None) -> bool:
+    """
+    Records a price sample in the shared store.
+    """
+    return price_store.record(mint, price, timestamp)
@@ -1,26 +1,64 @@
-from supabase import create_client, Client
-from config.settings import SUPABASE_URL, SUPABASE_ANON_KEY
+import httpx
+from supabase import AsyncClient, AsyncClientOptions
+from config.settings import SUPABASE_URL, SUPABASE_ANON_KEY, SUPABASE_UPSERT_CHUNK_SIZE
+from telemetry import metrics
+from telemetry.logs import event, get_logger
 import datetime
+import logging
+import time
 
 # Global variable for the Supabase client
-supabase: Client = None
+supabase: AsyncClient = None
 
-def initialize_supabase_client():
+logger = get_logger(__name__)
+
+_REQUEST_SECONDS = metrics.histogram(
+    "vector_db_request_duration_seconds", "Supabase request latency.", ("table", "operation", "outcome"))
+_ROWS = metrics.counter("vector_db_rows_total", "Rows returned or written by Supabase requests.", ("table", "operation"))
+
+async def _execute(query, table: str, operation: str):
+    """
+    Executes a PostgREST query, recording its latency, outcome and row count.
+    Exceptions are re-raised for the caller to handle.
+    """
+    started = time.perf_counter()
+    outcome = "error"
+    try:
+        response = await query.execute()
+        outcome = "ok"
+        _ROWS.inc(len(response.data or []), table=table, operation=operation)
+        return response
+    finally:
+        elapsed = time.perf_counter() - started
+        _REQUEST_SECONDS.observe(elapsed, table=table, operation=operation, outcome=outcome)
+        event(logger, logging.DEBUG, "db_request", table=table, operation=operation,
+              outcome=outcome, ms=round(elapsed * 1000, 1))
+
+def _not_initialized():
+    event(logger, logging.ERROR, "supabase_not_initialized", hint="call initialize_supabase_client() first")
+
+def initialize_supabase_client(url: str = SUPABASE_URL, key: str = SUPABASE_ANON_KEY,
+                               transport: httpx.AsyncBaseTransport = None):
     """
-    Initializes the Supabase client using credentials from settings.
+    Initializes the async Supabase client using credentials from settings.
     This function should be called once at the application start.
+    Args:
+        url (str): The Supabase project URL.
+        key (str): The anon key.
+        transport (httpx.AsyncBaseTransport, optional): Routes every request through this
+            transport instead of the network (e.g. a mock PostgREST for benchmarks).
     """
     global supabase
-    if not SUPABASE_URL or not SUPABASE_ANON_KEY:
-        print("Error: Supabase URL or Anon Key not found in environment variables.")
-        print("Please ensure SUPABASE_URL and SUPABASE_ANON_KEY are set in your.env file.")
+    if not url or not key:
+        event(logger, logging.ERROR, "supabase_credentials_missing", settings="SUPABASE_URL,SUPABASE_ANON_KEY")
         return None
     try:
-        supabase = create_client(SUPABASE_URL, SUPABASE_ANON_KEY)
-        print("Supabase client initialized successfully.")
+        options = AsyncClientOptions(httpx_client=httpx.AsyncClient(transport=transport)) if transport else AsyncClientOptions()
+        supabase = AsyncClient(url, key, options)
+        event(logger, logging.INFO, "supabase_initialized")
         return supabase
     except Exception as e:
-        print(f"Error initializing Supabase client: {e}")
+        event(logger, logging.ERROR, "supabase_init_failed", error=e)
         return None
 
 async def insert_wallet(wallet_data: dict) -> bool:
@@ -33,7 +71,7 @@ async def insert_wallet(wallet_data: dict) -> bool:
         bool: True if insertion is successful, False otherwise.
     """
     if not supabase:
-        print("Supabase client not initialized. Call initialize_supabase_client() first.")
+        _not_initialized()
         return False
     try:
         # Ensure 'first_seen' and 'last_active' are set if not provided
@@ -47,16 +85,16 @@ async def insert_wallet(wallet_data: dict) -> bool:
         if 'updated_at' not in wallet_data:
             wallet_data['updated_at'] = current_time
 
-        response = await supabase.table("wallets").insert(wallet_data).execute()
+        response = await _execute(supabase.table("wallets").insert(wallet_data), "wallets", "insert")
         if response.data:
-            print(f"Wallet {wallet_data.get('wallet_address', 'N/A')} inserted successfully.")
             return True
         else:
             # Supabase client might return an error object in 'error' field
-            print(f"Failed to insert wallet {wallet_data.get('wallet_address', 'N/A')}: {response.error}")
+            event(logger, logging.WARNING, "wallet_insert_failed", wallet=wallet_data.get('wallet_address'),
+                  error=getattr(response, "error", None))
             return False
     except Exception as e:
-        print(f"Error inserting wallet {wallet_data.get('wallet_address', 'N/A')}: {e}")
+        event(logger, logging.WARNING, "wallet_insert_failed", wallet=wallet_data.get('wallet_address'), error=e)
         return False
 
 async def get_wallet(wallet_address: str) -> dict | None:
@@ -68,15 +106,72 @@ async def get_wallet(wallet_address: str) -> dict | None:
         dict | None: The wallet data if found, None otherwise.
     """
     if not supabase:
-        print("Supabase client not initialized. Call initialize_supabase_client() first.")
+        _not_initialized()
         return None
     try:
-        response = await supabase.table("wallets").select("*").eq("wallet_address", wallet_address).limit(1).execute()
+        response = await _execute(supabase.table("wallets").select("*").eq("wallet_address", wallet_address).limit(1), "wallets", "select")
         if response.data:
             return response.data
         return None
     except Exception as e:
-        print(f"Error retrieving wallet {wallet_address}: {e}")
+        event(logger, logging.WARNING, "wallet_get_failed", wallet=wallet_address, error=e)
+        return None
+
+async def get_wallets_page(limit: int = 1000, after: tuple[str, str] = None, updated_after: str = None,
+                           columns: str = "*") -> list | None:
+    """
+    Retrieves one page of wallet records from the 'wallets' table.
+    Pages are ordered by 'updated_at' then 'wallet_address'. Pass the last row's
+    ('updated_at', 'wallet_address') as `after` to get the next page; unlike
+    offset paging, rows updated while paging don't shift later pages.
+    Args:
+        limit (int): Maximum number of rows to return.
+        after (tuple[str, str], optional): Only return rows that sort after this ('updated_at', 'wallet_address').
+        updated_after (str, optional): Only return rows with 'updated_at' >= this ISO timestamp.
+        columns (str): Columns to select.
+    Returns:
+        list | None: The wallet rows (possibly empty), or None if an error occurs.
+    """
+    if not supabase:
+        _not_initialized()
+        return None
+    try:
+        query = supabase.table("wallets").select(columns)
+        if updated_after:
+            query = query.gte("updated_at", updated_after)
+        if after:
+            updated_at, wallet_address = after
+            query = query.or_(f'updated_at.gt."{updated_at}",'
+                              f'and(updated_at.eq."{updated_at}",wallet_address.gt."{wallet_address}")')
+        response = await _execute(query.order("updated_at").order("wallet_address").limit(limit), "wallets", "select_page")
+        return response.data or []
+    except Exception as e:
+        event(logger, logging.WARNING, "wallets_page_failed", after=after, error=e)
+        return None
+
+async def get_wallets_by_address(limit: int = 1000, after: str = None, columns: str = "*") -> list | None:
+    """
+    Retrieves one page of wallet records ordered by 'wallet_address'.
+    Pass the last address of a page as `after` to get the next one; unlike
+    offset paging, rows updated while paging don't shift later pages.
+    Args:
+        limit (int): Maximum number of rows to return.
+        after (str, optional): Only return wallets whose address sorts after this one.
+        columns (str): Columns to select.
+    Returns:
+        list | None: The wallet rows (possibly empty), or None if an error occurs.
+    """
+    if not supabase:
+        _not_initialized()
+        return None
+    try:
+        query = supabase.table("wallets").select(columns)
+        if after:
+            query = query.gt("wallet_address", after)
+        response = await _execute(query.order("wallet_address").limit(limit), "wallets", "select_page")
+        return response.data or []
+    except Exception as e:
+        event(logger, logging.WARNING, "wallets_page_failed", after=after, error=e)
         return None
 
 async def update_wallet(wallet_address: str, update_data: dict) -> bool:
@@ -89,22 +184,75 @@ async def update_wallet(wallet_address: str, update_data: dict) -> bool:
         bool: True if update is successful, False otherwise.
     """
     if not supabase:
-        print("Supabase client not initialized. Call initialize_supabase_client() first.")
+        _not_initialized()
         return False
     try:
         # Always update 'updated_at' timestamp
         update_data['updated_at'] = datetime.datetime.now(datetime.timezone.utc).isoformat()
-        response = await supabase.table("wallets").update(update_data).eq("wallet_address", wallet_address).execute()
+        response = await _execute(supabase.table("wallets").update(update_data).eq("wallet_address", wallet_address), "wallets", "update")
         if response.data:
-            print(f"Wallet {wallet_address} updated successfully.")
             return True
         else:
-            print(f"Failed to update wallet {wallet_address}: {response.error}")
+            event(logger, logging.WARNING, "wallet_update_failed", wallet=wallet_address, error=getattr(response, "error", None))
             return False
     except Exception as e:
-        print(f"Error updating wallet {wallet_address}: {e}")
+        event(logger, logging.WARNING, "wallet_update_failed", wallet=wallet_address, error=e)
         return False
 
+async def bulk_upsert_wallets(records: list[dict], chunk_size: int = SUPABASE_UPSERT_CHUNK_SIZE) -> dict[str, bool]:
+    """
+    Inserts or updates many wallet records in the 'wallets' table.
+    Each chunk is a single upsert request, instead of a get plus an insert/update per wallet.
+    'first_seen' and 'created_at' are left out of the payload and the missing
+    columns take their defaults, so new rows get the column default (now())
+    and existing rows keep what they have. Every row gets a fresh 'updated_at',
+    and 'score'/'last_active'/etc. are taken from the record.
+    Args:
+        records (list[dict]): Wallet records. Expected keys: 'wallet_address', 'label',
+                              'score', 'is_bot', and optionally 'last_active'.
+                              All records should carry the same keys.
+        chunk_size (int): Maximum number of rows per upsert request.
+    Returns:
+        dict[str, bool]: Wallet address -> True if that row was written, False otherwise.
+    """
+    # Later records for the same address win, so a batch never conflicts with itself
+    records_by_address = {}
+    for record in records:
+        wallet_address = record.get('wallet_address')
+        if wallet_address:
+            records_by_address[wallet_address] = record
+    addresses = list(records_by_address)
+
+    if not supabase:
+        _not_initialized()
+        return {wallet_address: False for wallet_address in addresses}
+
+    results = {}
+    for start in range(0, len(addresses), chunk_size):
+        chunk_addresses = addresses[start:start + chunk_size]
+        try:
+            current_time = datetime.datetime.now(datetime.timezone.utc).isoformat()
+            rows = []
+            for wallet_address in chunk_addresses:
+                row = {column: value for column, value in records_by_address[wallet_address].items()
+                       if column not in ('first_seen', 'created_at')}
+                row.setdefault('last_active', current_time)
+                row['updated_at'] = current_time
+                rows.append(row)
+
+            response = await _execute(
+                supabase.table("wallets").upsert(rows, on_conflict="wallet_address", default_to_null=False),
+                "wallets", "upsert")
+            written = {row.get('wallet_address') for row in response.data or []}
+            for wallet_address in chunk_addresses:
+                results[wallet_address] = wallet_address in written
+            event(logger, logging.DEBUG, "wallets_upserted", written=len(written), rows=len(chunk_addresses))
+        except Exception as e:
+            event(logger, logging.WARNING, "wallets_upsert_failed", rows=len(chunk_addresses), error=e)
+            for wallet_address in chunk_addresses:
+                results[wallet_address] = False
+    return results
+
 async def insert_token_metadata(token_data: dict) -> bool:
     """
     Inserts or updates token metadata in the 'token_metadata' table.
@@ -114,7 +262,7 @@ async def insert_token_metadata(token_data: dict) -> bool:
         bool: True if successful, False otherwise.
     """
     if not supabase:
-        print("Supabase client not initialized. Call initialize_supabase_client() first.")
+        _not_initialized()
         return False
     try:
         current_time = datetime.datetime.now(datetime.timezone.utc).isoformat()
@@ -123,13 +271,58 @@ async def insert_token_metadata(token_data: dict) -> bool:
             token_data['created_at'] = current_time
 
         # Use upsert to insert if not exists, update if exists
-        response = await supabase.table("token_metadata").upsert(token_data, on_conflict="token_mint").execute()
+        response = await _execute(supabase.table("token_metadata").upsert(token_data, on_conflict="token_mint"), "token_metadata", "upsert")
         if response.data:
-            print(f"Token metadata for {token_data.get('token_mint', 'N/A')} upserted successfully.")
             return True
         else:
-            print(f"Failed to upsert token metadata {token_data.get('token_mint', 'N/A')}: {response.error}")
+            event(logger, logging.WARNING, "token_metadata_upsert_failed", mint=token_data.get('token_mint'),
+                  error=getattr(response, "error", None))
             return False
     except Exception as e:
-        print(f"Error upserting token metadata {token_data.get('token_mint', 'N/A')}: {e}")
-        return False
\ No newline at end of file
+        event(logger, logging.WARNING, "token_metadata_upsert_failed", mint=token_data.get('token_mint'), error=e)
+        return False
+
+async def bulk_upsert_token_metadata(records: list[dict], chunk_size: int = SUPABASE_UPSERT_CHUNK_SIZE) -> dict[str, bool]:
+    """
+    Inserts or updates many rows in the 'token_metadata' table, one upsert request per chunk.
+    Args:
+        records (list[dict]): Token rows, keyed by 'token_mint'. Columns a row leaves out keep their stored value.
+        chunk_size (int): Maximum number of rows per upsert request.
+    Returns:
+        dict[str, bool]: Token mint -> True if that row was written, False otherwise.
+    """
+    records_by_mint = {}
+    for record in records:
+        token_mint = record.get('token_mint')
+        if token_mint:
+            records_by_mint[token_mint] = record
+    mints = list(records_by_mint)
+
+    if not supabase:
+        _not_initialized()
+        return {token_mint: False for token_mint in mints}
+
+    results = {}
+    for start in range(0, len(mints), chunk_size):
+        chunk_mints = mints[start:start + chunk_size]
+        try:
+            current_time = datetime.datetime.now(datetime.timezone.utc).isoformat()
+            # PostgREST nulls a column missing from some rows of a bulk upsert, so rows
+            # without e.g. a price are sent in their own request to keep the stored value
+            groups = {}
+            for token_mint in chunk_mints:
+                row = dict(records_by_mint[token_mint])
+                row['updated_at'] = current_time
+                row.setdefault('created_at', current_time)
+                groups.setdefault(tuple(sorted(row)), []).append(row)
+            written = set()
+            for rows in groups.values():
+                response = await _execute(supabase.table("token_metadata").upsert(rows, on_conflict="token_mint"), "token_metadata", "upsert")
+                written.update(row.get('token_mint') for row in response.data or [])
+            for token_mint in chunk_mints:
+                results[token_mint] = token_mint in written
+        except Exception as e:
+            event(logger, logging.WARNING, "token_metadata_upsert_failed", rows=len(chunk_mints), error=e)
+            for token_mint in chunk_mints:
+                results[token_mint] = False
+    return results
@@ -1,24 +1,132 @@
 import asyncio
+import logging
+import signal
+import sys
 from db.supabase_manager import initialize_supabase_client
+from db.outbox import outbox
+from db.price_store import price_store
 from wallet.discovery import discover_and_store_wallets
+from api import http_client
+from api.recorder import recorder
+from api.trade_stream import BUY, TradeStream
+from wallet.registry import registry
+from wallet import pnl_engine
+from wallet.scheduler import Scheduler
+from wallet.rescoring import rescore_wallets
+from telemetry import logs, metrics
+from config.settings import (
+    STREAM_MAX_WALLETS, METRICS_PATH, METRICS_DUMP_SECONDS, METRICS_PORT, OUTBOX_ENABLED, API_ARCHIVE_MODE,
+    PNL_SNAPSHOT_SECONDS, PNL_RECONCILE_SECONDS, PNL_RECONCILE_SAMPLE,
+)
+
+logger = logs.get_logger("main")
+
+async def stream_signals():
+    """
+    Streams trades for the top tracked wallets and logs each signal as it is emitted.
+    Every trade also updates the local PnL engine, which is snapshotted and spot-checked against a provider.
+    """
+    wallets = [wallet_address for wallet_address, _ in registry.top(STREAM_MAX_WALLETS)]
+    if not wallets:
+        logs.event(logger, logging.WARNING, "no_tracked_wallets", hint="run discovery first")
+        return
+    stream = TradeStream(wallets)
+    engine = pnl_engine.PnLEngine()
+    tasks = [asyncio.create_task(stream.run())]
+    if PNL_SNAPSHOT_SECONDS > 0:
+        tasks.append(asyncio.create_task(pnl_engine.snapshot_periodically(engine, PNL_SNAPSHOT_SECONDS)))
+    if PNL_RECONCILE_SECONDS > 0:
+        tasks.append(asyncio.create_task(pnl_engine.reconcile_periodically(engine, PNL_RECONCILE_SECONDS, PNL_RECONCILE_SAMPLE)))
+    logs.event(logger, logging.INFO, "streaming_started", wallets=len(wallets))
+    try:
+        while True:
+            event = await stream.queue.get()
+            # Trades are the freshest prices we see; keep them for entry/exit and drawdown queries
+            price_store.record(event.mint, event.price_usd, event.block_time / 1000 if event.block_time else None)
+            engine.ingest(event)
+            logs.event(logger, logging.INFO, "signal", wallet=event.wallet, mint=event.mint,
+                       side="buy" if event.side == BUY else "sell", amount=event.amount, price_usd=event.price_usd,
+                       block_time=event.block_time, merged=event.merged)
+    finally:
+        await stream.stop()
+        for task in tasks:
+            task.cancel()
+        engine.snapshot()
+
+async def serve():
+    """
+    Runs the scheduler until SIGINT or SIGTERM, then drains in-flight work.
+    """
+    scheduler = Scheduler()
+    loop = asyncio.get_running_loop()
+    for signum in (signal.SIGINT, signal.SIGTERM):
+        try:
+            loop.add_signal_handler(signum, scheduler.stop)
+        except (NotImplementedError, RuntimeError):
+            pass  # e.g. Windows; Ctrl+C still cancels the run
+    await scheduler.run()
 
 async def main():
     """
     Main function to initialize the application and start the wallet discovery process.
+    Run with the 'stream' argument to stream trades for tracked wallets instead,
+    or with 'serve' to keep running and refresh data on a schedule,
+    or with 'rescore' to re-score every wallet from local positions.
     """
-    print("Starting Solana Copy Trading Bot Application...")
+    logs.configure()
+    logs.event(logger, logging.INFO, "application_started")
 
     # Initialize Supabase client
     supabase_client = initialize_supabase_client()
     if not supabase_client:
-        print("Application cannot proceed without Supabase client. Exiting.")
+        logs.event(logger, logging.ERROR, "application_aborted", reason="no Supabase client")
         return
 
-    # Start the wallet discovery process
-    await discover_and_store_wallets()
+    background = []
+    server = await metrics.serve_prometheus(METRICS_PORT) if METRICS_PORT else None
+    if METRICS_PATH and METRICS_DUMP_SECONDS > 0:
+        background.append(asyncio.create_task(metrics.dump_periodically(METRICS_PATH, METRICS_DUMP_SECONDS)))
+
+    try:
+        # Record provider traffic for later offline runs, or serve it from a previous recording
+        if API_ARCHIVE_MODE:
+            recorder.open(API_ARCHIVE_MODE)
+
+        # Replay writes a previous run acknowledged but never flushed, then write behind from here on
+        if OUTBOX_ENABLED:
+            await outbox.start()
+
+        mode = sys.argv[1] if len(sys.argv) > 1 else None
+        # Load known wallets into memory, so discovery doesn't query the database per wallet.
+        # Re-scoring pages through the table itself and only writes changed rows, so it skips this.
+        if mode != "rescore":
+            await registry.load()
+
+        if mode == "stream":
+            await stream_signals()
+        elif mode == "serve":
+            await serve()
+        elif mode == "rescore":
+            await rescore_wallets()
+        else:
+            # Start the wallet discovery process
+            await discover_and_store_wallets()
+    finally:
+        # Push what's still pending; anything that can't be written stays journaled for next time
+        await outbox.stop()
+        price_store.close()
+        # Release the pooled provider connections
+        await http_client.close_clients()
+        recorder.close()
+        for task in background:
+            task.cancel()
+        if server is not None:
+            server.close()
+        if METRICS_PATH:
+            metrics.write_prometheus(METRICS_PATH)
 
-    print("Application finished. You can now check your Supabase database.")
+    logs.event(logger, logging.INFO, "application_finished", metrics=METRICS_PATH or None)
 
 if __name__ == "__main__":
     # Run the asynchronous main function
-    asyncio.run(main())
\ No newline at end of file
+    asyncio.run(main())
@@ -0,0 +1,71 @@
+import datetime
+import json
+import logging
+import sys
+from config.settings import LOG_LEVEL, LOG_FORMAT
+
+# Third-party loggers that log every request at INFO; only shown when debugging
+_NOISY_LOGGERS = ("httpx", "httpcore", "hpack", "websockets")
+
+def _timestamp(record: logging.LogRecord) -> str:
+    return datetime.datetime.fromtimestamp(record.created, datetime.timezone.utc).isoformat(timespec="milliseconds")
+
+class JsonFormatter(logging.Formatter):
+    """
+    Formats each record as one JSON object: ts, level, logger, event and the event's fields.
+    """
+
+    def format(self, record: logging.LogRecord) -> str:
+        payload = {
+            "ts": _timestamp(record),
+            "level": record.levelname.lower(),
+            "logger": record.name,
+            "event": record.getMessage(),
+        }
+        payload.update(getattr(record, "fields", None) or {})
+        if record.exc_info:
+            payload["exc"] = self.formatException(record.exc_info)
+        return json.dumps(payload, default=str)
+
+class TextFormatter(logging.Formatter):
+    """
+    Formats each record as 'ts LEVEL logger event key=value ...'.
+    """
+
+    def format(self, record: logging.LogRecord) -> str:
+        parts = [_timestamp(record), f"{record.levelname:<7}", record.name, record.getMessage()]
+        for key, value in (getattr(record, "fields", None) or {}).items():
+            value = str(value)
+            parts.append(f"{key}={json.dumps(value) if ' ' in value or not value else value}")
+        line = " ".join(parts)
+        if record.exc_info:
+            line += "\n" + self.formatException(record.exc_info)
+        return line
+
+def configure(level: str = LOG_LEVEL, fmt: str = LOG_FORMAT, stream=None):
+    """
+    Sends all application logs to `stream` (stderr by default) at `level`,
+    as JSON lines or key=value text. Call once at startup.
+    """
+    handler = logging.StreamHandler(stream or sys.stderr)
+    handler.setFormatter(JsonFormatter() if fmt == "json" else TextFormatter())
+    root = logging.getLogger()
+    for existing in list(root.handlers):
+        root.removeHandler(existing)
+    root.addHandler(handler)
+    root.setLevel(level)
+    noisy_level = logging.DEBUG if root.level <= logging.DEBUG else logging.WARNING
+    for name in _NOISY_LOGGERS:
+        logging.getLogger(name).setLevel(noisy_level)
+
+def get_logger(name: str) -> logging.Logger:
+    return logging.getLogger(name)
+
+def event(logger: logging.Logger, level: int, name: str, exc_info=None, **fields):
+    """
+    Logs a structured event: a short snake_case name plus key/value fields.
+    Nothing is formatted unless the level is enabled, so debug events are
+    cheap to leave on hot paths.
+    """
+    if logger.isEnabledFor(level):
+        logger.log(level, name, exc_info=exc_info, extra={"fields": fields})
@@ -0,0 +1,271 @@
+import asyncio
+import bisect
+import contextlib
+import os
+import time
+
+# Latency buckets in seconds, from a cache-speed call up to a slow, retried request
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def _format_labels(names: tuple, values: tuple, extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if value != int(value) else str(int(value))
+
+class _Metric:
+    """
+    Base for all metric types. Values are kept per combination of label values,
+    which are given as keyword arguments when recording.
+    """
+
+    kind = "untyped"
+
+    def __init__(self, name: str, help: str, labelnames: tuple = ()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._values: dict[tuple, object] = {}
+
+    def _key(self, labels: dict) -> tuple:
+        return tuple("" if labels.get(name) is None else str(labels[name]) for name in self.labelnames)
+
+    def labelsets(self) -> list[dict]:
+        return [dict(zip(self.labelnames, key)) for key in self._values]
+
+    def clear(self):
+        self._values.clear()
+
+    def _samples(self):
+        for key, value in self._values.items():
+            yield self.name, key, "", value
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        for name, key, extra, value in self._samples():
+            lines.append(f"{name}{_format_labels(self.labelnames, key, extra)} {_format_value(value)}")
+        return lines
+
+class Counter(_Metric):
+    """
+    A value that only goes up (requests sent, compute units spent, ...).
+    """
+
+    kind = "counter"
+
+    def inc(self, amount: float = 1.0, **labels):
+        key = self._key(labels)
+        self._values[key] = self._values.get(key, 0.0) + amount
+
+    def value(self, **labels) -> float:
+        return self._values.get(self._key(labels), 0.0)
+
+class Gauge(_Metric):
+    """
+    A value that goes up and down (queue depth, quota remaining, ...).
+    """
+
+    kind = "gauge"
+
+    def set(self, value: float, **labels):
+        self._values[self._key(labels)] = value
+
+    def inc(self, amount: float = 1.0, **labels):
+        key = self._key(labels)
+        self._values[key] = self._values.get(key, 0.0) + amount
+
+    def value(self, **labels) -> float:
+        return self._values.get(self._key(labels), 0.0)
+
+class _HistogramValue:
+    __slots__ = ("counts", "sum", "count")
+
+    def __init__(self, size: int):
+        self.counts = [0] * size
+        self.sum = 0.0
+        self.count = 0
+
+class Histogram(_Metric):
+    """
+    Counts observations into fixed buckets, so latency percentiles can be
+    estimated without keeping every sample.
+    """
+
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, labelnames: tuple = (), buckets: tuple = DEFAULT_BUCKETS):
+        super().__init__(name, help, labelnames)
+        self.buckets = tuple(sorted(buckets)) + (float("inf"),)
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        entry = self._values.get(key)
+        if entry is None:
+            entry = self._values[key] = _HistogramValue(len(self.buckets))
+        entry.counts[bisect.bisect_left(self.buckets, value)] += 1
+        entry.sum += value
+        entry.count += 1
+
+    @contextlib.contextmanager
+    def time(self, **labels):
+        """
+        Observes how long the `with` block takes, in seconds.
+        """
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+
+    def count(self, **labels) -> int:
+        entry = self._values.get(self._key(labels))
+        return entry.count if entry else 0
+
+    def quantile(self, q: float, **labels) -> float | None:
+        """
+        Estimates the q-th quantile (0-1) by interpolating within its bucket.
+        Returns None if nothing was observed.
+        """
+        entry = self._values.get(self._key(labels))
+        if entry is None or not entry.count:
+            return None
+        rank = q * entry.count
+        cumulative = 0
+        for index, count in enumerate(entry.counts):
+            if count and cumulative + count >= rank:
+                upper = self.buckets[index]
+                lower = self.buckets[index - 1] if index else 0.0
+                if upper == float("inf"):
+                    return lower
+                return lower + (upper - lower) * (rank - cumulative) / count
+            cumulative += count
+        return self.buckets[-2]
+
+    def summary(self) -> dict:
+        """
+        Returns count, mean, p50 and p99 (in milliseconds) for every label combination,
+        keyed by the label values joined with '/'.
+        """
+        result = {}
+        for key, entry in self._values.items():
+            labels = dict(zip(self.labelnames, key))
+            p50 = self.quantile(0.50, **labels)
+            p99 = self.quantile(0.99, **labels)
+            result["/".join(key) or self.name] = {
+                "count": entry.count,
+                "mean_ms": round(entry.sum / entry.count * 1000, 3) if entry.count else None,
+                "p50_ms": round(p50 * 1000, 3) if p50 is not None else None,
+                "p99_ms": round(p99 * 1000, 3) if p99 is not None else None,
+            }
+        return result
+
+    def _samples(self):
+        for key, entry in self._values.items():
+            cumulative = 0
+            for bound, count in zip(self.buckets, entry.counts):
+                cumulative += count
+                yield f"{self.name}_bucket", key, f'le="{_format_value(bound)}"', cumulative
+            yield f"{self.name}_sum", key, "", entry.sum
+            yield f"{self.name}_count", key, "", entry.count
+
+# Every metric created through counter()/gauge()/histogram(), by name
+_registry: dict[str, _Metric] = {}
+
+def _get_or_create(cls, name: str, help: str, labelnames: tuple, **kwargs) -> _Metric:
+    metric = _registry.get(name)
+    if metric is None:
+        metric = _registry[name] = cls(name, help, labelnames, **kwargs)
+    elif not isinstance(metric, cls) or metric.labelnames != tuple(labelnames):
+        raise ValueError(f"Metric {name} is already registered as a different {metric.kind}.")
+    return metric
+
+def counter(name: str, help: str, labelnames: tuple = ()) -> Counter:
+    """
+    Returns the counter called `name`, registering it on first use.
+    """
+    return _get_or_create(Counter, name, help, labelnames)
+
+def gauge(name: str, help: str, labelnames: tuple = ()) -> Gauge:
+    """
+    Returns the gauge called `name`, registering it on first use.
+    """
+    return _get_or_create(Gauge, name, help, labelnames)
+
+def histogram(name: str, help: str, labelnames: tuple = (), buckets: tuple = DEFAULT_BUCKETS) -> Histogram:
+    """
+    Returns the histogram called `name`, registering it on first use.
+    """
+    return _get_or_create(Histogram, name, help, labelnames, buckets=buckets)
+
+def get_metric(name: str) -> _Metric | None:
+    return _registry.get(name)
+
+def reset():
+    """
+    Clears every recorded value (the metrics themselves stay registered).
+    """
+    for metric in _registry.values():
+        metric.clear()
+
+def render_prometheus() -> str:
+    """
+    Returns every registered metric in the Prometheus text exposition format.
+    """
+    lines = []
+    for name in sorted(_registry):
+        lines.extend(_registry[name].render())
+    return "\n".join(lines) + "\n"
+
+def write_prometheus(path: str):
+    """
+    Writes the current metrics to `path` (e.g. for node_exporter's textfile collector).
+    The file is replaced atomically, so a scraper never reads it half written.
+    """
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    temp_path = f"{path}.tmp"
+    with open(temp_path, "w", encoding="utf-8") as f:
+        f.write(render_prometheus())
+    os.replace(temp_path, path)
+
+async def dump_periodically(path: str, interval: float):
+    """
+    Writes the metrics to `path` every `interval` seconds until cancelled.
+    """
+    while True:
+        await asyncio.sleep(interval)
+        write_prometheus(path)
+
+async def serve_prometheus(port: int, host: str = "0.0.0.0") -> asyncio.AbstractServer:
+    """
+    Starts a minimal HTTP server that answers every request with the current metrics,
+    so Prometheus can scrape http://<host>:<port>/metrics.
+    Returns:
+        asyncio.AbstractServer: The running server; close it to stop serving.
+    """
+    async def handle(reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            # Read (and ignore) the request line and headers
+            while (await reader.readline()) not in (b"\r\n", b"\n", b""):
+                pass
+            body = render_prometheus().encode()
+            writer.write(b"HTTP/1.1 200 OK\r\n"
+                         b"Content-Type: text/plain; version=0.0.4; charset=utf-8\r\n"
+                         b"Content-Length: " + str(len(body)).encode() + b"\r\n"
+                         b"Connection: close\r\n\r\n" + body)
+            await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    return await asyncio.start_server(handle, host, port)
@@ -0,0 +1,119 @@
+import math
+import random
+import numpy as np
+import pytest
+from wallet import analyzer
+
+def _random_buyers(count: int, wallets: int, seed: int = 7) -> list[dict]:
+    rng = random.Random(seed)
+    buyers = []
+    for _ in range(count):
+        first_buy = rng.uniform(0, 3_600_000)
+        buyer = {
+            "wallet": f"W{rng.randrange(wallets)}",
+            "first_buy_time": first_buy,
+            "last_transaction_time": first_buy + rng.uniform(0, 600_000),
+            "realized": rng.uniform(-100, 100),
+            "unrealized": rng.choice([0.0, rng.uniform(-50, 50)]),
+            "total_invested": rng.choice([None, rng.uniform(1, 200)]),
+            "total_transactions": rng.choice([None, rng.randint(1, 30)]),
+            "buy_transactions": rng.randint(1, 10),
+            "sell_transactions": rng.randint(0, 10),
+        }
+        if rng.random() < 0.6:
+            buyer["first_sell_time"] = first_buy + rng.uniform(0, 120_000)
+            buyer["last_sell_time"] = buyer["first_sell_time"] + rng.uniform(0, 120_000)
+        buyers.append(buyer)
+    return buyers
+
+def _reference_features(buyers: list, launch_time: float, now_ms: float) -> dict:
+    """
+    The features computed one position at a time in plain Python, as a per-trade implementation would.
+    """
+    by_wallet = {}
+    for buyer in buyers:
+        by_wallet.setdefault(buyer["wallet"], []).append(buyer)
+    features = {}
+    for wallet_address, positions in by_wallet.items():
+        totals = [position["realized"] + position["unrealized"] for position in positions]
+        realized = sum(position["realized"] for position in positions)
+        unrealized = sum(position["unrealized"] for position in positions)
+        invested = [position["total_invested"] for position in positions if position["total_invested"] is not None]
+        holds, delays, transactions = [], [], []
+        for position in positions:
+            exit_time = position.get("last_sell_time", position.get("first_sell_time", now_ms))
+            holds.append((exit_time - position["first_buy_time"]) / 1000.0)
+            delays.append((position["first_buy_time"] - launch_time) / 1000.0)
+            count = position["total_transactions"]
+            transactions.append(count if count is not None else position["buy_transactions"] + position["sell_transactions"])
+        first_seen = min(position["first_buy_time"] for position in positions)
+        last_seen = max(position["last_transaction_time"] for position in positions)
+        active_days = max((last_seen - first_seen) / 86_400_000.0, 1.0 / 24.0)
+        features[wallet_address] = {
+            "positions": len(positions),
+            "win_rate": sum(total > 0 for total in totals) / len(positions),
+            "realized_ratio": realized / (abs(realized) + abs(unrealized)),
+            "roi": (realized + unrealized) / sum(invested) if invested else math.nan,
+            "total_pnl": realized + unrealized,
+            "mean_hold_seconds": sum(holds) / len(holds),
+            "short_hold_fraction": sum(hold < analyzer.SHORT_HOLD_SECONDS for hold in holds) / len(holds),
+            "trades_per_day": sum(transactions) / active_days,
+            "mean_launch_delay_seconds": sum(delays) / len(delays),
+            "early_entry_fraction": sum(delay <= analyzer.EARLY_ENTRY_SECONDS for delay in delays) / len(delays),
+        }
+    return features
+
+def test_vectorized_features_match_per_position_reference():
+    buyers = _random_buyers(2000, 300)
+    launch_time, now_ms = 0.0, 10_000_000.0
+    positions = analyzer.PositionColumns.from_first_buyers(buyers, launch_time=launch_time, now_ms=now_ms)
+    features = analyzer.compute_features(positions)
+    reference = _reference_features(buyers, launch_time, now_ms)
+    assert sorted(positions.wallets) == sorted(reference)
+    for i, wallet_address in enumerate(positions.wallets):
+        for name in analyzer.FEATURE_NAMES:
+            expected = reference[wallet_address][name]
+            if math.isnan(expected):
+                assert math.isnan(features[name][i]), (wallet_address, name)
+            else:
+                assert features[name][i] == pytest.approx(expected, rel=1e-9, abs=1e-9), (wallet_address, name)
+
+def test_positions_are_held_until_their_last_sell():
+    buyers = [
+        {"wallet": "A", "first_buy_time": 0, "first_sell_time": 10_000, "last_sell_time": 90_000},
+        {"wallet": "B", "first_buy_time": 0, "first_sell_time": 10_000},
+        {"wallet": "C", "first_buy_time": 0},
+    ]
+    positions = analyzer.PositionColumns.from_first_buyers(buyers, now_ms=500_000)
+    assert positions.exit_time.tolist() == [90_000, 10_000, 500_000]
+    hold = analyzer.compute_features(positions)["mean_hold_seconds"]
+    assert hold.tolist() == [90.0, 10.0, 500.0]
+
+def test_batch_scores_match_scoring_each_wallet_alone():
+    buyers = _random_buyers(500, 40, seed=3)
+    positions = analyzer.PositionColumns.from_first_buyers(buyers, launch_time=0.0, now_ms=10_000_000.0)
+    batch = {result["wallet_address"]: result for result in analyzer.analyze_positions(positions)}
+    for wallet_address in positions.wallets[:10]:
+        alone = analyzer.PositionColumns.from_first_buyers([buyer for buyer in buyers if buyer["wallet"] == wallet_address],
+                                                           launch_time=0.0, now_ms=10_000_000.0)
+        result = analyzer.analyze_positions(alone)[0]
+        assert result == batch[wallet_address]
+
+def test_scores_are_bounded_and_likely_bots_are_not_ranked():
+    buyers = _random_buyers(1000, 100, seed=11)
+    # A sniper that flips every launch within seconds
+    buyers += [{"wallet": "BOT", "first_buy_time": 1000.0 * i, "first_sell_time": 1000.0 * i + 2000,
+                "realized": 1.0, "total_transactions": 500} for i in range(20)]
+    positions = analyzer.PositionColumns.from_first_buyers(buyers, launch_time=0.0, now_ms=10_000_000.0)
+    results = analyzer.analyze_positions(positions)
+    scores = np.array([result["score"] for result in results])
+    assert ((scores >= 0) & (scores <= 100)).all()
+    assert next(result for result in results if result["wallet_address"] == "BOT")["is_bot"]
+    ranked = analyzer.rank_wallets(positions)
+    assert "BOT" not in {wallet_address for wallet_address, _ in ranked}
+    assert [score for _, score in ranked] == sorted((score for _, score in ranked), reverse=True)
+
+def test_empty_positions():
+    positions = analyzer.PositionColumns.from_first_buyers([])
+    assert analyzer.analyze_positions(positions) == []
+    assert analyzer.rank_wallets(positions) == []
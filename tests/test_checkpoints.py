@@ -0,0 +1,138 @@
+import asyncio
+import json
+import pytest
+from wallet import checkpoints as checkpoints_module, pipeline as pipeline_module
+from wallet.checkpoints import CheckpointStore
+from wallet.pipeline import DiscoveryPipeline
+from wallet.registry import WalletRegistry
+from tests.test_pipeline import _buyer, world  # noqa: F401  (shared fixture)
+
+class Killed(Exception):
+    """
+    Stands in for the process dying mid-run.
+    """
+
+def _run(path: str, mints, recheck_seconds: float = 0, **options) -> dict:
+    # A restarted process starts with an empty registry
+    pipeline_module.registry = WalletRegistry()
+    pipeline = DiscoveryPipeline(checkpoints=CheckpointStore(path=path), recheck_seconds=recheck_seconds,
+                                 fetch_workers=1, write_batch_size=1, write_flush_seconds=0.05, save_seconds=0,
+                                 **options)
+    return asyncio.run(asyncio.wait_for(pipeline.run(mints), timeout=5))
+
+def _kill_after_commits(monkeypatch, commits: int):
+    original = CheckpointStore.commit_buyer
+    done = []
+
+    def commit_buyer(self, mint, wallet, digest, buyer_time=None):
+        if len(done) == commits:
+            raise Killed()
+        done.append(wallet)
+        original(self, mint, wallet, digest, buyer_time)
+
+    monkeypatch.setattr(CheckpointStore, "commit_buyer", commit_buyer)
+    return lambda: monkeypatch.setattr(CheckpointStore, "commit_buyer", original)
+
+def _written(world) -> list:
+    return [wallet for batch in world.writes for wallet in batch]
+
+def _mints(*mints):
+    """
+    Feeds mints one at a time, so each reaches the write stage (and is saved) on its own.
+    """
+    async def feed():
+        for mint in mints:
+            yield mint
+            await asyncio.sleep(0.1)
+    return feed()
+
+def test_restart_skips_committed_buyers(world, monkeypatch, tmp_path):
+    path = str(tmp_path / "checkpoints.json")
+    world.payloads["M1"] = [_buyer("A"), _buyer("B"), _buyer("C")]
+    world.payloads["M2"] = [_buyer("D")]
+    # B's write fails, so M1 is saved half done; the run then dies writing M2
+    world.failing = {"B"}
+    revive = _kill_after_commits(monkeypatch, 2)
+    with pytest.raises(Killed):
+        _run(path, _mints("M1", "M2"))
+    revive()
+    saved = json.load(open(path))["mints"]
+    assert saved["M1"]["pending_hash"] and saved["M1"]["payload_hash"] is None
+    assert sorted(saved["M1"]["buyers"]) == ["A", "C"]
+    # M2 was begun after the last save, so nothing of it survived
+    assert "M2" not in saved
+
+    world.failing = set()
+    world.writes.clear()
+    stats = _run(path, ["M1", "M2"], recheck_seconds=3600)
+    # Interrupted mints are resumed however recently they were checked, without rewriting committed buyers
+    assert stats["mints_skipped_fresh"] == 0 and stats["buyers_unchanged"] == 2
+    assert sorted(_written(world)) == ["B", "D"]
+    saved = json.load(open(path))["mints"]
+    for mint, buyers in (("M1", ["A", "B", "C"]), ("M2", ["D"])):
+        assert "pending_hash" not in saved[mint] and saved[mint]["payload_hash"]
+        assert sorted(saved[mint]["buyers"]) == buyers
+
+    # Now complete and fresh: skipped without a fetch
+    world.fetched.clear()
+    assert _run(path, ["M1", "M2"], recheck_seconds=3600)["mints_skipped_fresh"] == 2
+    assert world.fetched == []
+
+def test_changed_payload_of_an_interrupted_mint_is_refetched(world, monkeypatch, tmp_path):
+    path = str(tmp_path / "checkpoints.json")
+    world.payloads["M1"] = [_buyer("A"), _buyer("B")]
+    _run(path, ["M1"])
+    completed_hash = json.load(open(path))["mints"]["M1"]["payload_hash"]
+
+    # B traded again and D joined; D's write fails, and the run dies on the next mint
+    world.payloads["M1"] = [_buyer("A"), _buyer("B", total=99.0), _buyer("D")]
+    world.payloads["M2"] = [_buyer("E")]
+    world.failing = {"D"}
+    revive = _kill_after_commits(monkeypatch, 1)
+    with pytest.raises(Killed):
+        _run(path, _mints("M1", "M2"))
+    revive()
+    saved = json.load(open(path))["mints"]["M1"]
+    assert saved["payload_hash"] == completed_hash and saved["pending_hash"] not in (None, completed_hash)
+
+    # By the restart D's entry changed again: the pending payload no longer matches and is processed anew
+    world.payloads["M1"][2] = _buyer("D", total=5.0)
+    world.failing = set()
+    world.writes.clear()
+    world.fetched.clear()
+    _run(path, ["M1"], recheck_seconds=3600)
+    assert world.fetched == ["M1"]
+    assert _written(world) == ["D"]
+    saved = json.load(open(path))["mints"]["M1"]
+    assert "pending_hash" not in saved and saved["payload_hash"] not in (None, completed_hash)
+
+def test_interrupted_save_leaves_the_previous_file_intact(tmp_path, monkeypatch):
+    path = str(tmp_path / "checkpoints.json")
+    store = CheckpointStore(path=path)
+    store.begin("M1", "h1")
+    store.complete("M1", "h1")
+    store.save()
+
+    def torn_dump(payload, f, **kwargs):
+        f.write(json.dumps(payload)[:10])
+        raise OSError("disk full")
+
+    store.begin("M2", "h2")
+    monkeypatch.setattr(checkpoints_module.json, "dump", torn_dump)
+    with pytest.raises(OSError):
+        store.save()
+    monkeypatch.undo()
+
+    # The torn write only reached the temporary file
+    assert (tmp_path / "checkpoints.json.tmp").exists()
+    reloaded = CheckpointStore(path=path)
+    assert reloaded.is_unchanged("M1", "h1") and not reloaded.changed_buyers("M2", {}) and "M2" not in reloaded._mints
+    # The next save replaces the leftover temporary file
+    store.save()
+    assert "M2" in CheckpointStore(path=path)._mints
+
+def test_unreadable_file_starts_empty(tmp_path):
+    path = tmp_path / "checkpoints.json"
+    path.write_text('{"mints": {"M1": ')
+    store = CheckpointStore(path=str(path))
+    assert not store.is_fresh("M1", 3600) and store._mints == {}
@@ -0,0 +1,67 @@
+import numpy as np
+from wallet.cooccurrence import CooccurrenceIndex
+
+def _buyers(wallets, start_ms=1_000.0):
+    return [{"wallet": wallet, "first_buy_time": start_ms + i} for i, wallet in enumerate(wallets)]
+
+def _dense(matrix):
+    return np.asarray(matrix.todense())
+
+def test_incremental_cooccurrence_matches_full_recompute():
+    rng = np.random.default_rng(7)
+    wallets = [f"W{i}" for i in range(60)]
+    index = CooccurrenceIndex(path=None, early_rank=5)
+    for step in range(40):
+        # Re-checked mints come back with extra buyers, some of them earlier than the indexed ones
+        mint = f"M{rng.integers(0, 15)}"
+        buyers = _buyers(rng.choice(wallets, size=rng.integers(1, 12), replace=False).tolist(),
+                         start_ms=float(rng.integers(0, 1_000)))
+        index.add_launch(mint, buyers)
+        if step % 3 == 0:
+            incremental = index.cooccurrence()
+            full = index.incidence() @ index.incidence().T
+            assert np.array_equal(_dense(incremental), _dense(full))
+    incidence = index.incidence()
+    assert np.array_equal(_dense(index.cooccurrence()), _dense(incidence @ incidence.T))
+    assert np.array_equal(index.cooccurrence().diagonal(), np.array(index.early_appearances))
+
+def test_recheck_keeps_original_rank_and_only_adds_new_wallets():
+    index = CooccurrenceIndex(path=None, early_rank=2)
+    assert index.add_launch("M", _buyers(["A", "B", "C"])) == 3
+    assert index.add_launch("M", [{"wallet": "D", "first_buy_time": 0.0}, *_buyers(["A", "B"])]) == 1
+    ranks = dict(zip((index.wallets[w] for w in index.pair_wallet), index.pair_rank))
+    assert ranks == {"A": 1, "B": 2, "C": 3, "D": 1}
+    assert list(index.early_appearances) == [1, 1, 0, 1]
+
+def test_clusters_link_wallets_by_shared_launches_and_jaccard():
+    index = CooccurrenceIndex(path=None, early_rank=10)
+    # A, B and C buy the same four launches; D shares two with them and buys four more elsewhere
+    for mint in ("M1", "M2", "M3", "M4"):
+        index.add_launch(mint, _buyers(["A", "B", "C"] + (["D"] if mint in ("M1", "M2") else [])))
+    for mint in ("N1", "N2", "N3", "N4"):
+        index.add_launch(mint, _buyers(["D", "E"]))
+    assert index.clusters(min_shared=3, min_jaccard=0.5) == [["A", "B", "C"], ["D", "E"]]
+    # D shares 2 of A's 4 and 2 of its own 6 launches with A: Jaccard 2 / 8
+    assert ("D", 2, 0.25) in index.co_buyers("A")
+    assert sorted(map(sorted, index.clusters(min_shared=2, min_jaccard=0.25))) == [["A", "B", "C", "D", "E"]]
+    assert index.clusters(min_shared=5, min_jaccard=0.0) == []
+
+def test_repeat_early_wallets_ranks_by_early_launches_then_mean_rank():
+    index = CooccurrenceIndex(path=None, early_rank=1)
+    index.add_launch("M1", _buyers(["A", "B"]))
+    index.add_launch("M2", _buyers(["A", "B"]))
+    index.add_launch("M3", _buyers(["B", "A"]))
+    assert index.repeat_early_wallets(min_launches=1) == [("A", 2, 3, 1.33), ("B", 1, 3, 1.67)]
+
+def test_save_and_load_round_trip(tmp_path):
+    path = str(tmp_path / "cooccurrence.npz")
+    index = CooccurrenceIndex(path=path, early_rank=3)
+    index.add_launch("M1", _buyers(["A", "B", "C", "D"]))
+    index.add_launch("M2", _buyers(["B", "A"]))
+    index.save()
+    loaded = CooccurrenceIndex(path=path, early_rank=3)
+    assert loaded.stats() == index.stats()
+    assert np.array_equal(_dense(loaded.cooccurrence()), _dense(index.cooccurrence()))
+    assert loaded.launch_times() == index.launch_times()
+    # Re-adding a stored launch adds nothing
+    assert loaded.add_launch("M2", _buyers(["B", "A"])) == 0
@@ -0,0 +1,69 @@
+import asyncio
+import json
+import pytest
+from api import decoding
+
+_BUYERS = [{"wallet": "A", "realized": "12.5", "first_buy_time": 1000, "extra": {"nested": [1, 2]}},
+           {"wallet": "B,]}", "realized": None, "note": "quote \" and backslash \\\\ and [brackets]"},
+           "not an object",
+           {"wallet": "C", "realized": True}]
+
+def _chunks(data: bytes, size: int):
+    async def chunks():
+        for start in range(0, len(data), size):
+            yield data[start:start + size]
+    return chunks()
+
+def test_splitter_yields_each_element_across_any_chunk_boundary():
+    body = json.dumps(_BUYERS).encode()
+    assert list(decoding.iter_array(body)) == _BUYERS
+    for size in (1, 2, 7, len(body)):
+        splitter = decoding.ArraySplitter()
+        items = [item for start in range(0, len(body), size) for item in splitter.feed(body[start:start + size])]
+        assert [json.loads(item) for item in items] == _BUYERS
+        assert splitter.done
+    assert list(decoding.iter_array(b" [ ] ")) == []
+
+def test_stream_decoded_first_buyers_match_the_buffered_decoder():
+    body = json.dumps(_BUYERS).encode()
+    streamed = asyncio.run(decoding.adecode_first_buyers(_chunks(body, 5)))
+    buffered = decoding.decode_first_buyers(body)
+    assert [record.to_dict() for record in streamed] == [record.to_dict() for record in buffered]
+    assert [record.wallet for record in streamed] == ["A", "B,]}", "C"]
+
+def test_position_record_keeps_only_declared_fields_and_converts_on_read():
+    record = decoding.PositionRecord.from_dict(_BUYERS[0] | {"unrealized": "n/a", "total": True})
+    assert not hasattr(record, "__dict__")
+    # Raw values are kept as they came, in declaration order; undeclared keys are dropped
+    assert record.raw_values()[:2] == ("A", 1000)
+    assert len(record.raw_values()) == len(decoding.PositionRecord.FIELDS)
+    assert record.realized == record.get("realized") == record["realized"] == 12.5
+    # Bad values, booleans and missing fields read as None (or the default), never raise
+    assert record.unrealized is None and record.total is None and record.get("last_sell_time", 0.0) == 0.0
+    assert record.get("extra") is None and record.get("extra", "x") == "x"
+    with pytest.raises(KeyError):
+        record["extra"]
+    with pytest.raises(AttributeError):
+        record.extra
+    assert record.to_dict()["first_buy_time"] == 1000.0 and "extra" not in record.to_dict()
+
+def test_holder_record_reads_provider_keys_and_attributes():
+    body = json.dumps({"result": [{"ownerAddress": "W", "balanceFormatted": "1.5", "usdValue": None}, "junk"],
+                       "cursor": "c"}).encode()
+    payload = decoding.decode_token_holders(body)
+    assert payload["cursor"] == "c" and len(payload["result"]) == 1
+    holder = payload["result"][0]
+    assert holder.owner_address == holder.get("ownerAddress") == "W"
+    assert holder.balance == holder["balanceFormatted"] == 1.5
+    assert holder.usd_value is None
+
+def test_wallet_pnl_tokens_become_records():
+    body = json.dumps({"summary": {"realized": 1}, "tokens": {"M": {"realized": 3, "total_invested": "2"}}}).encode()
+    payload = decoding.decode_wallet_pnl(body)
+    assert payload["summary"] == {"realized": 1}
+    assert payload["tokens"]["M"].realized == 3.0 and payload["tokens"]["M"].get("total_invested") == 2.0
+
+def test_to_number():
+    assert decoding.to_number("2.5") == 2.5 and decoding.to_number(3) == 3.0
+    assert decoding.to_number(None) is None and decoding.to_number(True) is None
+    assert decoding.to_number("x", default=-1.0) == -1.0
@@ -0,0 +1,147 @@
+import asyncio
+import httpx
+import pytest
+from api import http_client, rate_limiter
+from config.settings import HTTP_MAX_RETRIES, HTTP_BACKOFF_MAX_SECONDS
+
+PROVIDER = http_client.SOLANA_TRACKER
+
+@pytest.fixture
+def provider(monkeypatch):
+    """
+    Routes Solana Tracker through a scripted MockTransport, with no rate limit and instant backoff.
+    `responses` is consumed in order (the last one repeats); items may be responses or exceptions.
+    """
+    state = {"responses": [], "requests": [], "delays": [], "throttles": []}
+
+    def handle(request: httpx.Request) -> httpx.Response:
+        state["requests"].append(request)
+        index = min(len(state["requests"]), len(state["responses"])) - 1
+        item = state["responses"][index]
+        if isinstance(item, Exception):
+            raise item
+        return item
+
+    def backoff_delay(attempt, retry_after=None):
+        state["delays"].append((attempt, retry_after))
+        return 0.0
+
+    saved_buckets, saved_quotas = dict(rate_limiter._buckets), dict(rate_limiter._quotas)
+    rate_limiter.configure_provider(PROVIDER, rate=1e6)
+    monkeypatch.setattr(rate_limiter, "backoff_delay", backoff_delay)
+    real_record_throttle = rate_limiter.record_throttle
+    monkeypatch.setattr(rate_limiter, "record_throttle",
+                        lambda name, retry_after: (state["throttles"].append(retry_after), real_record_throttle(name, 0.0)))
+    http_client.set_transport(PROVIDER, httpx.MockTransport(handle))
+    yield state
+    http_client.set_transport(PROVIDER, None)
+    rate_limiter._buckets.update(saved_buckets)
+    rate_limiter._quotas.update(saved_quotas)
+
+def _get(path="/tokens/M"):
+    async def run():
+        try:
+            return await http_client.get_json(PROVIDER, path, endpoint="token_metadata")
+        finally:
+            await http_client.close_clients()
+    return asyncio.run(run())
+
+def test_client_is_created_once_per_provider_and_replaced_with_its_transport(provider):
+    async def run():
+        first = http_client.get_client(PROVIDER)
+        assert http_client.get_client(PROVIDER) is first
+        assert http_client.get_client(http_client.MORALIS) is not first
+        assert str(first.base_url).rstrip("/") == http_client.PROVIDERS[PROVIDER]["base_url"].rstrip("/")
+        http_client.set_transport(PROVIDER, httpx.MockTransport(lambda request: httpx.Response(200, json={})))
+        second = http_client.get_client(PROVIDER)
+        assert second is not first
+        await asyncio.sleep(0)  # the replaced client closes in the background
+        assert first.is_closed
+        await second.aclose()
+        assert http_client.get_client(PROVIDER) is not second
+        await http_client.close_clients()
+
+    asyncio.run(run())
+
+def test_requests_share_one_client_and_send_provider_headers(provider):
+    provider["responses"] = [httpx.Response(200, json={"ok": True})]
+
+    async def run():
+        results = await asyncio.gather(*(http_client.get_json(PROVIDER, f"/tokens/M{i}") for i in range(5)))
+        await http_client.close_clients()
+        return results
+
+    assert asyncio.run(run()) == [{"ok": True}] * 5
+    assert {request.headers["x-api-key"] for request in provider["requests"]} == {
+        http_client.PROVIDERS[PROVIDER]["headers"]["x-api-key"]}
+    assert [request.url.path.rsplit("/", 1)[-1] for request in provider["requests"]] == [f"M{i}" for i in range(5)]
+
+def test_server_errors_are_retried_with_backoff(provider):
+    provider["responses"] = [httpx.Response(503), httpx.Response(502, headers={"Retry-After": "2"}),
+                             httpx.Response(200, json={"n": 1})]
+    assert _get() == {"n": 1}
+    assert len(provider["requests"]) == 3
+    # Each retry backs off further, and never less than Retry-After
+    assert provider["delays"] == [(1, None), (2, 2.0)]
+
+def test_429_pauses_the_bucket_and_retries(provider):
+    provider["responses"] = [httpx.Response(429, headers={"Retry-After": "1"}), httpx.Response(200, json={"n": 2})]
+    assert _get() == {"n": 2}
+    assert provider["throttles"] == [1.0]
+    assert rate_limiter.get_quota_usage()[PROVIDER]["retries"] == 1
+
+def test_transport_errors_are_retried(provider):
+    provider["responses"] = [httpx.ConnectError("refused"), httpx.ReadTimeout("slow"), httpx.Response(200, json={"n": 3})]
+    assert _get() == {"n": 3}
+    assert [attempt for attempt, _ in provider["delays"]] == [1, 2]
+
+def test_retries_stop_after_the_limit(provider):
+    provider["responses"] = [httpx.Response(500)]
+    with pytest.raises(httpx.HTTPStatusError):
+        _get()
+    assert len(provider["requests"]) == HTTP_MAX_RETRIES + 1
+
+    provider["requests"].clear()
+    provider["responses"] = [httpx.ConnectError("refused")]
+    with pytest.raises(httpx.ConnectError):
+        _get()
+    assert len(provider["requests"]) == HTTP_MAX_RETRIES + 1
+
+def test_long_retry_after_and_client_errors_are_not_retried(provider):
+    provider["responses"] = [httpx.Response(429, headers={"Retry-After": str(HTTP_BACKOFF_MAX_SECONDS + 60)})]
+    with pytest.raises(httpx.HTTPStatusError):
+        _get()
+    assert len(provider["requests"]) == 1
+
+    provider["requests"].clear()
+    provider["responses"] = [httpx.Response(404)]
+    with pytest.raises(httpx.HTTPStatusError):
+        _get()
+    assert len(provider["requests"]) == 1
+
+def test_large_or_unsized_bodies_are_stream_decoded(provider, monkeypatch):
+    monkeypatch.setattr(http_client, "HTTP_STREAM_DECODE_MIN_BYTES", 64)
+    decoded = []
+
+    async def stream_decode(chunks):
+        body = b"".join([chunk async for chunk in chunks])
+        decoded.append(body)
+        return "streamed"
+
+    async def chunked():
+        yield b'[{"wallet": "A"},'
+        yield b' {"wallet": "B"}]'
+
+    provider["responses"] = [httpx.Response(503), httpx.Response(200, content=b"[1]"),
+                             httpx.Response(200, content=b"[" + b"1," * 40 + b"1]"), httpx.Response(200, content=chunked())]
+
+    async def run():
+        try:
+            return [await http_client.get_json(PROVIDER, "/first-buyers/M", decode=lambda body: ("buffered", body),
+                                               stream_decode=stream_decode) for _ in range(3)]
+        finally:
+            await http_client.close_clients()
+
+    # The 503 is retried; small bodies with a known length are decoded in one go
+    assert asyncio.run(run()) == [("buffered", b"[1]"), "streamed", "streamed"]
+    assert decoded[1] == b'[{"wallet": "A"}, {"wallet": "B"}]'
@@ -0,0 +1,106 @@
+import asyncio
+import json
+from db import outbox
+
+def _writer(calls: list, fail: bool = False, delay: float = 0.0):
+    async def write(records):
+        if delay:
+            await asyncio.sleep(delay)
+        calls.append(records)
+        if fail:
+            raise ConnectionError("database down")
+        return {record["wallet_address"]: True for record in records}
+    return write
+
+def _journal(path) -> list:
+    with open(path, "r", encoding="utf-8") as f:
+        return [json.loads(line) for line in f]
+
+def test_replay_coalesces_journal_and_skips_torn_line(tmp_path):
+    path = tmp_path / "outbox.jsonl"
+    path.write_text(
+        json.dumps({"table": "wallets", "record": {"wallet_address": "A", "score": 1.0, "label": "x"}}) + "\n"
+        + json.dumps({"table": "wallets", "record": {"wallet_address": "A", "score": 2.0}}) + "\n"
+        + json.dumps({"table": "unknown", "record": {"wallet_address": "B"}}) + "\n"
+        + '{"table": "wallets", "rec')
+    box = outbox.WriteOutbox(path=str(path))
+    assert box.replay() == 2
+    assert box.pending_count() == 1
+    # Later entries update the earlier one field by field
+    assert box._pending["wallets"]["A"] == {"wallet_address": "A", "score": 2.0, "label": "x"}
+
+def test_stop_writes_pending_rows_and_empties_journal(tmp_path, monkeypatch):
+    calls = []
+    monkeypatch.setitem(outbox.TABLES, "wallets", ("wallet_address", _writer(calls)))
+    path = tmp_path / "outbox.jsonl"
+
+    async def run():
+        box = outbox.WriteOutbox(path=str(path), flush_seconds=60)
+        await box.start()
+        box.enqueue_many("wallets", [{"wallet_address": "A", "score": 1.0}, {"wallet_address": "A", "score": 3.0},
+                                     {"wallet_address": "B", "score": 2.0}])
+        assert len(_journal(path)) == 3
+        await box.stop()
+        return box
+
+    box = asyncio.run(run())
+    assert box.pending_count() == 0
+    assert sorted((row["wallet_address"], row["score"]) for row in calls[0]) == [("A", 3.0), ("B", 2.0)]
+    assert _journal(path) == []
+
+def test_failed_rows_survive_stop_and_replay_in_next_run(tmp_path, monkeypatch):
+    path = tmp_path / "outbox.jsonl"
+    monkeypatch.setitem(outbox.TABLES, "wallets", ("wallet_address", _writer([], fail=True)))
+
+    async def first_run():
+        box = outbox.WriteOutbox(path=str(path), flush_seconds=60)
+        await box.start()
+        box.enqueue("wallets", {"wallet_address": "A", "score": 1.0})
+        await box.stop()
+        return box
+
+    assert asyncio.run(first_run()).pending_count() == 1
+    assert [entry["record"]["wallet_address"] for entry in _journal(path)] == ["A"]
+
+    calls = []
+    monkeypatch.setitem(outbox.TABLES, "wallets", ("wallet_address", _writer(calls)))
+
+    async def second_run():
+        box = outbox.WriteOutbox(path=str(path), flush_seconds=60)
+        await box.start()
+        await box.stop()
+        return box
+
+    assert asyncio.run(second_run()).pending_count() == 0
+    assert calls == [[{"wallet_address": "A", "score": 1.0}]]
+    assert _journal(path) == []
+
+def test_stop_during_inflight_write_keeps_the_batch(tmp_path, monkeypatch):
+    path = tmp_path / "outbox.jsonl"
+    monkeypatch.setitem(outbox.TABLES, "wallets", ("wallet_address", _writer([], delay=10.0)))
+
+    async def run():
+        box = outbox.WriteOutbox(path=str(path), flush_seconds=60, flush_rows=1)
+        await box.start()
+        box.enqueue("wallets", {"wallet_address": "A", "score": 1.0})
+        # Let the flusher pick the row up and start writing it
+        await asyncio.sleep(0.05)
+        assert box.pending_count() == 0
+        await box.stop(timeout=0.1)
+        return box
+
+    box = asyncio.run(run())
+    assert box.pending_count() == 1
+    assert [entry["record"]["wallet_address"] for entry in _journal(path)] == ["A"]
+
+def test_rows_updated_during_a_failed_write_keep_newer_fields(monkeypatch):
+    box = outbox.WriteOutbox(path=None)
+
+    async def write(records):
+        box.enqueue("wallets", {"wallet_address": "A", "score": 5.0})
+        raise ConnectionError("database down")
+
+    monkeypatch.setitem(outbox.TABLES, "wallets", ("wallet_address", write))
+    box.enqueue("wallets", {"wallet_address": "A", "score": 1.0, "label": "x"})
+    assert asyncio.run(box.flush()) is False
+    assert box._pending["wallets"]["A"] == {"wallet_address": "A", "score": 5.0, "label": "x"}
@@ -0,0 +1,142 @@
+import asyncio
+import json
+import pytest
+from api import decoding, solana_tracker
+from db import outbox
+from wallet import pipeline
+from wallet.checkpoints import CheckpointStore
+from wallet.pipeline import DiscoveryPipeline
+from wallet.registry import WalletRegistry
+
+def _buyer(wallet: str, first_buy_time: float = 1_700_000_000_000, **fields) -> dict:
+    return {"wallet": wallet, "first_buy_time": first_buy_time, "last_transaction_time": first_buy_time + 60_000,
+            "realized": 10.0, "unrealized": 0.0, "total": 10.0, "total_invested": 100.0,
+            "buy_transactions": 1, "sell_transactions": 1, "total_transactions": 2, **fields}
+
+@pytest.fixture
+def world(monkeypatch):
+    """
+    Scripted first-buyer payloads per mint, a fresh registry, and a record of every wallet write.
+    """
+    world = type("World", (), {})()
+    world.payloads = {}
+    world.writes = []
+    world.write_error = None
+    world.failing = set()
+    world.enriched = []
+    world.fetched = []
+
+    async def get_first_token_buyers(mint):
+        world.fetched.append(mint)
+        payload = world.payloads.get(mint)
+        return decoding.decode_first_buyers(json.dumps(payload).encode()) if payload else None
+
+    async def write_wallets(records):
+        if world.write_error is not None:
+            raise world.write_error
+        world.writes.append([record["wallet_address"] for record in records])
+        return {record["wallet_address"]: record["wallet_address"] not in world.failing for record in records}
+
+    async def store_token_metadata(mint):
+        world.enriched.append(mint)
+        return True
+
+    monkeypatch.setattr(solana_tracker, "get_first_token_buyers", get_first_token_buyers)
+    monkeypatch.setattr(outbox, "write_wallets", write_wallets)
+    monkeypatch.setattr(pipeline, "store_token_metadata", store_token_metadata)
+    monkeypatch.setattr(pipeline, "registry", WalletRegistry())
+    return world
+
+def _pipeline(**options) -> DiscoveryPipeline:
+    return DiscoveryPipeline(**{"checkpoints": CheckpointStore(path=None), "recheck_seconds": 0,
+                                "write_flush_seconds": 0.05, **options})
+
+class CountingQueue(asyncio.Queue):
+    """
+    Counts the end-of-input sentinels put on and taken off each pipeline queue.
+    """
+    created = []
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.done_put = 0
+        self.done_taken = 0
+        CountingQueue.created.append(self)
+
+    async def put(self, item):
+        self.done_put += item is pipeline._DONE
+        await super().put(item)
+
+    async def get(self):
+        item = await super().get()
+        self.done_taken += item is pipeline._DONE
+        return item
+
+def test_each_stage_gets_one_sentinel_per_worker(world, monkeypatch):
+    for i in range(12):
+        world.payloads[f"M{i}"] = [_buyer(f"W{i}"), _buyer(f"W{i + 1}")]
+    CountingQueue.created = []
+    monkeypatch.setattr(pipeline.asyncio, "Queue", CountingQueue)
+    stats = asyncio.run(asyncio.wait_for(
+        _pipeline(fetch_workers=3, normalise_workers=2, enrich_workers=4, queue_size=2).run(list(world.payloads)),
+        timeout=5))
+    # mints -> fetch, buyers -> normalise, records -> enrich, enriched -> write
+    queues = CountingQueue.created
+    assert [queue.done_put for queue in queues] == [3, 2, 4, 1]
+    assert [queue.done_taken for queue in queues] == [3, 2, 4, 1]
+    assert all(queue.empty() for queue in queues)
+    assert stats["mints_with_buyers"] == 12 and len(world.enriched) == 12
+    assert stats["wallets_unique"] == 13
+
+def test_failing_stage_cancels_the_others_without_deadlock(world):
+    for i in range(50):
+        world.payloads[f"M{i}"] = [_buyer(f"W{i}")]
+    world.write_error = RuntimeError("database down")
+
+    async def main():
+        run = _pipeline(fetch_workers=2, queue_size=1, write_batch_size=1).run(list(world.payloads))
+        with pytest.raises(RuntimeError, match="database down"):
+            await asyncio.wait_for(run, timeout=5)
+        # Every stage was cancelled and awaited
+        return [task for task in asyncio.all_tasks() if task is not asyncio.current_task()]
+
+    assert asyncio.run(main()) == []
+
+def test_failing_mint_source_stops_the_run(world):
+    world.payloads["M1"] = [_buyer("A")]
+
+    async def mints():
+        yield "M1"
+        raise ValueError("listing failed")
+
+    with pytest.raises(ValueError, match="listing failed"):
+        asyncio.run(asyncio.wait_for(_pipeline().run(mints()), timeout=5))
+
+def test_item_failures_are_skipped_not_fatal(world, monkeypatch):
+    world.payloads = {"M1": [_buyer("A")], "M2": [_buyer("B")]}
+
+    async def store_token_metadata(mint):
+        if mint == "M1":
+            raise ValueError("bad metadata")
+        return True
+
+    monkeypatch.setattr(pipeline, "store_token_metadata", store_token_metadata)
+    stats = asyncio.run(asyncio.wait_for(_pipeline(fetch_workers=1).run(["M1", "M2"]), timeout=5))
+    assert [wallet for batch in world.writes for wallet in batch] == ["B"]
+    assert stats["mints_with_buyers"] == 2
+
+def test_wallet_is_written_again_only_when_its_merged_record_changes(world):
+    # The same buyer entry on two mints merges to the same record; a later trade on a third changes it
+    world.payloads["M1"] = [_buyer("A")]
+    world.payloads["M2"] = [_buyer("A")]
+    world.payloads["M3"] = [_buyer("A", last_transaction_time=1_800_000_000_000)]
+
+    async def mints():
+        for mint in ("M1", "M2", "M3"):
+            yield mint
+            # Let each mint reach the write stage on its own
+            await asyncio.sleep(0.1)
+
+    stats = asyncio.run(asyncio.wait_for(_pipeline(fetch_workers=1, write_batch_size=1).run(mints()), timeout=5))
+    assert world.writes == [["A"], ["A"]]
+    assert stats["wallets_unique"] == 1 and stats["wallets_written"] == 2
@@ -0,0 +1,100 @@
+import asyncio
+import pytest
+from api.trade_stream import BUY, SELL, TradeEvent
+from wallet import pnl_engine
+from wallet.pnl_engine import PnLEngine
+
+def _trade(side, amount, price, signature=None, wallet="W", mint="M", block_time=0.0, volume=None):
+    return TradeEvent(signature, wallet, mint, side, amount, price,
+                      amount * price if volume is None else volume, block_time, 0.0)
+
+def test_sells_consume_the_oldest_lots_first():
+    engine = PnLEngine(path=None)
+    engine.ingest(_trade(BUY, 10, 1.0, block_time=1000))
+    engine.ingest(_trade(BUY, 10, 2.0, block_time=2000))
+    engine.ingest(_trade(SELL, 15, 3.0, block_time=3000))
+    position = engine.position("W", "M")
+    # 10 @ 1 and 5 @ 2 sold at 3
+    assert position.realized == pytest.approx(25.0)
+    assert position.amount == pytest.approx(5.0)
+    assert position.cost == pytest.approx(10.0)
+    assert (position.first_trade, position.last_trade) == (1000, 3000)
+    assert position.unrealized(4.0) == pytest.approx(10.0)
+
+def test_selling_more_than_was_bought_is_left_out_of_realized():
+    engine = PnLEngine(path=None)
+    engine.ingest(_trade(BUY, 5, 1.0))
+    engine.ingest(_trade(SELL, 8, 2.0))
+    position = engine.position("W", "M")
+    assert position.realized == pytest.approx(5.0)
+    assert position.unmatched_amount == pytest.approx(3.0)
+    assert position.amount == 0.0 and position.cost == 0.0
+
+def test_duplicates_and_invalid_trades_are_ignored():
+    engine = PnLEngine(path=None)
+    assert engine.ingest(_trade(BUY, 10, 1.0, signature="tx1"))
+    assert not engine.ingest(_trade(BUY, 10, 1.0, signature="tx1"))
+    assert not engine.ingest(_trade(BUY, 0, 1.0, signature="tx2"))
+    assert not engine.ingest(_trade(BUY, 10, 0.0, signature="tx3", volume=0.0))
+    assert engine.position("W", "M").amount == 10
+
+def test_merged_trades_are_costed_at_their_vwap():
+    engine = PnLEngine(path=None)
+    merged = _trade(BUY, 3, 5.0, volume=11.0)  # e.g. 1 @ 1 + 2 @ 5, last fill at 5
+    merged.merged = 2
+    engine.ingest(merged)
+    assert engine.position("W", "M").cost == pytest.approx(11.0)
+
+def test_wallet_pnl_marks_open_positions():
+    engine = PnLEngine(path=None)
+    engine.ingest(_trade(BUY, 10, 1.0, mint="A"))
+    engine.ingest(_trade(SELL, 4, 2.0, mint="A"))
+    engine.ingest(_trade(BUY, 1, 10.0, mint="B"))
+    pnl = engine.wallet_pnl("W", prices={"A": 3.0})
+    assert pnl["realized_pnl_usd"] == pytest.approx(4.0)
+    # B has no price, so it counts as zero rather than a loss
+    assert pnl["unrealized_pnl_usd"] == pytest.approx(12.0)
+    assert pnl["open_positions"] == 2 and pnl["tokens_traded"] == 2
+    summaries = engine.summaries(prices={"A": 3.0})
+    assert summaries["total"].tolist() == pytest.approx([16.0])
+    assert engine.wallet_pnl("unknown") is None
+
+def test_snapshot_round_trip(tmp_path):
+    path = str(tmp_path / "pnl.json")
+    engine = PnLEngine(path=path)
+    engine.ingest(_trade(BUY, 10, 1.0, signature="tx1"))
+    engine.ingest(_trade(BUY, 10, 2.0, signature="tx2"))
+    engine.ingest(_trade(SELL, 5, 3.0, signature="tx3"))
+    engine.snapshot()
+
+    restored = PnLEngine(path=path)
+    before, after = engine.position("W", "M"), restored.position("W", "M")
+    assert after.to_list() == before.to_list()
+    # Remembered signatures survive, so a replayed trade isn't applied twice
+    assert not restored.ingest(_trade(SELL, 5, 3.0, signature="tx3"))
+    restored.ingest(_trade(SELL, 10, 4.0))
+    assert restored.position("W", "M").realized == pytest.approx(10.0 + 5.0 + 20.0)
+
+def test_reconcile_keeps_a_baseline_per_provider(monkeypatch):
+    engine = PnLEngine(path=None)
+    engine.ingest(_trade(BUY, 10, 1.0))
+    engine.ingest(_trade(SELL, 10, 2.0))  # realized 10 locally
+    answers = iter([
+        {"realized_pnl_usd": 110.0, "provider": "solana_tracker"},
+        {"realized_pnl_usd": 60.0, "provider": "moralis"},
+        {"realized_pnl_usd": 110.0, "provider": "solana_tracker"},
+        {"realized_pnl_usd": 500.0, "provider": "moralis"},
+    ])
+
+    async def get_wallet_pnl(wallet_address):
+        return next(answers)
+
+    monkeypatch.setattr(pnl_engine.provider_router, "get_wallet_pnl", get_wallet_pnl)
+
+    first = asyncio.run(engine.reconcile("W"))
+    assert first["baseline"] == pytest.approx(100.0) and first["agrees"]
+    second = asyncio.run(engine.reconcile("W"))
+    assert second["provider"] == "moralis" and second["baseline"] == pytest.approx(50.0)
+    assert asyncio.run(engine.reconcile("W"))["agrees"]
+    assert not asyncio.run(engine.reconcile("W"))["agrees"]
+    assert engine.baselines["W"] == {"solana_tracker": pytest.approx(100.0), "moralis": pytest.approx(50.0)}
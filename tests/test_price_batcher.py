@@ -0,0 +1,77 @@
+import asyncio
+from api.price_batcher import BatchUnsupportedError, PriceBatcher
+
+def _batcher(calls: dict, max_batch: int = 100, window_seconds: float = 0.01, unsupported: bool = False,
+             **kwargs) -> PriceBatcher:
+    calls.setdefault("batch", [])
+    calls.setdefault("one", [])
+
+    async def fetch_batch(mints):
+        calls["batch"].append(list(mints))
+        if unsupported:
+            raise BatchUnsupportedError("404")
+        # One mint is unknown to the provider
+        return {mint: {"mint": mint, "usdPrice": len(mint)} for mint in mints if mint != "unknown"}
+
+    async def fetch_one(mint):
+        calls["one"].append(mint)
+        return {"mint": mint, "usdPrice": len(mint)}
+
+    return PriceBatcher("test", fetch_batch, fetch_one, max_batch, window_seconds, **kwargs)
+
+def test_window_groups_concurrent_lookups_and_routes_each_result():
+    calls = {}
+    batcher = _batcher(calls, window_seconds=0.02)
+
+    async def run():
+        return await asyncio.gather(batcher.get("a"), batcher.get("bb"), batcher.get("a"), batcher.get("unknown"))
+
+    a, bb, again, unknown = asyncio.run(run())
+    assert calls["batch"] == [["a", "bb", "unknown"]] and calls["one"] == []
+    assert a == again == {"mint": "a", "usdPrice": 1}
+    assert bb == {"mint": "bb", "usdPrice": 2}
+    assert unknown is None
+
+def test_full_batch_is_sent_before_the_window_ends():
+    calls = {}
+    batcher = _batcher(calls, max_batch=2, window_seconds=60)
+
+    async def run():
+        return await asyncio.wait_for(batcher.get_many(["a", "bb", "ccc", "dddd"]), timeout=1)
+
+    prices = asyncio.run(run())
+    assert calls["batch"] == [["a", "bb"], ["ccc", "dddd"]]
+    assert {mint: price["usdPrice"] for mint, price in prices.items()} == {"a": 1, "bb": 2, "ccc": 3, "dddd": 4}
+
+def test_failed_batch_falls_back_to_single_requests():
+    calls = {"batch": []}
+
+    async def fetch_batch(mints):
+        calls["batch"].append(list(mints))
+        raise ConnectionError("reset")
+
+    async def fetch_one(mint):
+        return {"mint": mint}
+
+    batcher = PriceBatcher("test", fetch_batch, fetch_one, 100, 0.01)
+    assert asyncio.run(batcher.get_many(["a", "b"])) == {"a": {"mint": "a"}, "b": {"mint": "b"}}
+    # A plain failure doesn't turn batching off
+    assert batcher.batching_supported
+
+def test_unsupported_batching_is_retried_after_the_cooldown():
+    calls = {}
+    batcher = _batcher(calls, unsupported=True, retry_seconds=0.2)
+
+    async def run():
+        prices = await batcher.get_many(["a", "b"])
+        assert len(calls["batch"]) == 1 and not batcher.batching_supported
+        # Within the cooldown lookups skip the batch endpoint
+        await batcher.get("c")
+        assert len(calls["batch"]) == 1 and calls["one"] == ["a", "b", "c"]
+        await asyncio.sleep(0.25)
+        assert batcher.batching_supported
+        await batcher.get("d")
+        assert calls["batch"][-1] == ["d"]
+        return prices
+
+    assert asyncio.run(run()) == {"a": {"mint": "a", "usdPrice": 1}, "b": {"mint": "b", "usdPrice": 1}}
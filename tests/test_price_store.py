@@ -0,0 +1,101 @@
+import math
+import numpy as np
+import pytest
+from db.price_store import PriceStore, RingBuffer
+
+TIERS = (("1s", 1.0, 10), ("1m", 60.0, 10))
+
+def _store(path=None) -> PriceStore:
+    return PriceStore(path=path, tiers=TIERS, max_open=2)
+
+def test_ring_buffer_keeps_the_close_of_each_bucket_and_wraps():
+    ring = RingBuffer(1.0, 3)
+    assert ring.append(0.2, 1.0)
+    assert ring.append(0.7, 2.0)  # same bucket: replaces the close
+    assert not ring.append(0.5, 9.0)  # older than the latest row
+    for second in range(1, 5):
+        ring.append(float(second), 10.0 + second)
+    timestamps, prices = ring.series()
+    assert timestamps.tolist() == [2.0, 3.0, 4.0]
+    assert prices.tolist() == [12.0, 13.0, 14.0]
+    assert ring.last() == (4.0, 14.0)
+
+def test_price_at_falls_back_to_coarser_tiers():
+    store = _store()
+    for second in range(0, 300):
+        store.record("M", 1.0 + second, timestamp=1000.0 + second)
+    # The 1s tier only reaches back 10 seconds
+    prices = store.price_at("M", [1299.0, 1295.5, 1100.0, 999.0])
+    assert prices[0] == 300.0
+    assert prices[1] == 296.0
+    # Older times come from the 1m closes: the latest sample at or before them
+    assert prices[2] == 80.0  # the 1m bucket [1020, 1080) closed at 1079
+    assert math.isnan(prices[3])
+    assert math.isnan(store.price_at("unknown", 1000.0)[0])
+
+def test_series_picks_the_finest_tier_covering_the_window():
+    store = _store()
+    for second in range(0, 300):
+        store.record("M", 1.0, timestamp=1000.0 + second)
+    recent, _ = store.series("M", start=1295.0)
+    assert recent.tolist() == [1295.0, 1296.0, 1297.0, 1298.0, 1299.0]
+    older, _ = store.series("M", start=1100.0)
+    # 1m closes, the last one still open
+    assert older.tolist() == [1139.0, 1199.0, 1259.0, 1299.0]
+    with pytest.raises(ValueError):
+        store.series("M", tier="1d")
+
+def test_window_stats_and_returns():
+    store = _store()
+    for second, price in enumerate([10.0, 12.0, 8.0, 9.0, 15.0, 14.0]):
+        store.record("M", price, timestamp=100.0 + second)
+    stats = store.window_stats("M", start=100.5, end=105.0)
+    # Entry is the last price at or before the window start
+    assert stats["entry_price"] == 10.0
+    assert stats["exit_price"] == 14.0
+    assert stats["return"] == pytest.approx(0.4)
+    assert stats["max_drawdown"] == pytest.approx(8.0 / 12.0 - 1.0)
+    assert stats["max_runup"] == pytest.approx(15.0 / 8.0 - 1.0)
+    assert stats["samples"] == 5
+    assert store.window_stats("M", start=10.0, end=20.0) is None
+    assert store.returns("M", [1.0, 4.0], at=105.0).tolist() == pytest.approx([14.0 / 15.0 - 1.0, 14.0 / 12.0 - 1.0])
+
+def test_invalid_samples_are_rejected():
+    store = _store()
+    assert not store.record("M", 0.0, timestamp=1.0)
+    assert not store.record("M", "n/a", timestamp=1.0)
+    assert not store.record("", 1.0, timestamp=1.0)
+    assert store.latest("M") is None
+
+def test_history_survives_reopening_and_eviction(tmp_path):
+    path = str(tmp_path / "prices")
+    store = _store(path)
+    for mint in ("A", "B", "C"):
+        store.record_many(mint, [3.0, 1.0, 2.0], [30.0, 10.0, 20.0])
+    assert store._open.keys() == {"B", "C"}
+    assert store.latest("A") == (3.0, 30.0)
+    store.close()
+
+    reopened = _store(path)
+    assert sorted(reopened.mints()) == ["A", "B", "C"]
+    assert reopened.latest("C") == (3.0, 30.0)
+    reopened.record("C", 40.0, timestamp=4.0)
+    assert reopened.series("C", tier="1s")[1].tolist() == [10.0, 20.0, 30.0, 40.0]
+
+def test_record_many_matches_recording_one_by_one():
+    rng = np.random.default_rng(7)
+    one_by_one, batched = _store(), _store()
+    # Batches with repeated buckets, out-of-order and stale samples, invalid prices and ring wraps
+    start = 1000.0
+    for size in (5, 40, 3, 200, 1):
+        timestamps = start + np.round(rng.uniform(-3.0, 90.0, size), 1)
+        prices = rng.uniform(0.5, 2.0, size)
+        prices[rng.random(size) < 0.1] = np.nan
+        expected = sum(one_by_one.record("M", prices[i], timestamps[i]) for i in np.argsort(timestamps, kind="stable"))
+        assert batched.record_many("M", timestamps, prices) == expected
+        for tier, _, _ in TIERS:
+            for got, want in zip(batched.series("M", tier=tier), one_by_one.series("M", tier=tier)):
+                assert got.tolist() == want.tolist()
+        start += 60.0
+    assert batched.record_many("", [1.0], [1.0]) == 0
+    assert batched.record_many("M", [], []) == 0
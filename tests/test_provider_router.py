@@ -0,0 +1,135 @@
+import asyncio
+import pytest
+from api import provider_router, rate_limiter
+from api.provider_router import ProviderRouter
+
+KIND = "lookup"
+
+class FakeProvider:
+    """
+    A provider whose answers and latency are scripted.
+    """
+
+    def __init__(self, answer=None, delay: float = 0.0):
+        self.answer = answer
+        self.delay = delay
+        self.calls = 0
+
+    async def fetch(self, key):
+        self.calls += 1
+        await asyncio.sleep(self.delay)
+        return dict(self.answer) if self.answer else self.answer
+
+@pytest.fixture
+def limits(monkeypatch):
+    saved_buckets, saved_quotas = dict(rate_limiter._buckets), dict(rate_limiter._quotas)
+    for provider in ("a", "b"):
+        rate_limiter.configure_provider(provider, rate=1e6)
+    monkeypatch.setattr(provider_router, "has_credentials", lambda provider: True)
+    yield
+    for provider in ("a", "b"):
+        rate_limiter._buckets.pop(provider, None)
+        rate_limiter._quotas.pop(provider, None)
+    rate_limiter._buckets.update(saved_buckets)
+    rate_limiter._quotas.update(saved_quotas)
+
+def _router(**providers):
+    routes = {KIND: {name: (provider.fetch, dict, "endpoint") for name, provider in providers.items()}}
+    return ProviderRouter(routes=routes, order=list(providers))
+
+def test_confirmed_unknown_is_not_a_failure(limits):
+    a, b = FakeProvider({}), FakeProvider({})
+    router = _router(a=a, b=b)
+    assert asyncio.run(router.fetch(KIND, "key")) == {}
+    assert (a.calls, b.calls) == (1, 1)
+    assert router._stats(KIND, "a").error_rate() == 0.0
+
+def test_unknown_plus_failure_is_not_confirmed(limits):
+    router = _router(a=FakeProvider({}), b=FakeProvider(None))
+    assert asyncio.run(router.fetch(KIND, "key")) is None
+
+def test_failed_provider_fails_over_to_the_next(limits):
+    a, b = FakeProvider(None), FakeProvider({"value": 1})
+    router = _router(a=a, b=b)
+    assert asyncio.run(router.fetch(KIND, "key")) == {"value": 1, "provider": "b"}
+    assert (a.calls, b.calls) == (1, 1)
+    assert router._stats(KIND, "a").error_rate() == 1.0
+    # The failing provider is now ranked behind the one that answered
+    assert router.rank(KIND) == ["b", "a"]
+
+def test_provider_that_raises_counts_as_failed(limits):
+    class Broken(FakeProvider):
+        async def fetch(self, key):
+            raise ValueError("bad payload")
+
+    router = _router(a=Broken(), b=FakeProvider({"value": 1}))
+    assert asyncio.run(router.fetch(KIND, "key"))["provider"] == "b"
+
+def test_hedge_fires_once_the_first_provider_passes_its_p90(limits, monkeypatch):
+    monkeypatch.setattr(provider_router, "ROUTER_HEDGE_MIN_DELAY_SECONDS", 0.01)
+    a, b = FakeProvider({"value": "a"}, delay=0.5), FakeProvider({"value": "b"})
+    router = _router(a=a, b=b)
+    for _ in range(10):
+        router._stats(KIND, "a").record(0.02, True)
+
+    async def timed():
+        started = asyncio.get_running_loop().time()
+        result = await router.fetch(KIND, "key", hedge=True)
+        return result, asyncio.get_running_loop().time() - started
+
+    result, elapsed = asyncio.run(timed())
+    assert result["provider"] == "b" and elapsed < 0.3
+    assert (a.calls, b.calls) == (1, 1)
+
+def test_no_hedge_before_the_p90(limits, monkeypatch):
+    monkeypatch.setattr(provider_router, "ROUTER_HEDGE_MIN_DELAY_SECONDS", 0.01)
+    a, b = FakeProvider({"value": "a"}, delay=0.02), FakeProvider({"value": "b"})
+    router = _router(a=a, b=b)
+    for _ in range(10):
+        router._stats(KIND, "a").record(0.2, True)
+    assert asyncio.run(router.fetch(KIND, "key", hedge=True))["provider"] == "a"
+    assert b.calls == 0
+
+def test_no_hedge_without_spare_quota(limits, monkeypatch):
+    monkeypatch.setattr(provider_router, "ROUTER_HEDGE_MIN_DELAY_SECONDS", 0.01)
+    rate_limiter.configure_provider("b", rate=1e6, daily_limit=100)
+    rate_limiter._quotas["b"].consume(90)
+    a, b = FakeProvider({"value": "a"}, delay=0.1), FakeProvider({"value": "b"})
+    router = _router(a=a, b=b)
+    assert asyncio.run(router.fetch(KIND, "key", hedge=True))["provider"] == "a"
+    assert b.calls == 0
+
+def test_cooling_down_provider_is_demoted(limits, monkeypatch):
+    monkeypatch.setattr(provider_router, "ROUTER_FAILURE_THRESHOLD", 2)
+    router = _router(a=FakeProvider(), b=FakeProvider())
+    # a is faster, but just failed twice in a row
+    for ok in (True, True, True, True, True, True, True, True, False, False):
+        router._stats(KIND, "a").record(0.01, ok)
+    router._stats(KIND, "b").record(1.0, True)
+    assert router._stats(KIND, "a").cooling_down()
+    assert router.rank(KIND) == ["b", "a"]
+    router._stats(KIND, "a").cooldown_until = 0.0
+    router._stats(KIND, "a").outcomes.clear()
+    assert router.rank(KIND) == ["a", "b"]
+
+def test_provider_low_on_quota_is_demoted_and_exhausted_one_dropped(limits):
+    router = _router(a=FakeProvider(), b=FakeProvider())
+    rate_limiter.configure_provider("a", rate=1e6, daily_limit=1000)
+    rate_limiter._quotas["a"].consume(950)
+    assert router.rank(KIND) == ["b", "a"]
+    rate_limiter._quotas["a"].consume(50)
+    assert router.rank(KIND) == ["b"]
+
+def test_wallet_positions_keep_per_token_records(limits, monkeypatch):
+    pnl = {"summary": {"realized": 5.0, "unrealized": 1.0, "total": 6.0},
+           "tokens": {"M": {"total_invested": 10.0, "realized": 5.0}}}
+
+    async def get_wallet_pnl(wallet_address):
+        return pnl
+
+    router = ProviderRouter(routes={provider_router.WALLET_POSITIONS: {
+        "a": (get_wallet_pnl, provider_router.normalise_solana_tracker_positions, "wallet_pnl")}}, order=["a"])
+    monkeypatch.setattr(provider_router, "router", router)
+    result = asyncio.run(provider_router.get_wallet_positions("W"))
+    assert result["tokens"] == pnl["tokens"]
+    assert (result["realized_pnl_usd"], result["volume_usd"], result["wallet"]) == (5.0, 10.0, "W")
@@ -0,0 +1,96 @@
+import asyncio
+import datetime
+import time
+import pytest
+from api import rate_limiter
+from api.rate_limiter import DailyQuota, QuotaExceededError, TokenBucket
+
+@pytest.fixture
+def limits():
+    saved_buckets, saved_quotas = dict(rate_limiter._buckets), dict(rate_limiter._quotas)
+    yield
+    rate_limiter._buckets.update(saved_buckets)
+    rate_limiter._quotas.update(saved_quotas)
+
+def _timed(coroutine) -> float:
+    started = time.monotonic()
+    asyncio.run(coroutine)
+    return time.monotonic() - started
+
+def test_bucket_bursts_up_to_capacity_then_waits_for_refill():
+    bucket = TokenBucket(rate=50.0, capacity=5.0)
+
+    async def burst(count):
+        for _ in range(count):
+            await bucket.acquire()
+
+    assert _timed(burst(5)) < 0.05
+    # The sixth token needs 1/50 s of refill
+    assert 0.015 <= _timed(burst(1)) < 0.2
+
+def test_bucket_refill_is_capped_at_capacity():
+    bucket = TokenBucket(rate=10.0, capacity=3.0)
+    bucket._tokens = 0.0
+    bucket._updated -= 100.0
+    bucket._refill()
+    assert bucket._tokens == 3.0
+
+def test_cost_above_capacity_is_capped():
+    bucket = TokenBucket(rate=1000.0, capacity=10.0)
+    assert _timed(bucket.acquire(50.0)) < 0.05
+
+def test_bucket_works_across_event_loops():
+    bucket = TokenBucket(rate=200.0, capacity=1.0)
+
+    async def contend():
+        # Several waiters, so the lock actually has to queue them
+        await asyncio.gather(*(bucket.acquire() for _ in range(3)))
+
+    asyncio.run(contend())
+    asyncio.run(contend())
+
+def test_daily_quota_refuses_past_the_limit_and_resets_next_day():
+    quota = DailyQuota(10.0)
+    quota.consume(6.0)
+    with pytest.raises(QuotaExceededError):
+        quota.consume(5.0)
+    assert quota.remaining() == 4.0 and quota.requests == 1
+    quota._day -= datetime.timedelta(days=1)
+    assert quota.remaining() == 10.0 and quota.requests == 0
+
+def test_uncapped_quota_counts_but_never_refuses():
+    quota = DailyQuota(None)
+    quota.consume(1e9)
+    assert quota.remaining() is None and quota.used == 1e9
+
+def test_acquire_charges_endpoint_costs_until_the_quota_cutoff(limits):
+    rate_limiter.configure_provider("moralis", rate=1e6, daily_limit=120)
+
+    async def calls():
+        assert await rate_limiter.acquire("moralis", "new_tokens") == 50
+        assert await rate_limiter.acquire("moralis", "token_metadata", retry=True) == 10
+        assert await rate_limiter.acquire("moralis", "wallet_profitability") == 50
+        with pytest.raises(QuotaExceededError):
+            await rate_limiter.acquire("moralis", "token_holders")
+
+    asyncio.run(calls())
+    usage = rate_limiter.get_quota_usage()["moralis"]
+    assert (usage["used"], usage["remaining"], usage["requests"], usage["retries"]) == (110, 10, 3, 1)
+    assert rate_limiter.can_afford("moralis", "token_metadata")
+    assert not rate_limiter.can_afford("moralis", "new_tokens")
+    assert rate_limiter.remaining_fraction("moralis") == pytest.approx(10 / 120)
+
+def test_record_throttle_pauses_the_bucket_for_retry_after(limits):
+    rate_limiter.configure_provider("solana_tracker", rate=100.0, capacity=100.0)
+    rate_limiter.record_throttle("solana_tracker", 0.2)
+    elapsed = _timed(rate_limiter.acquire("solana_tracker"))
+    assert 0.2 <= elapsed < 0.5
+    assert rate_limiter.get_quota_usage()["solana_tracker"]["throttled"] == 1
+
+def test_parse_retry_after():
+    assert rate_limiter.parse_retry_after("3") == 3.0
+    assert rate_limiter.parse_retry_after("-1") == 0.0
+    assert rate_limiter.parse_retry_after(None) is None
+    assert rate_limiter.parse_retry_after("soon") is None
+    later = datetime.datetime.now(datetime.timezone.utc) + datetime.timedelta(seconds=30)
+    assert 25 < rate_limiter.parse_retry_after(later.strftime("%a, %d %b %Y %H:%M:%S GMT")) <= 30
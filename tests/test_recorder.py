@@ -0,0 +1,110 @@
+import asyncio
+import httpx
+import pytest
+from api.recorder import RECORD, REPLAY, ApiRecorder, ReplayMissError, request_key
+
+def _response(status: int, body: dict) -> httpx.Response:
+    return httpx.Response(status, json=body, request=httpx.Request("GET", "https://provider.test/x"))
+
+def _record(recorder: ApiRecorder, path: str, params: dict, status: int, body: dict, body_json=None,
+            started: float = 1_700_000_000.0, elapsed: float = 0.25):
+    recorder.record("solana_tracker", "GET", path, params, body_json, "first_buyers",
+                    _response(status, body), started=started, elapsed=elapsed)
+
+def test_request_key_is_independent_of_parameter_order():
+    assert request_key("p", "GET", "/a", {"b": 2, "a": 1}) == request_key("p", "GET", "/a", {"a": 1, "b": 2})
+    assert request_key("p", "POST", "/a", body={"x": 1}) != request_key("p", "POST", "/a", body={"x": 2})
+
+def test_round_trip_replays_responses_in_order(tmp_path):
+    path = str(tmp_path / "archive" / "api.bin")
+    recorder = ApiRecorder()
+    recorder.open(RECORD, path)
+    _record(recorder, "/first-buyers/M1", {"limit": 10}, 200, {"n": 1})
+    _record(recorder, "/first-buyers/M1", {"limit": 10}, 429, {"n": 2})
+    _record(recorder, "/first-buyers/M2", None, 200, {"n": 3})
+    recorder.close()
+
+    # A second session appends to the same archive
+    recorder.open(RECORD, path)
+    recorder.record("moralis", "POST", "/prices", None, {"tokens": ["M1"]}, "prices",
+                    _response(200, {"n": 4}), started=1_700_000_001.0, elapsed=0.1)
+    recorder.close()
+
+    recorder.open(REPLAY, path)
+    assert sorted(recorder.keys("first_buyers")) == sorted([
+        request_key("solana_tracker", "GET", "/first-buyers/M1", {"limit": 10}),
+        request_key("solana_tracker", "GET", "/first-buyers/M2"),
+    ])
+
+    async def replay():
+        responses = []
+        for _ in range(3):
+            responses.append(await recorder.replay("solana_tracker", "GET", "/first-buyers/M1", {"limit": 10}))
+        responses.append(await recorder.replay("moralis", "POST", "/prices", body={"tokens": ["M1"]}))
+        return responses
+
+    responses = asyncio.run(replay())
+    # Recorded order, with the last response repeating once they run out
+    assert [(response.status_code, response.json()["n"]) for response in responses] == [(200, 1), (429, 2), (429, 2), (200, 4)]
+    assert responses[0].headers["content-type"] == "application/json"
+    recorder.close()
+
+def test_replay_miss_is_a_request_error(tmp_path):
+    path = str(tmp_path / "api.bin")
+    recorder = ApiRecorder()
+    recorder.open(RECORD, path)
+    recorder.close()
+    recorder.open(REPLAY, path)
+    with pytest.raises(httpx.RequestError) as raised:
+        asyncio.run(recorder.replay("solana_tracker", "GET", "/missing"))
+    assert isinstance(raised.value, ReplayMissError)
+    recorder.close()
+
+def test_replay_skips_entries_cut_short_by_a_crash(tmp_path):
+    path = str(tmp_path / "api.bin")
+    recorder = ApiRecorder()
+    recorder.open(RECORD, path)
+    _record(recorder, "/kept", None, 200, {"n": 1})
+    _record(recorder, "/lost", None, 200, {"n": 2})
+    recorder.close()
+    # Lose the tail of the last body and leave a torn index line behind
+    with open(path, "r+b") as f:
+        f.truncate(f.seek(0, 2) - 1)
+    with open(f"{path}.idx", "a", encoding="utf-8") as f:
+        f.write('{"key": "solana_tracker GET /torn", "off')
+
+    recorder.open(REPLAY, path)
+    assert recorder.keys() == [request_key("solana_tracker", "GET", "/kept")]
+    assert asyncio.run(recorder.replay("solana_tracker", "GET", "/kept")).json() == {"n": 1}
+    recorder.close()
+
+def test_unknown_mode_is_rejected(tmp_path):
+    with pytest.raises(ValueError):
+        ApiRecorder().open("rewind", str(tmp_path / "api.bin"))
+
+def test_replay_keeps_recorded_bursts_and_gaps(tmp_path):
+    path = str(tmp_path / "api.bin")
+    recorder = ApiRecorder()
+    recorder.open(RECORD, path)
+    # A burst of two responses, then one four seconds later
+    _record(recorder, "/a", None, 200, {"n": 1}, started=100.0, elapsed=0.0)
+    _record(recorder, "/b", None, 200, {"n": 2}, started=100.0, elapsed=0.5)
+    _record(recorder, "/c", None, 200, {"n": 3}, started=104.0, elapsed=0.0)
+    recorder.close()
+    recorder.open(REPLAY, path, speed=20.0)
+
+    async def replay():
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        offsets = []
+        for path in ("/a", "/b", "/c"):
+            await recorder.replay("solana_tracker", "GET", path)
+            offsets.append(loop.time() - started)
+        return offsets
+
+    offsets = asyncio.run(replay())
+    # Served 0 s, 0.5 s and 4 s into the recording, at 20x speed
+    assert offsets[0] < 0.01
+    assert 0.02 <= offsets[1] < 0.06
+    assert 0.19 <= offsets[2] < 0.26
+    recorder.close()
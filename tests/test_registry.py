@@ -0,0 +1,105 @@
+import asyncio
+import math
+from db import outbox, supabase_manager
+from wallet.registry import WalletRegistry, _to_epoch
+from tests.test_supabase_manager import postgrest  # noqa: F401 (fixture)
+
+def _wallet(wallet_address: str, score: float = 1.0, **fields) -> dict:
+    return {"wallet_address": wallet_address, "label": "", "score": score, "is_bot": False, **fields}
+
+def test_rows_are_stored_column_wise():
+    registry = WalletRegistry()
+    registry.upsert(_wallet("A", 2.0, label="smart", last_active="2024-01-01T00:00:00Z"))
+    registry.upsert(_wallet("B", 5.0, is_bot=True))
+    registry.upsert(_wallet("C", 3.0))
+    assert registry.addresses == ["A", "B", "C"]
+    assert list(registry.scores) == [2.0, 5.0, 3.0]
+    assert list(registry.is_bot) == [0, 1, 0]
+    assert registry.last_active[0] == _to_epoch("2024-01-01T00:00:00+00:00")
+    assert math.isnan(registry.last_active[1])
+    assert registry.get("A")["label"] == "smart"
+    assert registry.get("A")["last_active"].startswith("2024-01-01T00:00:00")
+    assert registry.get("D") is None and "D" not in registry and registry.get_score("B") == 5.0
+    assert registry.score_array().tolist() == [2.0, 5.0, 3.0]
+    # Bots are left out unless asked for
+    assert registry.top(2) == [("C", 3.0), ("A", 2.0)]
+    assert registry.top(1, include_bots=True) == [("B", 5.0)]
+
+def test_only_changed_rows_are_dirty():
+    registry = WalletRegistry()
+    assert registry.upsert(_wallet("A", 1.0, last_active="2024-01-01T00:00:00Z"))
+    assert registry.upsert(_wallet("B", 2.0))
+    registry._dirty.clear()
+    # Same values, and a missing last_active that doesn't erase the stored one
+    assert not registry.upsert(_wallet("A", 1.0))
+    assert not registry.is_dirty("A") and registry.dirty_count() == 0
+    assert registry.upsert(_wallet("B", 4.0))
+    assert registry.is_dirty("B") and not registry.is_dirty("A") and not registry.is_dirty("Z")
+    assert registry.dirty_count() == 1
+
+def test_flush_writes_dirty_rows_and_keeps_failed_ones_dirty(monkeypatch):
+    calls = []
+
+    async def write(records):
+        calls.append([record["wallet_address"] for record in records])
+        return {record["wallet_address"]: record["wallet_address"] != "B" for record in records}
+
+    monkeypatch.setattr(supabase_manager, "bulk_upsert_wallets", write)
+    registry = WalletRegistry()
+    for wallet_address in ("A", "B", "C"):
+        registry.upsert(_wallet(wallet_address))
+    registry._dirty.discard(registry._index["C"])
+    assert asyncio.run(registry.flush()) == {"A": True, "B": False}
+    assert calls == [["A", "B"]]
+    assert registry.dirty_count() == 1 and registry.is_dirty("B")
+    asyncio.run(registry.flush())
+    assert calls[-1] == ["B"]
+
+def test_flush_through_running_outbox_counts_journaled_rows(postgrest, tmp_path, monkeypatch):
+    monkeypatch.setattr(outbox, "outbox", outbox.WriteOutbox(path=str(tmp_path / "outbox.jsonl"), flush_seconds=60))
+    registry = WalletRegistry()
+    registry.upsert(_wallet("A", 2.0))
+    registry.upsert(_wallet("B", 3.0))
+
+    async def run():
+        await outbox.outbox.start()
+        results = await registry.flush()
+        # Journaled but not yet written
+        assert postgrest.tables["wallets"] == {}
+        await outbox.outbox.stop()
+        return results
+
+    assert asyncio.run(run()) == {"A": True, "B": True}
+    assert registry.dirty_count() == 0
+    assert {row["wallet_address"]: row["score"] for row in postgrest.tables["wallets"].values()} == {"A": 2.0, "B": 3.0}
+
+def test_remote_rows_do_not_overwrite_unflushed_changes():
+    registry = WalletRegistry()
+    registry.upsert(_wallet("A", 9.0))
+    registry._apply_remote([_wallet("A", 1.0, updated_at="2024-01-02T00:00:00+00:00"),
+                            _wallet("B", 2.0, updated_at="2024-01-01T00:00:00+00:00")])
+    assert registry.get_score("A") == 9.0 and registry.get_score("B") == 2.0
+    # The skipped row doesn't move the cursor, so the next refresh reads it again
+    assert registry.cursor == "2024-01-01T00:00:00+00:00"
+
+def test_load_and_refresh_page_on_updated_at_and_address(postgrest):
+    wallets = postgrest.tables["wallets"]
+    # Five rows share one timestamp, so pages of two split them
+    for wallet_address in "EDCBA":
+        wallets[wallet_address] = _wallet(wallet_address, updated_at="2024-01-01T00:00:00+00:00")
+    wallets["F"] = _wallet("F", updated_at="2024-01-02T00:00:00+00:00")
+    registry = WalletRegistry()
+    assert asyncio.run(registry.load(page_size=2)) == 6
+    assert sorted(registry.addresses) == list("ABCDEF")
+    assert registry.cursor == "2024-01-02T00:00:00+00:00"
+
+    # A refresh starts at the cursor (inclusive) and pages past equal timestamps without repeats or gaps
+    for wallet_address in "HG":
+        wallets[wallet_address] = _wallet(wallet_address, 7.0, updated_at="2024-01-02T00:00:00+00:00")
+    wallets["A"] = _wallet("A", 5.0, updated_at="2024-01-03T00:00:00+00:00")
+    requests = len(postgrest.requests)
+    assert asyncio.run(registry.refresh(page_size=2)) == 4
+    assert len(postgrest.requests) - requests == 3
+    assert registry.get_score("A") == 5.0 and registry.get_score("G") == registry.get_score("H") == 7.0
+    assert len(registry) == 8
+    assert registry.cursor == "2024-01-03T00:00:00+00:00"
@@ -0,0 +1,112 @@
+import asyncio
+import os
+import subprocess
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from multiprocessing import shared_memory
+import pytest
+from wallet import rescoring
+from wallet.cooccurrence import CooccurrenceIndex
+from wallet.pnl_engine import PnLEngine
+from wallet.position_store import PositionStore
+from wallet.registry import WalletRegistry
+from tests.test_supabase_manager import postgrest  # noqa: F401 (fixture)
+
+WALLETS = [f"W{i}" for i in range(8)]
+
+def _buyers(mint_index: int) -> list:
+    launch = 1_700_000_000_000 + mint_index * 3_600_000
+    return [{"wallet": wallet, "first_buy_time": launch + 1000 * (i + 1), "last_sell_time": launch + 60_000 * (i + 1),
+             "realized": (i - 3) * 10.0 * (mint_index + 1), "unrealized": 0.0, "total_invested": 100.0,
+             "total_transactions": 2 + i}
+            for i, wallet in enumerate(WALLETS)]
+
+@pytest.fixture
+def rescorer_factory(postgrest, monkeypatch):
+    """
+    Builds Rescorers over local positions for WALLETS (plus one wallet with none), with the
+    'wallets' table in the mock PostgREST and a fresh registry for the write-back.
+    """
+    positions, cooccurrence = PositionStore(path=None), CooccurrenceIndex(path=None)
+    for mint_index in range(3):
+        positions.add_launch(f"M{mint_index}", _buyers(mint_index))
+        cooccurrence.add_launch(f"M{mint_index}", _buyers(mint_index))
+    for wallet in WALLETS + ["unseen"]:
+        postgrest.tables["wallets"][wallet] = {"wallet_address": wallet, "label": "", "score": 0.0, "is_bot": False}
+    monkeypatch.setattr(rescoring, "registry", WalletRegistry())
+
+    def build(**kwargs):
+        return rescoring.Rescorer(engine=PnLEngine(path=None), cooccurrence=cooccurrence, positions=positions,
+                                  **{"workers": 2, "page_size": 4, **kwargs})
+    return build
+
+def test_shard_of_is_stable_across_processes():
+    shards = [rescoring.shard_of(wallet, 4) for wallet in WALLETS]
+    assert all(0 <= shard < 4 for shard in shards) and len(set(shards)) > 1
+    # A different hash seed mustn't move wallets between shards
+    script = f"from wallet.rescoring import shard_of; print([shard_of(w, 4) for w in {WALLETS!r}])"
+    output = subprocess.run([sys.executable, "-c", script], capture_output=True, text=True, check=True,
+                            env={**os.environ, "PYTHONHASHSEED": "123"}, cwd=os.path.dirname(os.path.dirname(__file__)))
+    assert output.stdout.strip() == str(shards)
+
+def test_run_scores_in_workers_and_unlinks_shared_memory(rescorer_factory, postgrest, monkeypatch):
+    names = []
+
+    class Tracked(rescoring.SharedPositions):
+        def __init__(self, *args, **kwargs):
+            super().__init__(*args, **kwargs)
+            if self.owner:
+                names.append(self.name)
+
+    monkeypatch.setattr(rescoring, "SharedPositions", Tracked)
+    stats = asyncio.run(rescorer_factory().run())
+    assert stats["pages"] == 3 and stats["wallets_read"] == 9
+    assert stats["wallets_scored"] == 8 and stats["wallets_without_positions"] == 1
+    assert stats["wallets_written"] == stats["wallets_changed"] > 0
+    assert len(names) == 2
+    for name in names:
+        with pytest.raises(FileNotFoundError):
+            shared_memory.SharedMemory(name=name)
+
+def test_shared_memory_is_unlinked_when_a_worker_fails(rescorer_factory, monkeypatch):
+    names = []
+    real_layout = rescoring.Rescorer._layout
+
+    def layout(self, positions):
+        shared, wallets, ranges = real_layout(self, positions)
+        names.append(shared.name)
+        return shared, wallets, ranges
+
+    def fail(*args):
+        raise RuntimeError("worker died")
+
+    monkeypatch.setattr(rescoring.Rescorer, "_layout", layout)
+    monkeypatch.setattr(rescoring, "_score_shard", fail)
+    rows = [{"wallet_address": wallet, "score": 0.0} for wallet in WALLETS]
+
+    async def run():
+        with ThreadPoolExecutor(max_workers=2) as pool:
+            await rescorer_factory()._score_page(pool, rows, {})
+
+    with pytest.raises(RuntimeError):
+        asyncio.run(run())
+    with pytest.raises(FileNotFoundError):
+        shared_memory.SharedMemory(name=names[0])
+
+def test_only_changes_over_min_change_are_written(rescorer_factory, postgrest):
+    asyncio.run(rescorer_factory(min_change=0.0).run())
+    wallets = postgrest.tables["wallets"]
+    scores = {wallet: wallets[wallet]["score"] for wallet in WALLETS}
+    assert len(set(scores.values())) > 1
+
+    # W0 drifts less than min_change, W1 more, and W2's bot flag flips with no score change
+    wallets["W0"]["score"] = scores["W0"] + 0.005
+    wallets["W1"]["score"] = scores["W1"] + 0.5
+    wallets["W2"]["is_bot"] = not wallets["W2"]["is_bot"]
+    upserts = len(postgrest.upserts)
+    stats = asyncio.run(rescorer_factory(min_change=0.01).run())
+    written = sorted(row["wallet_address"] for body in postgrest.upserts[upserts:] for row in body)
+    assert written == ["W1", "W2"]
+    assert stats["wallets_changed"] == stats["wallets_written"] == 2
+    assert wallets["W0"]["score"] == scores["W0"] + 0.005
+    assert wallets["W1"]["score"] == scores["W1"]
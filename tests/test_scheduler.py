@@ -0,0 +1,125 @@
+import asyncio
+import pytest
+from api import moralis_client, solana_tracker
+from wallet import discovery, scheduler
+from wallet.checkpoints import CheckpointStore
+from wallet.pipeline import DISCOVERY_CALLS_PER_MINT, DiscoveryPipeline
+from wallet.scheduler import RefreshQueue, Scheduler, refresh_interval
+
+def test_refresh_interval_scales_geometrically_with_score():
+    assert refresh_interval(0, fastest=60, slowest=6000) == pytest.approx(6000)
+    assert refresh_interval(100, fastest=60, slowest=6000) == pytest.approx(60)
+    assert refresh_interval(50, fastest=60, slowest=6000) == pytest.approx(600)
+    # Out-of-range and missing scores are clamped
+    assert refresh_interval(250, fastest=60, slowest=6000) == pytest.approx(60)
+    assert refresh_interval(None, fastest=60, slowest=6000) == pytest.approx(6000)
+    assert refresh_interval(90) < refresh_interval(40) < refresh_interval(10)
+
+def test_refresh_queue_orders_by_due_time_then_value():
+    queue = RefreshQueue()
+    queue.schedule("late", due=20.0, value=99.0)
+    queue.schedule("low", due=10.0, value=1.0)
+    queue.schedule("high", due=10.0, value=50.0)
+    queue.schedule("early", due=5.0)
+    assert queue.next_due() == 5.0
+    assert queue.pop_due(now=15.0, limit=10) == [("early", 5.0), ("high", 10.0), ("low", 10.0)]
+    assert queue.pop_due(now=15.0, limit=10) == []
+    assert len(queue) == 1 and "late" in queue
+
+def test_refresh_queue_rescheduling_replaces_the_old_entry():
+    queue = RefreshQueue()
+    queue.schedule("a", due=1.0)
+    queue.schedule("b", due=2.0)
+    queue.schedule("a", due=3.0)
+    queue.discard("b")
+    assert len(queue) == 1 and queue.keys() == ["a"]
+    assert queue.next_due() == 3.0
+    assert queue.pop_due(now=2.5, limit=5) == []
+    assert queue.pop_due(now=3.0, limit=5) == [("a", 3.0)]
+
+def test_refresh_queue_pops_at_most_limit():
+    queue = RefreshQueue()
+    for i in range(5):
+        queue.schedule(f"k{i}", due=float(i))
+    assert [key for key, _ in queue.pop_due(now=10.0, limit=2)] == ["k0", "k1"]
+    assert len(queue) == 3
+
+def test_only_mints_that_are_fetched_are_charged(monkeypatch):
+    checkpoints = CheckpointStore(path=None)
+    checkpoints.begin("FRESH", "h")
+    checkpoints.complete("FRESH", "h")
+    charges, fetched = [], []
+
+    async def spend(calls):
+        charges.append(calls)
+        return len(charges) < 2
+
+    async def get_first_token_buyers(mint):
+        fetched.append(mint)
+        return None
+
+    monkeypatch.setattr(solana_tracker, "get_first_token_buyers", get_first_token_buyers)
+    pipeline = DiscoveryPipeline(fetch_workers=1, checkpoints=checkpoints, recheck_seconds=3600, spend=spend)
+    stats = asyncio.run(pipeline.run(["FRESH", "A", "B"]))
+    assert stats["mints_skipped_fresh"] == 1
+    # A is charged and fetched; B's charge is refused, so it's left for a later run
+    assert charges == [DISCOVERY_CALLS_PER_MINT, DISCOVERY_CALLS_PER_MINT]
+    assert fetched == ["A"]
+
+def test_new_tokens_listing_is_charged(monkeypatch):
+    listed = []
+
+    async def get_new_tokens_by_exchange(exchange, limit):
+        listed.append(exchange)
+        return [{"tokenAddress": "M1"}, {"mint": "M2"}, {}]
+
+    async def collect(spend):
+        return [mint async for mint in discovery.new_token_mints("Raydium", 10, spend=spend)]
+
+    monkeypatch.setattr(moralis_client, "get_new_tokens_by_exchange", get_new_tokens_by_exchange)
+    charges = []
+
+    async def allow(calls):
+        charges.append(calls)
+        return True
+
+    async def refuse(calls):
+        return False
+
+    assert asyncio.run(collect(allow)) == ["M1", "M2"]
+    assert charges == [1]
+    assert asyncio.run(collect(refuse)) == []
+    assert listed == ["Raydium"]
+
+def test_run_waits_for_cancelled_jobs_before_the_final_flush(monkeypatch):
+    events = []
+
+    async def flush():
+        events.append("flush")
+        return {}
+
+    monkeypatch.setattr(scheduler, "SCHEDULER_DRAIN_SECONDS", 0.05)
+    monkeypatch.setattr(scheduler.registry, "top", lambda n: [])
+    monkeypatch.setattr(scheduler.registry, "flush", flush)
+    monkeypatch.setattr(scheduler.price_store.price_store, "mints", lambda: [])
+
+    async def stuck_job():
+        try:
+            await asyncio.sleep(60)
+        finally:
+            events.append("job_cleanup")
+
+    async def main():
+        service = Scheduler(discovery_seconds=0, sync_seconds=60)
+        running = asyncio.create_task(service.run())
+        await asyncio.sleep(0)
+        await service._slots.acquire()
+        service._start(["W"], stuck_job())
+        await asyncio.sleep(0.01)
+        service.stop()
+        await running
+        return service
+
+    service = asyncio.run(main())
+    assert events[-2:] == ["job_cleanup", "flush"]
+    assert not service._in_flight and not service._busy
@@ -0,0 +1,74 @@
+import asyncio
+import json
+import httpx
+import pytest
+from bench.mock_servers import SUPABASE_MOCK_URL, MockBehaviour, PostgrestMock
+from db import supabase_manager
+
+@pytest.fixture
+def postgrest(monkeypatch):
+    """
+    A mock PostgREST behind the production client, recording the body of every upsert.
+    """
+    monkeypatch.setattr(supabase_manager, "supabase", None)
+    server = PostgrestMock(MockBehaviour(latency_ms=0.0))
+    server.upserts = []
+    server.requests = []
+
+    async def handle(request: httpx.Request) -> httpx.Response:
+        server.requests.append(request)
+        if request.method == "POST":
+            server.upserts.append(json.loads(request.content))
+        return await server.handle(request)
+
+    assert supabase_manager.initialize_supabase_client(SUPABASE_MOCK_URL, "test-key", transport=httpx.MockTransport(handle))
+    return server
+
+def test_bulk_upsert_wallets_keeps_first_seen_of_existing_rows(postgrest):
+    postgrest.tables["wallets"]["A"] = {"wallet_address": "A", "first_seen": "2024-01-01T00:00:00+00:00",
+                                        "created_at": "2024-01-01T00:00:00+00:00", "score": 1.0}
+    records = [{"wallet_address": "A", "label": None, "score": 2.0, "is_bot": False},
+               {"wallet_address": "B", "label": None, "score": 3.0, "is_bot": False},
+               {"wallet_address": "B", "label": None, "score": 4.0, "is_bot": True}]
+    results = asyncio.run(supabase_manager.bulk_upsert_wallets(records, chunk_size=10))
+    assert results == {"A": True, "B": True}
+    # One request for the whole chunk (no read of existing rows), with later duplicates winning
+    assert [request.method for request in postgrest.requests] == ["POST"]
+    assert "missing=default" in postgrest.requests[0].headers["prefer"]
+    assert all("first_seen" not in row and "created_at" not in row for row in postgrest.upserts[0])
+    stored = postgrest.tables["wallets"]
+    assert stored["A"]["first_seen"] == stored["A"]["created_at"] == "2024-01-01T00:00:00+00:00"
+    assert stored["A"]["score"] == 2.0
+    assert stored["B"]["score"] == 4.0 and stored["B"]["is_bot"] is True
+    # New rows take the column defaults
+    assert stored["B"]["first_seen"] and stored["B"]["created_at"]
+
+def test_bulk_upsert_wallets_chunks_requests(postgrest):
+    records = [{"wallet_address": f"W{i}", "label": None, "score": 0.0, "is_bot": False} for i in range(25)]
+    results = asyncio.run(supabase_manager.bulk_upsert_wallets(records, chunk_size=10))
+    assert all(results.values()) and len(results) == 25
+    assert [len(body) for body in postgrest.upserts] == [10, 10, 5]
+
+def test_bulk_upsert_wallets_reports_failed_chunks(postgrest):
+    postgrest.behaviour.error_rate = 1.0
+    results = asyncio.run(supabase_manager.bulk_upsert_wallets([{"wallet_address": "A", "score": 1.0}]))
+    assert results == {"A": False}
+
+def test_bulk_upsert_token_metadata_sends_rows_without_a_price_separately(postgrest):
+    postgrest.tables["token_metadata"]["M2"] = {"token_mint": "M2", "symbol": "OLD", "last_price_usd": 1.5}
+    records = [{"token_mint": "M1", "symbol": "ONE", "last_price_usd": 2.0},
+               {"token_mint": "M2", "symbol": "TWO"}]
+    results = asyncio.run(supabase_manager.bulk_upsert_token_metadata(records))
+    assert results == {"M1": True, "M2": True}
+    # PostgREST nulls columns missing from some rows of a bulk upsert, so every request has uniform columns
+    assert len(postgrest.upserts) == 2
+    for body in postgrest.upserts:
+        assert len({tuple(sorted(row)) for row in body}) == 1
+    stored = postgrest.tables["token_metadata"]
+    assert stored["M2"]["symbol"] == "TWO" and stored["M2"]["last_price_usd"] == 1.5
+    assert stored["M1"]["last_price_usd"] == 2.0
+
+def test_bulk_upsert_without_client_fails_every_row(monkeypatch):
+    monkeypatch.setattr(supabase_manager, "supabase", None)
+    assert asyncio.run(supabase_manager.bulk_upsert_wallets([{"wallet_address": "A"}])) == {"A": False}
+    assert asyncio.run(supabase_manager.bulk_upsert_token_metadata([{"token_mint": "M"}])) == {"M": False}
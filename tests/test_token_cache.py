@@ -0,0 +1,125 @@
+import asyncio
+import types
+import pytest
+from api import token_cache
+from api.token_cache import TokenMetadataCache
+
+class FakeProvider:
+    """
+    A metadata lookup whose answers are scripted per mint and that can be held open.
+    """
+
+    def __init__(self):
+        self.answers = {}
+        self.calls = []
+        self.gate = None
+
+    async def fetch(self, mint):
+        self.calls.append(mint)
+        if self.gate is not None:
+            await self.gate.wait()
+        answer = self.answers.get(mint)
+        return dict(answer) if answer else answer
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(token_cache, "time", types.SimpleNamespace(monotonic=lambda: now[0]))
+    return now
+
+@pytest.fixture
+def provider():
+    provider = FakeProvider()
+    provider.answers["M"] = {"name": "Token", "symbol": "TOK", "priceUsd": 1.5}
+    return provider
+
+def _cache(provider, **ttls):
+    return TokenMetadataCache("test", provider.fetch, ("priceUsd",), **{
+        "static_ttl": 100.0, "volatile_ttl": 10.0, "negative_ttl": 5.0, **ttls})
+
+def test_concurrent_misses_share_one_lookup(provider):
+    cache = _cache(provider)
+
+    async def lookups():
+        provider.gate = asyncio.Event()
+        pending = [asyncio.ensure_future(cache.get("M")) for _ in range(10)]
+        await asyncio.sleep(0)
+        provider.gate.set()
+        return await asyncio.gather(*pending)
+
+    results = asyncio.run(lookups())
+    assert provider.calls == ["M"]
+    assert all(result == provider.answers["M"] for result in results)
+    # Every caller gets its own copy
+    results[0]["name"] = "changed"
+    assert results[1]["name"] == "Token"
+    assert (cache.hits, cache.misses) == (0, 10)
+
+def test_static_and_volatile_fields_expire_separately(provider, clock):
+    cache = _cache(provider)
+    asyncio.run(cache.get("M"))
+    clock[0] += 11.0
+    # Prices are stale, but the static fields are still served without a lookup
+    assert asyncio.run(cache.get("M", include_volatile=False)) == {"name": "Token", "symbol": "TOK"}
+    assert provider.calls == ["M"]
+    provider.answers["M"]["priceUsd"] = 2.0
+    assert asyncio.run(cache.get("M"))["priceUsd"] == 2.0
+    assert provider.calls == ["M", "M"]
+    clock[0] += 101.0
+    asyncio.run(cache.get("M", include_volatile=False))
+    assert provider.calls == ["M", "M", "M"]
+
+def test_confirmed_unknown_mint_is_negative_cached(provider, clock):
+    cache = _cache(provider)
+    provider.answers["X"] = {}
+    assert asyncio.run(cache.get("X")) is None
+    assert asyncio.run(cache.get("X")) is None
+    assert provider.calls == ["X"]
+    clock[0] += 6.0
+    asyncio.run(cache.get("X"))
+    assert provider.calls == ["X", "X"]
+
+def test_failed_lookup_caches_nothing_and_keeps_static_fields(provider, clock):
+    cache = _cache(provider)
+    asyncio.run(cache.get("M"))
+    clock[0] += 11.0
+    provider.answers["M"] = None
+    assert asyncio.run(cache.get("M")) is None
+    assert asyncio.run(cache.get("M", include_volatile=False)) == {"name": "Token", "symbol": "TOK"}
+    # Not negative-cached: the next fresh lookup goes to the provider again
+    assert asyncio.run(cache.get("M")) is None
+    assert provider.calls == ["M", "M", "M"]
+
+def test_clear_detaches_in_flight_lookups(provider):
+    cache = _cache(provider)
+
+    async def lookups():
+        provider.gate = asyncio.Event()
+        first = asyncio.ensure_future(cache.get("M"))
+        await asyncio.sleep(0)
+        cache.clear()
+        # A lookup after clear() doesn't join the detached request
+        second = asyncio.ensure_future(cache.get("M"))
+        await asyncio.sleep(0)
+        provider.gate.set()
+        return await first, await second
+
+    first, second = asyncio.run(lookups())
+    assert first == second == provider.answers["M"]
+    assert provider.calls == ["M", "M"]
+
+def test_detached_lookup_does_not_refill_the_cache(provider):
+    cache = _cache(provider)
+
+    async def lookup():
+        provider.gate = asyncio.Event()
+        pending = asyncio.ensure_future(cache.get("M"))
+        await asyncio.sleep(0)
+        cache.invalidate("M")
+        provider.gate.set()
+        return await pending
+
+    assert asyncio.run(lookup()) == provider.answers["M"]
+    provider.gate = None
+    asyncio.run(cache.get("M"))
+    assert provider.calls == ["M", "M"]
@@ -0,0 +1,136 @@
+import asyncio
+import time
+import pytest
+from api import trade_stream
+from api.trade_stream import BUY, SELL, SignalQueue, TradeEvent, TradeStream
+from bench.mock_datastream import MockDatastream
+
+def _event(wallet="W", mint="M", side=BUY, amount=1.0, price=1.0, signature=None):
+    return TradeEvent(signature, wallet, mint, side, amount, price, amount * price, 0.0, time.perf_counter())
+
+def _trade(tx: str, amount: float = 10.0, price: float = 2.0) -> dict:
+    return {"tx": tx, "type": "buy", "mint": "M", "amount": amount, "priceUsd": price, "volume": amount * price,
+            "time": 1_700_000_000_000}
+
+async def _until(predicate, timeout: float = 5.0):
+    deadline = asyncio.get_running_loop().time() + timeout
+    while not predicate():
+        assert asyncio.get_running_loop().time() < deadline, "timed out"
+        await asyncio.sleep(0.005)
+
+async def _drain(queue: SignalQueue) -> list:
+    events = []
+    while len(queue):
+        events.append(await queue.get())
+    return events
+
+@pytest.fixture
+def fast_reconnect(monkeypatch):
+    monkeypatch.setattr(trade_stream, "STREAM_RECONNECT_BASE_SECONDS", 0.01)
+    monkeypatch.setattr(trade_stream, "STREAM_RECONNECT_MAX_SECONDS", 0.05)
+
+def _with_stream(wallets, scenario, **kwargs):
+    async def main():
+        server = MockDatastream()
+        await server.start()
+        stream = TradeStream(wallets, queue=SignalQueue(maxsize=100, policy="drop_newest"), url=server.url, **kwargs)
+        running = asyncio.create_task(stream.run())
+        try:
+            await _until(lambda: all(server.subscribers(wallet) for wallet in wallets))
+            return await scenario(server, stream)
+        finally:
+            await stream.stop()
+            running.cancel()
+            await asyncio.gather(running, return_exceptions=True)
+            await server.stop()
+
+    return asyncio.run(main())
+
+def test_stream_resubscribes_after_a_forced_disconnect(fast_reconnect):
+    gaps = []
+
+    async def scenario(server, stream):
+        await server.publish("A", _trade("t1"))
+        await _until(lambda: len(stream.queue) == 1)
+        await server.drop_connections()
+        await _until(lambda: stream.reconnects == 1 and server.subscribers("A") and server.subscribers("B"))
+        await server.publish("B", _trade("t2"))
+        await _until(lambda: len(stream.queue) == 2)
+        return await _drain(stream.queue)
+
+    events = _with_stream(["A", "B"], scenario, on_gap=lambda wallets, start, end: gaps.append((wallets, start, end)))
+    assert [(event.wallet, event.signature) for event in events] == [("A", "t1"), ("B", "t2")]
+    assert len(gaps) == 1 and gaps[0][0] == {"A", "B"} and gaps[0][1] <= gaps[0][2]
+
+def test_stream_drops_duplicates_per_signature_and_wallet(fast_reconnect):
+    async def scenario(server, stream):
+        await server.publish("A", _trade("t1"))
+        await server.publish("A", _trade("t1"))
+        # The same transaction seen from another tracked wallet is its own signal
+        await server.publish("B", _trade("t1"))
+        await _until(lambda: stream.duplicates == 1 and len(stream.queue) == 2)
+        # Events replayed after a reconnect are dropped too
+        await server.drop_connections()
+        await _until(lambda: stream.reconnects == 1 and server.subscribers("A"))
+        await server.publish("A", _trade("t1"))
+        await server.publish("A", _trade("t3"))
+        await _until(lambda: len(stream.queue) == 3)
+        return await _drain(stream.queue)
+
+    events = _with_stream(["A", "B"], scenario)
+    assert [(event.wallet, event.signature) for event in events] == [("A", "t1"), ("B", "t1"), ("A", "t3")]
+
+def test_untracked_and_malformed_messages_are_ignored():
+    stream = TradeStream(["A"], queue=SignalQueue(maxsize=10))
+    now = time.perf_counter()
+    stream._handle_message(b"not json", now)
+    stream._handle_message(b"[1, 2]", now)
+    stream._handle_message(b'{"type": "message", "room": "wallet:Z", "data": {"type": "buy", "mint": "M"}}', now)
+    stream._handle_message(b'{"type": "message", "room": "wallet:A", "data": {"type": "transfer", "mint": "M"}}', now)
+    assert len(stream.queue) == 0
+    stream._handle_message(b'{"type": "message", "room": "wallet:A", "data": {"type": "sell", "token": '
+                           b'{"from": {"address": "M"}}, "amount": "5", "priceUsd": "0.5", "volume": "2.5"}}', now)
+    event = asyncio.run(stream.queue.get())
+    assert (event.wallet, event.mint, event.side, event.amount, event.price_usd) == ("A", "M", SELL, 5.0, 0.5)
+
+def test_drop_newest_discards_the_arriving_event():
+    queue = SignalQueue(maxsize=2, policy="drop_newest")
+    assert queue.put_nowait(_event(mint="M1")) and queue.put_nowait(_event(mint="M2"))
+    assert not queue.put_nowait(_event(mint="M3"))
+    assert [event.mint for event in asyncio.run(_drain(queue))] == ["M1", "M2"]
+    assert queue.dropped == 1 and queue.emitted == 2
+
+def test_drop_oldest_makes_room_for_the_arriving_event():
+    queue = SignalQueue(maxsize=2, policy="drop_oldest")
+    for mint in ("M1", "M2", "M3"):
+        assert queue.put_nowait(_event(mint=mint))
+    assert [event.mint for event in asyncio.run(_drain(queue))] == ["M2", "M3"]
+    assert queue.dropped == 1
+
+def test_coalesce_merges_into_the_pending_event_at_its_vwap():
+    queue = SignalQueue(maxsize=2, policy="coalesce")
+    queue.put_nowait(_event(amount=10.0, price=1.0))
+    queue.put_nowait(_event(mint="OTHER"))
+    # Full: merged into the pending W/M buy, not queued
+    assert queue.put_nowait(_event(amount=30.0, price=3.0))
+    assert queue.put_nowait(_event(amount=60.0, price=0.5))
+    assert len(queue) == 2 and queue.coalesced == 2 and queue.dropped == 0
+    merged, other = asyncio.run(_drain(queue))
+    assert merged.amount == 100.0 and merged.merged == 3
+    assert merged.volume_usd == pytest.approx(10.0 + 90.0 + 30.0)
+    assert merged.price_usd == pytest.approx(130.0 / 100.0)
+    assert other.mint == "OTHER"
+
+def test_coalesce_without_a_match_drops_the_oldest():
+    queue = SignalQueue(maxsize=2, policy="coalesce")
+    queue.put_nowait(_event(mint="M1"))
+    queue.put_nowait(_event(mint="M2"))
+    # A sell doesn't merge into a pending buy
+    queue.put_nowait(_event(mint="M1", side=SELL))
+    events = asyncio.run(_drain(queue))
+    assert [(event.mint, event.side) for event in events] == [("M2", BUY), ("M1", SELL)]
+    assert queue.dropped == 1 and queue.coalesced == 0
+
+def test_unknown_overflow_policy_is_rejected():
+    with pytest.raises(ValueError):
+        SignalQueue(policy="block")
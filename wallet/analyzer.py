@@ -0,0 +1,313 @@
+import time
+import numpy as np
+from api.decoding import to_number
+
+# Feature columns produced by compute_features, one value per wallet
+FEATURE_NAMES = (
+    "positions",
+    "win_rate",
+    "realized_ratio",
+    "roi",
+    "total_pnl",
+    "mean_hold_seconds",
+    "short_hold_fraction",
+    "trades_per_day",
+    "mean_launch_delay_seconds",
+    "early_entry_fraction",
+)
+
+# Positions held for less than this are treated as flips
+SHORT_HOLD_SECONDS = 60.0
+# Buys within this many seconds of launch are treated as sniper entries
+EARLY_ENTRY_SECONDS = 5.0
+# PnL (USD) at which the PnL component of the score is ~76% saturated
+PNL_SCALE_USD = 1000.0
+# Positions needed before a wallet's score is trusted at half weight
+CONFIDENCE_POSITIONS = 3.0
+
+# Composite score weights (sum to 1)
+SCORE_WEIGHTS = {
+    "win_rate": 0.30,
+    "roi": 0.25,
+    "pnl": 0.25,
+    "realized_ratio": 0.10,
+    "launch_proximity": 0.10,
+}
+
+# Logistic bot model: intercept and per-feature weights
+BOT_INTERCEPT = -4.0
+BOT_WEIGHTS = {
+    "short_hold_fraction": 3.0,
+    "early_entry_fraction": 2.5,
+    "trade_intensity": 3.0,
+}
+BOT_LIKELIHOOD_THRESHOLD = 0.7
+
+class PositionColumns:
+    """
+    Columnar (wallet, token) position records.
+    Each attribute is a NumPy array with one entry per position; `wallet_index`
+    points into `wallets`. Times are epoch milliseconds, NaN when unknown.
+    """
+
+    __slots__ = ("wallets", "wallet_index", "realized", "unrealized", "invested",
+                 "first_buy_time", "exit_time", "last_trade_time", "launch_time", "transactions")
+
+    def __init__(self, wallets, wallet_index, realized, unrealized, invested,
+                 first_buy_time, exit_time, last_trade_time, launch_time, transactions):
+        self.wallets = wallets
+        self.wallet_index = wallet_index
+        self.realized = realized
+        self.unrealized = unrealized
+        self.invested = invested
+        self.first_buy_time = first_buy_time
+        self.exit_time = exit_time
+        self.last_trade_time = last_trade_time
+        self.launch_time = launch_time
+        self.transactions = transactions
+
+    def __len__(self):
+        return len(self.wallet_index)
+
+    @classmethod
+    def _from_rows(cls, rows: list, launch_times: list, now_ms: float):
+        """
+        Builds columns from (wallet_address, payload) pairs using Solana Tracker field names.
+        """
+        wallets = []
+        wallet_rows = {}
+        wallet_index = np.empty(len(rows), dtype=np.int32)
+        for i, (wallet_address, _) in enumerate(rows):
+            row = wallet_rows.get(wallet_address)
+            if row is None:
+                row = wallet_rows[wallet_address] = len(wallets)
+                wallets.append(wallet_address)
+            wallet_index[i] = row
+
+        def column(field):
+            return np.array([to_number(payload.get(field), np.nan) for _, payload in rows], dtype=np.float64)
+
+        first_buy_time = column("first_buy_time")
+        last_trade_time = np.fmax(column("last_transaction_time"), column("last_trade_time"))
+        # A position is held until its last sell (first_sell_time if that's all there is),
+        # like PnLEngine's closed positions, which exit at their last trade; until now if never sold
+        exit_time = np.fmax(column("first_sell_time"), column("last_sell_time"))
+        exit_time = np.where(np.isnan(exit_time), now_ms, exit_time)
+        transactions = column("total_transactions")
+        transactions = np.where(np.isnan(transactions), column("buy_transactions") + column("sell_transactions"), transactions)
+
+        return cls(
+            wallets=wallets,
+            wallet_index=wallet_index,
+            realized=np.nan_to_num(column("realized")),
+            unrealized=np.nan_to_num(column("unrealized")),
+            invested=column("total_invested"),
+            first_buy_time=first_buy_time,
+            exit_time=exit_time,
+            last_trade_time=last_trade_time,
+            launch_time=np.array(launch_times, dtype=np.float64),
+            transactions=transactions,
+        )
+
+    @classmethod
+    def from_first_buyers(cls, buyers: list, launch_time: float = None, now_ms: float = None):
+        """
+        Builds positions from one token's get_first_token_buyers payload.
+        Args:
+            buyers (list): Buyer dictionaries for a single token.
+            launch_time (float, optional): Token launch time in epoch ms. Defaults to the
+                                           earliest first buy in the payload.
+            now_ms (float, optional): Current time in epoch ms, for still-open positions.
+        """
+        rows = [(buyer["wallet"], buyer) for buyer in buyers if buyer.get("wallet")]
+        if launch_time is None:
+            first_buys = [to_number(payload.get("first_buy_time"), np.nan) for _, payload in rows]
+            launch_time = np.nanmin(first_buys) if rows and not np.all(np.isnan(first_buys)) else np.nan
+        return cls._from_rows(rows, [launch_time] * len(rows), now_ms or time.time() * 1000)
+
+    @classmethod
+    def from_wallet_pnl(cls, wallet_pnls: dict, launch_times: dict = None, now_ms: float = None):
+        """
+        Builds positions from get_wallet_pnl payloads ({'tokens': {mint: {...}}, ...}).
+        Args:
+            wallet_pnls (dict): Wallet address -> PnL payload.
+            launch_times (dict, optional): Mint -> launch time in epoch ms.
+            now_ms (float, optional): Current time in epoch ms, for still-open positions.
+        """
+        launch_times = launch_times or {}
+        rows = []
+        row_launch_times = []
+        for wallet_address, pnl in wallet_pnls.items():
+            for mint, token_pnl in ((pnl or {}).get("tokens") or {}).items():
+                rows.append((wallet_address, token_pnl))
+                row_launch_times.append(launch_times.get(mint, np.nan))
+        return cls._from_rows(rows, row_launch_times, now_ms or time.time() * 1000)
+
+    @classmethod
+    def concat(cls, parts: list):
+        """
+        Concatenates several PositionColumns, re-indexing wallets that appear in more than one.
+        """
+        wallets = []
+        wallet_rows = {}
+        indexes = []
+        for part in parts:
+            remap = np.empty(len(part.wallets), dtype=np.int32)
+            for i, wallet_address in enumerate(part.wallets):
+                row = wallet_rows.get(wallet_address)
+                if row is None:
+                    row = wallet_rows[wallet_address] = len(wallets)
+                    wallets.append(wallet_address)
+                remap[i] = row
+            indexes.append(remap[part.wallet_index])
+
+        def stack(name):
+            return np.concatenate([getattr(part, name) for part in parts]) if parts else np.empty(0)
+
+        return cls(
+            wallets=wallets,
+            wallet_index=np.concatenate(indexes) if parts else np.empty(0, dtype=np.int32),
+            realized=stack("realized"),
+            unrealized=stack("unrealized"),
+            invested=stack("invested"),
+            first_buy_time=stack("first_buy_time"),
+            exit_time=stack("exit_time"),
+            last_trade_time=stack("last_trade_time"),
+            launch_time=stack("launch_time"),
+            transactions=stack("transactions"),
+        )
+
+def _group_sum(index: np.ndarray, values: np.ndarray, size: int):
+    """
+    Per-wallet sum and count of the non-NaN entries of `values`.
+    """
+    valid = ~np.isnan(values)
+    sums = np.bincount(index[valid], weights=values[valid], minlength=size)
+    counts = np.bincount(index[valid], minlength=size)
+    return sums, counts
+
+def _safe_divide(numerator, denominator):
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return np.where(denominator != 0, numerator / denominator, np.nan)
+
+def compute_features(positions: PositionColumns) -> dict:
+    """
+    Computes per-wallet features from positions, vectorized over all wallets at once.
+    Args:
+        positions (PositionColumns): Positions for any number of wallets.
+    Returns:
+        dict: Feature name (see FEATURE_NAMES) -> array with one value per wallet,
+              in the order of positions.wallets. Undefined features are NaN.
+    """
+    index = positions.wallet_index
+    size = len(positions.wallets)
+    total = positions.realized + positions.unrealized
+
+    count = np.bincount(index, minlength=size).astype(np.float64)
+    wins = np.bincount(index, weights=(total > 0).astype(np.float64), minlength=size)
+    realized_sum = np.bincount(index, weights=positions.realized, minlength=size)
+    unrealized_sum = np.bincount(index, weights=positions.unrealized, minlength=size)
+    total_sum = realized_sum + unrealized_sum
+    invested_sum, _ = _group_sum(index, positions.invested, size)
+
+    hold_seconds = (positions.exit_time - positions.first_buy_time) / 1000.0
+    hold_sum, hold_count = _group_sum(index, hold_seconds, size)
+    short_holds, _ = _group_sum(index, np.where(np.isnan(hold_seconds), np.nan, hold_seconds < SHORT_HOLD_SECONDS), size)
+
+    launch_delay = (positions.first_buy_time - positions.launch_time) / 1000.0
+    delay_sum, delay_count = _group_sum(index, launch_delay, size)
+    early_entries, _ = _group_sum(index, np.where(np.isnan(launch_delay), np.nan, launch_delay <= EARLY_ENTRY_SECONDS), size)
+
+    transactions, _ = _group_sum(index, positions.transactions, size)
+    first_seen = np.full(size, np.inf)
+    np.minimum.at(first_seen, index, np.where(np.isnan(positions.first_buy_time), np.inf, positions.first_buy_time))
+    last_seen = np.full(size, -np.inf)
+    np.maximum.at(last_seen, index, np.where(np.isnan(positions.last_trade_time), -np.inf, positions.last_trade_time))
+    # At least one hour of activity, so a handful of trades in one burst doesn't look infinite
+    active_days = np.maximum((last_seen - first_seen) / 86_400_000.0, 1.0 / 24.0)
+    active_days = np.where(np.isfinite(active_days), active_days, np.nan)
+
+    return {
+        "positions": count,
+        "win_rate": _safe_divide(wins, count),
+        "realized_ratio": _safe_divide(realized_sum, np.abs(realized_sum) + np.abs(unrealized_sum)),
+        "roi": _safe_divide(total_sum, invested_sum),
+        "total_pnl": total_sum,
+        "mean_hold_seconds": _safe_divide(hold_sum, hold_count),
+        "short_hold_fraction": _safe_divide(short_holds, hold_count),
+        "trades_per_day": _safe_divide(transactions, active_days),
+        "mean_launch_delay_seconds": _safe_divide(delay_sum, delay_count),
+        "early_entry_fraction": _safe_divide(early_entries, delay_count),
+    }
+
+def score_features(features: dict):
+    """
+    Turns wallet features into a composite score and a bot likelihood.
+    Every component is squashed with a fixed transform rather than normalised
+    against the batch, so scores from different batches are comparable.
+    Args:
+        features (dict): Output of compute_features.
+    Returns:
+        tuple[np.ndarray, np.ndarray]: (score in [0, 100], bot likelihood in [0, 1]) per wallet.
+    """
+    win_rate = np.nan_to_num(features["win_rate"], nan=0.0)
+    roi = 0.5 * (np.tanh(np.nan_to_num(features["roi"], nan=0.0)) + 1.0)
+    pnl = 0.5 * (np.tanh(features["total_pnl"] / PNL_SCALE_USD) + 1.0)
+    realized_ratio = 0.5 * (np.nan_to_num(features["realized_ratio"], nan=0.0) + 1.0)
+    # 1.0 for buying at launch, decaying to ~0.37 after one hour
+    launch_proximity = np.exp(-np.maximum(np.nan_to_num(features["mean_launch_delay_seconds"], nan=np.inf), 0.0) / 3600.0)
+
+    quality = (SCORE_WEIGHTS["win_rate"] * win_rate
+               + SCORE_WEIGHTS["roi"] * roi
+               + SCORE_WEIGHTS["pnl"] * pnl
+               + SCORE_WEIGHTS["realized_ratio"] * realized_ratio
+               + SCORE_WEIGHTS["launch_proximity"] * launch_proximity)
+    # Shrink towards the neutral 0.5 when a wallet has only a few positions
+    confidence = features["positions"] / (features["positions"] + CONFIDENCE_POSITIONS)
+    quality = 0.5 + confidence * (quality - 0.5)
+
+    logit = (BOT_INTERCEPT
+             + BOT_WEIGHTS["short_hold_fraction"] * np.nan_to_num(features["short_hold_fraction"], nan=0.0)
+             + BOT_WEIGHTS["early_entry_fraction"] * np.nan_to_num(features["early_entry_fraction"], nan=0.0)
+             + BOT_WEIGHTS["trade_intensity"] * np.tanh(np.nan_to_num(features["trades_per_day"], nan=0.0) / 200.0))
+    bot_likelihood = 1.0 / (1.0 + np.exp(-logit))
+
+    # Likely bots are ranked down, not removed
+    score = 100.0 * quality * (1.0 - 0.5 * bot_likelihood)
+    return score, bot_likelihood
+
+def analyze_positions(positions: PositionColumns) -> list[dict]:
+    """
+    Scores every wallet in `positions`.
+    Args:
+        positions (PositionColumns): Positions for any number of wallets.
+    Returns:
+        list[dict]: One dict per wallet with 'wallet_address', 'score', 'is_bot' and
+                    'bot_likelihood', in the order of positions.wallets.
+    """
+    if len(positions) == 0:
+        return []
+    score, bot_likelihood = score_features(compute_features(positions))
+    is_bot = bot_likelihood >= BOT_LIKELIHOOD_THRESHOLD
+    return [
+        {
+            "wallet_address": wallet_address,
+            "score": round(float(score[i]), 4),
+            "is_bot": bool(is_bot[i]),
+            "bot_likelihood": round(float(bot_likelihood[i]), 4),
+        }
+        for i, wallet_address in enumerate(positions.wallets)
+    ]
+
+def rank_wallets(positions: PositionColumns, top_n: int = None) -> list[tuple[str, float]]:
+    """
+    Returns (wallet_address, score) pairs sorted best first, excluding likely bots.
+    """
+    if len(positions) == 0:
+        return []
+    score, bot_likelihood = score_features(compute_features(positions))
+    order = np.argsort(-score, kind="stable")
+    order = order[bot_likelihood[order] < BOT_LIKELIHOOD_THRESHOLD]
+    if top_n is not None:
+        order = order[:top_n]
+    return [(positions.wallets[i], float(score[i])) for i in order]
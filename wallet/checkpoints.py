@@ -0,0 +1,124 @@
+import datetime
+import hashlib
+import json
+import logging
+import os
+import time
+from telemetry.logs import event, get_logger
+from config.settings import DISCOVERY_CHECKPOINT_PATH
+
+logger = get_logger(__name__)
+
+def content_hash(payload) -> str:
+    """
+    Returns a short, stable hash of a JSON-serialisable payload (key order doesn't matter).
+    """
+    encoded = json.dumps(payload, sort_keys=True, separators=(",", ":"), default=str).encode()
+    return hashlib.blake2b(encoded, digest_size=8).hexdigest()
+
+class CheckpointStore:
+    """
+    Persists per-mint discovery progress in a JSON file.
+    For each mint it keeps the hash of the last fully processed first-buyers
+    payload, the hash of each buyer entry already written, the latest buyer
+    time processed, and when the mint was last checked. Writes go to a
+    temporary file that replaces the old one, so a crash never leaves it half written.
+    """
+
+    def __init__(self, path: str = DISCOVERY_CHECKPOINT_PATH):
+        self.path = path
+        self._mints: dict[str, dict] = {}
+        self._dirty = False
+        self.load()
+
+    def load(self):
+        if not self.path or not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                self._mints = json.load(f).get("mints", {})
+        except (OSError, ValueError) as e:
+            event(logger, logging.WARNING, "checkpoints_unreadable", path=self.path, error=e)
+            self._mints = {}
+
+    def save(self):
+        if not self.path or not self._dirty:
+            return
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        temp_path = f"{self.path}.tmp"
+        with open(temp_path, "w", encoding="utf-8") as f:
+            json.dump({"mints": self._mints}, f, separators=(",", ":"))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp_path, self.path)
+        self._dirty = False
+
+    def _checkpoint(self, mint: str) -> dict:
+        checkpoint = self._mints.get(mint)
+        if checkpoint is None:
+            checkpoint = self._mints[mint] = {"payload_hash": None, "buyers": {}, "last_buyer_time": None, "checked_at": None}
+        return checkpoint
+
+    def is_fresh(self, mint: str, max_age_seconds: float) -> bool:
+        """
+        Returns True if the mint was fully processed and checked within `max_age_seconds`.
+        """
+        checkpoint = self._mints.get(mint)
+        if not checkpoint or not checkpoint.get("payload_hash") or not checkpoint.get("checked_at"):
+            return False
+        # An interrupted run must be resumed, however recently the mint was checked
+        if checkpoint.get("pending_hash"):
+            return False
+        return time.time() - checkpoint["checked_at"] < max_age_seconds
+
+    def is_unchanged(self, mint: str, payload_hash: str) -> bool:
+        """
+        Returns True if `payload_hash` matches the last fully processed payload.
+        """
+        checkpoint = self._mints.get(mint)
+        return bool(checkpoint) and checkpoint.get("payload_hash") == payload_hash
+
+    def changed_buyers(self, mint: str, buyer_hashes: dict) -> dict:
+        """
+        Filters `buyer_hashes` (wallet -> hash) down to the buyers that are new
+        or whose entry changed since they were last written.
+        """
+        committed = (self._mints.get(mint) or {}).get("buyers", {})
+        return {wallet: digest for wallet, digest in buyer_hashes.items() if committed.get(wallet) != digest}
+
+    def begin(self, mint: str, payload_hash: str):
+        """
+        Records that a changed payload is being processed, until complete() is called.
+        """
+        self._checkpoint(mint)["pending_hash"] = payload_hash
+        self._dirty = True
+
+    def touch(self, mint: str):
+        """
+        Records that the mint was just checked against the provider and found unchanged.
+        """
+        self._checkpoint(mint)["checked_at"] = time.time()
+        self._dirty = True
+
+    def commit_buyer(self, mint: str, wallet: str, digest: str, buyer_time: float = None):
+        """
+        Records that a buyer's entry has been written.
+        """
+        checkpoint = self._checkpoint(mint)
+        checkpoint["buyers"][wallet] = digest
+        if buyer_time and (checkpoint["last_buyer_time"] is None or buyer_time > checkpoint["last_buyer_time"]):
+            checkpoint["last_buyer_time"] = buyer_time
+        self._dirty = True
+
+    def complete(self, mint: str, payload_hash: str):
+        """
+        Marks the mint's payload as fully processed.
+        """
+        checkpoint = self._checkpoint(mint)
+        checkpoint["payload_hash"] = payload_hash
+        checkpoint.pop("pending_hash", None)
+        checkpoint["checked_at"] = time.time()
+        checkpoint["completed_at"] = datetime.datetime.now(datetime.timezone.utc).isoformat()
+        self._dirty = True
@@ -0,0 +1,287 @@
+import logging
+import os
+from array import array
+import numpy as np
+from scipy import sparse
+from scipy.sparse.csgraph import connected_components
+from api.decoding import to_number
+from telemetry import metrics
+from telemetry.logs import event, get_logger
+from config.settings import (
+    COOCCURRENCE_PATH, COOCCURRENCE_EARLY_RANK, COOCCURRENCE_MIN_SHARED, COOCCURRENCE_MIN_JACCARD,
+)
+
+logger = get_logger(__name__)
+
+_PAIRS = metrics.gauge("vector_cooccurrence_pairs", "(wallet, mint) first-buyer pairs in the co-occurrence index.")
+
+class CooccurrenceIndex:
+    """
+    Sparse inverted index of first buyers: which wallets bought each mint, at
+    what rank (1 = first buyer) and when.
+    Pairs are kept column-wise in compact arrays (20 bytes per pair), from
+    which the wallet x mint incidence matrix and the wallet x wallet
+    co-occurrence matrix of early buyers (rank <= `early_rank`) are built with
+    scipy.sparse. The co-occurrence matrix is updated incrementally: only the
+    mints that gained buyers since the last update are multiplied out again.
+    A per-mint set of buyer ids lets a re-checked mint add its new buyers
+    without scanning the pairs.
+    The index is saved as a single .npz file and rebuilt from it on load.
+    """
+
+    def __init__(self, path: str = COOCCURRENCE_PATH, early_rank: int = COOCCURRENCE_EARLY_RANK):
+        self.path = path
+        self.early_rank = early_rank
+        self._wallet_ids: dict[str, int] = {}
+        self.wallets: list[str] = []
+        self._mint_ids: dict[str, int] = {}
+        self.mints: list[str] = []
+        # Per mint: ids of the wallets already indexed as its buyers
+        self._mint_wallets: list[set[int]] = []
+        self.pair_wallet = array("i")
+        self.pair_mint = array("i")
+        self.pair_rank = array("i")
+        self.pair_time = array("d")
+        # Per wallet: launches bought, and launches bought within early_rank
+        self.appearances = array("i")
+        self.early_appearances = array("i")
+        self._cooccurrence: sparse.csr_matrix | None = None
+        # Pairs already folded into the co-occurrence matrix
+        self._indexed_pairs = 0
+        self._dirty = False
+        self.load()
+
+    def __len__(self):
+        return len(self.pair_wallet)
+
+    def _wallet_id(self, wallet_address: str) -> int:
+        wallet = self._wallet_ids.get(wallet_address)
+        if wallet is None:
+            wallet = self._wallet_ids[wallet_address] = len(self.wallets)
+            self.wallets.append(wallet_address)
+            self.appearances.append(0)
+            self.early_appearances.append(0)
+        return wallet
+
+    def _mint_id(self, mint: str) -> int:
+        mint_id = self._mint_ids.get(mint)
+        if mint_id is None:
+            mint_id = self._mint_ids[mint] = len(self.mints)
+            self.mints.append(mint)
+            self._mint_wallets.append(set())
+        return mint_id
+
+    def _columns(self) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Copies of the wallet, mint and rank columns (copies, so the arrays can keep growing).
+        """
+        return (np.array(self.pair_wallet, dtype=np.int32), np.array(self.pair_mint, dtype=np.int32),
+                np.array(self.pair_rank, dtype=np.int32))
+
+    def add_launch(self, mint: str, buyers: list) -> int:
+        """
+        Adds one mint's get_first_token_buyers payload.
+        Buyers are ranked by first buy time (payload order breaks ties). For a
+        mint that is already indexed only the new wallets are added; wallets
+        already indexed keep their original rank.
+        Returns:
+            int: Number of (wallet, mint) pairs added.
+        """
+        mint_id = self._mint_id(mint)
+        known_wallets = self._mint_wallets[mint_id]
+
+        buyers = [buyer for buyer in buyers or () if buyer.get('wallet')]
+        times = np.array([to_number(buyer.get('first_buy_time'), np.nan) for buyer in buyers], dtype=np.float64)
+        ranks = np.empty(len(buyers), dtype=np.int32)
+        ranks[np.argsort(np.where(np.isnan(times), np.inf, times), kind="stable")] = np.arange(1, len(buyers) + 1)
+
+        added = 0
+        for buyer, rank, buy_time in zip(buyers, ranks, times):
+            wallet = self._wallet_id(buyer['wallet'])
+            if wallet in known_wallets:
+                continue
+            known_wallets.add(wallet)
+            self.pair_wallet.append(wallet)
+            self.pair_mint.append(mint_id)
+            self.pair_rank.append(int(rank))
+            self.pair_time.append(buy_time)
+            self.appearances[wallet] += 1
+            if rank <= self.early_rank:
+                self.early_appearances[wallet] += 1
+            added += 1
+        if added:
+            self._dirty = True
+            _PAIRS.set(len(self))
+        return added
+
+    def incidence(self, early_only: bool = True) -> sparse.csr_matrix:
+        """
+        Returns the wallet x mint matrix with a 1 for every (early) buyer.
+        Rows follow `wallets`, columns follow `mints`.
+        """
+        wallet, mint, rank = self._columns()
+        if early_only:
+            keep = rank <= self.early_rank
+            wallet, mint = wallet[keep], mint[keep]
+        return sparse.csr_matrix((np.ones(len(wallet), dtype=np.int32), (wallet, mint)),
+                                 shape=(len(self.wallets), len(self.mints)))
+
+    def cooccurrence(self) -> sparse.csr_matrix:
+        """
+        Returns the symmetric wallet x wallet matrix of launches two wallets both bought early.
+        The diagonal holds each wallet's number of early launches.
+        """
+        size = len(self.wallets)
+        if self._cooccurrence is None:
+            self._cooccurrence = sparse.csr_matrix((size, size), dtype=np.int32)
+            self._indexed_pairs = 0
+        if self._cooccurrence.shape[0] != size:
+            self._cooccurrence.resize((size, size))
+        if self._indexed_pairs == len(self):
+            return self._cooccurrence
+
+        wallet, mint, rank = self._columns()
+        early = rank <= self.early_rank
+        changed = np.unique(mint[self._indexed_pairs:][early[self._indexed_pairs:]])
+        if len(changed):
+            # A changed mint's contribution is recomputed in full and the old one taken back out
+            in_changed = early & np.isin(mint, changed)
+            before = in_changed & (np.arange(len(mint)) < self._indexed_pairs)
+            shape = (size, len(self.mints))
+            after_matrix = sparse.csr_matrix((np.ones(in_changed.sum(), dtype=np.int32),
+                                              (wallet[in_changed], mint[in_changed])), shape=shape)
+            before_matrix = sparse.csr_matrix((np.ones(before.sum(), dtype=np.int32),
+                                               (wallet[before], mint[before])), shape=shape)
+            delta = after_matrix @ after_matrix.T - before_matrix @ before_matrix.T
+            self._cooccurrence = (self._cooccurrence + delta).tocsr()
+            self._cooccurrence.eliminate_zeros()
+        self._indexed_pairs = len(mint)
+        return self._cooccurrence
+
+    def repeat_early_wallets(self, min_launches: int = 2, top: int = None) -> list[tuple[str, int, int, float]]:
+        """
+        Returns wallets that bought at least `min_launches` launches early, most first.
+        Returns:
+            list[tuple]: (wallet_address, early launches, launches bought, mean rank) per wallet.
+        """
+        early = np.array(self.early_appearances, dtype=np.int64)
+        appearances = np.array(self.appearances, dtype=np.int64)
+        wallet, _, rank = self._columns()
+        rank_sums = np.bincount(wallet, weights=rank, minlength=len(self.wallets))
+        with np.errstate(divide="ignore", invalid="ignore"):
+            mean_rank = rank_sums / appearances
+        candidates = np.flatnonzero(early >= min_launches)
+        # Most early launches first, then the lowest mean rank
+        order = candidates[np.lexsort((mean_rank[candidates], -early[candidates]))]
+        if top is not None:
+            order = order[:top]
+        return [(self.wallets[i], int(early[i]), int(appearances[i]), round(float(mean_rank[i]), 2)) for i in order]
+
+    def co_buyers(self, wallet_address: str, min_shared: int = 1, top: int = 20) -> list[tuple[str, int, float]]:
+        """
+        Returns the wallets that most often bought the same launches early as `wallet_address`.
+        Returns:
+            list[tuple]: (wallet_address, shared early launches, Jaccard similarity), most shared first.
+        """
+        wallet = self._wallet_ids.get(wallet_address)
+        if wallet is None:
+            return []
+        matrix = self.cooccurrence()
+        row = matrix.getrow(wallet)
+        others, shared = row.indices, row.data
+        keep = (others != wallet) & (shared >= min_shared)
+        others, shared = others[keep], shared[keep]
+        diagonal = matrix.diagonal()
+        jaccard = shared / (diagonal[wallet] + diagonal[others] - shared)
+        order = np.lexsort((-jaccard, -shared))[:top]
+        return [(self.wallets[others[i]], int(shared[i]), round(float(jaccard[i]), 4)) for i in order]
+
+    def clusters(self, min_shared: int = COOCCURRENCE_MIN_SHARED, min_jaccard: float = COOCCURRENCE_MIN_JACCARD,
+                 min_size: int = 2) -> list[list[str]]:
+        """
+        Groups wallets that keep buying the same launches early, e.g. bot farms or sybil wallets.
+        Two wallets are linked when they share at least `min_shared` early launches
+        and those make up at least `min_jaccard` of the early launches either bought;
+        clusters are the connected components of those links.
+        Returns:
+            list[list[str]]: Clusters of at least `min_size` wallets, largest first.
+        """
+        matrix = self.cooccurrence().tocoo()
+        diagonal = matrix.diagonal()
+        rows, cols, shared = matrix.row, matrix.col, matrix.data
+        keep = (rows != cols) & (shared >= min_shared)
+        rows, cols, shared = rows[keep], cols[keep], shared[keep]
+        keep = shared / (diagonal[rows] + diagonal[cols] - shared) >= min_jaccard
+        links = sparse.csr_matrix((np.ones(keep.sum(), dtype=np.int8), (rows[keep], cols[keep])), shape=matrix.shape)
+        _, labels = connected_components(links, directed=False)
+        sizes = np.bincount(labels)
+        groups = {}
+        for wallet in np.flatnonzero(sizes[labels] >= min_size):
+            groups.setdefault(labels[wallet], []).append(self.wallets[wallet])
+        return sorted(groups.values(), key=len, reverse=True)
+
+    def launch_times(self) -> dict[str, float]:
+        """
+        Mint -> earliest first buy seen (epoch ms), the best local estimate of each launch time.
+        """
+        times = np.full(len(self.mints), np.inf)
+        np.fmin.at(times, np.array(self.pair_mint, dtype=np.int32), np.array(self.pair_time, dtype=np.float64))
+        return {mint: float(time) for mint, time in zip(self.mints, times) if np.isfinite(time)}
+
+    def stats(self) -> dict:
+        return {
+            "wallets": len(self.wallets),
+            "mints": len(self.mints),
+            "pairs": len(self),
+            "pair_bytes": sum(column.itemsize * len(column) for column in
+                              (self.pair_wallet, self.pair_mint, self.pair_rank, self.pair_time)),
+        }
+
+    def load(self):
+        if not self.path or not os.path.exists(self.path):
+            return
+        try:
+            with np.load(self.path) as data:
+                wallets = data["wallets"].tolist()
+                mints = data["mints"].tolist()
+                columns = [data[name] for name in ("pair_wallet", "pair_mint", "pair_rank", "pair_time")]
+        except (OSError, ValueError, KeyError) as e:
+            event(logger, logging.WARNING, "cooccurrence_unreadable", path=self.path, error=e)
+            return
+        path = self.path
+        self.__init__(path=None, early_rank=self.early_rank)
+        self.path = path
+        for wallet_address in wallets:
+            self._wallet_id(wallet_address)
+        for mint in mints:
+            self._mint_id(mint)
+        for column, values in zip((self.pair_wallet, self.pair_mint, self.pair_rank, self.pair_time), columns):
+            column.frombytes(values.astype(np.dtype(column.typecode)).tobytes())
+        wallet, mint, rank = self._columns()
+        for wallet_id, mint_id in zip(wallet.tolist(), mint.tolist()):
+            self._mint_wallets[mint_id].add(wallet_id)
+        self.appearances = array("i", np.bincount(wallet, minlength=len(wallets)).astype(np.int32).tobytes())
+        self.early_appearances = array("i", np.bincount(wallet[rank <= self.early_rank],
+                                                        minlength=len(wallets)).astype(np.int32).tobytes())
+        _PAIRS.set(len(self))
+
+    def save(self):
+        """
+        Writes the index to a temporary file that replaces the old one (uncompressed, so it stays fast).
+        """
+        if not self.path or not self._dirty:
+            return
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        temp_path = f"{self.path}.tmp"
+        with open(temp_path, "wb") as f:
+            np.savez(f, wallets=np.array(self.wallets, dtype=str), mints=np.array(self.mints, dtype=str),
+                     pair_wallet=np.array(self.pair_wallet, dtype=np.int32),
+                     pair_mint=np.array(self.pair_mint, dtype=np.int32),
+                     pair_rank=np.array(self.pair_rank, dtype=np.int32),
+                     pair_time=np.array(self.pair_time, dtype=np.float64))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp_path, self.path)
+        self._dirty = False
@@ -1,87 +1,85 @@
-from api import solana_tracker
-from db import supabase_manager
-from config.settings import DEFAULT_DISCOVERY_TOKEN_MINT
-import datetime
+import logging
+from api import moralis_client
+from telemetry.logs import event, get_logger
+from wallet.pipeline import DiscoveryPipeline
+from wallet.checkpoints import CheckpointStore
+from wallet.cooccurrence import CooccurrenceIndex
+from wallet.position_store import PositionStore
+from config.settings import (
+    DISCOVERY_TOKEN_MINTS, DISCOVERY_MINT_SOURCE,
+    DISCOVERY_NEW_TOKENS_EXCHANGE, DISCOVERY_NEW_TOKENS_LIMIT,
+)
 
-async def discover_and_store_wallets():
+logger = get_logger(__name__)
+
+async def new_token_mints(exchange: str = DISCOVERY_NEW_TOKENS_EXCHANGE, limit: int = DISCOVERY_NEW_TOKENS_LIMIT,
+                          spend=None):
     """
-    Discovers wallets by fetching first buyers of a default token
-    and stores/updates them in the Supabase database.
-    This function is designed for simplicity and a "small win".
+    Yields the mint addresses of tokens newly listed on an exchange (via Moralis).
+    Args:
+        exchange (str): The name of the exchange (e.g., "Raydium").
+        limit (int): Number of new tokens to fetch.
+        spend (callable, optional): Async callable charged one API call for the listing
+                                    request; nothing is listed if it returns False.
     """
-    print("\n--- Starting Wallet Discovery Process ---")
-
-    # Step 1: Fetch first buyers for a predefined token
-    # We use DEFAULT_DISCOVERY_TOKEN_MINT from settings.py (e.g., USDC)
-    first_buyers_data = await solana_tracker.get_first_token_buyers(DEFAULT_DISCOVERY_TOKEN_MINT)
-
-    if not first_buyers_data:
-        print(f"No first buyers found for token {DEFAULT_DISCOVERY_TOKEN_MINT} or API call failed. Exiting discovery.")
+    if spend is not None and not await spend(1):
         return
+    new_tokens = await moralis_client.get_new_tokens_by_exchange(exchange, limit)
+    for token in new_tokens or []:
+        mint = token.get('tokenAddress') or token.get('mint')
+        if mint:
+            yield mint
 
-    print(f"Processing {len(first_buyers_data)} potential wallets...")
-
-    # Step 2: Process each discovered wallet
-    for buyer in first_buyers_data:
-        wallet_address = buyer.get('wallet')
-        if not wallet_address:
-            print("Skipping buyer with no wallet address.")
-            continue
-
-        # Check if wallet already exists in our database
-        existing_wallet = await supabase_manager.get_wallet(wallet_address)
-
-        # Extract PnL data from the buyer response (Solana Tracker provides this directly)
-        realized_pnl = buyer.get('realized', 0.0)
-        unrealized_pnl = buyer.get('unrealized', 0.0)
-        total_pnl = buyer.get('total', 0.0)
-
-        # Simple heuristic for 'is_bot' for a "small win"
-        # For now, we'll assume they are not bots unless we have strong indicators.
-        # This can be refined later in wallet/analyzer.py
-        is_bot = False 
-        # Example: If a wallet has extremely high PnL but very few transactions, or
-        # if 'first_buy_time' and 'last_transaction_time' are very close, it *might* be a bot.
-        # For simplicity, we'll keep is_bot as False for now.
+def configured_mint_source(spend=None):
+    """
+    Returns the mint stream selected by DISCOVERY_MINT_SOURCE in settings.
+    Args:
+        spend (callable, optional): Charged for any API call the source makes (see new_token_mints).
+    """
+    if DISCOVERY_MINT_SOURCE == "moralis":
+        return new_token_mints(spend=spend)
+    return list(DISCOVERY_TOKEN_MINTS)
 
-        wallet_data_to_store = {
-            "wallet_address": wallet_address,
-            "label": "First Buyer", # A simple label for now
-            "is_bot": is_bot,
-            # For initial score, we can use total PnL directly, or a simplified version
-            "score": total_pnl, 
-            "last_active": datetime.datetime.fromtimestamp(buyer.get('last_transaction_time', 0) / 1000, datetime.timezone.utc).isoformat() if buyer.get('last_transaction_time') else datetime.datetime.now(datetime.timezone.utc).isoformat()
-        }
+async def discover_and_store_wallets(mints=None, checkpoints: CheckpointStore = None,
+                                     cooccurrence: CooccurrenceIndex = None, positions: PositionStore = None,
+                                     spend=None) -> dict:
+    """
+    Discovers wallets by fetching the first buyers of each token mint
+    and stores/updates them in the Supabase database.
+    Mints are processed concurrently by a DiscoveryPipeline, and progress is
+    checkpointed, so reruns only process new or changed buyers.
+    Args:
+        mints (optional): An iterable or async iterable of token mint addresses.
+                          Defaults to the source configured in settings.
+        checkpoints (CheckpointStore, optional): Where progress is saved.
+                                                 Defaults to DISCOVERY_CHECKPOINT_PATH.
+        cooccurrence (CooccurrenceIndex, optional): Where first buyers are indexed.
+                                                    Defaults to COOCCURRENCE_PATH.
+        positions (PositionStore, optional): Where first-buyer positions are kept for re-scoring.
+                                             Defaults to POSITION_STORE_PATH.
+        spend (callable, optional): Async callable charged with each fetched mint's API calls
+                                    (see DiscoveryPipeline); a mint is skipped if it returns False.
+    Returns:
+        dict: Run statistics from the pipeline.
+    """
+    event(logger, logging.INFO, "discovery_started")
 
-        if existing_wallet:
-            # Update existing wallet's score and last_active time
-            print(f"Updating existing wallet: {wallet_address}")
-            await supabase_manager.update_wallet(wallet_address, {
-                "score": wallet_data_to_store["score"],
-                "last_active": wallet_data_to_store["last_active"],
-                "label": wallet_data_to_store["label"] # Update label if it changes
-            })
-        else:
-            # Insert new wallet
-            print(f"Inserting new wallet: {wallet_address}")
-            await supabase_manager.insert_wallet(wallet_data_to_store)
+    if mints is None:
+        mints = configured_mint_source(spend)
 
-        # Optionally, fetch token metadata and store it if not already present
-        token_metadata = await solana_tracker.get_token_metadata(DEFAULT_DISCOVERY_TOKEN_MINT)
-        if token_metadata:
-            await supabase_manager.insert_token_metadata({
-                "token_mint": token_metadata.get('mint'),
-                "symbol": token_metadata.get('symbol'),
-                "name": token_metadata.get('name'),
-                "decimals": token_metadata.get('decimals'),
-                "image_url": token_metadata.get('image'),
-                "last_price_usd": token_metadata.get('priceUsd'),
-                "last_price_updated": datetime.datetime.now(datetime.timezone.utc).isoformat()
-            })
+    if checkpoints is None:
+        checkpoints = CheckpointStore()
+    if cooccurrence is None:
+        cooccurrence = CooccurrenceIndex()
+    if positions is None:
+        positions = PositionStore()
 
-        # Add a small delay to respect API rate limits, even if not explicitly hit yet
-        # For Solana Tracker free tier (10,000 requests/month, 1/second rate limit) [1]
-        # A 1-second delay per wallet is a safe starting point.
-        time.sleep(1) 
+    stats = await DiscoveryPipeline(checkpoints=checkpoints, cooccurrence=cooccurrence, positions=positions,
+                                    spend=spend).run(mints)
 
-    print("\n--- Wallet Discovery Process Completed ---")
\ No newline at end of file
+    event(logger, logging.INFO, "discovery_completed", **{
+        key: round(value, 3) if isinstance(value, float) else value for key, value in stats.items()})
+    clusters = cooccurrence.clusters()
+    event(logger, logging.INFO, "cooccurrence_updated", **cooccurrence.stats(), clusters=len(clusters),
+          clustered_wallets=sum(len(cluster) for cluster in clusters))
+    return stats
@@ -0,0 +1,451 @@
+import asyncio
+import datetime
+import logging
+import time
+from api import solana_tracker, token_cache
+from telemetry import metrics
+from telemetry.logs import event, get_logger
+from wallet import analyzer
+from wallet.registry import registry
+from wallet.checkpoints import CheckpointStore, content_hash
+from wallet.cooccurrence import CooccurrenceIndex
+from wallet.position_store import PositionStore
+from db import outbox, price_store
+from config.settings import (
+    DISCOVERY_FETCH_WORKERS, DISCOVERY_NORMALISE_WORKERS, DISCOVERY_ENRICH_WORKERS,
+    DISCOVERY_QUEUE_SIZE, DISCOVERY_WRITE_BATCH_SIZE, DISCOVERY_WRITE_FLUSH_SECONDS,
+    DISCOVERY_RECHECK_SECONDS, DISCOVERY_SAVE_SECONDS,
+)
+
+# API calls a fetched mint costs: first buyers, then token metadata
+DISCOVERY_CALLS_PER_MINT = 2
+
+# Marks the end of a stage's input
+_DONE = object()
+
+logger = get_logger(__name__)
+
+_STAGE_SECONDS = metrics.histogram("vector_stage_duration_seconds", "Time spent per item in each discovery stage.", ("stage",))
+_STAGE_FAILURES = metrics.counter("vector_stage_failures_total", "Discovery stage items that raised.", ("stage",))
+_QUEUE_DEPTH = metrics.gauge("vector_queue_depth", "Items waiting in each pipeline queue.", ("queue",))
+
+def buyer_to_wallet_record(buyer: dict) -> dict | None:
+    """
+    Converts one first-buyer entry from Solana Tracker into a 'wallets' row.
+    Args:
+        buyer (PositionRecord): A buyer entry from get_first_token_buyers.
+    Returns:
+        dict | None: The wallet record, or None if the buyer has no wallet address.
+    """
+    wallet_address = buyer.get('wallet')
+    if not wallet_address:
+        return None
+
+    # Raw PnL from the buyer response; the pipeline replaces score and is_bot
+    # with the analyzer's composite score and bot flag
+    total_pnl = buyer.get('total', 0.0)
+    is_bot = False
+
+    last_transaction_time = buyer.get('last_transaction_time')
+    if last_transaction_time:
+        last_active = datetime.datetime.fromtimestamp(last_transaction_time / 1000, datetime.timezone.utc).isoformat()
+    else:
+        last_active = datetime.datetime.now(datetime.timezone.utc).isoformat()
+
+    return {
+        "wallet_address": wallet_address,
+        "label": "First Buyer", # A simple label for now
+        "is_bot": is_bot,
+        "score": total_pnl,
+        "last_active": last_active,
+    }
+
+def merge_wallet_records(existing: dict, new: dict) -> dict:
+    """
+    Merges two records for the same wallet seen on different mints.
+    Keeps the best score and the most recent activity.
+    """
+    merged = dict(existing)
+    merged["score"] = max(existing.get("score") or 0.0, new.get("score") or 0.0)
+    merged["last_active"] = max(existing.get("last_active") or "", new.get("last_active") or "")
+    merged["is_bot"] = bool(existing.get("is_bot") or new.get("is_bot"))
+    return merged
+
+async def store_token_metadata(token_mint_address: str) -> bool:
+    """
+    Fetches a token's metadata through the cache and upserts it into 'token_metadata',
+    but only if it differs from what was last written.
+    Args:
+        token_mint_address (str): The mint address of the token.
+    Returns:
+        bool: True if the stored row is up to date, False otherwise.
+    """
+    # Through the router, so discovery keeps going if one provider is down or out of quota
+    token_metadata = await token_cache.get_token_metadata(token_mint_address, provider="router")
+    if not token_metadata:
+        return False
+    price_store.record_price(token_mint_address, token_metadata.get('price_usd'))
+
+    row = {
+        "token_mint": token_metadata.get('mint') or token_mint_address,
+        "symbol": token_metadata.get('symbol'),
+        "name": token_metadata.get('name'),
+        "decimals": token_metadata.get('decimals'),
+        "image_url": token_metadata.get('image'),
+    }
+    # Some providers (e.g. Moralis metadata) carry no price; keep the stored one rather than blank it
+    price_usd = token_metadata.get('price_usd')
+    if price_usd is not None:
+        row["last_price_usd"] = price_usd
+    cache = token_cache.get_cache("router")
+    if not cache.needs_persist(token_mint_address, row):
+        return True
+
+    if price_usd is not None:
+        row["last_price_updated"] = datetime.datetime.now(datetime.timezone.utc).isoformat()
+    stored = await outbox.write_token_metadata(row)
+    if stored:
+        cache.mark_persisted(token_mint_address, row)
+    return stored
+
+class _MintBatch:
+    """
+    One mint's first-buyers payload as it moves through the pipeline.
+    `buyer_hashes` and `records` only cover buyers that are new or changed.
+    """
+
+    __slots__ = ("mint", "buyers", "payload_hash", "buyer_hashes", "buyer_times", "records")
+
+    def __init__(self, mint, buyers, payload_hash, buyer_hashes, buyer_times):
+        self.mint = mint
+        self.buyers = buyers
+        self.payload_hash = payload_hash
+        self.buyer_hashes = buyer_hashes
+        self.buyer_times = buyer_times
+        self.records = []
+
+class DiscoveryPipeline:
+    """
+    Runs a stream of token mints through the discovery stages:
+    fetch first buyers -> normalise -> enrich (token metadata) -> batch write.
+    Stages are connected by bounded queues, so a slow stage applies backpressure
+    to the ones before it, and each stage runs its own pool of workers.
+    Wallets seen on several mints are merged and written once per batch.
+    Progress is checkpointed per mint: unchanged payloads are skipped, only
+    new or changed buyers are processed, and a buyer is only marked done once
+    its wallet has been written, so an interrupted run resumes where it stopped.
+    Changed payloads are also added to the first-buyer co-occurrence index and
+    the position store (for later re-scoring), if they're given.
+    If a `spend` callback is given (e.g. the scheduler's shared API budget), each
+    mint that isn't skipped as fresh is charged DISCOVERY_CALLS_PER_MINT calls
+    before it is fetched; a mint whose charge is refused is left for a later run.
+    """
+
+    def __init__(self, fetch_workers: int = DISCOVERY_FETCH_WORKERS,
+                 normalise_workers: int = DISCOVERY_NORMALISE_WORKERS,
+                 enrich_workers: int = DISCOVERY_ENRICH_WORKERS,
+                 queue_size: int = DISCOVERY_QUEUE_SIZE,
+                 write_batch_size: int = DISCOVERY_WRITE_BATCH_SIZE,
+                 write_flush_seconds: float = DISCOVERY_WRITE_FLUSH_SECONDS,
+                 checkpoints: CheckpointStore = None,
+                 recheck_seconds: float = DISCOVERY_RECHECK_SECONDS,
+                 save_seconds: float = DISCOVERY_SAVE_SECONDS,
+                 cooccurrence: CooccurrenceIndex = None, positions: PositionStore = None, spend=None):
+        self.fetch_workers = fetch_workers
+        self.normalise_workers = normalise_workers
+        self.enrich_workers = enrich_workers
+        self.queue_size = queue_size
+        self.write_batch_size = write_batch_size
+        self.write_flush_seconds = write_flush_seconds
+        # Without a path the checkpoints only live for this run
+        self.checkpoints = checkpoints if checkpoints is not None else CheckpointStore(path=None)
+        self.recheck_seconds = recheck_seconds
+        self.save_seconds = save_seconds
+        self._saved_at = time.monotonic()
+        self.cooccurrence = cooccurrence
+        self.positions = positions
+        self.spend = spend
+        # Latest record written per wallet during this run, for cross-mint de-duplication
+        self._written: dict[str, dict] = {}
+        # Buyers waiting for their wallet to be written: wallet -> [(mint, digest, buyer_time)]
+        self._wallet_mints: dict[str, list] = {}
+        # Mints with buyers still waiting to be written: mint -> (outstanding wallets, payload hash)
+        self._outstanding: dict[str, tuple[set, str]] = {}
+        self.stats = {
+            "mints_received": 0,
+            "mints_with_buyers": 0,
+            "mints_skipped_fresh": 0,
+            "mints_unchanged": 0,
+            "buyers_seen": 0,
+            "buyers_unchanged": 0,
+            "buyer_pairs_indexed": 0,
+            "wallets_unique": 0,
+            "wallets_written": 0,
+            "wallets_unchanged": 0,
+            "wallets_failed": 0,
+            "write_batches": 0,
+            "elapsed_seconds": 0.0,
+        }
+
+    async def _feed(self, mints, out_queue: asyncio.Queue, seen_mints: set):
+        if hasattr(mints, "__aiter__"):
+            async for mint in mints:
+                await self._feed_one(mint, out_queue, seen_mints)
+        else:
+            for mint in mints:
+                await self._feed_one(mint, out_queue, seen_mints)
+
+    async def _feed_one(self, mint: str, out_queue: asyncio.Queue, seen_mints: set):
+        if not mint or mint in seen_mints:
+            return
+        seen_mints.add(mint)
+        self.stats["mints_received"] += 1
+        if self.recheck_seconds > 0 and self.checkpoints.is_fresh(mint, self.recheck_seconds):
+            self.stats["mints_skipped_fresh"] += 1
+            return
+        await out_queue.put(mint)
+
+    async def _run_stage(self, worker_count: int, in_queue: asyncio.Queue, out_queue: asyncio.Queue, handle):
+        """
+        Runs `worker_count` workers that apply `handle` to each item of `in_queue`
+        and put non-None results on `out_queue`. Signals the next stage when done.
+        """
+        stage = handle.__name__.lstrip("_")
+
+        async def worker():
+            while True:
+                item = await in_queue.get()
+                if item is _DONE:
+                    return
+                # The depth seen by each consumer shows which stage is the bottleneck
+                _QUEUE_DEPTH.set(in_queue.qsize(), queue=stage)
+                started = time.perf_counter()
+                try:
+                    result = await handle(item)
+                except Exception as e:
+                    _STAGE_FAILURES.inc(stage=stage)
+                    event(logger, logging.ERROR, "stage_failed", stage=stage, exc_info=e)
+                    continue
+                finally:
+                    _STAGE_SECONDS.observe(time.perf_counter() - started, stage=stage)
+                if result is not None:
+                    await out_queue.put(result)
+
+        await asyncio.gather(*(worker() for _ in range(worker_count)))
+        await out_queue.put(_DONE)
+
+    async def _fetch(self, mint: str):
+        if self.spend is not None and not await self.spend(DISCOVERY_CALLS_PER_MINT):
+            return None
+        buyers = await solana_tracker.get_first_token_buyers(mint)
+        if not buyers:
+            return None
+        self.stats["mints_with_buyers"] += 1
+        self.stats["buyers_seen"] += len(buyers)
+
+        payload_hash = content_hash([buyer.raw_values() for buyer in buyers])
+        if self.checkpoints.is_unchanged(mint, payload_hash):
+            self.checkpoints.touch(mint)
+            self.stats["mints_unchanged"] += 1
+            self.stats["buyers_unchanged"] += len(buyers)
+            return None
+
+        buyer_hashes = {}
+        buyer_times = {}
+        for buyer in buyers:
+            wallet_address = buyer.get('wallet')
+            if wallet_address:
+                buyer_hashes[wallet_address] = content_hash(buyer.raw_values())
+                buyer_times[wallet_address] = buyer.get('first_buy_time')
+        changed = self.checkpoints.changed_buyers(mint, buyer_hashes)
+        self.stats["buyers_unchanged"] += len(buyer_hashes) - len(changed)
+        self.checkpoints.begin(mint, payload_hash)
+        return _MintBatch(mint, buyers, payload_hash, changed, buyer_times)
+
+    async def _normalise(self, batch: _MintBatch):
+        if self.cooccurrence is not None:
+            self.stats["buyer_pairs_indexed"] += self.cooccurrence.add_launch(batch.mint, batch.buyers)
+        if self.positions is not None:
+            self.positions.add_launch(batch.mint, batch.buyers)
+        # Score the whole payload in one vectorized pass; unchanged buyers still
+        # count towards launch time and the other relative features
+        positions = analyzer.PositionColumns.from_first_buyers(batch.buyers)
+        scores = {result["wallet_address"]: result for result in analyzer.analyze_positions(positions)}
+        for buyer in batch.buyers:
+            record = buyer_to_wallet_record(buyer)
+            if not record or record["wallet_address"] not in batch.buyer_hashes:
+                continue
+            result = scores.get(record["wallet_address"])
+            if result:
+                record["score"] = result["score"]
+                record["is_bot"] = result["is_bot"]
+            batch.records.append(record)
+        batch.buyers = None  # No longer needed; don't keep the payload alive in the queues
+        return batch
+
+    async def _enrich(self, batch: _MintBatch):
+        await store_token_metadata(batch.mint)
+        return batch
+
+    def _track(self, batch: _MintBatch):
+        """
+        Registers a batch's buyers as waiting for their wallets to be written.
+        """
+        if not batch.records:
+            self.checkpoints.complete(batch.mint, batch.payload_hash)
+            return
+        wallets = set()
+        for record in batch.records:
+            wallet_address = record["wallet_address"]
+            wallets.add(wallet_address)
+            self._wallet_mints.setdefault(wallet_address, []).append(
+                (batch.mint, batch.buyer_hashes[wallet_address], batch.buyer_times.get(wallet_address)))
+        self._outstanding[batch.mint] = (wallets, batch.payload_hash)
+
+    def _commit_wallet(self, wallet_address: str):
+        """
+        Marks every buyer entry waiting on this wallet as done, completing mints with nothing left.
+        """
+        for mint, digest, buyer_time in self._wallet_mints.pop(wallet_address, ()):
+            self.checkpoints.commit_buyer(mint, wallet_address, digest, buyer_time)
+            wallets, payload_hash = self._outstanding[mint]
+            wallets.discard(wallet_address)
+            if not wallets:
+                self.checkpoints.complete(mint, payload_hash)
+                del self._outstanding[mint]
+
+    async def _flush(self, pending: dict):
+        if not pending:
+            return
+        batch = list(pending.values())
+        pending.clear()
+        # The registry only marks wallets that actually changed, so unchanged ones cost nothing
+        changed = []
+        for record in batch:
+            # A wallet left dirty by an earlier failed write still needs writing
+            if registry.upsert(record) or registry.is_dirty(record["wallet_address"]):
+                changed.append(record)
+            else:
+                self.stats["wallets_unchanged"] += 1
+                self._written[record["wallet_address"]] = record
+                self._commit_wallet(record["wallet_address"])
+        if changed:
+            with _STAGE_SECONDS.time(stage="write"):
+                results = await registry.flush()
+            self.stats["write_batches"] += 1
+            for record in changed:
+                if results.get(record["wallet_address"]):
+                    self.stats["wallets_written"] += 1
+                    self._written[record["wallet_address"]] = record
+                    self._commit_wallet(record["wallet_address"])
+                else:
+                    self.stats["wallets_failed"] += 1
+        self._save_progress()
+
+    async def _write(self, in_queue: asyncio.Queue):
+        """
+        Collects wallet records into batches and writes each batch in one bulk upsert.
+        A wallet already written this run is only written again if its merged record changed.
+        """
+        pending: dict[str, dict] = {}
+        getter = None
+        try:
+            while True:
+                if getter is None:
+                    getter = asyncio.ensure_future(in_queue.get())
+                # Not wait_for: a cancellation arriving as it times out would come back as a timeout
+                # (Python < 3.12) and this stage would keep running after run() cancelled it
+                done, _ = await asyncio.wait({getter}, timeout=self.write_flush_seconds)
+                if not done:
+                    await self._flush(pending)
+                    continue
+                batch = getter.result()
+                getter = None
+                if batch is _DONE:
+                    break
+                _QUEUE_DEPTH.set(in_queue.qsize(), queue="write")
+                self._track(batch)
+                for record in batch.records:
+                    wallet_address = record["wallet_address"]
+                    previous = pending.get(wallet_address) or self._written.get(wallet_address)
+                    if previous is None:
+                        self.stats["wallets_unique"] += 1
+                        pending[wallet_address] = record
+                        continue
+                    merged = merge_wallet_records(previous, record)
+                    if merged != self._written.get(wallet_address):
+                        pending[wallet_address] = merged
+                    elif wallet_address not in pending:
+                        # Already written this run with the same data
+                        self._commit_wallet(wallet_address)
+                if len(pending) >= self.write_batch_size:
+                    await self._flush(pending)
+        finally:
+            if getter is not None:
+                getter.cancel()
+        await self._flush(pending)
+
+    def _save_progress(self, force: bool = False):
+        """
+        Saves the indexes and then the checkpoints, at most once every `save_seconds` unless forced.
+        The index files are rewritten whole, so saving them on every write batch would cost more
+        than the batch itself; an interrupted run re-fetches the mints completed since the last save.
+        """
+        if not force and time.monotonic() - self._saved_at < self.save_seconds:
+            return
+        # Saved before the checkpoints, so a mint is never marked done without its buyers indexed
+        for name, index in (("cooccurrence", self.cooccurrence), ("position_store", self.positions)):
+            if index is None:
+                continue
+            try:
+                index.save()
+            except OSError as e:
+                event(logger, logging.WARNING, f"{name}_save_failed", error=e)
+        self.checkpoints.save()
+        self._saved_at = time.monotonic()
+
+    async def run(self, mints) -> dict:
+        """
+        Runs every mint from `mints` through the pipeline and waits until all wallets are written.
+        If a stage fails, the other stages are cancelled and the error is raised.
+        Args:
+            mints: An iterable or async iterable of token mint addresses.
+        Returns:
+            dict: Run statistics (mints, buyers, unique wallets, rows written, elapsed time).
+        """
+        started = time.monotonic()
+        mint_queue = asyncio.Queue(self.queue_size)
+        buyers_queue = asyncio.Queue(self.queue_size)
+        records_queue = asyncio.Queue(self.queue_size)
+        enriched_queue = asyncio.Queue(self.queue_size)
+
+        async def feed():
+            await self._feed(mints, mint_queue, set())
+            for _ in range(self.fetch_workers):
+                await mint_queue.put(_DONE)
+
+        async def relay(worker_count: int, in_queue: asyncio.Queue, out_queue: asyncio.Queue, handle, next_workers: int):
+            await self._run_stage(worker_count, in_queue, out_queue, handle)
+            # _run_stage sent one _DONE; the next stage needs one per worker
+            for _ in range(next_workers - 1):
+                await out_queue.put(_DONE)
+
+        stages = [asyncio.ensure_future(stage) for stage in (
+            feed(),
+            relay(self.fetch_workers, mint_queue, buyers_queue, self._fetch, self.normalise_workers),
+            relay(self.normalise_workers, buyers_queue, records_queue, self._normalise, self.enrich_workers),
+            relay(self.enrich_workers, records_queue, enriched_queue, self._enrich, 1),
+            self._write(enriched_queue),
+        )]
+        try:
+            done, _ = await asyncio.wait(stages, return_when=asyncio.FIRST_EXCEPTION)
+            for stage in done:
+                # A failed stage stops draining its queue, which would block the stages before it forever
+                stage.result()
+        finally:
+            for stage in stages:
+                stage.cancel()
+            await asyncio.gather(*stages, return_exceptions=True)
+        self._save_progress(force=True)
+        self.stats["elapsed_seconds"] = time.monotonic() - started
+        return self.stats
@@ -0,0 +1,407 @@
+import asyncio
+import json
+import logging
+import os
+import random
+import time
+from collections import OrderedDict, deque
+import numpy as np
+from api import provider_router
+from api.trade_stream import BUY, SELL, TradeEvent, normalise_trade
+from db import price_store
+from wallet import analyzer
+from telemetry import metrics
+from telemetry.logs import event, get_logger
+from config.settings import (
+    PNL_SNAPSHOT_PATH, PNL_RECONCILE_TOLERANCE, PNL_RECONCILE_MIN_USD,
+)
+
+# Lots smaller than this (in tokens) are treated as fully sold
+_DUST = 1e-9
+# Signatures remembered so trades replayed by a reconnect or backfill are applied once
+_RECENT_SIGNATURES = 100_000
+
+logger = get_logger(__name__)
+
+_TRADES = metrics.counter("vector_pnl_trades_total", "Trades seen by the local PnL engine, by outcome.", ("outcome",))
+_RECONCILED = metrics.counter("vector_pnl_reconciled_total", "Local PnL checks against a provider, by outcome.", ("outcome",))
+_OPEN_POSITIONS = metrics.gauge("vector_pnl_open_positions", "(wallet, token) positions with tokens still held.")
+
+class Position:
+    """
+    One wallet's position in one token.
+    Open tokens are kept as FIFO lots of [amount, unit cost in USD]; a sell
+    consumes the oldest lots first. Tokens sold beyond what was bought since
+    tracking started have no known cost, so they're counted in
+    `unmatched_amount` and left out of realized PnL.
+    """
+
+    __slots__ = ("lots", "amount", "cost", "realized", "bought_usd", "sold_usd",
+                 "unmatched_amount", "buys", "sells", "first_trade", "last_trade")
+
+    def __init__(self):
+        self.lots = deque()
+        self.amount = 0.0
+        self.cost = 0.0
+        self.realized = 0.0
+        self.bought_usd = 0.0
+        self.sold_usd = 0.0
+        self.unmatched_amount = 0.0
+        self.buys = 0
+        self.sells = 0
+        self.first_trade = None
+        self.last_trade = None
+
+    def buy(self, amount: float, price: float):
+        self.lots.append([amount, price])
+        self.amount += amount
+        self.cost += amount * price
+        self.bought_usd += amount * price
+        self.buys += 1
+
+    def sell(self, amount: float, price: float):
+        remaining = amount
+        while remaining > _DUST and self.lots:
+            lot = self.lots[0]
+            matched = min(lot[0], remaining)
+            self.realized += matched * (price - lot[1])
+            self.cost -= matched * lot[1]
+            self.amount -= matched
+            lot[0] -= matched
+            remaining -= matched
+            if lot[0] <= _DUST:
+                self.lots.popleft()
+        if not self.lots:
+            # Don't let float error leave a phantom balance behind
+            self.amount = 0.0
+            self.cost = 0.0
+        if remaining > _DUST:
+            self.unmatched_amount += remaining
+        self.sold_usd += amount * price
+        self.sells += 1
+
+    def unrealized(self, price: float | None) -> float:
+        if not self.amount or price is None or price != price:
+            return 0.0
+        return self.amount * price - self.cost
+
+    def to_list(self) -> list:
+        return [self.amount, self.cost, self.realized, self.bought_usd, self.sold_usd, self.unmatched_amount,
+                self.buys, self.sells, self.first_trade, self.last_trade, [list(lot) for lot in self.lots]]
+
+    @classmethod
+    def from_list(cls, values: list):
+        position = cls()
+        (position.amount, position.cost, position.realized, position.bought_usd, position.sold_usd,
+         position.unmatched_amount, position.buys, position.sells, position.first_trade, position.last_trade,
+         lots) = values
+        position.lots = deque([float(amount), float(price)] for amount, price in lots)
+        return position
+
+class PnLEngine:
+    """
+    Keeps per-wallet, per-token FIFO cost basis and realized PnL from raw trades,
+    updated as each trade arrives, so wallet profitability doesn't need a
+    provider call per wallet. Unrealized PnL is marked against current prices
+    (the local price store by default). Trades are de-duplicated by signature.
+    State is snapshotted to a JSON file (written to a temporary file that
+    replaces the old one) and reloaded on start.
+    """
+
+    def __init__(self, path: str = PNL_SNAPSHOT_PATH):
+        self.path = path
+        self.positions: dict[str, dict[str, Position]] = {}
+        # Wallet -> provider -> that provider's realized PnL minus local realized PnL at the
+        # wallet's first reconcile against it, i.e. what the wallet made before local tracking
+        # started. Per provider, since providers define realized PnL differently.
+        self.baselines: dict[str, dict[str, float]] = {}
+        self._recent_signatures: OrderedDict = OrderedDict()
+        self._dirty = False
+        self.load()
+
+    def __len__(self):
+        return len(self.positions)
+
+    def position(self, wallet_address: str, mint: str) -> Position | None:
+        return self.positions.get(wallet_address, {}).get(mint)
+
+    def _is_duplicate(self, signature: str | None, wallet_address: str, mint: str) -> bool:
+        if not signature:
+            return False
+        key = f"{signature}:{wallet_address}:{mint}"
+        if key in self._recent_signatures:
+            return True
+        self._recent_signatures[key] = None
+        if len(self._recent_signatures) > _RECENT_SIGNATURES:
+            self._recent_signatures.popitem(last=False)
+        return False
+
+    def ingest(self, trade: TradeEvent) -> bool:
+        """
+        Applies one trade to its wallet's position.
+        Returns:
+            bool: False if the trade was a duplicate or had no usable amount or price.
+        """
+        amount = trade.amount
+        if trade.merged > 1 and trade.volume_usd and amount:
+            # Several fills coalesced into one event: cost them at their VWAP, not the last fill's price
+            price = trade.volume_usd / amount
+        else:
+            price = trade.price_usd or (trade.volume_usd / amount if amount else 0.0)
+        if amount <= 0 or price <= 0:
+            _TRADES.inc(outcome="invalid")
+            return False
+        if self._is_duplicate(trade.signature, trade.wallet, trade.mint):
+            _TRADES.inc(outcome="duplicate")
+            return False
+
+        positions = self.positions.setdefault(trade.wallet, {})
+        position = positions.get(trade.mint)
+        if position is None:
+            position = positions[trade.mint] = Position()
+        if trade.side == BUY:
+            position.buy(amount, price)
+        elif trade.side == SELL:
+            position.sell(amount, price)
+        if trade.block_time:
+            position.first_trade = min(position.first_trade or trade.block_time, trade.block_time)
+            position.last_trade = max(position.last_trade or trade.block_time, trade.block_time)
+        self._dirty = True
+        _TRADES.inc(outcome="applied")
+        return True
+
+    def ingest_payload(self, data: dict, wallet_address: str = None) -> bool:
+        """
+        Applies one raw trade payload (Datastream format, see normalise_trade).
+        """
+        trade = normalise_trade(data, time.perf_counter(), wallet_address)
+        if trade is None:
+            _TRADES.inc(outcome="invalid")
+            return False
+        return self.ingest(trade)
+
+    @staticmethod
+    def _price(mint: str, prices: dict | None) -> float | None:
+        if prices is not None:
+            return prices.get(mint)
+        latest = price_store.price_store.latest(mint)
+        return latest[1] if latest else None
+
+    def wallet_pnl(self, wallet_address: str, prices: dict = None) -> dict | None:
+        """
+        Returns a wallet's PnL in the same shape as provider_router.get_wallet_pnl.
+        Args:
+            wallet_address (str): The wallet.
+            prices (dict, optional): Mint -> USD price to mark open positions at.
+                                     Defaults to the latest prices in the local price store.
+        Returns:
+            dict | None: realized_pnl_usd, unrealized_pnl_usd, total_pnl_usd, volume_usd,
+                         tokens_traded, open_positions, wallet and provider ('local');
+                         None if the wallet has no trades.
+        """
+        positions = self.positions.get(wallet_address)
+        if not positions:
+            return None
+        realized = sum(position.realized for position in positions.values())
+        unrealized = sum(position.unrealized(self._price(mint, prices)) for mint, position in positions.items())
+        return {
+            "realized_pnl_usd": realized,
+            "unrealized_pnl_usd": unrealized,
+            "total_pnl_usd": realized + unrealized,
+            "volume_usd": sum(position.bought_usd + position.sold_usd for position in positions.values()),
+            "tokens_traded": len(positions),
+            "open_positions": sum(1 for position in positions.values() if position.amount > _DUST),
+            "wallet": wallet_address,
+            "provider": "local",
+        }
+
+    def summaries(self, prices: dict = None) -> dict[str, np.ndarray]:
+        """
+        Marks every position at once.
+        Returns:
+            dict: 'wallets' (list) and per-wallet arrays 'realized', 'unrealized', 'total',
+                  'volume' and 'open_positions', in the order of 'wallets'.
+        """
+        wallets = list(self.positions)
+        wallet_index, mints, amounts, costs, realized, volume = [], [], [], [], [], []
+        for row, wallet_address in enumerate(wallets):
+            for mint, position in self.positions[wallet_address].items():
+                wallet_index.append(row)
+                mints.append(mint)
+                amounts.append(position.amount)
+                costs.append(position.cost)
+                realized.append(position.realized)
+                volume.append(position.bought_usd + position.sold_usd)
+        unique_mints = list(dict.fromkeys(mints))
+        mint_prices = {mint: self._price(mint, prices) for mint in unique_mints}
+        marks = np.array([mint_prices[mint] if mint_prices[mint] is not None else np.nan for mint in mints], dtype=np.float64)
+        wallet_index = np.array(wallet_index, dtype=np.int64)
+        amounts = np.array(amounts, dtype=np.float64)
+        # Unpriced positions count as zero unrealized PnL rather than a full loss of their cost
+        unrealized = np.where(np.isnan(marks) | (amounts <= _DUST), 0.0, amounts * marks - np.array(costs, dtype=np.float64))
+        size = len(wallets)
+        realized_sum = np.bincount(wallet_index, weights=np.array(realized, dtype=np.float64), minlength=size)
+        unrealized_sum = np.bincount(wallet_index, weights=unrealized, minlength=size)
+        return {
+            "wallets": wallets,
+            "realized": realized_sum,
+            "unrealized": unrealized_sum,
+            "total": realized_sum + unrealized_sum,
+            "volume": np.bincount(wallet_index, weights=np.array(volume, dtype=np.float64), minlength=size),
+            "open_positions": np.bincount(wallet_index, weights=(amounts > _DUST).astype(np.float64), minlength=size),
+        }
+
+    def position_columns(self, wallet_addresses=None, launch_times: dict = None, prices: dict = None,
+                         now_ms: float = None) -> analyzer.PositionColumns:
+        """
+        Builds analyzer positions from the tracked trades, so wallets can be scored
+        locally. Open positions are marked as in summaries() and count as held
+        until now; closed ones as exited at their last trade.
+        Args:
+            wallet_addresses (optional): Wallets to include, in order. Defaults to all tracked wallets;
+                                         wallets with no trades are left out.
+            launch_times (dict, optional): Mint -> launch time in epoch ms.
+            prices (dict, optional): Mint -> USD price. Defaults to the local price store.
+            now_ms (float, optional): Current time in epoch ms.
+        """
+        launch_times = launch_times or {}
+        now_ms = now_ms or time.time() * 1000
+        wallets, wallet_index, mints, values = [], [], [], []
+        for wallet_address in self.positions if wallet_addresses is None else wallet_addresses:
+            positions = self.positions.get(wallet_address)
+            if not positions:
+                continue
+            row = len(wallets)
+            wallets.append(wallet_address)
+            for mint, position in positions.items():
+                wallet_index.append(row)
+                mints.append(mint)
+                values.append((position.amount, position.cost, position.realized, position.bought_usd,
+                               position.buys + position.sells, position.first_trade, position.last_trade))
+        # None (unknown trade times) becomes NaN
+        amounts, costs, realized, invested, transactions, first_trade, last_trade = (
+            np.array(values, dtype=np.float64).reshape(-1, 7).T.copy())
+        mint_prices = {mint: self._price(mint, prices) for mint in dict.fromkeys(mints)}
+        marks = np.array([mint_prices[mint] if mint_prices[mint] is not None else np.nan for mint in mints], dtype=np.float64)
+        open_positions = amounts > _DUST
+        return analyzer.PositionColumns(
+            wallets=wallets,
+            wallet_index=np.array(wallet_index, dtype=np.int32),
+            realized=realized,
+            unrealized=np.where(np.isnan(marks) | ~open_positions, 0.0, amounts * marks - costs),
+            invested=invested,
+            first_buy_time=first_trade,
+            exit_time=np.where(open_positions, now_ms, last_trade),
+            last_trade_time=last_trade,
+            launch_time=np.array([launch_times.get(mint, np.nan) for mint in mints], dtype=np.float64),
+            transactions=transactions,
+        )
+
+    def load(self):
+        if not self.path or not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                snapshot = json.load(f)
+            self.positions = {
+                wallet_address: {mint: Position.from_list(values) for mint, values in positions.items()}
+                for wallet_address, positions in snapshot.get("positions", {}).items()
+            }
+        except (OSError, ValueError, TypeError) as e:
+            event(logger, logging.WARNING, "pnl_snapshot_unreadable", path=self.path, error=e)
+            self.positions = {}
+            return
+        # Older snapshots kept one baseline per wallet, with no provider; those are re-taken
+        self.baselines = {wallet_address: baselines for wallet_address, baselines in snapshot.get("baselines", {}).items()
+                          if isinstance(baselines, dict)}
+        self._recent_signatures = OrderedDict.fromkeys(snapshot.get("signatures", []))
+        self._update_gauge()
+
+    def _update_gauge(self):
+        _OPEN_POSITIONS.set(sum(1 for positions in self.positions.values()
+                                for position in positions.values() if position.amount > _DUST))
+
+    def snapshot(self):
+        """
+        Writes the current state to `path`, if anything changed since the last snapshot.
+        """
+        if not self.path or not self._dirty:
+            return
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        temp_path = f"{self.path}.tmp"
+        with open(temp_path, "w", encoding="utf-8") as f:
+            json.dump({
+                "positions": {
+                    wallet_address: {mint: position.to_list() for mint, position in positions.items()}
+                    for wallet_address, positions in self.positions.items()
+                },
+                "baselines": self.baselines,
+                "signatures": list(self._recent_signatures),
+            }, f, separators=(",", ":"))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp_path, self.path)
+        self._dirty = False
+        self._update_gauge()
+
+    async def reconcile(self, wallet_address: str) -> dict | None:
+        """
+        Checks a wallet's local realized PnL against a provider's.
+        The first check of a wallet against each provider records the difference
+        as its baseline (PnL made before local tracking started); later answers
+        from the same provider are compared with the change since then, so drift
+        in the local numbers shows up as a mismatch. Baselines are per provider
+        because providers define realized PnL differently.
+        Returns:
+            dict | None: local, remote and baseline realized PnL, the provider and whether they agree;
+                         None if the wallet isn't tracked or no provider answered.
+        """
+        local = self.wallet_pnl(wallet_address, prices={})
+        if local is None:
+            return None
+        remote = await provider_router.get_wallet_pnl(wallet_address)
+        if remote is None or remote.get("realized_pnl_usd") is None:
+            _RECONCILED.inc(outcome="unavailable")
+            return None
+        remote_realized = float(remote["realized_pnl_usd"])
+        provider = remote.get("provider")
+        baselines = self.baselines.setdefault(wallet_address, {})
+        if provider not in baselines:
+            baselines[provider] = remote_realized - local["realized_pnl_usd"]
+            self._dirty = True
+            _RECONCILED.inc(outcome="baseline")
+            return {"local": local["realized_pnl_usd"], "remote": remote_realized, "provider": provider,
+                    "baseline": baselines[provider], "agrees": True}
+        baseline = baselines[provider]
+        difference = remote_realized - baseline - local["realized_pnl_usd"]
+        agrees = abs(difference) <= max(PNL_RECONCILE_MIN_USD, PNL_RECONCILE_TOLERANCE * abs(remote_realized - baseline))
+        _RECONCILED.inc(outcome="match" if agrees else "mismatch")
+        if not agrees:
+            event(logger, logging.WARNING, "pnl_mismatch", wallet=wallet_address, provider=remote.get("provider"),
+                  local=round(local["realized_pnl_usd"], 2), remote=round(remote_realized, 2),
+                  baseline=round(baseline, 2), difference=round(difference, 2))
+        return {"local": local["realized_pnl_usd"], "remote": remote_realized, "provider": provider,
+                "baseline": baseline, "agrees": agrees}
+
+async def snapshot_periodically(engine: PnLEngine, interval: float):
+    """
+    Snapshots `engine` every `interval` seconds until cancelled.
+    """
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            engine.snapshot()
+        except OSError as e:
+            event(logger, logging.WARNING, "pnl_snapshot_failed", error=e)
+
+async def reconcile_periodically(engine: PnLEngine, interval: float, sample_size: int):
+    """
+    Every `interval` seconds, checks a random sample of tracked wallets against a provider.
+    """
+    while True:
+        await asyncio.sleep(interval)
+        wallets = list(engine.positions)
+        for wallet_address in random.sample(wallets, min(sample_size, len(wallets))):
+            await engine.reconcile(wallet_address)
@@ -0,0 +1,195 @@
+import logging
+import os
+import time
+from array import array
+import numpy as np
+from wallet import analyzer
+from telemetry import metrics
+from telemetry.logs import event, get_logger
+from config.settings import POSITION_STORE_PATH
+
+logger = get_logger(__name__)
+
+_POSITIONS = metrics.gauge("vector_position_store_positions", "(wallet, mint) first-buyer positions kept for re-scoring.")
+
+# PositionColumns float columns kept per position (launch time comes from the co-occurrence index)
+_COLUMNS = ("realized", "unrealized", "invested", "first_buy_time", "exit_time", "last_trade_time", "transactions")
+
+class PositionStore:
+    """
+    The latest first-buyer position of every (wallet, mint) pair discovery has
+    seen, so every discovered wallet can be re-scored without calling the API.
+    Positions are kept column-wise in compact arrays like the co-occurrence
+    index; a pair seen again (its mint re-checked) is overwritten with the
+    newer payload. Open positions are stored with a NaN exit time and count
+    as held until the time they're read.
+    The store is saved as a single .npz file and rebuilt from it on load.
+    """
+
+    def __init__(self, path: str = POSITION_STORE_PATH):
+        self.path = path
+        self._wallet_ids: dict[str, int] = {}
+        self.wallets: list[str] = []
+        self._mint_ids: dict[str, int] = {}
+        self.mints: list[str] = []
+        # (wallet id, mint id) -> row
+        self._rows: dict[tuple[int, int], int] = {}
+        self.pair_wallet = array("i")
+        self.pair_mint = array("i")
+        self.columns = {column: array("d") for column in _COLUMNS}
+        # Rows grouped by wallet: (row order, per-wallet bounds), rebuilt after rows are added
+        self._by_wallet: tuple[np.ndarray, np.ndarray] | None = None
+        self._dirty = False
+        self.load()
+
+    def __len__(self):
+        return len(self.pair_wallet)
+
+    def _wallet_id(self, wallet_address: str) -> int:
+        wallet = self._wallet_ids.get(wallet_address)
+        if wallet is None:
+            wallet = self._wallet_ids[wallet_address] = len(self.wallets)
+            self.wallets.append(wallet_address)
+        return wallet
+
+    def _mint_id(self, mint: str) -> int:
+        mint_id = self._mint_ids.get(mint)
+        if mint_id is None:
+            mint_id = self._mint_ids[mint] = len(self.mints)
+            self.mints.append(mint)
+        return mint_id
+
+    def add_launch(self, mint: str, buyers: list) -> int:
+        """
+        Stores one mint's get_first_token_buyers payload, replacing the positions it had before.
+        Returns:
+            int: Number of (wallet, mint) pairs that weren't stored yet.
+        """
+        # A NaN "now" leaves open positions without an exit time
+        positions = analyzer.PositionColumns.from_first_buyers(buyers or [], now_ms=np.nan)
+        if not len(positions):
+            return 0
+        mint_id = self._mint_id(mint)
+        values = np.column_stack([getattr(positions, column) for column in _COLUMNS]).tolist()
+        added = 0
+        for wallet_row, row_values in zip(positions.wallet_index.tolist(), values):
+            key = (self._wallet_id(positions.wallets[wallet_row]), mint_id)
+            row = self._rows.get(key)
+            if row is None:
+                self._rows[key] = len(self.pair_wallet)
+                self.pair_wallet.append(key[0])
+                self.pair_mint.append(mint_id)
+                for column, value in zip(_COLUMNS, row_values):
+                    self.columns[column].append(value)
+                added += 1
+            else:
+                for column, value in zip(_COLUMNS, row_values):
+                    self.columns[column][row] = value
+        if added:
+            self._by_wallet = None
+            _POSITIONS.set(len(self))
+        self._dirty = True
+        return added
+
+    def _wallet_rows(self) -> tuple[np.ndarray, np.ndarray]:
+        if self._by_wallet is None:
+            wallet = np.array(self.pair_wallet, dtype=np.int32)
+            order = np.argsort(wallet, kind="stable")
+            bounds = np.searchsorted(wallet[order], np.arange(len(self.wallets) + 1))
+            self._by_wallet = (order, bounds)
+        return self._by_wallet
+
+    def position_columns(self, wallet_addresses, launch_times: dict = None, exclude: dict = None,
+                         now_ms: float = None) -> analyzer.PositionColumns:
+        """
+        Builds analyzer positions for some wallets from their stored first-buyer positions.
+        Args:
+            wallet_addresses: Wallets to include, in order; wallets with no stored positions are left out.
+            launch_times (dict, optional): Mint -> launch time in epoch ms.
+            exclude (dict, optional): Wallet -> mints whose positions come from elsewhere
+                                      (e.g. PnLEngine.positions), left out here.
+            now_ms (float, optional): Current time in epoch ms, for still-open positions.
+        """
+        launch_times = launch_times or {}
+        exclude = exclude or {}
+        now_ms = now_ms or time.time() * 1000
+        order, bounds = self._wallet_rows()
+        wallets, wallet_index, rows = [], [], []
+        for wallet_address in wallet_addresses:
+            wallet = self._wallet_ids.get(wallet_address)
+            if wallet is None:
+                continue
+            skip = exclude.get(wallet_address) or ()
+            wallet_rows = [row for row in order[bounds[wallet]:bounds[wallet + 1]].tolist()
+                           if self.mints[self.pair_mint[row]] not in skip]
+            if not wallet_rows:
+                continue
+            wallet_index.extend([len(wallets)] * len(wallet_rows))
+            wallets.append(wallet_address)
+            rows.extend(wallet_rows)
+        rows = np.array(rows, dtype=np.int64)
+        values = {column: np.array([self.columns[column][row] for row in rows.tolist()], dtype=np.float64)
+                  for column in _COLUMNS}
+        return analyzer.PositionColumns(
+            wallets=wallets,
+            wallet_index=np.array(wallet_index, dtype=np.int32),
+            realized=values["realized"],
+            unrealized=values["unrealized"],
+            invested=values["invested"],
+            first_buy_time=values["first_buy_time"],
+            exit_time=np.where(np.isnan(values["exit_time"]), now_ms, values["exit_time"]),
+            last_trade_time=values["last_trade_time"],
+            launch_time=np.array([launch_times.get(self.mints[self.pair_mint[row]], np.nan) for row in rows.tolist()],
+                                 dtype=np.float64),
+            transactions=values["transactions"],
+        )
+
+    def stats(self) -> dict:
+        return {"wallets": len(self.wallets), "mints": len(self.mints), "positions": len(self)}
+
+    def load(self):
+        if not self.path or not os.path.exists(self.path):
+            return
+        try:
+            with np.load(self.path) as data:
+                wallets = data["wallets"].tolist()
+                mints = data["mints"].tolist()
+                pair_wallet = data["pair_wallet"]
+                pair_mint = data["pair_mint"]
+                columns = [data[column] for column in _COLUMNS]
+        except (OSError, ValueError, KeyError) as e:
+            event(logger, logging.WARNING, "position_store_unreadable", path=self.path, error=e)
+            return
+        path = self.path
+        self.__init__(path=None)
+        self.path = path
+        for wallet_address in wallets:
+            self._wallet_id(wallet_address)
+        for mint in mints:
+            self._mint_id(mint)
+        self.pair_wallet.frombytes(pair_wallet.astype(np.int32).tobytes())
+        self.pair_mint.frombytes(pair_mint.astype(np.int32).tobytes())
+        for column, values in zip(_COLUMNS, columns):
+            self.columns[column].frombytes(values.astype(np.float64).tobytes())
+        self._rows = {key: row for row, key in enumerate(zip(self.pair_wallet, self.pair_mint))}
+        _POSITIONS.set(len(self))
+
+    def save(self):
+        """
+        Writes the store to a temporary file that replaces the old one.
+        """
+        if not self.path or not self._dirty:
+            return
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        temp_path = f"{self.path}.tmp"
+        with open(temp_path, "wb") as f:
+            np.savez(f, wallets=np.array(self.wallets, dtype=str), mints=np.array(self.mints, dtype=str),
+                     pair_wallet=np.array(self.pair_wallet, dtype=np.int32),
+                     pair_mint=np.array(self.pair_mint, dtype=np.int32),
+                     **{column: np.array(values, dtype=np.float64) for column, values in self.columns.items()})
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp_path, self.path)
+        self._dirty = False
@@ -0,0 +1,241 @@
+import datetime
+import logging
+import re
+from array import array
+import numpy as np
+from db import supabase_manager, outbox
+from telemetry.logs import event, get_logger
+from config.settings import WALLET_REGISTRY_PAGE_SIZE
+
+logger = get_logger(__name__)
+
+# Date and time, optional fraction of any length, optional 'Z' or +hh, +hhmm, +hh:mm offset
+_ISO_TIMESTAMP = re.compile(r"(\d{4}-\d{2}-\d{2}[T ]\d{2}:\d{2}(?::\d{2})?)(?:\.(\d+))?(?:(Z)|([+-]\d{2}):?(\d{2})?)?$")
+
+def _to_epoch(value) -> float:
+    """
+    Converts an ISO timestamp from the database into epoch seconds (NaN if missing).
+    Before Python 3.11 fromisoformat() rejects a 'Z' suffix and fractions that
+    aren't 3 or 6 digits, both of which PostgREST returns, so the timestamp is
+    normalised first. Timestamps without an offset are taken as UTC.
+    """
+    if not value or not isinstance(value, str):
+        return float("nan")
+    match = _ISO_TIMESTAMP.match(value.strip())
+    if match is None:
+        return float("nan")
+    moment, fraction, _, offset_hours, offset_minutes = match.groups()
+    if fraction:
+        moment += "." + fraction[:6].ljust(6, "0")
+    moment += f"{offset_hours}:{offset_minutes or '00'}" if offset_hours else "+00:00"
+    try:
+        return datetime.datetime.fromisoformat(moment).timestamp()
+    except ValueError:
+        return float("nan")
+
+def _to_iso(epoch: float) -> str:
+    if epoch != epoch:  # NaN
+        return datetime.datetime.now(datetime.timezone.utc).isoformat()
+    return datetime.datetime.fromtimestamp(epoch, datetime.timezone.utc).isoformat()
+
+class WalletRegistry:
+    """
+    Process-local copy of the 'wallets' table.
+    Rows are stored column-wise in compact arrays, with an address -> row index,
+    so existence and score lookups never touch the network. Local changes are
+    tracked as dirty rows and flushed in bulk; remote changes are pulled
+    incrementally using 'updated_at' as a cursor.
+    """
+
+    def __init__(self):
+        self._index: dict[str, int] = {}
+        self.addresses: list[str] = []
+        self.labels: list[str] = []
+        self.scores = array("d")
+        self.is_bot = array("b")
+        self.last_active = array("d")
+        self._dirty: set[int] = set()
+        self.cursor: str | None = None
+        self.loaded = False
+
+    def __len__(self):
+        return len(self.addresses)
+
+    def clear(self):
+        """
+        Drops every row, including unflushed changes, and resets the refresh cursor.
+        """
+        self.__init__()
+
+    def __contains__(self, wallet_address: str) -> bool:
+        return wallet_address in self._index
+
+    def get_score(self, wallet_address: str) -> float | None:
+        row = self._index.get(wallet_address)
+        return None if row is None else self.scores[row]
+
+    def get(self, wallet_address: str) -> dict | None:
+        """
+        Returns a wallet as a 'wallets' record, or None if it isn't known.
+        """
+        row = self._index.get(wallet_address)
+        if row is None:
+            return None
+        return self._record(row)
+
+    def _record(self, row: int) -> dict:
+        return {
+            "wallet_address": self.addresses[row],
+            "label": self.labels[row],
+            "score": self.scores[row],
+            "is_bot": bool(self.is_bot[row]),
+            "last_active": _to_iso(self.last_active[row]),
+        }
+
+    def _set_row(self, record: dict) -> tuple[int, bool]:
+        """
+        Writes a record into its row, appending a new row if needed.
+        Returns (row, changed).
+        """
+        wallet_address = record["wallet_address"]
+        label = record.get("label") or ""
+        score = float(record.get("score") or 0.0)
+        is_bot = 1 if record.get("is_bot") else 0
+        last_active = _to_epoch(record.get("last_active"))
+
+        row = self._index.get(wallet_address)
+        if row is None:
+            row = len(self.addresses)
+            self._index[wallet_address] = row
+            self.addresses.append(wallet_address)
+            self.labels.append(label)
+            self.scores.append(score)
+            self.is_bot.append(is_bot)
+            self.last_active.append(last_active)
+            return row, True
+
+        changed = (self.labels[row] != label or self.scores[row] != score or self.is_bot[row] != is_bot
+                   or (last_active == last_active and self.last_active[row] != last_active))
+        if changed:
+            self.labels[row] = label
+            self.scores[row] = score
+            self.is_bot[row] = is_bot
+            if last_active == last_active:
+                self.last_active[row] = last_active
+        return row, changed
+
+    def upsert(self, record: dict) -> bool:
+        """
+        Applies a local change to a wallet and marks it dirty if anything changed.
+        Args:
+            record (dict): A 'wallets' record with at least 'wallet_address'.
+        Returns:
+            bool: True if the wallet is new or changed (and will be written on flush).
+        """
+        row, changed = self._set_row(record)
+        if changed:
+            self._dirty.add(row)
+        return changed
+
+    def is_dirty(self, wallet_address: str) -> bool:
+        """
+        Returns True if the wallet has local changes that haven't been flushed yet.
+        """
+        row = self._index.get(wallet_address)
+        return row is not None and row in self._dirty
+
+    def dirty_count(self) -> int:
+        return len(self._dirty)
+
+    async def flush(self) -> dict[str, bool]:
+        """
+        Writes only the dirty rows in bulk, and clears the ones that succeeded.
+        With the outbox running, rows count as written once they are journaled.
+        Returns:
+            dict[str, bool]: Wallet address -> True if that row was written.
+        """
+        if not self._dirty:
+            return {}
+        rows = sorted(self._dirty)
+        results = await outbox.write_wallets([self._record(row) for row in rows])
+        for row in rows:
+            if results.get(self.addresses[row]):
+                self._dirty.discard(row)
+        return results
+
+    def _apply_remote(self, rows: list):
+        for record in rows:
+            wallet_address = record.get("wallet_address")
+            if not wallet_address:
+                continue
+            existing_row = self._index.get(wallet_address)
+            # Local changes not yet flushed win over the remote copy
+            if existing_row is not None and existing_row in self._dirty:
+                continue
+            self._set_row(record)
+            updated_at = record.get("updated_at")
+            if updated_at and (self.cursor is None or _to_epoch(updated_at) > _to_epoch(self.cursor)):
+                self.cursor = updated_at
+
+    async def _pull(self, updated_after: str | None, page_size: int) -> int:
+        pulled = 0
+        after = None
+        while True:
+            rows = await supabase_manager.get_wallets_page(
+                limit=page_size, after=after, updated_after=updated_after,
+                columns="wallet_address, label, score, is_bot, last_active, updated_at",
+            )
+            if rows is None:
+                break
+            self._apply_remote(rows)
+            pulled += len(rows)
+            if len(rows) < page_size:
+                break
+            last = rows[-1]
+            # Rows without 'updated_at' sort last and can't be paged past
+            if not last.get("updated_at"):
+                break
+            after = (last["updated_at"], last["wallet_address"])
+        return pulled
+
+    async def load(self, page_size: int = WALLET_REGISTRY_PAGE_SIZE) -> int:
+        """
+        Loads the whole 'wallets' table using paged bulk reads.
+        This should be called once at startup.
+        Returns:
+            int: Number of rows read.
+        """
+        pulled = await self._pull(None, page_size)
+        self.loaded = True
+        event(logger, logging.INFO, "registry_loaded", pulled=pulled, wallets=len(self))
+        return pulled
+
+    async def refresh(self, page_size: int = WALLET_REGISTRY_PAGE_SIZE) -> int:
+        """
+        Pulls only the rows updated since the last load or refresh.
+        Returns:
+            int: Number of rows read.
+        """
+        if not self.loaded:
+            return await self.load(page_size)
+        return await self._pull(self.cursor, page_size)
+
+    def score_array(self) -> np.ndarray:
+        """
+        Returns a copy of the scores as a NumPy array, in row order.
+        A copy is used because the backing array can't grow while a view of it exists.
+        """
+        return np.array(self.scores, dtype=np.float64)
+
+    def top(self, n: int, include_bots: bool = False) -> list[tuple[str, float]]:
+        """
+        Returns the `n` highest-scoring wallets as (wallet_address, score) pairs.
+        """
+        scores = self.score_array()
+        if not include_bots and len(scores):
+            scores = np.where(np.array(self.is_bot, dtype=bool), -np.inf, scores)
+        order = np.argsort(-scores, kind="stable")[:n]
+        return [(self.addresses[row], float(scores[row])) for row in order if np.isfinite(scores[row])]
+
+# Shared registry for the process
+registry = WalletRegistry()
@@ -0,0 +1,257 @@
+import asyncio
+import logging
+import os
+import time
+import zlib
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+import numpy as np
+from db import supabase_manager
+from wallet import analyzer
+from wallet.cooccurrence import CooccurrenceIndex
+from wallet.pnl_engine import PnLEngine
+from wallet.position_store import PositionStore
+from wallet.registry import registry
+from telemetry import metrics
+from telemetry.logs import event, get_logger
+from config.settings import RESCORE_PAGE_SIZE, RESCORE_WORKERS, RESCORE_MIN_SCORE_CHANGE
+
+logger = get_logger(__name__)
+
+_RESCORED = metrics.counter("vector_rescore_wallets_total", "Wallets seen by batch re-scoring, by outcome.", ("outcome",))
+_SHARD_SECONDS = metrics.histogram("vector_rescore_shard_duration_seconds", "Time to score one shard in a worker process.")
+
+# PositionColumns float columns copied into shared memory, in layout order
+_COLUMNS = ("realized", "unrealized", "invested", "first_buy_time", "exit_time",
+            "last_trade_time", "launch_time", "transactions")
+
+def shard_of(wallet_address: str, shards: int) -> int:
+    """
+    Returns a wallet's shard. crc32 rather than hash(), so it's the same in every process and run.
+    """
+    return zlib.crc32(wallet_address.encode()) % shards
+
+class SharedPositions:
+    """
+    One page of positions in a single shared-memory block, so worker processes
+    read the feature columns and write their scores in place; only the block's
+    name and row ranges cross the process boundary.
+    Layout: wallet_index (int64) and the _COLUMNS (float64), one entry per
+    position, then score and bot_likelihood (float64), one entry per wallet.
+    """
+
+    def __init__(self, positions: int, wallets: int, name: str = None):
+        self.positions = positions
+        self.wallets = wallets
+        self.owner = name is None
+        size = 8 * ((1 + len(_COLUMNS)) * positions + 2 * wallets)
+        self.shm = shared_memory.SharedMemory(name=name, create=self.owner, size=max(size, 8))
+        offset = 0
+
+        def view(dtype, count):
+            nonlocal offset
+            array = np.ndarray(count, dtype=dtype, buffer=self.shm.buf, offset=offset)
+            offset += 8 * count
+            return array
+
+        self.wallet_index = view(np.int64, positions)
+        self.columns = {column: view(np.float64, positions) for column in _COLUMNS}
+        self.score = view(np.float64, wallets)
+        self.bot_likelihood = view(np.float64, wallets)
+
+    @property
+    def name(self) -> str:
+        return self.shm.name
+
+    def close(self):
+        # The views must go before the block can be closed
+        self.wallet_index = self.columns = self.score = self.bot_likelihood = None
+        self.shm.close()
+        if self.owner:
+            self.shm.unlink()
+
+def _score_shard(name: str, positions: int, wallets: int, position_range: tuple, wallet_range: tuple) -> float:
+    """
+    Worker process entry point: scores one shard of a SharedPositions block in place.
+    Returns:
+        float: Seconds spent.
+    """
+    started = time.perf_counter()
+    shared = SharedPositions(positions, wallets, name=name)
+    try:
+        position_start, position_end = position_range
+        wallet_start, wallet_end = wallet_range
+        shard = analyzer.PositionColumns(
+            wallets=range(wallet_end - wallet_start),
+            wallet_index=shared.wallet_index[position_start:position_end] - wallet_start,
+            **{column: shared.columns[column][position_start:position_end] for column in _COLUMNS},
+        )
+        score, bot_likelihood = analyzer.score_features(analyzer.compute_features(shard))
+        shared.score[wallet_start:wallet_end] = score
+        shared.bot_likelihood[wallet_start:wallet_end] = bot_likelihood
+    finally:
+        shared.close()
+    return time.perf_counter() - started
+
+class Rescorer:
+    """
+    Re-scores the whole 'wallets' table from local positions: the first-buyer
+    positions discovery stored for every wallet it found, overridden per mint
+    by the PnL engine's streamed trades (loaded from its snapshot), with launch
+    times from the first-buyer index.
+    Wallets are paged out of Supabase in address order. Each page's positions
+    are copied once into shared memory, sharded by address hash and scored by a
+    process pool, while the next page is being fetched. Only wallets whose
+    score or bot flag changed are written back, in bulk through the registry.
+    Wallets with no local positions (e.g. added before the position store
+    existed) keep their current score and are counted as skipped.
+    """
+
+    def __init__(self, engine: PnLEngine = None, cooccurrence: CooccurrenceIndex = None, positions: PositionStore = None,
+                 workers: int = RESCORE_WORKERS, page_size: int = RESCORE_PAGE_SIZE,
+                 min_change: float = RESCORE_MIN_SCORE_CHANGE):
+        self.engine = engine if engine is not None else PnLEngine()
+        self.cooccurrence = cooccurrence if cooccurrence is not None else CooccurrenceIndex()
+        self.positions = positions if positions is not None else PositionStore()
+        self.workers = workers or os.cpu_count() or 1
+        self.page_size = page_size
+        self.min_change = min_change
+        self.stats = {
+            "pages": 0,
+            "wallets_read": 0,
+            "wallets_without_positions": 0,
+            "wallets_scored": 0,
+            "positions_scored": 0,
+            "positions_from_discovery": 0,
+            "positions_from_trades": 0,
+            "wallets_changed": 0,
+            "wallets_written": 0,
+            "wallets_failed": 0,
+            "scoring_seconds": 0.0,
+        }
+
+    async def _read_pages(self, queue: asyncio.Queue):
+        after = None
+        try:
+            while True:
+                rows = await supabase_manager.get_wallets_by_address(
+                    limit=self.page_size, after=after, columns="wallet_address, label, score, is_bot, last_active")
+                if rows is None:
+                    event(logger, logging.WARNING, "rescore_page_failed", after=after)
+                    break
+                if rows:
+                    await queue.put(rows)
+                if len(rows) < self.page_size:
+                    break
+                after = rows[-1]["wallet_address"]
+        finally:
+            await queue.put(None)
+
+    def _layout(self, positions: analyzer.PositionColumns) -> tuple[SharedPositions, list, list]:
+        """
+        Copies positions into shared memory grouped by shard.
+        Returns:
+            tuple: (block, wallet addresses in block order, [(position_range, wallet_range)] per shard).
+        """
+        shards = np.array([shard_of(wallet_address, self.workers) for wallet_address in positions.wallets], dtype=np.int64)
+        wallet_order = np.argsort(shards, kind="stable")
+        block_row = np.empty_like(wallet_order)
+        block_row[wallet_order] = np.arange(len(wallet_order))
+        wallet_index = block_row[positions.wallet_index]
+        position_order = np.argsort(wallet_index, kind="stable")
+
+        shared = SharedPositions(len(positions), len(positions.wallets))
+        shared.wallet_index[:] = wallet_index[position_order]
+        for column in _COLUMNS:
+            shared.columns[column][:] = getattr(positions, column)[position_order]
+
+        wallet_bounds = np.searchsorted(shards[wallet_order], np.arange(self.workers + 1))
+        position_bounds = np.searchsorted(shared.wallet_index, wallet_bounds)
+        ranges = [((int(position_bounds[i]), int(position_bounds[i + 1])), (int(wallet_bounds[i]), int(wallet_bounds[i + 1])))
+                  for i in range(self.workers) if wallet_bounds[i + 1] > wallet_bounds[i]]
+        return shared, [positions.wallets[row] for row in wallet_order], ranges
+
+    async def _score_page(self, pool: ProcessPoolExecutor, rows: list, launch_times: dict):
+        self.stats["pages"] += 1
+        self.stats["wallets_read"] += len(rows)
+        current = {row["wallet_address"]: row for row in rows if row.get("wallet_address")}
+        discovered = self.positions.position_columns(list(current), launch_times, exclude=self.engine.positions)
+        traded = self.engine.position_columns(list(current), launch_times)
+        positions = analyzer.PositionColumns.concat([discovered, traded])
+        self.stats["positions_from_discovery"] += len(discovered)
+        self.stats["positions_from_trades"] += len(traded)
+        self.stats["wallets_without_positions"] += len(current) - len(positions.wallets)
+        _RESCORED.inc(len(current) - len(positions.wallets), outcome="no_positions")
+        if not len(positions):
+            return
+
+        started = time.perf_counter()
+        shared, wallets, ranges = self._layout(positions)
+        try:
+            loop = asyncio.get_running_loop()
+            elapsed = await asyncio.gather(*(
+                loop.run_in_executor(pool, _score_shard, shared.name, shared.positions, shared.wallets,
+                                     position_range, wallet_range)
+                for position_range, wallet_range in ranges))
+            score = shared.score.copy()
+            bot_likelihood = shared.bot_likelihood.copy()
+        finally:
+            shared.close()
+        for seconds in elapsed:
+            _SHARD_SECONDS.observe(seconds)
+        self.stats["scoring_seconds"] += time.perf_counter() - started
+        self.stats["wallets_scored"] += len(wallets)
+        self.stats["positions_scored"] += len(positions)
+
+        is_bot = bot_likelihood >= analyzer.BOT_LIKELIHOOD_THRESHOLD
+        changed = 0
+        for i, wallet_address in enumerate(wallets):
+            row = current[wallet_address]
+            new_score = round(float(score[i]), 4)
+            if abs(new_score - float(row.get("score") or 0.0)) < self.min_change and bool(is_bot[i]) == bool(row.get("is_bot")):
+                continue
+            changed += 1
+            registry.upsert({
+                "wallet_address": wallet_address,
+                "label": row.get("label"),
+                "score": new_score,
+                "is_bot": bool(is_bot[i]),
+                "last_active": row.get("last_active"),
+            })
+        self.stats["wallets_changed"] += changed
+        _RESCORED.inc(len(wallets) - changed, outcome="unchanged")
+        _RESCORED.inc(changed, outcome="changed")
+        if changed:
+            results = await registry.flush()
+            written = sum(1 for ok in results.values() if ok)
+            self.stats["wallets_written"] += written
+            self.stats["wallets_failed"] += len(results) - written
+
+    async def run(self) -> dict:
+        """
+        Re-scores every wallet in the table.
+        Returns:
+            dict: Run statistics.
+        """
+        started = time.perf_counter()
+        launch_times = self.cooccurrence.launch_times()
+        event(logger, logging.INFO, "rescore_started", workers=self.workers, page_size=self.page_size,
+              discovered_wallets=len(self.positions.wallets), tracked_wallets=len(self.engine), launches=len(launch_times))
+        queue = asyncio.Queue(maxsize=1)
+        reader = asyncio.create_task(self._read_pages(queue))
+        try:
+            with ProcessPoolExecutor(max_workers=self.workers) as pool:
+                while (rows := await queue.get()) is not None:
+                    await self._score_page(pool, rows, launch_times)
+        finally:
+            reader.cancel()
+        self.stats["elapsed_seconds"] = time.perf_counter() - started
+        event(logger, logging.INFO, "rescore_completed", **{
+            key: round(value, 3) if isinstance(value, float) else value for key, value in self.stats.items()})
+        return self.stats
+
+async def rescore_wallets(**kwargs) -> dict:
+    """
+    Runs one batch re-scoring pass with a new Rescorer (see its arguments).
+    """
+    return await Rescorer(**kwargs).run()
@@ -0,0 +1,315 @@
+import asyncio
+import heapq
+import itertools
+import logging
+import math
+import time
+from api import moralis_client, provider_router
+from api.rate_limiter import TokenBucket
+from db import price_store
+from telemetry import metrics
+from telemetry.logs import event, get_logger
+from wallet import analyzer, discovery
+from wallet.registry import registry
+from config.settings import (
+    SCHEDULER_API_CALLS_PER_MINUTE, SCHEDULER_API_BURST, SCHEDULER_MAX_CONCURRENCY,
+    SCHEDULER_MAX_WALLETS, SCHEDULER_WALLET_REFRESH_MIN_SECONDS, SCHEDULER_WALLET_REFRESH_MAX_SECONDS,
+    SCHEDULER_PRICE_REFRESH_SECONDS, SCHEDULER_DISCOVERY_SECONDS, SCHEDULER_SYNC_SECONDS,
+    SCHEDULER_DRAIN_SECONDS, MORALIS_PRICE_BATCH_SIZE,
+)
+
+# Longest the scheduler sleeps between checks for due work
+_IDLE_SECONDS = 1.0
+
+logger = get_logger(__name__)
+
+_JOBS = metrics.counter("vector_scheduler_jobs_total", "Scheduled jobs run, by job and outcome.", ("job", "outcome"))
+_LATENESS = metrics.histogram("vector_scheduler_lateness_seconds", "How long refreshes waited past their due time.", ("job",),
+                              buckets=(1, 5, 15, 60, 300, 900, 3600, 14400, 86400))
+_QUEUE_DEPTH = metrics.gauge("vector_queue_depth", "Items waiting in each pipeline queue.", ("queue",))
+
+def refresh_interval(score: float, fastest: float = SCHEDULER_WALLET_REFRESH_MIN_SECONDS,
+                     slowest: float = SCHEDULER_WALLET_REFRESH_MAX_SECONDS) -> float:
+    """
+    Maps a wallet score (0-100) to how often it should be refreshed, geometrically
+    between `slowest` (score 0) and `fastest` (score 100).
+    """
+    weight = min(max((score or 0.0) / 100.0, 0.0), 1.0)
+    return slowest * (fastest / slowest) ** weight
+
+class RefreshQueue:
+    """
+    Priority queue of keys ordered by due time, then by value (highest first),
+    so the stalest work is done first and ties go to the most valuable keys.
+    Rescheduling a key replaces its old entry, which is skipped lazily.
+    """
+
+    def __init__(self):
+        self._heap = []
+        self._entries: dict[str, tuple] = {}
+        self._sequence = itertools.count()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._entries
+
+    def schedule(self, key: str, due: float, value: float = 0.0):
+        entry = (due, -value, next(self._sequence), key)
+        self._entries[key] = entry
+        heapq.heappush(self._heap, entry)
+
+    def keys(self) -> list[str]:
+        return list(self._entries)
+
+    def discard(self, key: str):
+        self._entries.pop(key, None)
+
+    def _skip_stale(self):
+        while self._heap and self._entries.get(self._heap[0][3]) is not self._heap[0]:
+            heapq.heappop(self._heap)
+
+    def next_due(self) -> float | None:
+        self._skip_stale()
+        return self._heap[0][0] if self._heap else None
+
+    def pop_due(self, now: float, limit: int) -> list[tuple[str, float]]:
+        """
+        Removes and returns up to `limit` (key, due time) pairs that are due at `now`.
+        """
+        due = []
+        while len(due) < limit:
+            self._skip_stale()
+            if not self._heap or self._heap[0][0] > now:
+                break
+            entry = heapq.heappop(self._heap)
+            del self._entries[entry[3]]
+            due.append((entry[3], entry[0]))
+        return due
+
+class Scheduler:
+    """
+    Long-running service that keeps wallet scores and token prices fresh.
+    - Tracked wallets (the top SCHEDULER_MAX_WALLETS by score, bots excluded)
+      are re-scored from their per-token PnL (through the provider router). Each is due again after an
+      interval that shrinks with its score, so high-value wallets stay near
+      real time while low-value ones are refreshed rarely.
+    - Tokens with local price history have their prices refreshed through the
+      batched Moralis price lookup once they are SCHEDULER_PRICE_REFRESH_SECONDS stale.
+    - Discovery runs every SCHEDULER_DISCOVERY_SECONDS.
+    Every API call made by these jobs first takes a token from one shared
+    budget (SCHEDULER_API_CALLS_PER_MINUTE), so all of them fit in the same
+    quota. stop() stops taking new work and drains the jobs in flight.
+    """
+
+    def __init__(self, calls_per_minute: float = SCHEDULER_API_CALLS_PER_MINUTE, burst: float = SCHEDULER_API_BURST,
+                 max_concurrency: int = SCHEDULER_MAX_CONCURRENCY, max_wallets: int = SCHEDULER_MAX_WALLETS,
+                 price_refresh_seconds: float = SCHEDULER_PRICE_REFRESH_SECONDS,
+                 discovery_seconds: float = SCHEDULER_DISCOVERY_SECONDS, sync_seconds: float = SCHEDULER_SYNC_SECONDS):
+        self.budget = TokenBucket(calls_per_minute / 60.0, burst)
+        self.max_wallets = max_wallets
+        self.price_refresh_seconds = price_refresh_seconds
+        self.discovery_seconds = discovery_seconds
+        self.sync_seconds = sync_seconds
+        self.wallets = RefreshQueue()
+        self.prices = RefreshQueue()
+        self._slots = asyncio.Semaphore(max_concurrency)
+        self._in_flight: set[asyncio.Task] = set()
+        # Wallets and mints with a job in flight; they're rescheduled when it finishes
+        self._busy: set[str] = set()
+        self._stopping = asyncio.Event()
+        self.stats = {"wallets_refreshed": 0, "prices_refreshed": 0, "discovery_runs": 0, "failures": 0}
+
+    async def _spend(self, calls: float) -> bool:
+        """
+        Waits for `calls` from the shared budget.
+        Returns:
+            bool: False if the scheduler is stopping, in which case nothing was spent.
+        """
+        if self._stopping.is_set():
+            return False
+        acquire = asyncio.ensure_future(self.budget.acquire(calls))
+        stopping = asyncio.ensure_future(self._stopping.wait())
+        done, _ = await asyncio.wait({acquire, stopping}, return_when=asyncio.FIRST_COMPLETED)
+        stopping.cancel()
+        if acquire not in done:
+            acquire.cancel()
+            return False
+        return True
+
+    def sync_targets(self):
+        """
+        Schedules newly tracked wallets and tokens, and drops wallets that are no longer tracked.
+        New wallets are due at once, best first; new tokens once their last price is stale.
+        """
+        now = time.time()
+        tracked = registry.top(self.max_wallets)
+        tracked_addresses = {wallet_address for wallet_address, _ in tracked}
+        for wallet_address in [key for key in self.wallets.keys() if key not in tracked_addresses]:
+            self.wallets.discard(wallet_address)
+        for wallet_address, score in tracked:
+            if wallet_address not in self.wallets and wallet_address not in self._busy:
+                self.wallets.schedule(wallet_address, now, score)
+        for mint in price_store.price_store.mints():
+            if mint not in self.prices and mint not in self._busy:
+                latest = price_store.price_store.latest(mint)
+                self.prices.schedule(mint, (latest[0] if latest else 0.0) + self.price_refresh_seconds)
+        _QUEUE_DEPTH.set(len(self.wallets), queue="refresh_wallets")
+        _QUEUE_DEPTH.set(len(self.prices), queue="refresh_prices")
+
+    def _start(self, keys: list[str], job):
+        self._busy.update(keys)
+        task = asyncio.create_task(job)
+        self._in_flight.add(task)
+
+        def done(task):
+            self._in_flight.discard(task)
+            self._busy.difference_update(keys)
+            self._slots.release()
+
+        task.add_done_callback(done)
+
+    async def refresh_wallet(self, wallet_address: str):
+        """
+        Re-scores one wallet from its full PnL, and reschedules it by its new score.
+        """
+        try:
+            pnl = await provider_router.get_wallet_positions(wallet_address)
+            record = registry.get(wallet_address)
+            if pnl and record:
+                positions = analyzer.PositionColumns.from_wallet_pnl({wallet_address: pnl})
+                results = analyzer.analyze_positions(positions)
+                if results:
+                    record["score"] = results[0]["score"]
+                    record["is_bot"] = results[0]["is_bot"]
+                    registry.upsert(record)
+                self.stats["wallets_refreshed"] += 1
+            _JOBS.inc(job="wallet", outcome="ok" if pnl else "empty")
+        except Exception as e:
+            self.stats["failures"] += 1
+            _JOBS.inc(job="wallet", outcome="failed")
+            event(logger, logging.WARNING, "wallet_refresh_failed", wallet=wallet_address, error=e)
+        score = registry.get_score(wallet_address)
+        if score is not None and not self._stopping.is_set():
+            self.wallets.schedule(wallet_address, time.time() + refresh_interval(score), score)
+
+    async def refresh_prices(self, mints: list[str]):
+        """
+        Refreshes a batch of token prices into the local price store.
+        """
+        try:
+            prices = await moralis_client.get_token_prices(mints)
+            now = time.time()
+            for mint, payload in prices.items():
+                if payload:
+                    price_store.record_price(mint, payload.get("usdPrice"), now)
+            self.stats["prices_refreshed"] += sum(1 for payload in prices.values() if payload)
+            _JOBS.inc(job="prices", outcome="ok")
+        except Exception as e:
+            self.stats["failures"] += 1
+            _JOBS.inc(job="prices", outcome="failed")
+            event(logger, logging.WARNING, "price_refresh_failed", mints=len(mints), error=e)
+        if not self._stopping.is_set():
+            due = time.time() + self.price_refresh_seconds
+            for mint in mints:
+                self.prices.schedule(mint, due)
+
+    async def _discovery_loop(self):
+        while not self._stopping.is_set():
+            try:
+                # Mints are charged in the fetch stage, so ones skipped as fresh cost nothing
+                await discovery.discover_and_store_wallets(spend=self._spend)
+                self.stats["discovery_runs"] += 1
+                _JOBS.inc(job="discovery", outcome="ok")
+            except Exception as e:
+                self.stats["failures"] += 1
+                _JOBS.inc(job="discovery", outcome="failed")
+                event(logger, logging.ERROR, "discovery_failed", exc_info=e)
+            # Pick up the wallets and tokens it found
+            self.sync_targets()
+            try:
+                await asyncio.wait_for(self._stopping.wait(), timeout=self.discovery_seconds)
+            except asyncio.TimeoutError:
+                pass
+
+    async def _refresh_loop(self):
+        last_sync = time.monotonic()
+        while not self._stopping.is_set():
+            if time.monotonic() - last_sync >= self.sync_seconds:
+                self.sync_targets()
+                last_sync = time.monotonic()
+            now = time.time()
+            wallet_due = self.wallets.next_due()
+            price_due = self.prices.next_due()
+            # Whichever queue has the stalest work goes next
+            if wallet_due is not None and wallet_due <= now and (price_due is None or wallet_due <= price_due):
+                await self._slots.acquire()
+                if not await self._spend(1):
+                    self._slots.release()
+                    break
+                # Popped only now, so a wallet dropped while waiting for the budget isn't refreshed
+                due = self.wallets.pop_due(time.time(), 1)
+                if not due:
+                    self._slots.release()
+                    continue
+                wallet_address, due_at = due[0]
+                _LATENESS.observe(max(0.0, time.time() - due_at), job="wallet")
+                self._start([wallet_address], self.refresh_wallet(wallet_address))
+            elif price_due is not None and price_due <= now:
+                await self._slots.acquire()
+                due = self.prices.pop_due(now, MORALIS_PRICE_BATCH_SIZE)
+                if not await self._spend(math.ceil(len(due) / MORALIS_PRICE_BATCH_SIZE)):
+                    self._slots.release()
+                    break
+                for _, due_at in due:
+                    _LATENESS.observe(max(0.0, time.time() - due_at), job="prices")
+                mints = [mint for mint, _ in due]
+                self._start(mints, self.refresh_prices(mints))
+            else:
+                upcoming = [due for due in (wallet_due, price_due) if due is not None]
+                timeout = min([_IDLE_SECONDS] + [max(0.0, due - now) for due in upcoming])
+                try:
+                    await asyncio.wait_for(self._stopping.wait(), timeout=timeout)
+                except asyncio.TimeoutError:
+                    pass
+            _QUEUE_DEPTH.set(len(self.wallets), queue="refresh_wallets")
+            _QUEUE_DEPTH.set(len(self.prices), queue="refresh_prices")
+
+    async def _flush_loop(self):
+        # Score changes go out in bulk, like discovery's writes
+        while not self._stopping.is_set():
+            try:
+                await asyncio.wait_for(self._stopping.wait(), timeout=self.sync_seconds)
+            except asyncio.TimeoutError:
+                pass
+            await registry.flush()
+
+    async def run(self):
+        """
+        Runs until stop() is called, then waits (up to SCHEDULER_DRAIN_SECONDS)
+        for the jobs in flight and flushes the registry.
+        """
+        event(logger, logging.INFO, "scheduler_started", wallets=min(len(registry), self.max_wallets),
+              calls_per_minute=self.budget.rate * 60)
+        self.sync_targets()
+        loops = [asyncio.create_task(self._refresh_loop()), asyncio.create_task(self._flush_loop())]
+        if self.discovery_seconds > 0:
+            loops.append(asyncio.create_task(self._discovery_loop()))
+        try:
+            await self._stopping.wait()
+        finally:
+            self._stopping.set()
+            # Discovery drains itself: its feed stops, and mints already fetched are written
+            await asyncio.wait(loops, timeout=SCHEDULER_DRAIN_SECONDS)
+            if self._in_flight:
+                await asyncio.wait(set(self._in_flight), timeout=SCHEDULER_DRAIN_SECONDS)
+            tasks = loops + list(self._in_flight)
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            await registry.flush()
+            event(logger, logging.INFO, "scheduler_stopped", **self.stats)
+
+    def stop(self):
+        self._stopping.set()